@@ -0,0 +1,11 @@
+"""Componentes compartidos por las etapas del pipeline ETLQ.
+
+Common se importa como paquete de nivel superior (``from Common.config import config``), así
+que test/src/ETLQ debe estar en sys.path. Los módulos de las etapas no lo modifican al
+importarse; lo fijan los puntos de entrada: cli.py, pipeline_runner.py, daemon_service.py y
+main.py (por estar en test/src/ETLQ), Extract/ExtractInterface.py,
+Proccess/ProcessorInterface.py, Extraction_Data_Metatrader5/main.py y
+test/src/PERFORMANCE/benchmarks/run_benchmarks.py. Los módulos con bloque __main__
+(Validation.py, duplicate_detector.py, TL_table_Date_historic.py...) añaden test/src/ETLQ a
+sys.path solo cuando se ejecutan directamente (python <ruta del módulo>).
+"""
@@ -0,0 +1,168 @@
+import os
+import copy
+import json
+
+# Registro central de rutas, brokers y parámetros de etapa. Solo usa la librería estándar
+# para que cli.py pueda importarlo sin cargar pandas ni MetaTrader5.
+#
+# Variables de entorno (los procesos hijos las heredan):
+# - HERMESDB_DATA_ROOT: carpeta de datos. Por defecto, test/data del repositorio.
+# - HERMESDB_CONFIG: archivo JSON con sobrescrituras. Por defecto, <data_root>/hermesdb.json
+#   si existe. Claves admitidas (todas opcionales):
+#       {"data_root": "...", "paths": {"processed": "..."}, "brokers": ["Oanda"],
+#        "stages": {"process": {"timezone_offsets": {"Oanda": 3}},
+#                   "extract": {"sessions": {"Oanda": {"day_offset_hours": 0, "week_start": "SUN"}}}}}
+#   Las rutas relativas se resuelven contra data_root; los parámetros de cada etapa se
+#   combinan con los valores por defecto.
+DATA_ROOT_ENV = "HERMESDB_DATA_ROOT"
+CONFIG_ENV = "HERMESDB_CONFIG"
+CONFIG_FILE_NAME = "hermesdb.json"
+
+ETLQ_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DATA_ROOT = os.path.abspath(os.path.join(ETLQ_DIR, "..", "..", "data"))
+
+# Rutas con nombre, relativas a data_root
+DEFAULT_PATHS = {
+    "raw": "raw",
+    "credentials": "raw/config.csv",
+    "external": "external",
+    "swaps": "external/datos_swaps",
+    "symbol_info": "external/symbol_info.csv",
+    "processed": "processed",
+    "symbol_info_processed": "processed/symbol_info_procesado.csv",
+    # Caché de formas canónicas de símbolos (symbol_canonicalizer.SymbolCanonicalizer.shared)
+    "symbol_cache": "interim/symbol_cache.json",
+    "backup": "backup",
+    "table_assets": "backup/Table_Assets.csv",
+    "table_broker": "backup/Table_Broker.csv",
+    "table_market": "backup/Table_market.csv",
+    "table_sector": "backup/Table_Sector.csv",
+    "database": "backup/hermesdb.sqlite",
+    "logs": "logs",
+    "extract_logs": "logs/Extract_Data_metatrader5",
+    "pipeline_reports": "logs/pipeline",
+    "daemon_logs": "logs/daemon",
+}
+
+DEFAULT_BROKERS = ["Darwinex", "Dukascopy", "Oanda", "Pepperstone", "Tickmill"]
+
+# Parámetros por defecto de cada etapa
+DEFAULT_STAGES = {
+    "extract": {
+        "start_date": "2000-01-01",
+        # Instrumentación de profiling_utils: "off", "time", "rss" o "tracemalloc" (la variable
+        # HERMESDB_PROFILE y --profile de la CLI tienen prioridad)
+        "profile": "off",
+        # Límites de sesión de cada broker para la política "resample" (hora del servidor, ver
+        # modules/resampler.py). Los servidores van en UTC+2 (process.timezone_offsets): el día
+        # de trading empieza a las 00:00 del servidor y la barra semanal, el domingo
+        "sessions": {broker: {"day_offset_hours": 0, "week_start": "SUN"} for broker in DEFAULT_BROKERS},
+    },
+    "process": {
+        "columns_to_clean": ["open", "high", "low", "close"],
+        # Cada broker utiliza una hora local que corresponde a UTC+2
+        "timezone_offsets": {broker: 2 for broker in DEFAULT_BROKERS},
+        "bar_store_dir": None,
+        "bar_store_encoded": False,
+    },
+    "validate": {
+        "timeframes": ["H1", "H4", "D1", "W1", "MN1"],
+    },
+    "pipeline": {
+        "cpu": None,
+        # Procesos de descarga por broker; ocupan unidades de cpu del grafo (None = cpu / 2)
+        "extract_workers": None,
+        "min_headroom": 0.1,
+        # Borrar las barras con la llave única repetida antes de crear los índices
+        "drop_duplicates": False,
+    },
+    "daemon": {
+        # Solo se escucha en la máquina local
+        "host": "127.0.0.1",
+        "port": 8765,
+        # Actualización incremental programada (None o 0 = solo bajo demanda)
+        "interval_minutes": 60,
+        "workers_per_broker": None,
+        "cpu": None,
+        # Limpiar y validar cada broker tras actualizarlo
+        "process": True,
+    },
+}
+
+
+class Config:
+    """
+    Rutas de datos, brokers y parámetros de etapa del pipeline.
+
+    Los valores por defecto (DEFAULT_PATHS, DEFAULT_BROKERS, DEFAULT_STAGES) se combinan con
+    el archivo JSON de sobrescrituras, de modo que cambiar de equipo solo requiere fijar
+    HERMESDB_DATA_ROOT o editar hermesdb.json en lugar de tocar cada módulo.
+    """
+
+    def __init__(self, data_root: str = None, overrides: dict = None):
+        overrides = overrides or {}
+        self.data_root = os.path.abspath(data_root or overrides.get("data_root") or DEFAULT_DATA_ROOT)
+        self.paths = dict(DEFAULT_PATHS, **overrides.get("paths", {}))
+        self.brokers = list(overrides.get("brokers") or DEFAULT_BROKERS)
+        self.stages = copy.deepcopy(DEFAULT_STAGES)
+        for stage, params in overrides.get("stages", {}).items():
+            self.stages.setdefault(stage, {}).update(params)
+
+    @classmethod
+    def load(cls, config_file: str = None) -> "Config":
+        """
+        Configuración del entorno: HERMESDB_DATA_ROOT y el archivo de sobrescrituras
+        (config_file, HERMESDB_CONFIG o <data_root>/hermesdb.json si existe).
+        """
+        data_root = os.environ.get(DATA_ROOT_ENV)
+        config_file = config_file or os.environ.get(CONFIG_ENV)
+        if not config_file:
+            default_file = os.path.join(data_root or DEFAULT_DATA_ROOT, CONFIG_FILE_NAME)
+            config_file = default_file if os.path.exists(default_file) else None
+        overrides = {}
+        if config_file:
+            with open(config_file, encoding="utf-8") as f:
+                overrides = json.load(f)
+        return cls(data_root, overrides)
+
+    def path(self, name: str, *parts: str) -> str:
+        """
+        Ruta absoluta con nombre (ver DEFAULT_PATHS), opcionalmente con subrutas.
+
+        Args:
+            name (str): Nombre de la ruta, p. ej. "processed" o "credentials".
+            parts (str): Componentes añadidos al final, p. ej. path("processed", "Oanda.csv").
+        """
+        if name not in self.paths:
+            raise KeyError(f"Ruta desconocida: {name}. Disponibles: {', '.join(sorted(self.paths))}")
+        return os.path.join(self.data_root, os.path.normpath(self.paths[name]), *parts)
+
+    def stage(self, name: str) -> dict:
+        """Copia de los parámetros de una etapa (se puede modificar sin afectar al registro)."""
+        return copy.deepcopy(self.stages.get(name, {}))
+
+    def as_dict(self) -> dict:
+        return {
+            "data_root": self.data_root,
+            "paths": {name: self.path(name) for name in sorted(self.paths)},
+            "brokers": self.brokers,
+            "stages": self.stages,
+        }
+
+
+_config = None
+_config_pid = None
+
+
+def config() -> Config:
+    """Configuración del proceso actual (se lee una vez por proceso)."""
+    global _config, _config_pid
+    if _config is None or _config_pid != os.getpid():
+        _config = Config.load()
+        _config_pid = os.getpid()
+    return _config
+
+
+def data_path(name: str, *parts: str) -> str:
+    """Atajo de config().path(name, *parts)."""
+    return config().path(name, *parts)
@@ -0,0 +1,120 @@
+import os
+import psutil
+import pandas as pd
+
+# Variables de entorno: presupuesto global (MB) y proceso raíz cuyo árbol se mide.
+# Los procesos hijos (pools de multiprocessing) heredan ambas, de modo que todos los
+# workers comparten el mismo presupuesto.
+BUDGET_ENV = "HERMESDB_MEMORY_BUDGET_MB"
+ROOT_PID_ENV = "HERMESDB_MEMORY_ROOT_PID"
+
+
+class MemoryGovernor:
+    """
+    Controla el tamaño de los chunks de lectura con un presupuesto global de memoria (RSS).
+
+    - El presupuesto se fija en MB (budget_mb o la variable HERMESDB_MEMORY_BUDGET_MB) o,
+      por defecto, como budget_fraction de la memoria total.
+    - El consumo se mide como el RSS del árbol de procesos del pipeline (proceso raíz y
+      sus hijos), no solo del proceso actual.
+    - Entre chunks se recalcula el tamaño a partir de la memoria por fila observada y del
+      margen libre: rows = margen * chunk_fraction / (bytes_por_fila * amplification).
+      amplification cubre las copias que hace la transformación de cada chunk.
+    """
+
+    _shared = None
+
+    def __init__(self, budget_mb: float = None, budget_fraction: float = 0.5, chunk_fraction: float = 0.25,
+                 amplification: float = 4.0, min_rows: int = 1000, max_rows: int = 5_000_000,
+                 initial_rows: int = 100000):
+        assert 0 < budget_fraction <= 1, "El budget_fraction debe estar entre 0 y 1."
+        assert 0 < chunk_fraction <= 1, "El chunk_fraction debe estar entre 0 y 1."
+        if budget_mb is None and os.environ.get(BUDGET_ENV):
+            budget_mb = float(os.environ[BUDGET_ENV])
+        if budget_mb is None:
+            budget_mb = psutil.virtual_memory().total * budget_fraction / 1024**2
+        self.budget_bytes = int(budget_mb * 1024**2)
+        self.chunk_fraction = chunk_fraction
+        self.amplification = amplification
+        self.min_rows = min_rows
+        self.max_rows = max_rows
+        self.initial_rows = initial_rows
+        self.bytes_per_row = None
+        # El primer governor del árbol fija la raíz; los hijos la heredan por entorno
+        os.environ.setdefault(ROOT_PID_ENV, str(os.getpid()))
+        self.root_pid = int(os.environ[ROOT_PID_ENV])
+
+    @classmethod
+    def shared(cls) -> "MemoryGovernor":
+        """Instancia única por proceso usada por todos los lectores por chunks del proyecto."""
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    def rss(self) -> int:
+        """RSS en bytes del árbol de procesos del pipeline."""
+        try:
+            root = psutil.Process(self.root_pid)
+            processes = [root] + root.children(recursive=True)
+        except psutil.Error:
+            processes = [psutil.Process()]
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                continue
+        return total
+
+    def headroom(self) -> int:
+        """Bytes libres dentro del presupuesto (nunca más que la memoria disponible del sistema)."""
+        free_budget = self.budget_bytes - self.rss()
+        return max(min(free_budget, psutil.virtual_memory().available), 0)
+
+    def observe(self, df: pd.DataFrame):
+        """Actualiza la memoria por fila (media móvil) con un chunk ya leído."""
+        if df is None or len(df) == 0:
+            return
+        per_row = df.memory_usage(deep=True).sum() / len(df)
+        self.bytes_per_row = per_row if self.bytes_per_row is None else 0.7 * self.bytes_per_row + 0.3 * per_row
+
+    def chunk_size(self, max_rows: int = None, chunk_fraction: float = None) -> int:
+        """
+        Número de filas recomendado para el siguiente chunk.
+
+        Args:
+            max_rows (int): Límite superior adicional (p. ej. el chunksize pedido por el usuario).
+            chunk_fraction (float): Fracción del margen libre que puede ocupar el chunk.
+        """
+        upper = min(self.max_rows, max_rows) if max_rows else self.max_rows
+        if self.bytes_per_row is None:
+            # Sin observaciones aún: el primer chunk usa el límite pedido o initial_rows
+            return max(upper if max_rows else min(self.initial_rows, upper), 1)
+        fraction = chunk_fraction or self.chunk_fraction
+        rows = int(self.headroom() * fraction // (self.bytes_per_row * self.amplification))
+        return max(min(rows, upper), min(self.min_rows, upper))
+
+    def estimate_rows(self, sample: pd.DataFrame, max_rows: int = None, chunk_fraction: float = None) -> int:
+        """Observa una muestra y devuelve el tamaño de chunk resultante."""
+        self.observe(sample)
+        return self.chunk_size(max_rows, chunk_fraction)
+
+    def read_csv_chunks(self, path: str, max_rows: int = None, chunk_fraction: float = None, **read_csv_kwargs):
+        """
+        Equivalente a pd.read_csv(path, chunksize=...) pero ajustando el tamaño de cada chunk
+        según el presupuesto y la memoria observada en los chunks anteriores.
+
+        Args:
+            path (str): Ruta del CSV.
+            max_rows (int): Límite superior de filas por chunk.
+            chunk_fraction (float): Fracción del margen libre por chunk.
+            **read_csv_kwargs: Argumentos adicionales de pd.read_csv.
+        """
+        with pd.read_csv(path, iterator=True, **read_csv_kwargs) as reader:
+            while True:
+                try:
+                    chunk = reader.get_chunk(self.chunk_size(max_rows, chunk_fraction))
+                except StopIteration:
+                    return
+                self.observe(chunk)
+                yield chunk
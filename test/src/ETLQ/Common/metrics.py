@@ -0,0 +1,358 @@
+# ----------------------------
+# Descripcion
+# ----------------------------
+"""Este código define el registro de métricas del pipeline (MetricsRegistry) con contadores,
+gauges e histogramas por nombre y etiquetas, sin dependencias externas. Cada proceso guarda el
+estado acumulado de su registro en un snapshot JSON dentro de la carpeta del run, y collect()
+los fusiona en el proceso padre: los contadores e histogramas se suman y los gauges conservan
+el máximo. El resultado se exporta en el formato de texto de Prometheus (export_text) o como
+filas de un CSV histórico (export_csv). Con HERMESDB_METRICS=off las métricas no registran
+nada."""
+# ----------------------------
+# librerias y dependencias
+# ----------------------------
+
+# Standard library imports
+import os
+import csv
+import glob
+import json
+import bisect
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+# ----------------------------
+# Conexiones
+# ----------------------------
+
+# Componentes compartidos entre etapas (test/src/ETLQ/Common)
+from Common.run_context import current_run_id, run_dir
+
+# ----------------------------
+# Codigo
+# ----------------------------
+
+# Variables de entorno (los procesos hijos las heredan):
+# - HERMESDB_METRICS: "on" (por defecto) u "off".
+# - HERMESDB_METRICS_DIR: carpeta donde cada proceso guarda su snapshot
+#   (<dir>/<run_id>/<pid>.json). Por defecto, <tmp>/hermesdb_metrics. Las carpetas de runs
+#   antiguos se borran al empezar uno nuevo (ver Common/run_context.py).
+METRICS_ENV = "HERMESDB_METRICS"
+METRICS_DIR_ENV = "HERMESDB_METRICS_DIR"
+
+# Buckets por defecto (segundos) para latencias de llamadas al terminal y de E/S
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Buckets para tamaños (barras o filas por llamada/lote)
+SIZE_BUCKETS = (0, 10, 100, 1000, 10000, 100000, 1000000)
+
+CSV_COLUMNS = ["run_id", "timestamp", "metric", "type", "labels", "le", "value"]
+
+
+def metrics_enabled() -> bool:
+    return os.environ.get(METRICS_ENV, "on").strip().lower() not in ("off", "0", "false", "no")
+
+
+def metrics_dir() -> str:
+    return os.environ.get(METRICS_DIR_ENV) or os.path.join(tempfile.gettempdir(), "hermesdb_metrics")
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Counter:
+    """Contador monótono. Se suma entre procesos."""
+
+    kind = "counter"
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def state(self):
+        return self.value
+
+    def merge(self, state):
+        self.value += state
+
+
+class Gauge:
+    """Valor instantáneo. Entre procesos se conserva el máximo (p. ej. picos de memoria o de cola)."""
+
+    kind = "gauge"
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+    def state(self):
+        return self.value
+
+    def merge(self, state):
+        self.value = max(self.value, state)
+
+
+class Histogram:
+    """Histograma de buckets fijos (límites superiores inclusivos) con suma y número de observaciones."""
+
+    kind = "histogram"
+
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self):
+        """Context manager que observa la duración del bloque en segundos."""
+        return _Timer(self)
+
+    def state(self):
+        return {"buckets": list(self.buckets), "counts": self.counts, "sum": self.sum, "count": self.count}
+
+    def merge(self, state):
+        if tuple(state["buckets"]) != self.buckets:
+            raise ValueError("No se pueden fusionar histogramas con buckets distintos.")
+        self.counts = [a + b for a, b in zip(self.counts, state["counts"])]
+        self.sum += state["sum"]
+        self.count += state["count"]
+
+    def cumulative(self) -> list:
+        """(límite, observaciones acumuladas) por bucket, terminando en +Inf."""
+        result, total = [], 0
+        for bound, n in zip(list(self.buckets) + [float("inf")], self.counts):
+            total += n
+            result.append((bound, total))
+        return result
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class _NullMetric:
+    """Métrica vacía devuelta con HERMESDB_METRICS=off."""
+
+    def inc(self, amount: float = 1):
+        pass
+
+    def dec(self, amount: float = 1):
+        pass
+
+    def set(self, value: float):
+        pass
+
+    def observe(self, value: float):
+        pass
+
+    def time(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_METRIC = _NullMetric()
+_KINDS = {"counter": Counter, "gauge": Gauge, "histogram": Histogram}
+
+
+class MetricsRegistry:
+    """
+    Registro en memoria de contadores, gauges e histogramas por (nombre, etiquetas).
+
+    Cada proceso tiene su registro (shared()). flush() guarda el estado acumulado del proceso
+    en <metrics_dir>/<run_id>/<pid>.json (reemplazo atómico), de modo que los workers de un
+    pool, que terminan sin atexit, lo llaman al final de cada tarea. collect() fusiona en el
+    proceso padre los snapshots de todos los procesos del run: los contadores e histogramas
+    se suman y los gauges conservan el máximo. export_text() escribe el formato de
+    exposición de texto de Prometheus y export_csv() añade un snapshot a un CSV histórico.
+    """
+
+    _shared = None
+    _shared_pid = None
+
+    def __init__(self, enabled: bool = None, run_id: str = None, directory: str = None):
+        self.enabled = metrics_enabled() if enabled is None else enabled
+        self.run_id = run_id or current_run_id()
+        self.directory = directory or metrics_dir()
+        self.pid = os.getpid()
+        self.metrics = {}
+        self.help = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls) -> "MetricsRegistry":
+        """Instancia única por proceso (se recrea en los procesos hijos)."""
+        if cls._shared is None or cls._shared_pid != os.getpid():
+            cls._shared = cls()
+            cls._shared_pid = os.getpid()
+        return cls._shared
+
+    def _get(self, kind: str, name: str, help_text: str, labels: dict, **kwargs):
+        if not self.enabled:
+            return _NULL_METRIC
+        key = (name, _label_key(labels))
+        metric = self.metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self.metrics.get(key)
+                if metric is None:
+                    metric = self.metrics[key] = _KINDS[kind](**kwargs)
+                    if help_text:
+                        self.help.setdefault(name, help_text)
+        if metric.kind != kind:
+            raise TypeError(f"La métrica {name} ya está registrada como {metric.kind}.")
+        return metric
+
+    def counter(self, name: str, help_text: str = "", **labels) -> Counter:
+        return self._get("counter", name, help_text, labels)
+
+    def gauge(self, name: str, help_text: str = "", **labels) -> Gauge:
+        return self._get("gauge", name, help_text, labels)
+
+    def histogram(self, name: str, help_text: str = "", buckets: tuple = LATENCY_BUCKETS, **labels) -> Histogram:
+        return self._get("histogram", name, help_text, labels, buckets=buckets)
+
+    def remove(self, name: str, **labels):
+        """
+        Elimina una serie (p. ej. un gauge con el símbolo en curso al terminar la tarea) para
+        que el snapshot no acumule una serie por cada valor de etiqueta que tuvo el proceso.
+        """
+        with self._lock:
+            self.metrics.pop((name, _label_key(labels)), None)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            items = list(self.metrics.items())
+        return {
+            "pid": self.pid,
+            "help": dict(self.help),
+            "metrics": [
+                {"name": name, "labels": dict(labels), "type": metric.kind, "state": metric.state()}
+                for (name, labels), metric in items
+            ],
+        }
+
+    def spool_path(self) -> str:
+        return os.path.join(self.directory, self.run_id, f"{self.pid}.json")
+
+    def flush(self):
+        """Guarda el snapshot acumulado de este proceso (sustituye al anterior)."""
+        if not self.enabled or not self.metrics:
+            return
+        path = self.spool_path()
+        run_dir(self.directory, self.run_id)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+
+    def collect(self) -> "MetricsRegistry":
+        """Registro con la fusión de los snapshots de todos los procesos del run (incluido este)."""
+        self.flush()
+        merged = MetricsRegistry(enabled=True, run_id=self.run_id, directory=self.directory)
+        for path in sorted(glob.glob(os.path.join(self.directory, self.run_id, "*.json"))):
+            with open(path, encoding="utf-8") as f:
+                merged.merge_snapshot(json.load(f))
+        return merged
+
+    def merge_snapshot(self, snapshot: dict):
+        """Fusiona en este registro un snapshot de otro proceso (ver snapshot())."""
+        for name, text in snapshot.get("help", {}).items():
+            self.help.setdefault(name, text)
+        for item in snapshot["metrics"]:
+            kwargs = {"buckets": tuple(item["state"]["buckets"])} if item["type"] == "histogram" else {}
+            self._get(item["type"], item["name"], "", item["labels"], **kwargs).merge(item["state"])
+
+    @staticmethod
+    def _format_labels(labels: tuple, extra: dict = None) -> str:
+        pairs = list(labels) + list((extra or {}).items())
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+    @staticmethod
+    def _metric_samples(name: str, labels: tuple, metric):
+        """(nombre, etiquetas, le, valor) de una métrica; los histogramas en buckets acumulados."""
+        if metric.kind == "histogram":
+            for bound, total in metric.cumulative():
+                yield f"{name}_bucket", labels, bound, total
+            yield f"{name}_sum", labels, None, metric.sum
+            yield f"{name}_count", labels, None, metric.count
+        else:
+            yield name, labels, None, metric.value
+
+    def export_text(self, path: str) -> str:
+        """Escribe las métricas en el formato de exposición de texto de Prometheus."""
+        lines, current = [], None
+        for (name, labels), metric in sorted(self.metrics.items()):
+            if name != current:
+                current = name
+                if name in self.help:
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} {metric.kind}")
+            for sample_name, sample_labels, bound, value in self._metric_samples(name, labels, metric):
+                extra = None if bound is None else {"le": "+Inf" if bound == float("inf") else repr(float(bound))}
+                lines.append(f"{sample_name}{self._format_labels(sample_labels, extra)} {value}")
+        _ensure_parent(path)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        return path
+
+    def export_csv(self, path: str) -> str:
+        """Añade un snapshot (una fila por muestra) al CSV; la cabecera solo si el archivo es nuevo."""
+        _ensure_parent(path)
+        header = not os.path.exists(path) or os.path.getsize(path) == 0
+        timestamp = datetime.now().isoformat(timespec="seconds")
+        with open(path, "a", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            if header:
+                writer.writerow(CSV_COLUMNS)
+            for (name, labels), metric in sorted(self.metrics.items()):
+                for sample_name, _, bound, value in self._metric_samples(name, labels, metric):
+                    le = "" if bound is None else ("+Inf" if bound == float("inf") else bound)
+                    writer.writerow([self.run_id, timestamp, sample_name, metric.kind,
+                                     json.dumps(dict(labels)), le, value])
+        return path
+
+
+def _ensure_parent(path: str):
+    parent_dir = os.path.dirname(path)
+    if parent_dir:
+        os.makedirs(parent_dir, exist_ok=True)
+
+
+def registry() -> MetricsRegistry:
+    """Registro de métricas del proceso actual."""
+    return MetricsRegistry.shared()
@@ -0,0 +1,206 @@
+import os
+import glob
+import json
+import time
+from collections import deque
+
+from Common.metrics import MetricsRegistry, metrics_dir
+
+# Variable de entorno (los procesos hijos la heredan):
+# - HERMESDB_PROGRESS: "tqdm" (por defecto) muestra las barras de progreso de cada etapa;
+#   "off" las desactiva cuando el avance se sigue en el panel de operaciones (main.py), ya
+#   que las barras de los distintos procesos se intercalan en la consola.
+PROGRESS_ENV = "HERMESDB_PROGRESS"
+
+# Ventana (segundos) sobre la que se calculan las tasas (símbolos/s, barras/s, filas/s)
+RATE_WINDOW = 30.0
+
+# Contadores de avance por etapa: (etapa, métrica, unidad)
+STAGE_COUNTERS = (
+    ("extract", "extract_symbols_total", "símbolos"),
+    ("process", "process_rows_read_total", "filas"),
+    ("transform", "process_rows_transformed_total", "filas"),
+    ("load", "load_rows_total", "filas"),
+)
+
+
+def progress_bars_enabled() -> bool:
+    """False si HERMESDB_PROGRESS desactiva las barras de tqdm (usar con disable=not ...)."""
+    return os.environ.get(PROGRESS_ENV, "tqdm").strip().lower() not in ("off", "0", "false", "no")
+
+
+def latest_run_id(directory: str = None) -> str:
+    """run_id con el snapshot de métricas más reciente en la carpeta de métricas (o None)."""
+    directory = directory or metrics_dir()
+    runs = [path for path in glob.glob(os.path.join(directory, "*")) if os.path.isdir(path)]
+    if not runs:
+        return None
+    return os.path.basename(max(runs, key=os.path.getmtime))
+
+
+class _Rate:
+    """Tasa por segundo de un valor acumulado sobre una ventana de tiempo."""
+
+    def __init__(self, window: float = RATE_WINDOW):
+        self.window = window
+        self.points = deque()
+
+    def update(self, now: float, value: float) -> float:
+        self.points.append((now, value))
+        while len(self.points) > 2 and now - self.points[0][0] > self.window:
+            self.points.popleft()
+        (first_time, first_value), (last_time, last_value) = self.points[0], self.points[-1]
+        elapsed = last_time - first_time
+        return max(last_value - first_value, 0) / elapsed if elapsed > 0 else 0.0
+
+
+class PipelineStatus:
+    """
+    Estado en vivo del pipeline a partir de los snapshots de métricas de sus procesos
+    (<metrics_dir>/<run_id>/<pid>.json, ver Common/metrics.py).
+
+    refresh() solo vuelve a leer los snapshots modificados desde la lectura anterior, de modo
+    que su coste está acotado por el número de procesos y no por la duración del run. Devuelve
+    un diccionario con el avance por broker, los workers activos y su símbolo, CPU y RSS por
+    proceso (publicados por SystemMonitor) y el avance, la tasa y la ETA de cada etapa.
+
+    Métricas que usa:
+    - extract_symbols_planned{broker} y extract_workers{broker} (gauges) y
+      extract_symbols_total{broker,status}.
+    - extract_worker_symbol{pid,broker,symbol}: 1 mientras el worker descarga ese símbolo; el
+      worker elimina la serie al terminar, de modo que hay como mucho una por pid.
+    - mt5_copy_rates_range_bars (histograma): barras descargadas.
+    - process_cpu_percent, process_rss_mib y process_alive por pid (SystemMonitor).
+    - Los contadores de STAGE_COUNTERS para el resto de etapas.
+    """
+
+    def __init__(self, run_id: str = None, directory: str = None, rate_window: float = RATE_WINDOW):
+        self.directory = directory or metrics_dir()
+        self.run_id = run_id
+        self.rate_window = rate_window
+        self._snapshots = {}
+        self._mtimes = {}
+        self._rates = {}
+        self._current_run = None
+
+    def _rate(self, key, now: float, value: float) -> float:
+        rate = self._rates.get(key)
+        if rate is None:
+            rate = self._rates[key] = _Rate(self.rate_window)
+        return rate.update(now, value)
+
+    def _read_snapshots(self):
+        run_id = self.run_id or latest_run_id(self.directory)
+        if run_id is None:
+            return None
+        if run_id != self._current_run:
+            # Nuevo run: se descartan los snapshots y las tasas del anterior
+            self._current_run = run_id
+            self._snapshots, self._mtimes, self._rates = {}, {}, {}
+        for path in glob.glob(os.path.join(self.directory, run_id, "*.json")):
+            try:
+                mtime = os.path.getmtime(path)
+                if self._mtimes.get(path) == mtime:
+                    continue
+                with open(path, encoding="utf-8") as f:
+                    self._snapshots[path] = json.load(f)
+                self._mtimes[path] = mtime
+            except (OSError, ValueError):
+                # El snapshot se está reemplazando o se eliminó; se usa el anterior
+                continue
+        merged = MetricsRegistry(enabled=True, run_id=run_id, directory=self.directory)
+        for snapshot in self._snapshots.values():
+            merged.merge_snapshot(snapshot)
+        return merged
+
+    def refresh(self) -> dict:
+        """Lee los snapshots modificados y devuelve el estado actual del run."""
+        merged = self._read_snapshots()
+        if merged is None:
+            return {"run_id": None, "brokers": [], "workers": [], "stages": [], "errors": 0}
+        now = time.monotonic()
+        planned, done, errors, pool_size = {}, {}, {}, {}
+        current = {}
+        processes = {}
+        totals = {}
+        bars = 0
+        for (name, labels), metric in merged.metrics.items():
+            labels = dict(labels)
+            if name == "extract_symbols_planned":
+                planned[labels["broker"]] = metric.value
+            elif name == "extract_workers":
+                pool_size[labels["broker"]] = metric.value
+            elif name == "extract_symbols_total":
+                broker = labels.get("broker", "")
+                done[broker] = done.get(broker, 0) + metric.value
+                if labels.get("status") == "error":
+                    errors[broker] = errors.get(broker, 0) + metric.value
+            elif name == "extract_worker_symbol":
+                current[labels["pid"]] = (labels["broker"], labels["symbol"])
+            elif name == "mt5_copy_rates_range_bars":
+                bars += metric.sum
+            elif name in ("process_cpu_percent", "process_rss_mib", "process_alive"):
+                processes.setdefault(labels["pid"], {})[name] = metric.value
+            if metric.kind == "counter":
+                totals[name] = totals.get(name, 0) + metric.value
+
+        brokers = []
+        for broker in sorted(set(planned) | set(done)):
+            total = planned.get(broker, 0)
+            completed = done.get(broker, 0)
+            rate = self._rate(("broker", broker), now, completed)
+            remaining = max(total - completed, 0)
+            brokers.append({
+                "broker": broker,
+                "planned": total,
+                "done": completed,
+                "errors": errors.get(broker, 0),
+                "workers": pool_size.get(broker, 0),
+                "active": sum(1 for active_broker, _ in current.values() if active_broker == broker),
+                "symbols_per_sec": rate,
+                "eta": remaining / rate if rate > 0 and total else None,
+            })
+
+        workers = []
+        for pid, values in sorted(processes.items()):
+            if not values.get("process_alive"):
+                continue
+            broker, symbol = current.get(pid, ("", ""))
+            workers.append({
+                "pid": pid,
+                "broker": broker,
+                "symbol": symbol,
+                "cpu": values.get("process_cpu_percent", 0.0),
+                "rss_mib": values.get("process_rss_mib", 0.0),
+            })
+        # Workers con símbolo en curso de los que SystemMonitor aún no ha publicado recursos
+        for pid, (broker, symbol) in sorted(current.items()):
+            if pid not in processes:
+                workers.append({"pid": pid, "broker": broker, "symbol": symbol, "cpu": None, "rss_mib": None})
+
+        stages = []
+        for stage, name, unit in STAGE_COUNTERS:
+            if name not in totals:
+                continue
+            value = totals[name]
+            rate = self._rate(("stage", stage), now, value)
+            total = sum(planned.values()) if stage == "extract" else None
+            remaining = max(total - value, 0) if total else None
+            stages.append({
+                "stage": stage,
+                "done": value,
+                "total": total,
+                "unit": unit,
+                "rate": rate,
+                "eta": remaining / rate if remaining is not None and rate > 0 else None,
+            })
+
+        return {
+            "run_id": self._current_run,
+            "brokers": brokers,
+            "workers": workers,
+            "stages": stages,
+            "symbols_per_sec": self._rate("symbols", now, sum(done.values())),
+            "bars_per_sec": self._rate("bars", now, bars),
+            "errors": sum(errors.values()),
+        }
@@ -0,0 +1,208 @@
+import io
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+# Cada entrada del índice describe un bloque contiguo de filas del CSV
+BLOCK_DTYPE = np.dtype([('first_id', '<i8'), ('last_id', '<i8'), ('offset', '<i8'), ('rows', '<i8')])
+INDEX_SUFFIX = ".ridx.npz"
+# Marca de CSV no indexable (con su tamaño y fecha de modificación), para no reintentar build
+UNINDEXABLE_SUFFIX = ".ridx.skip"
+
+
+class RegistroOffsetIndex:
+    """
+    Índice disperso registro_id -> offset en bytes de un CSV exportado (Table_Datos_historicos.csv,
+    datos_pre_mapping.csv).
+
+    export_multi escribe registro_id denso y creciente, así que basta con guardar, por cada
+    bloque de block_rows filas, el primer y último registro_id y el offset donde empieza el
+    bloque. Una búsqueda puntual o por rango localiza los bloques con searchsorted, hace seek
+    y parsea solo esos bytes.
+
+    El índice se guarda junto al CSV (<archivo>.ridx.npz) con el tamaño y la fecha de
+    modificación del CSV; si no coinciden al abrirlo, se reconstruye. Si el CSV no se puede
+    indexar, open() lo anota en <archivo>.ridx.skip y las siguientes llamadas fallan sin
+    volver a recorrer el archivo mientras el CSV no cambie.
+
+        index = RegistroOffsetIndex.open("Table_Datos_historicos.csv")
+        rows = index.lookup([77027691, 77051752])
+        rows = index.range(1000, 2000)
+    """
+
+    def __init__(self, csv_path: str, blocks: np.ndarray, columns: list, data_start: int):
+        self.csv_path = csv_path
+        self.blocks = blocks
+        self.columns = list(columns)
+        self.data_start = data_start
+
+    @staticmethod
+    def index_path(csv_path: str) -> str:
+        return csv_path + INDEX_SUFFIX
+
+    @classmethod
+    def build(cls, csv_path: str, block_rows: int = 10000, id_column: str = 'registro_id') -> "RegistroOffsetIndex":
+        """
+        Construye el índice leyendo el CSV una vez en binario (sin parsear las filas).
+
+        Raises:
+            ValueError: Si no existe la columna o los registro_id no son crecientes.
+        """
+        with open(csv_path, 'rb') as f:
+            header = f.readline()
+            columns = header.decode('utf-8').rstrip('\r\n').split(',')
+            if id_column not in columns:
+                raise ValueError(f"El CSV no contiene la columna '{id_column}'.")
+            position = columns.index(id_column)
+            data_start = f.tell()
+            entries = []
+            offset = data_start
+            block = None
+            for line in f:
+                if block is None:
+                    block = [int(float(line.split(b',')[position])), 0, offset, 0]
+                block[3] += 1
+                offset += len(line)
+                last_line = line
+                if block[3] == block_rows:
+                    block[1] = int(float(last_line.split(b',')[position]))
+                    entries.append(tuple(block))
+                    block = None
+            if block is not None:
+                block[1] = int(float(last_line.split(b',')[position]))
+                entries.append(tuple(block))
+        blocks = np.array(entries, dtype=BLOCK_DTYPE)
+        cls._check_sorted(blocks)
+        return cls(csv_path, blocks, columns, data_start)
+
+    @staticmethod
+    def _check_sorted(blocks: np.ndarray):
+        if len(blocks) and ((blocks['last_id'] < blocks['first_id']).any()
+                            or (blocks['first_id'][1:] <= blocks['last_id'][:-1]).any()):
+            raise ValueError("Los registro_id del CSV no son crecientes; no se puede indexar por offset.")
+
+    def save(self, path: str = None):
+        """Guarda el índice junto al CSV con su tamaño y fecha de modificación."""
+        stat = os.stat(self.csv_path)
+        if os.path.exists(self.csv_path + UNINDEXABLE_SUFFIX):
+            os.remove(self.csv_path + UNINDEXABLE_SUFFIX)
+        np.savez(
+            path or self.index_path(self.csv_path),
+            blocks=self.blocks,
+            columns=np.array(self.columns),
+            meta=np.array([self.data_start, stat.st_size, stat.st_mtime_ns], dtype='i8'),
+        )
+
+    @classmethod
+    def load(cls, csv_path: str, path: str = None):
+        """Carga el índice guardado; devuelve None si no existe o el CSV cambió."""
+        path = path or cls.index_path(csv_path)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            data_start, size, mtime_ns = data['meta'].tolist()
+            stat = os.stat(csv_path)
+            if stat.st_size != size or stat.st_mtime_ns != mtime_ns:
+                return None
+            return cls(csv_path, data['blocks'], data['columns'].tolist(), data_start)
+
+    @staticmethod
+    def _csv_signature(csv_path: str) -> list:
+        stat = os.stat(csv_path)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    @classmethod
+    def unindexable_reason(cls, csv_path: str):
+        """Motivo anotado por open() si el CSV (sin cambios desde entonces) no se pudo indexar."""
+        path = csv_path + UNINDEXABLE_SUFFIX
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, encoding='utf-8') as f:
+                marker = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if marker.get('csv') != cls._csv_signature(csv_path):
+            return None
+        return marker.get('reason')
+
+    @classmethod
+    def open(cls, csv_path: str, block_rows: int = 10000) -> "RegistroOffsetIndex":
+        """
+        Índice vigente del CSV: lo carga si está al día o lo construye y lo guarda.
+
+        Raises:
+            ValueError: Si el CSV no se puede indexar; el fallo queda anotado junto al CSV y
+                las llamadas siguientes lo repiten sin releer el archivo.
+        """
+        index = cls.load(csv_path)
+        if index is None:
+            reason = cls.unindexable_reason(csv_path)
+            if reason is not None:
+                raise ValueError(reason)
+            try:
+                index = cls.build(csv_path, block_rows=block_rows)
+            except ValueError as e:
+                with open(csv_path + UNINDEXABLE_SUFFIX, 'w', encoding='utf-8') as f:
+                    json.dump({'csv': cls._csv_signature(csv_path), 'reason': str(e)}, f)
+                raise
+            index.save()
+        return index
+
+    def _read_blocks(self, first: int, last: int) -> pd.DataFrame:
+        """Parsea los bloques [first, last] del índice con una sola lectura contigua."""
+        start = int(self.blocks['offset'][first])
+        end = int(self.blocks['offset'][last + 1]) if last + 1 < len(self.blocks) else None
+        with open(self.csv_path, 'rb') as f:
+            f.seek(start)
+            data = f.read() if end is None else f.read(end - start)
+        return pd.read_csv(io.BytesIO(data), header=None, names=self.columns)
+
+    def range(self, low: int, high: int) -> pd.DataFrame:
+        """Filas con low <= registro_id <= high."""
+        first = int(np.searchsorted(self.blocks['last_id'], low, side='left'))
+        last = int(np.searchsorted(self.blocks['first_id'], high, side='right')) - 1
+        if first >= len(self.blocks) or last < first:
+            return pd.DataFrame(columns=self.columns)
+        df = self._read_blocks(first, last)
+        return df[(df['registro_id'] >= low) & (df['registro_id'] <= high)].reset_index(drop=True)
+
+    def lookup(self, registro_ids) -> pd.DataFrame:
+        """Filas de una lista de registro_id; cada bloque necesario se lee una sola vez."""
+        ids = np.unique(np.asarray(registro_ids, dtype='int64'))
+        block_ids = np.searchsorted(self.blocks['first_id'], ids, side='right') - 1
+        valid = block_ids >= 0
+        valid[valid] = ids[valid] <= self.blocks['last_id'][block_ids[valid]]
+        frames = []
+        for block in np.unique(block_ids[valid]):
+            df = self._read_blocks(block, block)
+            frames.append(df[df['registro_id'].isin(ids)])
+        if not frames:
+            return pd.DataFrame(columns=self.columns)
+        return pd.concat(frames, ignore_index=True)
+
+
+class RegistroIndexWriter:
+    """
+    Construye el índice mientras se escribe el CSV, sin releerlo: el escritor registra el
+    offset antes de cada bloque de filas. Lo usa CSVSink con index_block_rows.
+    """
+
+    def __init__(self, csv_path: str, columns: list, data_start: int):
+        self.csv_path = csv_path
+        self.columns = list(columns)
+        self.data_start = data_start
+        self._entries = []
+
+    def add_block(self, offset: int, registro_ids: pd.Series):
+        if len(registro_ids):
+            self._entries.append((int(registro_ids.iloc[0]), int(registro_ids.iloc[-1]), offset, len(registro_ids)))
+
+    def finish(self) -> RegistroOffsetIndex:
+        blocks = np.array(self._entries, dtype=BLOCK_DTYPE)
+        RegistroOffsetIndex._check_sorted(blocks)
+        index = RegistroOffsetIndex(self.csv_path, blocks, self.columns, self.data_start)
+        index.save()
+        return index
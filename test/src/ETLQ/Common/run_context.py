@@ -0,0 +1,96 @@
+import os
+import time
+import shutil
+import uuid
+from datetime import datetime
+
+# Identificador de la ejecución del pipeline. Se guarda en el entorno para que los procesos
+# hijos (pools de multiprocessing con spawn) y las etapas lanzadas desde el mismo proceso
+# compartan el mismo run_id.
+RUN_ID_ENV = "HERMESDB_RUN_ID"
+
+# Carpetas por run_id (<dir>/<run_id>/<pid>.*) que escriben los procesos de cada ejecución:
+# - métricas (Common/metrics.py): HERMESDB_METRICS_DIR, por defecto <tmp>/hermesdb_metrics
+#   (activas por defecto, HERMESDB_METRICS="off" las desactiva).
+# - trazas (Common/tracing.py): HERMESDB_TRACE_DIR, por defecto <tmp>/hermesdb_traces.
+# - muestreo de pilas (performance/sampling_profiler.py): HERMESDB_SAMPLING_DIR, por defecto
+#   <tmp>/hermesdb_samples.
+# Al crear la carpeta de un run se borran las de runs anteriores con más de
+# HERMESDB_SPOOL_MAX_AGE_DAYS días (7) o que excedan los HERMESDB_SPOOL_KEEP_RUNS más
+# recientes (20); los resultados que interesan se exportan antes (export_text, export_csv,
+# export_chrome_trace, export_collapsed).
+SPOOL_KEEP_RUNS_ENV = "HERMESDB_SPOOL_KEEP_RUNS"
+SPOOL_MAX_AGE_ENV = "HERMESDB_SPOOL_MAX_AGE_DAYS"
+
+
+def new_run_id() -> str:
+    """Crea un run_id nuevo (fecha y hora más un sufijo aleatorio) y lo fija en el entorno."""
+    run_id = f"{datetime.now():%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:6]}"
+    os.environ[RUN_ID_ENV] = run_id
+    return run_id
+
+
+def current_run_id() -> str:
+    """run_id de la ejecución en curso; si no existe se crea uno."""
+    return os.environ.get(RUN_ID_ENV) or new_run_id()
+
+
+def _last_modified(path: str) -> float:
+    """Última modificación de una carpeta de run o de cualquiera de sus archivos."""
+    latest = os.path.getmtime(path)
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                latest = max(latest, entry.stat().st_mtime)
+            except OSError:
+                continue
+    return latest
+
+
+def prune_run_dirs(directory: str, keep: str = None, keep_runs: int = None, max_age_days: float = None) -> list:
+    """
+    Borra las carpetas de run de directory más antiguas que max_age_days o que excedan las
+    keep_runs más recientes (por defecto, HERMESDB_SPOOL_MAX_AGE_DAYS y HERMESDB_SPOOL_KEEP_RUNS).
+
+    Args:
+        directory (str): Carpeta con una subcarpeta por run_id.
+        keep (str): run_id que no se borra nunca (el de la ejecución en curso).
+
+    Returns:
+        list: Rutas borradas.
+    """
+    keep_runs = keep_runs or int(os.environ.get(SPOOL_KEEP_RUNS_ENV) or 20)
+    max_age_days = max_age_days or float(os.environ.get(SPOOL_MAX_AGE_ENV) or 7)
+    runs = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir() and entry.name != keep:
+                    try:
+                        runs.append((_last_modified(entry.path), entry.path))
+                    except OSError:
+                        continue
+    except FileNotFoundError:
+        return []
+    runs.sort(reverse=True)
+    cutoff = time.time() - max_age_days * 86400
+    # keep_runs incluye la carpeta del run en curso
+    limit = keep_runs - 1 if keep else keep_runs
+    removed = [path for position, (mtime, path) in enumerate(runs) if position >= limit or mtime < cutoff]
+    for path in removed:
+        shutil.rmtree(path, ignore_errors=True)
+    return removed
+
+
+def run_dir(directory: str, run_id: str) -> str:
+    """
+    Carpeta <directory>/<run_id>. El proceso que la crea borra las de runs antiguos
+    (ver prune_run_dirs).
+    """
+    path = os.path.join(directory, run_id)
+    try:
+        os.makedirs(path)
+    except FileExistsError:
+        return path
+    prune_run_dirs(directory, keep=run_id)
+    return path
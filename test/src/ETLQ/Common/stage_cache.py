@@ -0,0 +1,288 @@
+# ----------------------------
+# Descripcion
+# ----------------------------
+"""Este código define la clase StageCache, una caché de las salidas de las etapas indexada por
+contenido: la clave de una entrada es el hash de los archivos de entrada, de los parámetros y
+del código de la etapa, de modo que una etapa sin cambios restaura su salida en lugar de
+volver a calcularla. El hash de cada archivo se memoriza por tamaño y fecha de modificación,
+y evict() elimina las entradas demasiado antiguas, las usadas hace más tiempo cuando se supera
+el tamaño máximo y los hashes memorizados de archivos que ya no existen o cambiaron. Está
+desactivada salvo con HERMESDB_STAGE_CACHE=on."""
+# ----------------------------
+# librerias y dependencias
+# ----------------------------
+
+# Standard library imports
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+
+# ----------------------------
+# Conexiones
+# ----------------------------
+
+# Componentes compartidos entre etapas (test/src/ETLQ/Common)
+from Common.metrics import registry
+
+# ----------------------------
+# Codigo
+# ----------------------------
+
+# Variables de entorno (los procesos hijos las heredan):
+# - HERMESDB_STAGE_CACHE: "off" (por defecto) u "on".
+# - HERMESDB_STAGE_CACHE_DIR: carpeta de la caché. Por defecto, una carpeta del directorio temporal.
+# - HERMESDB_STAGE_CACHE_MAX_MB: tamaño máximo; se eliminan primero las entradas usadas hace más tiempo.
+# - HERMESDB_STAGE_CACHE_MAX_AGE_DAYS: antigüedad máxima de una entrada desde que se creó.
+CACHE_ENV = "HERMESDB_STAGE_CACHE"
+CACHE_DIR_ENV = "HERMESDB_STAGE_CACHE_DIR"
+CACHE_MAX_MB_ENV = "HERMESDB_STAGE_CACHE_MAX_MB"
+CACHE_MAX_AGE_ENV = "HERMESDB_STAGE_CACHE_MAX_AGE_DAYS"
+
+# Se incluye en todas las claves: cambiarla invalida la caché completa
+CACHE_FORMAT = 1
+HASH_BLOCK = 1024 * 1024
+
+
+def cache_enabled() -> bool:
+    return os.environ.get(CACHE_ENV, "off").strip().lower() in ("on", "1", "true", "yes")
+
+
+def _sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _size(path: str) -> int:
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, name))
+                   for root, _, files in os.walk(path) for name in files)
+    return os.path.getsize(path)
+
+
+def _copy(source: str, target: str):
+    if os.path.isdir(target):
+        shutil.rmtree(target)
+    parent_dir = os.path.dirname(target)
+    if parent_dir:
+        os.makedirs(parent_dir, exist_ok=True)
+    if os.path.isdir(source):
+        shutil.copytree(source, target)
+    else:
+        shutil.copyfile(source, target)
+
+
+class StageCache:
+    """
+    Caché de salidas de etapas direccionada por contenido.
+
+    La clave de una ejecución es el SHA-256 del nombre de la etapa, del contenido de sus
+    entradas (archivos o carpetas completas), de sus parámetros y del código fuente de los
+    módulos de la etapa. Si la clave ya existe, restore() copia las salidas guardadas a sus
+    rutas en lugar de recalcularlas; si no, la etapa se ejecuta y store() guarda sus salidas.
+
+    El hash de cada archivo se memoriza en <root>/hashes por (ruta, tamaño, mtime), de modo
+    que las entradas sin cambios no se vuelven a leer. Cada entrada vive en
+    <root>/entries/<clave>/ con un manifest.json; se escribe en una carpeta temporal y se
+    renombra, por lo que varios procesos pueden compartir la caché. Tras cada store() se
+    eliminan las entradas con más de max_age_days y, si se supera max_bytes, las usadas
+    hace más tiempo, además de los hashes memorizados de archivos que ya no existen o cambiaron.
+    """
+
+    def __init__(self, root: str = None, max_bytes: int = None, max_age_days: float = None):
+        self.root = root or os.environ.get(CACHE_DIR_ENV) or os.path.join(tempfile.gettempdir(), "hermesdb_stage_cache")
+        self.max_bytes = max_bytes or int(float(os.environ.get(CACHE_MAX_MB_ENV) or 10240) * 1024**2)
+        self.max_age_days = max_age_days or float(os.environ.get(CACHE_MAX_AGE_ENV) or 30)
+        self.entries_dir = os.path.join(self.root, "entries")
+        self.hashes_dir = os.path.join(self.root, "hashes")
+        os.makedirs(self.entries_dir, exist_ok=True)
+        os.makedirs(self.hashes_dir, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> "StageCache":
+        """Caché configurada por entorno, o None si HERMESDB_STAGE_CACHE está desactivado."""
+        return cls() if cache_enabled() else None
+
+    # ---------------------------------------------------------------- claves
+
+    def file_hash(self, path: str) -> str:
+        """SHA-256 del contenido de un archivo, memorizado por (ruta, tamaño, mtime)."""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        memo_path = os.path.join(self.hashes_dir, hashlib.sha1(path.encode("utf-8")).hexdigest() + ".json")
+        try:
+            with open(memo_path, encoding="utf-8") as f:
+                memo = json.load(f)
+            if memo["size"] == stat.st_size and memo["mtime_ns"] == stat.st_mtime_ns:
+                return memo["sha256"]
+        except (OSError, ValueError, KeyError):
+            pass
+        digest = _sha256_file(path)
+        tmp_path = f"{memo_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"path": path, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}, f)
+        os.replace(tmp_path, memo_path)
+        return digest
+
+    def content_hash(self, path: str) -> str:
+        """Hash de un archivo o de una carpeta (nombres relativos y contenido de sus archivos)."""
+        if not os.path.isdir(path):
+            return self.file_hash(path)
+        digest = hashlib.sha256()
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                file_path = os.path.join(root, name)
+                digest.update(os.path.relpath(file_path, path).replace(os.sep, "/").encode("utf-8"))
+                digest.update(self.file_hash(file_path).encode("ascii"))
+        return digest.hexdigest()
+
+    def key(self, stage: str, inputs: list, params: dict = None, code: list = None) -> str:
+        """
+        Clave de una ejecución de la etapa.
+
+        Args:
+            stage (str): Nombre de la etapa.
+            inputs (list): Archivos o carpetas de entrada (el orden forma parte de la clave).
+            params (dict): Parámetros de la etapa (serializables a JSON; el resto con str()).
+            code (list): Archivos de código de la etapa (p. ej. __file__ de sus módulos).
+        """
+        digest = hashlib.sha256()
+        digest.update(f"{CACHE_FORMAT}\0{stage}\0".encode("utf-8"))
+        for path in inputs:
+            digest.update(self.content_hash(path).encode("ascii"))
+        digest.update(json.dumps(params or {}, sort_keys=True, default=str).encode("utf-8"))
+        for path in code or ():
+            digest.update(self.file_hash(path).encode("ascii"))
+        return digest.hexdigest()
+
+    # ---------------------------------------------------------------- entradas
+
+    def _entry(self, key: str) -> str:
+        return os.path.join(self.entries_dir, key)
+
+    def restore(self, key: str, outputs: list, stage: str = "") -> bool:
+        """Copia las salidas guardadas con la clave a outputs. False si la clave no existe."""
+        entry = self._entry(key)
+        manifest_path = os.path.join(entry, "manifest.json")
+        hits = registry().counter("stage_cache_requests_total", "Consultas a la caché de etapas",
+                                  stage=stage, result="hit")
+        misses = registry().counter("stage_cache_requests_total", "Consultas a la caché de etapas",
+                                    stage=stage, result="miss")
+        try:
+            with open(manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            misses.inc()
+            return False
+        if len(manifest["outputs"]) != len(outputs):
+            misses.inc()
+            return False
+        try:
+            for i, target in enumerate(outputs):
+                _copy(os.path.join(entry, "outputs", str(i)), target)
+        except FileNotFoundError:
+            # Otro proceso desalojó la entrada mientras se restauraba
+            misses.inc()
+            return False
+        # La fecha de modificación del manifest es la del último uso (para el desalojo)
+        try:
+            os.utime(manifest_path)
+        except OSError:
+            pass
+        hits.inc()
+        return True
+
+    def store(self, key: str, outputs: list, stage: str = ""):
+        """Guarda las salidas (archivos o carpetas) de una ejecución bajo la clave."""
+        entry = self._entry(key)
+        if os.path.exists(entry):
+            return
+        tmp_entry = f"{entry}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_entry, ignore_errors=True)
+        for i, source in enumerate(outputs):
+            _copy(source, os.path.join(tmp_entry, "outputs", str(i)))
+        manifest = {
+            "key": key,
+            "stage": stage,
+            "created": time.time(),
+            "outputs": [os.path.abspath(path) for path in outputs],
+            "size": _size(tmp_entry),
+        }
+        with open(os.path.join(tmp_entry, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        try:
+            os.rename(tmp_entry, entry)
+        except OSError:
+            # Otro proceso guardó la misma clave a la vez
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+        self.evict()
+
+    def entries(self) -> list:
+        """Entradas de la caché: manifest con la fecha del último uso (last_used)."""
+        result = []
+        for key in os.listdir(self.entries_dir):
+            manifest_path = os.path.join(self.entries_dir, key, "manifest.json")
+            try:
+                with open(manifest_path, encoding="utf-8") as f:
+                    manifest = json.load(f)
+                manifest["last_used"] = os.path.getmtime(manifest_path)
+            except (OSError, ValueError):
+                continue
+            result.append(manifest)
+        return result
+
+    def evict(self) -> list:
+        """Elimina las entradas caducadas y, si se supera max_bytes, las usadas hace más tiempo."""
+        now = time.time()
+        entries = sorted(self.entries(), key=lambda m: m["last_used"])
+        removed = [m for m in entries if now - m["created"] > self.max_age_days * 86400]
+        kept = [m for m in entries if m not in removed]
+        total = sum(m["size"] for m in kept)
+        while kept and total > self.max_bytes:
+            oldest = kept.pop(0)
+            total -= oldest["size"]
+            removed.append(oldest)
+        for manifest in removed:
+            shutil.rmtree(self._entry(manifest["key"]), ignore_errors=True)
+        self.prune_hashes()
+        return [m["key"] for m in removed]
+
+    def prune_hashes(self) -> int:
+        """
+        Elimina los hashes memorizados de archivos que ya no existen o cuyo tamaño o mtime
+        cambiaron (file_hash los recalcularía). Devuelve cuántos se eliminaron.
+        """
+        removed = 0
+        for name in os.listdir(self.hashes_dir):
+            memo_path = os.path.join(self.hashes_dir, name)
+            try:
+                with open(memo_path, encoding="utf-8") as f:
+                    memo = json.load(f)
+                stat = os.stat(memo["path"])
+                if memo["size"] == stat.st_size and memo["mtime_ns"] == stat.st_mtime_ns:
+                    continue
+            except FileNotFoundError:
+                # El archivo memorizado ya no existe (o el memo lo borró otro proceso)
+                pass
+            except (OSError, ValueError, KeyError):
+                # Memo ilegible: se borra, salvo el .tmp que otro proceso está escribiendo
+                if name.endswith(".tmp"):
+                    continue
+            try:
+                os.remove(memo_path)
+                removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def clear(self):
+        """Vacía la caché (entradas y hashes memorizados)."""
+        shutil.rmtree(self.root, ignore_errors=True)
+        os.makedirs(self.entries_dir, exist_ok=True)
+        os.makedirs(self.hashes_dir, exist_ok=True)
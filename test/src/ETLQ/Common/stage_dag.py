@@ -0,0 +1,283 @@
+# ----------------------------
+# Descripcion
+# ----------------------------
+"""Este código define la clase StageDAG, el grafo de tareas por etapa y broker que ejecuta el
+pipeline_runner: cada tarea arranca en cuanto terminan sus dependencias, de modo que la
+limpieza y la carga de un broker se solapan con la descarga del siguiente. La concurrencia se
+limita por recursos con capacidad (conexión de MT5, pool de cómputo, escritor de la base de
+datos) y por el margen de memoria del MemoryGovernor. Una tarea fallida omite solo a las que
+dependen de ella, y run() devuelve un informe con el tiempo por etapa, la espera por recursos
+de cada tarea y la ruta crítica (format_report, write_report)."""
+# ----------------------------
+# librerias y dependencias
+# ----------------------------
+
+# Standard library imports
+import os
+import json
+import time
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+# ----------------------------
+# Conexiones
+# ----------------------------
+
+# Componentes compartidos entre etapas (test/src/ETLQ/Common)
+from Common.run_context import current_run_id
+from Common.tracing import span
+from Common.memory_governor import MemoryGovernor
+
+# ----------------------------
+# Codigo
+# ----------------------------
+
+# Estados de una tarea del grafo
+PENDING, RUNNING, DONE, FAILED, SKIPPED = "pending", "running", "done", "failed", "skipped"
+
+# Capacidad por defecto de cada recurso. Cada tarea declara cuántas unidades usa:
+# - "mt5": conexiones al terminal de MetaTrader 5 del proceso principal (una a la vez).
+# - "cpu": tareas de cómputo en el pool de procesos del grafo.
+# - "db": escritores de la base de datos (SQLite admite un único escritor).
+DEFAULT_LIMITS = {"mt5": 1, "cpu": max(multiprocessing.cpu_count() - 1, 1), "db": 1}
+
+
+def _execute(name: str, stage: str, func, args: tuple, kwargs: dict):
+    """Ejecuta una tarea dentro de un span "task" (en un hilo o en un proceso del pool)."""
+    with span(name, cat="task", stage=stage):
+        return func(*args, **kwargs)
+
+
+class Task:
+    """Nodo del grafo: una etapa aplicada a una clave (broker o símbolo)."""
+
+    def __init__(self, stage: str, key: str, func, args: tuple, kwargs: dict, deps: list,
+                 resources: dict, mode: str):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Modo de ejecución desconocido: {mode}")
+        self.stage = stage
+        self.key = key
+        self.name = f"{stage}:{key}"
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.deps = deps
+        self.resources = resources
+        self.mode = mode
+        self.status = PENDING
+        self.ready_at = None
+        self.start = None
+        self.end = None
+        self.result = None
+        self.error = None
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start if self.start is not None and self.end is not None else 0.0
+
+    def as_dict(self, origin: float) -> dict:
+        def relative(value):
+            return None if value is None else round(value - origin, 3)
+        return {
+            "task": self.name,
+            "stage": self.stage,
+            "key": self.key,
+            "status": self.status,
+            "ready": relative(self.ready_at),
+            "start": relative(self.start),
+            "end": relative(self.end),
+            "duration": round(self.duration, 3),
+            # Tiempo listo pero esperando recursos
+            "wait": round(self.start - self.ready_at, 3) if self.start is not None else None,
+            "error": self.error,
+        }
+
+
+class StageDAG:
+    """
+    Grafo de tareas por etapa y clave (p. ej. clean:Oanda depende de extract:Oanda) que
+    ejecuta cada tarea en cuanto sus dependencias terminan, de modo que las etapas se
+    solapan entre brokers: se limpia Oanda mientras Darwinex aún se descarga.
+
+    La concurrencia se limita por recursos con capacidad (limits, ver DEFAULT_LIMITS): una
+    tarea solo arranca si todas las unidades que declara están libres. Las tareas "process"
+    se ejecutan en un pool de procesos (spawn; la función y sus argumentos deben poder
+    serializarse) y, además, solo arrancan si el MemoryGovernor deja al menos
+    min_headroom del presupuesto libre (salvo que no haya nada en ejecución). Las tareas
+    "thread" se ejecutan en hilos del proceso principal (p. ej. la descarga, que crea su
+    propio pool y usa la conexión de MT5 del proceso).
+
+    Si una tarea falla, las que dependen de ella se marcan como omitidas y el resto del
+    grafo continúa. run() devuelve un informe con el tiempo total, el tiempo por etapa, la
+    espera por recursos de cada tarea y la ruta crítica.
+    """
+
+    def __init__(self, limits: dict = None, min_headroom: float = 0.1):
+        self.limits = dict(DEFAULT_LIMITS, **(limits or {}))
+        self.min_headroom = min_headroom
+        self.tasks = []
+        self._in_use = {resource: 0 for resource in self.limits}
+
+    def add(self, stage: str, key: str, func, *args, deps: list = (), resources: dict = None,
+            mode: str = "thread", **kwargs) -> Task:
+        """
+        Añade una tarea al grafo.
+
+        Args:
+            stage (str): Etapa (extract, process, validate, load...).
+            key (str): Broker o símbolo.
+            func: Función a ejecutar con *args y **kwargs.
+            deps (list): Tareas de las que depende.
+            resources (dict): Unidades de cada recurso que ocupa, p. ej. {"cpu": 1}.
+            mode (str): "thread" o "process".
+        """
+        resources = resources or {}
+        unknown = set(resources) - set(self.limits)
+        if unknown:
+            raise ValueError(f"Recursos sin capacidad definida: {', '.join(sorted(unknown))}")
+        for resource, units in resources.items():
+            if units > self.limits[resource]:
+                raise ValueError(f"La tarea {stage}:{key} pide {units} {resource} y la capacidad es {self.limits[resource]}.")
+        task = Task(stage, key, func, args, kwargs, list(deps), resources, mode)
+        self.tasks.append(task)
+        return task
+
+    def _fits(self, task: Task, running: int) -> bool:
+        if any(self._in_use[r] + units > self.limits[r] for r, units in task.resources.items()):
+            return False
+        if task.mode == "process" and running and self.min_headroom:
+            governor = MemoryGovernor.shared()
+            if governor.headroom() < governor.budget_bytes * self.min_headroom:
+                return False
+        return True
+
+    def _acquire(self, task: Task, sign: int):
+        for resource, units in task.resources.items():
+            self._in_use[resource] += sign * units
+
+    def run(self, process_workers: int = None) -> dict:
+        """
+        Ejecuta el grafo hasta que no queden tareas pendientes.
+
+        Args:
+            process_workers (int): Procesos del pool. Por defecto, la capacidad de "cpu".
+        """
+        process_workers = process_workers or self.limits["cpu"]
+        origin = time.monotonic()
+        futures = {}
+        with span("pipeline", cat="stage", tasks=len(self.tasks)), \
+                ThreadPoolExecutor(max_workers=max(len(self.tasks), 1)) as threads, \
+                ProcessPoolExecutor(max_workers=process_workers,
+                                    mp_context=multiprocessing.get_context("spawn")) as processes:
+            while True:
+                now = time.monotonic()
+                for task in self.tasks:
+                    if task.status != PENDING:
+                        continue
+                    if any(dep.status in (FAILED, SKIPPED) for dep in task.deps):
+                        task.status = SKIPPED
+                        task.error = "dependencia fallida"
+                    elif task.ready_at is None and all(dep.status == DONE for dep in task.deps):
+                        task.ready_at = now
+
+                # Tareas listas en orden de llegada (y de inserción a igualdad)
+                ready = sorted((t for t in self.tasks if t.status == PENDING and t.ready_at is not None),
+                               key=lambda t: t.ready_at)
+                for task in ready:
+                    if not self._fits(task, len(futures)):
+                        continue
+                    self._acquire(task, +1)
+                    task.status = RUNNING
+                    task.start = time.monotonic()
+                    executor = processes if task.mode == "process" else threads
+                    futures[executor.submit(_execute, task.name, task.stage, task.func, task.args, task.kwargs)] = task
+
+                if not futures:
+                    break
+                finished, _ = wait(list(futures), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    task = futures.pop(future)
+                    task.end = time.monotonic()
+                    self._acquire(task, -1)
+                    try:
+                        task.result = future.result()
+                        task.status = DONE
+                    except Exception as e:  # pylint: disable=broad-except
+                        task.status = FAILED
+                        task.error = f"{type(e).__name__}: {e}"
+                        print(f"Tarea {task.name} fallida: {task.error}")
+        return self.report(origin, time.monotonic())
+
+    def critical_path(self) -> list:
+        """
+        Cadena de tareas que determina la duración total: desde la última tarea en terminar,
+        se retrocede por la dependencia que terminó más tarde.
+        """
+        finished = [t for t in self.tasks if t.end is not None]
+        if not finished:
+            return []
+        path = [max(finished, key=lambda t: t.end)]
+        while True:
+            deps = [dep for dep in path[-1].deps if dep.end is not None]
+            if not deps:
+                break
+            path.append(max(deps, key=lambda t: t.end))
+        return list(reversed(path))
+
+    def report(self, origin: float, end: float) -> dict:
+        wall = end - origin
+        stages = {}
+        for task in self.tasks:
+            stage = stages.setdefault(task.stage, {"tasks": 0, "seconds": 0.0, "first_start": None, "last_end": None})
+            stage["tasks"] += 1
+            stage["seconds"] += task.duration
+            if task.start is not None:
+                start, task_end = task.start - origin, task.end - origin
+                stage["first_start"] = start if stage["first_start"] is None else min(stage["first_start"], start)
+                stage["last_end"] = task_end if stage["last_end"] is None else max(stage["last_end"], task_end)
+        path = self.critical_path()
+        task_seconds = sum(task.duration for task in self.tasks)
+        return {
+            "run_id": current_run_id(),
+            "wall_seconds": round(wall, 3),
+            "task_seconds": round(task_seconds, 3),
+            # Paralelismo medio conseguido (1 = etapas en serie)
+            "parallelism": round(task_seconds / wall, 2) if wall > 0 else 0.0,
+            "critical_path_seconds": round(sum(task.duration for task in path), 3),
+            "critical_path": [task.as_dict(origin) for task in path],
+            "stages": {name: {k: round(v, 3) if isinstance(v, float) else v for k, v in values.items()}
+                       for name, values in stages.items()},
+            "tasks": [task.as_dict(origin) for task in self.tasks],
+            "failed": [task.name for task in self.tasks if task.status == FAILED],
+            "skipped": [task.name for task in self.tasks if task.status == SKIPPED],
+        }
+
+
+def format_report(report: dict) -> str:
+    """Resumen legible del informe de StageDAG.run()."""
+    lines = [
+        f"Run {report['run_id']}: {report['wall_seconds']:.1f} s "
+        f"(tareas {report['task_seconds']:.1f} s, paralelismo {report['parallelism']:.2f})",
+        f"Ruta crítica: {report['critical_path_seconds']:.1f} s",
+    ]
+    for task in report["critical_path"]:
+        lines.append(f"  {task['task']:<30} {task['duration']:>8.1f} s  (espera {task['wait'] or 0:.1f} s)")
+    lines.append("Etapas:")
+    for name, stage in report["stages"].items():
+        window = "-" if stage["first_start"] is None else f"{stage['first_start']:.1f}-{stage['last_end']:.1f} s"
+        lines.append(f"  {name:<12} {stage['tasks']:>3} tareas {stage['seconds']:>8.1f} s  ventana {window}")
+    if report["failed"]:
+        lines.append(f"Fallidas: {', '.join(report['failed'])}")
+    if report["skipped"]:
+        lines.append(f"Omitidas: {', '.join(report['skipped'])}")
+    return "\n".join(lines)
+
+
+def write_report(report: dict, path: str) -> str:
+    """Guarda el informe en JSON."""
+    parent_dir = os.path.dirname(path)
+    if parent_dir:
+        os.makedirs(parent_dir, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    return path
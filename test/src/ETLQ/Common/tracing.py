@@ -0,0 +1,271 @@
+# ----------------------------
+# Descripcion
+# ----------------------------
+"""Este código define el trazado de spans del pipeline: la clase Tracer (registro de spans por
+proceso), la clase Span y el context manager span, que marcan etapas, brokers, símbolos y, en
+modo "detail", meses, chunks y lotes. Cada proceso añade sus spans a un .jsonl propio dentro de
+la carpeta del run, de modo que los workers de un pool los dejan en disco sin cambiar lo que
+devuelven, y export_chrome_trace une los de todos los procesos en un único timeline en formato
+Chrome trace (chrome://tracing, ui.perfetto.dev). Con el trazado desactivado (por defecto) span
+devuelve un span vacío sin coste."""
+# ----------------------------
+# librerias y dependencias
+# ----------------------------
+
+# Standard library imports
+import os
+import json
+import glob
+import tempfile
+import threading
+import time
+
+# ----------------------------
+# Conexiones
+# ----------------------------
+
+# Componentes compartidos entre etapas (test/src/ETLQ/Common)
+from Common.run_context import current_run_id, run_dir
+
+# ----------------------------
+# Codigo
+# ----------------------------
+
+# Variables de entorno (los procesos hijos las heredan):
+# - HERMESDB_TRACE: "off" (por defecto), "on" (run, etapa, broker, símbolo, timeframe) o
+#   "detail" (además las llamadas por mes y por chunk).
+# - HERMESDB_TRACE_DIR: carpeta donde cada proceso vuelca sus spans (un .jsonl por PID
+#   dentro de <dir>/<run_id>/). Por defecto, <tmp>/hermesdb_traces. Las carpetas de runs
+#   antiguos se borran al empezar uno nuevo (ver Common/run_context.py).
+TRACE_ENV = "HERMESDB_TRACE"
+TRACE_DIR_ENV = "HERMESDB_TRACE_DIR"
+TRACE_MODES = ("off", "on", "detail")
+
+
+def trace_mode() -> str:
+    """Modo de trazado activo según HERMESDB_TRACE."""
+    mode = os.environ.get(TRACE_ENV, "off").strip().lower() or "off"
+    if mode in ("0", "false", "no"):
+        return "off"
+    if mode in ("1", "true", "yes"):
+        return "on"
+    if mode not in TRACE_MODES:
+        raise ValueError(f"Modo de trazado desconocido en {TRACE_ENV}: {mode}")
+    return mode
+
+
+def configure(mode: str, trace_dir: str = None):
+    """Fija el modo (y opcionalmente la carpeta) de trazado para este proceso y sus hijos."""
+    if mode not in TRACE_MODES:
+        raise ValueError(f"Modo de trazado desconocido: {mode}")
+    os.environ[TRACE_ENV] = mode
+    if trace_dir:
+        os.environ[TRACE_DIR_ENV] = trace_dir
+    Tracer.reset()
+
+
+def trace_dir() -> str:
+    return os.environ.get(TRACE_DIR_ENV) or os.path.join(tempfile.gettempdir(), "hermesdb_traces")
+
+
+class _NullSpan:
+    """Span vacío que se devuelve con el trazado desactivado (sin coste por llamada)."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """Intervalo con nombre, categoría y argumentos; se registra al salir del bloque with."""
+
+    __slots__ = ("tracer", "name", "cat", "args", "start_us", "start_perf")
+
+    def __init__(self, tracer: "Tracer", name: str, cat: str, args: dict):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def set(self, **args):
+        """Añade argumentos al span (p. ej. filas descargadas) antes de cerrarlo."""
+        self.args.update(args)
+
+    def __enter__(self):
+        self.tracer._enter()
+        self.start_us = time.time_ns() // 1000
+        self.start_perf = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration_us = (time.perf_counter() - self.start_perf) * 1e6
+        if exc_type is not None:
+            self.args["error"] = f"{exc_type.__name__}: {exc}"
+        self.tracer._record(self, duration_us)
+        return False
+
+
+class Tracer:
+    """
+    Registro de spans de un proceso con volcado a disco para unir varios procesos.
+
+    Los spans se guardan como eventos "X" (complete) del formato Chrome trace, con el
+    inicio en microsegundos de reloj de pared (común a todos los procesos de la máquina),
+    PID y TID; los visores (chrome://tracing, ui.perfetto.dev) los anidan por tiempo.
+    Cuando se cierra el span más externo de un hilo, los eventos pendientes se añaden a
+    <trace_dir>/<run_id>/<pid>.jsonl. Así los workers de un pool (que terminan sin atexit)
+    dejan sus spans en disco tarea a tarea sin cambiar lo que devuelven.
+    """
+
+    _instance = None
+    _instance_pid = None
+
+    def __init__(self, mode: str = None, run_id: str = None, directory: str = None):
+        self.mode = mode or trace_mode()
+        self.run_id = run_id or current_run_id()
+        self.directory = directory or trace_dir()
+        self.pid = os.getpid()
+        self.process_name = None
+        self.events = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._named = False
+
+    @classmethod
+    def get(cls) -> "Tracer":
+        """Instancia del proceso actual (se recrea en los procesos hijos)."""
+        if cls._instance is None or cls._instance_pid != os.getpid():
+            cls._instance = cls()
+            cls._instance_pid = os.getpid()
+        return cls._instance
+
+    @classmethod
+    def reset(cls):
+        cls._instance = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def spool_path(self, pid: int = None) -> str:
+        return os.path.join(self.directory, self.run_id, f"{pid or self.pid}.jsonl")
+
+    def span(self, name: str, cat: str = "function", detail: bool = False, **args):
+        if self.mode == "off" or (detail and self.mode != "detail"):
+            return _NULL_SPAN
+        return Span(self, name, cat, args)
+
+    def _enter(self):
+        self._local.depth = getattr(self._local, "depth", 0) + 1
+
+    def _record(self, span: Span, duration_us: float):
+        event = {
+            "name": span.name,
+            "cat": span.cat,
+            "ph": "X",
+            "ts": span.start_us,
+            "dur": round(duration_us, 1),
+            "pid": self.pid,
+            "tid": threading.get_ident(),
+            "args": span.args,
+        }
+        with self._lock:
+            self.events.append(event)
+        self._local.depth -= 1
+        if self._local.depth == 0:
+            self.flush()
+
+    def set_process_name(self, name: str):
+        """Nombre del proceso en el visor (por defecto "worker <pid>")."""
+        self.process_name = name
+        self._named = False
+
+    def flush(self):
+        """Añade los eventos pendientes al .jsonl del proceso."""
+        with self._lock:
+            if not self.events:
+                return
+            pending, self.events = self.events, []
+            if not self._named:
+                pending.insert(0, {
+                    "name": "process_name", "ph": "M", "pid": self.pid, "tid": 0,
+                    "args": {"name": self.process_name or f"worker {self.pid}"},
+                })
+                self._named = True
+        path = self.spool_path()
+        run_dir(self.directory, self.run_id)
+        with open(path, "a", encoding="utf-8") as f:
+            for event in pending:
+                f.write(json.dumps(event, default=str) + "\n")
+
+    def collect(self) -> list:
+        """Eventos de todos los procesos del run_id (incluye los pendientes de este proceso)."""
+        self.flush()
+        events = []
+        for path in sorted(glob.glob(os.path.join(self.directory, self.run_id, "*.jsonl"))):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        try:
+                            events.append(json.loads(line))
+                        except json.JSONDecodeError:
+                            # Línea truncada de un proceso interrumpido
+                            continue
+        # El nombre de proceso puede repetirse si se cambió con set_process_name
+        names = {}
+        spans = []
+        for event in events:
+            if event.get("ph") == "M":
+                names[event["pid"]] = event
+            else:
+                spans.append(event)
+        spans.sort(key=lambda e: (e["ts"], -e.get("dur", 0)))
+        return list(names.values()) + spans
+
+    def export_chrome_trace(self, path: str) -> str:
+        """
+        Escribe el timeline del run en formato Chrome trace (JSON), legible en
+        chrome://tracing y en ui.perfetto.dev.
+        """
+        parent_dir = os.path.dirname(path)
+        if parent_dir:
+            os.makedirs(parent_dir, exist_ok=True)
+        trace = {
+            "traceEvents": self.collect(),
+            "displayTimeUnit": "ms",
+            "otherData": {"run_id": self.run_id},
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(trace, f, default=str)
+        return path
+
+
+def span(name: str, cat: str = "function", detail: bool = False, **args):
+    """
+    Context manager que registra un span en el tracer del proceso:
+
+        with span("Oanda", cat="broker"):
+            ...
+
+    Categorías usadas en el pipeline: run, stage, broker, symbol, timeframe y, en modo
+    "detail", month/chunk/batch. Con el trazado desactivado no registra nada.
+    """
+    return Tracer.get().span(name, cat, detail, **args)
+
+
+def set_process_name(name: str):
+    Tracer.get().set_process_name(name)
+
+
+def export_chrome_trace(path: str) -> str:
+    """Exporta el timeline de todos los procesos del run en curso (ver Tracer.export_chrome_trace)."""
+    return Tracer.get().export_chrome_trace(path)
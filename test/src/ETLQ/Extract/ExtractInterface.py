@@ -3,18 +3,28 @@
 """este modulo para gestionar los componentes que realizan la extraccion de datos de Metatrader 5, este modulo es la interfaz y es el orquestador o controller de todo el procedimiento de extraccion este componentemanejara el orden de ejecucion y hace las llamadas para hacer las tareas."""
 
 #==============================# Importamos los módulos necesarios #==============================#
+import os
+import sys
+
+# Punto de entrada: test/src/ETLQ en sys.path para importar Common (ver Common/__init__.py)
+ETLQ_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ETLQ_DIR not in sys.path:
+    sys.path.append(ETLQ_DIR)
 
 #Módulos de Importación y Exportación entre Componentes
 from modules.Facade.ImportInterface import ImportInterface # Modulo de importacion de datos
 from modules.Facade.ExportInterface import ExportInterface # Modulo de exportacion de datos
+from Common.config import config, data_path # Registro de rutas y parámetros
 
-#Modulo de extraccion de datos_historicos de diferentes brokers 
-from modules.Extraction.MT5Extract import *
-from modules.Extraction.ExtractCostOperative import *
-from modules.Extraction.Clasification import *
+# Los módulos de extracción (pandas, MetaTrader5) se importan dentro de ExtractInterface()
+# para que importar este módulo no cargue el terminal ni pandas.
 #==============================#      Fuction main [Interface]       #==============================#
 def ExtractInterface():
-    
+    from datetime import datetime
+    import pandas as pd
+    from modules.Extraction.ExtractCostOperative import SwapExtractor
+    from modules.Extraction.Clasification import MT5DataExtractor
+
     #================# Extraction of data from Metatrader 5 #================#
     credentials = ImportInterface("ExtractImportCredentials")       
     # Modulo observer de MT5_extract
@@ -25,8 +35,8 @@ def ExtractInterface():
     # Importacion de als direcciones para el log y los datos
     log_folder, data_folder = ExportInterface("Log-Data")
 
-    # Especificamos el rango de fechas (por ejemplo, desde el 1 de enero de 2000 hasta hoy)
-    start_date = datetime(2000, 1, 1)
+    # Especificamos el rango de fechas (desde el inicio configurado para la etapa extract hasta hoy)
+    start_date = datetime.strptime(config().stage("extract")["start_date"], "%Y-%m-%d")
     end_date = datetime.now()
 
     #downloader = HistoricalDataDownloader(credentials_df, log_folder, data_folder, start_date, end_date) #Esta linea ejecuta la descarga de datos
@@ -37,8 +47,8 @@ def ExtractInterface():
     extractor = SwapExtractor(df_cred, output_dir=ExportInterface("swap_carpet"))
     #extractor.run() #Esta linea ejecuta la extraccion de los costos operativos swap ademas
     #================# Extraction OF INFOR OF aCTIVE from Metatrader 5 #================#
-    CSV_FILE = r"C:\Users\spinz\OneDrive\Documentos\Portafolio oficial\HERMESDB\HERMESDB\test\data\raw\config.csv"
-    OUTPUT_FILE = r"C:\Users\spinz\OneDrive\Documentos\Portafolio oficial\HERMESDB\HERMESDB\test\data\external\symbol_info.csv"
+    CSV_FILE = data_path("credentials")
+    OUTPUT_FILE = data_path("symbol_info")
     extractor = MT5DataExtractor(CSV_FILE, OUTPUT_FILE)
     extractor.run()
 if __name__ == '__main__':
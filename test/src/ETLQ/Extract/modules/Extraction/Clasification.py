@@ -1,6 +1,16 @@
 import MetaTrader5 as mt5
 import pandas as pd
 import os
+import sys
+
+# Ejecución directa del módulo (ver el bloque __main__): test/src/ETLQ en sys.path para
+# importar Common. Importado como biblioteca, la ruta la fija el punto de entrada.
+if __name__ == "__main__":
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+
+# Componentes compartidos entre etapas (test/src/ETLQ/Common)
+from Common.metrics import registry
+from Common.config import data_path
 
 class MT5DataExtractor:
     """
@@ -130,9 +140,13 @@ class MT5DataExtractor:
         """
         symbols = mt5.symbols_get()
         data = []
+        calls = registry().counter("mt5_symbol_info_calls_total", "Llamadas a symbol_info", broker=broker)
+        latency = registry().histogram("mt5_symbol_info_seconds", "Latencia de symbol_info", broker=broker)
 
         for symbol in symbols:
-            info = mt5.symbol_info(symbol.name)
+            calls.inc()
+            with latency.time():
+                info = mt5.symbol_info(symbol.name)
             if info:
                 isin = info.isin if info.isin else "N/A"
                 data.append({
@@ -185,7 +199,7 @@ class MT5DataExtractor:
 
 # Ejecución
 if __name__ == "__main__":
-    CSV_FILE = r"C:\Users\spinz\OneDrive\Documentos\Portafolio oficial\HERMESDB\HERMESDB\test\data\raw\config.csv"
-    OUTPUT_FILE = r"C:\Users\spinz\OneDrive\Documentos\Portafolio oficial\HERMESDB\HERMESDB\test\data\external\symbol_info.csv"
+    CSV_FILE = data_path("credentials")
+    OUTPUT_FILE = data_path("symbol_info")
     extractor = MT5DataExtractor(CSV_FILE, OUTPUT_FILE)
     extractor.run()
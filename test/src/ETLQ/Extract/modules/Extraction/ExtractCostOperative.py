@@ -3,6 +3,9 @@ import pandas as pd
 from datetime import datetime
 import MetaTrader5 as mt5
 
+# Componentes compartidos entre etapas (test/src/ETLQ/Common)
+from Common.metrics import registry
+
 class SwapExtractor:
     def __init__(self, credentials_df: pd.DataFrame, output_dir: str = "output"):
         self.credentials = self._procesar_credenciales(credentials_df)
@@ -43,8 +46,12 @@ class SwapExtractor:
         if symbols is None:
             print(f"[{broker}] No se pudo obtener la lista de símbolos: {mt5.last_error()}")
         else:
+            calls = registry().counter("mt5_symbol_info_calls_total", "Llamadas a symbol_info", broker=broker)
+            latency = registry().histogram("mt5_symbol_info_seconds", "Latencia de symbol_info", broker=broker)
             for symbol in symbols:
-                info = mt5.symbol_info(symbol.name)
+                calls.inc()
+                with latency.time():
+                    info = mt5.symbol_info(symbol.name)
                 if info is not None:
                     data[symbol.name] = {
                         "swap_long": info.swap_long,
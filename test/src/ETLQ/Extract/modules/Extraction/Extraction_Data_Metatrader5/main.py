@@ -15,14 +15,15 @@
 # TODO: [FEATURE] Se debe implementar el monitorio de recursos para diagnosticar problemas de rendimiento.
 # TODO: [FEATURE] Se debe optimizar las funciones y los modulos.
 # TODO: [FEATURE] Se debe terminar la documentacion una vez terminado la implementacion del monitoreo de recursos y la optimizacion de modulos y submodulos
-# TODO: [FEATURE] Recuerda agregarle las columnas run_id y id a system_monitor.csv
-# TODO: [FEATURE] Recuerda agregarle las columnas run_id y id a funtion_profiles.csv
 
 # ----------------------------
 # librerias y dependencias
 # ----------------------------
 
 # Standard library imports
+import os
+import sys
+import argparse
 import cProfile
 import pstats
 import multiprocessing as mp
@@ -35,10 +36,37 @@ import pandas as pd
 # Conexiones
 # ----------------------------
 
+# Punto de entrada: test/src/ETLQ en sys.path para importar Common (ver Common/__init__.py)
+ETLQ_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", ".."))
+if ETLQ_DIR not in sys.path:
+    sys.path.append(ETLQ_DIR)
+
+from Common.config import config, data_path
+from profiling_utils import PROFILE_ENV, PROFILE_MODES
+
+# Modo de instrumentación de profiling_utils ("off" por defecto): --profile, HERMESDB_PROFILE o
+# stages.extract.profile de la configuración, en ese orden. Se fija antes de importar los
+# módulos decorados; los workers lo heredan por el entorno.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Descarga histórica de MetaTrader 5 con monitorización.")
+    parser.add_argument("--profile", choices=PROFILE_MODES,
+                        help="Instrumentación por función. Por defecto, HERMESDB_PROFILE o la configuración.")
+    profile = parser.parse_args().profile
+    os.environ[PROFILE_ENV] = profile or os.environ.get(PROFILE_ENV) or config().stage("extract")["profile"]
+
 from modules.historical_data_downloader import HistoricalDataDownloader
 from performance.system_monitor import SystemMonitor
-from performance.function_profiles import ProfileExporter
-from profiling_utils import mem_profile, memory_usage_dict
+from performance.function_profiles import ProfileExporter, ProfileAggregator
+from performance.sampling_profiler import start_sampling, stop_sampling, export_collapsed, sampling_enabled
+from profiling_utils import mem_profile, memory_usage_dict, stats_frame
+
+# Componentes compartidos entre etapas (test/src/ETLQ/Common)
+from Common.run_context import current_run_id
+from Common.tracing import span, set_process_name, export_chrome_trace, trace_mode
+from Common.metrics import registry
+
+# Salidas de monitorización y profiling de la extracción (ver Common/config.py)
+LOG_DIR = data_path("extract_logs")
 
 
 # ----------------------------
@@ -46,14 +74,15 @@ from profiling_utils import mem_profile, memory_usage_dict
 # ----------------------------
 
 
-def run_downloader():
+def run_downloader() -> ProfileAggregator:
     """
     Ejecuta la descarga de datos históricos mientras se monitoriza el sistema.
     Separa la responsabilidad de la lógica de negocio y la monitorización.
+    Devuelve los perfiles fusionados de los workers del pool.
     """
     # Inicializa y arranca el monitor del sistema
     monitor = SystemMonitor(
-        csv_path=r"C:\Users\spinz\OneDrive\Documentos\Portafolio oficial\HERMESDB\HERMESDB\test\data\logs\Extract_Data_metatrader5\system_metrics.csv",
+        csv_path=os.path.join(LOG_DIR, "system_metrics.csv"),
         interval=1.0,
     )
     monitor.start()
@@ -64,10 +93,10 @@ def run_downloader():
         "OANDA": [6369670, "GetBun72+", float("nan"), "OANDA-Demo-1"],
     }
     credentials_df = pd.DataFrame(data)
-    LOG_FOLDER = r"C:\Users\spinz\OneDrive\Documentos\Portafolio oficial\HERMESDB\HERMESDB\test\data\logs"
-    DATA_FOLDER = r"C:\Users\spinz\OneDrive\Documentos\Portafolio oficial\HERMESDB\HERMESDB\test\data\backup"
+    LOG_FOLDER = data_path("logs")
+    DATA_FOLDER = data_path("backup")
 
-    start_date = datetime(2000, 1, 1)
+    start_date = datetime.strptime(config().stage("extract")["start_date"], "%Y-%m-%d")
     end_date = datetime.now()
 
     mp.set_start_method("spawn", force=True)
@@ -81,11 +110,13 @@ def run_downloader():
     )
 
     try:
-        downloader.process_all_brokers()
+        with span("extract", cat="stage"):
+            downloader.process_all_brokers()
     except Exception as e:
         print(f"Error durante la descarga: {e}")
     finally:
         monitor.stop()
+    return downloader.profile_aggregator
 
 
 @mem_profile
@@ -94,21 +125,28 @@ def main():
     Función principal decorada para monitorear el consumo de memoria.
     Cumple el principio de inversión de dependencias (DIP) al depender de abstracciones (funciones y clases).
     """
-    run_downloader()
+    set_process_name("extract")
+    # Muestreo de pilas del proceso principal; los workers lo arrancan en worker_initializer
+    start_sampling("extract")
+    with span("run", cat="run", run_id=current_run_id()):
+        return run_downloader()
 
 
 if __name__ == "__main__":
+    os.makedirs(LOG_DIR, exist_ok=True)
+
     # Inicia el perfilador de rendimiento
     profiler = cProfile.Profile()
     profiler.enable()
 
-    main()
+    worker_profiles = main()
 
     profiler.disable()
+    stop_sampling()
 
     # Exporta el perfil a un archivo de texto para análisis
     with open(
-        r"C:\Users\spinz\OneDrive\Documentos\Portafolio oficial\HERMESDB\HERMESDB\test\data\logs\Extract_Data_metatrader5\function_profiles.txt",
+        os.path.join(LOG_DIR, "function_profiles.txt"),
         "w",
         encoding="utf-8",
     ) as f:
@@ -116,8 +154,40 @@ if __name__ == "__main__":
         stats_obj.sort_stats(pstats.SortKey.TIME)
         stats_obj.print_stats()
 
-    # Exporta el perfil a CSV utilizando la clase ProfileExporter
-    exporter = ProfileExporter(profiler, memory_usage_dict)
+    # Exporta el perfil a CSV (proceso principal, cada worker por PID y total) con ProfileExporter
+    exporter = ProfileExporter(profiler, memory_usage_dict, worker_profiles)
+    # function_profiles.prof: estadísticas totales en formato pstats para profile_diff.py
     exporter.export_to_csv(
-        r"C:\Users\spinz\OneDrive\Documentos\Portafolio oficial\HERMESDB\HERMESDB\test\data\logs\Extract_Data_metatrader5\function_profiles.csv"
+        os.path.join(LOG_DIR, "function_profiles.csv"),
+        stats_output=os.path.join(LOG_DIR, "function_profiles.prof"),
     )
+
+    # Exporta llamadas, percentiles de tiempo y memoria por función instrumentada
+    stats_frame().to_csv(
+        os.path.join(LOG_DIR, "function_timings.csv"),
+        index=False,
+    )
+
+    # Contadores e histogramas del run (proceso principal y workers): exposición de texto
+    # con el último snapshot y CSV histórico con una fila por muestra y run_id
+    run_metrics = registry().collect()
+    run_metrics.export_text(
+        os.path.join(LOG_DIR, "metrics.prom")
+    )
+    run_metrics.export_csv(
+        os.path.join(LOG_DIR, "metrics.csv")
+    )
+
+    # Timeline del run (proceso principal y workers) para chrome://tracing o ui.perfetto.dev;
+    # solo con HERMESDB_TRACE="on" o "detail"
+    if trace_mode() != "off":
+        export_chrome_trace(
+            os.path.join(LOG_DIR, "trace.json")
+        )
+
+    # Pilas colapsadas del muestreo (un archivo por proceso y otro por run) para flamegraphs;
+    # solo con HERMESDB_SAMPLING="on"
+    if sampling_enabled():
+        export_collapsed(
+            os.path.join(LOG_DIR, "samples")
+        )
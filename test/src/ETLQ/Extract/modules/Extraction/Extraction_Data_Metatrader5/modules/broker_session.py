@@ -0,0 +1,141 @@
+# ----------------------------
+# Descripcion
+# ----------------------------
+
+"""Este código define la clase BrokerSession, un pool de workers persistente por broker para el
+modo servicio (ETLQ/daemon_service.py). HistoricalDataDownloader crea un pool nuevo en cada
+ejecución, de modo que cada worker vuelve a importar pandas y MetaTrader5 e inicia sesión en el
+terminal; en las actualizaciones intradía ese coste fijo supera al de la descarga. BrokerSession
+crea el pool una sola vez (spawn, con worker_initializer y las credenciales del broker) y lo
+reutiliza en cada actualización incremental: los workers ya tienen la sesión de MT5 abierta y
+obtienen ellos mismos la lista de símbolos."""
+
+# ----------------------------
+# librerias y dependencias
+# ----------------------------
+
+# Standard library imports
+import os
+import json
+import time
+import multiprocessing as mp
+from datetime import datetime
+
+# ----------------------------
+# Conexiones
+# ----------------------------
+
+from .worker import worker_initializer, list_symbols, refresh_symbol_data
+from .resampler import session_for
+
+# Componentes compartidos entre etapas (test/src/ETLQ/Common)
+from Common.tracing import span
+from Common.metrics import registry
+
+# ----------------------------
+# Codigo
+# ----------------------------
+
+
+class BrokerSession:
+    """
+    Pool de workers persistente de un broker con la sesión de MT5 ya iniciada.
+
+    Args:
+        downloader (HistoricalDataDownloader): Credenciales, carpeta de datos, fecha de inicio,
+            política de extracción, logger y agregador de perfiles.
+        broker (str): Broker (columna del DataFrame de credenciales).
+        workers (int): Procesos del pool. Por defecto, los núcleos de la máquina.
+    """
+
+    def __init__(self, downloader, broker: str, workers: int = None):
+        self.downloader = downloader
+        self.broker = broker
+        self.workers = workers or mp.cpu_count()
+        self.data_folder = os.path.join(downloader.data_storage, broker)
+        os.makedirs(self.data_folder, exist_ok=True)
+        self.refreshes = 0
+        self.symbols_metadata = []
+
+        start = time.perf_counter()
+        with span(broker, cat="session", workers=self.workers):
+            self.pool = mp.get_context("spawn").Pool(
+                processes=self.workers,
+                initializer=worker_initializer,
+                initargs=(
+                    downloader.extract_credentials(broker),
+                    self.data_folder,
+                    (downloader.start_date, downloader.end_date),
+                    downloader.extraction_policy,
+                    session_for(broker, downloader.sessions),
+                ),
+            )
+            # La primera tarea espera a que un worker haya iniciado sesión
+            self._list_symbols()
+        # Coste de arranque en frío que las actualizaciones posteriores ya no pagan
+        self.startup_seconds = time.perf_counter() - start
+        registry().histogram(
+            "daemon_session_start_seconds", "Arranque de la sesión persistente de un broker", broker=broker
+        ).observe(self.startup_seconds)
+        downloader.logger.info(
+            "Sesión de %s lista en %.2f s con %s workers.", broker, self.startup_seconds, self.workers
+        )
+
+    def _list_symbols(self) -> list:
+        """Lista de símbolos desde un worker; se guarda en symbols_metadata.json."""
+        self.symbols_metadata = self.pool.apply(list_symbols)
+        with open(os.path.join(self.data_folder, "symbols_metadata.json"), "w", encoding="utf-8") as f:
+            json.dump(self.symbols_metadata, f)
+        return self.symbols_metadata
+
+    def refresh(self, symbols: list = None, end_timestamp: datetime = None) -> dict:
+        """
+        Actualización incremental de los símbolos del broker con los workers persistentes.
+        A diferencia de HistoricalDataDownloader.process_broker, un símbolo con error no
+        detiene el pool: se registra y se devuelve en "errors".
+
+        Args:
+            symbols (list): Símbolos a actualizar. Por defecto, todos los del broker.
+            end_timestamp (datetime): Fin del rango. Por defecto, ahora.
+
+        Returns:
+            dict: broker, símbolos pedidos, descargados, con barras nuevas (changed) y errores.
+        """
+        end_timestamp = end_timestamp or datetime.now()
+        if symbols is None:
+            symbols = [s["name"] for s in self._list_symbols()]
+
+        metrics = registry()
+        metrics.gauge("extract_symbols_planned", "Símbolos a descargar", broker=self.broker).set(len(symbols))
+        metrics.gauge("extract_workers", "Workers del pool", broker=self.broker).set(self.workers)
+        metrics.flush()
+
+        downloaded, changed, errors = [], [], []
+        with span(self.broker, cat="broker", incremental=True):
+            for result in self.pool.imap_unordered(refresh_symbol_data, [(s, end_timestamp) for s in symbols]):
+                self.downloader.profile_aggregator.add(result.pop("profile", None))
+                if result.get("error"):
+                    self.downloader.logger.error("Error en activo %s: %s", result["symbol"], result["error"])
+                    errors.append({"symbol": result["symbol"], "error": result["error"]})
+                else:
+                    downloaded.append(result["symbol"])
+                    if result.get("changed", True):
+                        changed.append(result["symbol"])
+        self.refreshes += 1
+        self.downloader.logger.info(
+            "Broker %s actualizado: %s símbolos (%s con barras nuevas), %s errores.",
+            self.broker, len(downloaded), len(changed), len(errors)
+        )
+        return {"broker": self.broker, "symbols": len(symbols), "downloaded": len(downloaded),
+                "changed": len(changed), "errors": errors}
+
+    def close(self):
+        """Cierra el pool; los workers cierran su sesión de MT5 al terminar."""
+        self.pool.close()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -9,7 +9,8 @@ configura los logs, crea la carpeta de almacenamiento y define un rango de fecha
 Luego, extrae las credenciales de cada broker, se conecta a través de MetaTrader5, obtiene la lista
 de activos disponibles y, mediante un pool de procesos, descarga los datos en paralelo para
 optimizar el rendimiento. Además, maneja errores y registra el número total de archivos
-descargados,asegurando una ejecución robusta y eficiente.
+descargados,asegurando una ejecución robusta y eficiente. Con extraction_policy="resample" solo se
+descarga la temporalidad H1 y las superiores se construyen localmente (ver resampler.py).
 """
 # ----------------------------
 # librerias y dependencias
@@ -17,6 +18,7 @@ descargados,asegurando una ejecución robusta y eficiente.
 
 # Standard library imports
 import os
+import json
 import multiprocessing as mp
 from datetime import datetime
 
@@ -25,6 +27,7 @@ from tqdm import tqdm
 import pandas as pd
 import MetaTrader5 as mt5
 from profiling_utils import mem_profile
+from performance.function_profiles import ProfileAggregator
 
 
 # ----------------------------
@@ -34,6 +37,13 @@ from profiling_utils import mem_profile
 from .logger_config import setup_logger
 from .mt5_connection import MT5Connection
 from .worker import worker_initializer, download_symbol_data
+from .resampler import session_for
+
+# Componentes compartidos entre etapas (test/src/ETLQ/Common)
+from Common.tracing import span
+from Common.metrics import registry
+from Common.pipeline_status import progress_bars_enabled
+from Common.config import config
 
 # ----------------------------
 # Codigo
@@ -54,6 +64,9 @@ class HistoricalDataDownloader:
         data_storage: str,
         start_timestamp: datetime = None,
         end_timestamp: datetime = None,
+        extraction_policy: str = "full",
+        workers: int = None,
+        sessions: dict = None,
     ):
         self.authentication_df = authentication_df
         self.logs_path = logs_path
@@ -64,6 +77,14 @@ class HistoricalDataDownloader:
 
         self.start_date = start_timestamp or datetime(2000, 1, 1)
         self.end_date = end_timestamp or datetime.now()
+        # "full": descarga todas las temporalidades; "resample": solo H1 y deriva el resto
+        self.extraction_policy = extraction_policy
+        # Procesos del pool de descarga de cada broker (por defecto, los núcleos)
+        self.workers = workers or mp.cpu_count()
+        # Límites de sesión por broker para "resample" (por defecto, los de la configuración)
+        self.sessions = config().stage("extract")["sessions"] if sessions is None else sessions
+        # Perfiles de los workers del pool, fusionados por PID (ver profile_task)
+        self.profile_aggregator = ProfileAggregator()
 
     @mem_profile
     def extract_credentials(self, broker: str) -> dict:
@@ -92,7 +113,8 @@ class HistoricalDataDownloader:
         connection = MT5Connection(credentials)
         connection.initialize()
 
-        symbols = mt5.symbols_get()  # pylint: disable=no-member
+        with registry().histogram("mt5_symbols_get_seconds", "Latencia de symbols_get", broker=broker).time():
+            symbols = mt5.symbols_get()  # pylint: disable=no-member
         if symbols is None:
             error_msg = f"No se pudieron obtener símbolos para broker {broker}"
             self.logger.error(error_msg)
@@ -100,6 +122,11 @@ class HistoricalDataDownloader:
             raise RuntimeError(error_msg)
 
         symbol_list = [s.name for s in symbols]
+        # Decimales y punto de cada símbolo: el procesamiento los usa para codificar precios
+        # como enteros y convertir el spread a precio
+        symbols_metadata = [
+            {"name": s.name, "digits": s.digits, "point": s.point} for s in symbols
+        ]
         connection.shutdown()
         self.logger.info(
             "Broker %s: %s símbolos encontrados.", broker, len(symbol_list)
@@ -107,14 +134,26 @@ class HistoricalDataDownloader:
 
         broker_data_folder = os.path.join(self.data_storage, broker)
         os.makedirs(broker_data_folder, exist_ok=True)
+        with open(
+            os.path.join(broker_data_folder, "symbols_metadata.json"), "w", encoding="utf-8"
+        ) as f:
+            json.dump(symbols_metadata, f)
+
+        # Avance del broker para el panel en vivo (Common/pipeline_status.py)
+        metrics = registry()
+        metrics.gauge("extract_symbols_planned", "Símbolos a descargar", broker=broker).set(len(symbol_list))
+        metrics.gauge("extract_workers", "Workers del pool", broker=broker).set(self.workers)
+        metrics.flush()
 
         pool = mp.Pool(
-            processes=mp.cpu_count(),
+            processes=self.workers,
             initializer=worker_initializer,
             initargs=(
                 credentials,
                 broker_data_folder,
                 (self.start_date, self.end_date),
+                self.extraction_policy,
+                session_for(broker, self.sessions),
             ),
         )
 
@@ -123,7 +162,9 @@ class HistoricalDataDownloader:
             pool.imap_unordered(download_symbol_data, symbol_list),
             total=len(symbol_list),
             desc=f"Broker {broker}",
+            disable=not progress_bars_enabled(),
         ):
+            self.profile_aggregator.add(result.pop("profile", None))
             results.append(result)
             if result.get("error"):
                 pool.terminate()
@@ -153,7 +194,8 @@ class HistoricalDataDownloader:
 
         for broker in broker_columns:
             try:
-                results = self.process_broker(broker)
+                with span(broker, cat="broker"):
+                    results = self.process_broker(broker)
                 total_files_downloaded += len(results)
             except Exception as e:
                 self.logger.error("Excepción al procesar broker %s: %s", broker, str(e))
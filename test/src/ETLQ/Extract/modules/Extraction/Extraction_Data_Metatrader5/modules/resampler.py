@@ -0,0 +1,205 @@
+# ----------------------------
+# Descripcion
+# ----------------------------
+
+"""Este código define la construcción local de temporalidades superiores (H4, D1, W1, MN1) a
+partir de las barras de una temporalidad base (H1) ya descargada, evitando descargar cada
+temporalidad por separado desde MetaTrader 5. Las barras se agrupan de forma vectorizada según
+los límites de sesión y de semana de cada broker, y se incluye una verificación de una muestra
+contra las barras que entrega el broker.
+
+Los límites de sesión de cada broker se configuran en Common/config.py (stages.extract.sessions,
+junto a los desfases horarios de process.timezone_offsets) y llegan a los workers con session_for.
+
+Limitaciones:
+- Las temporalidades derivadas solo cubren el periodo de la temporalidad base. Los brokers suelen
+  guardar más historia en D1, W1 y MN1 que en H1; con la política "resample" esa historia más
+  antigua no se descarga (usar la política "full" si se necesita).
+- Solo se verifican contra el broker los últimos VERIFY_MONTHS meses (ver worker.py); una
+  diferencia de sesión en periodos anteriores no se detecta."""
+
+# ----------------------------
+# librerias y dependencias
+# ----------------------------
+
+# Third-party imports
+import numpy as np
+import pandas as pd
+
+# ----------------------------
+# Conexiones
+# ----------------------------
+
+from profiling_utils import mem_profile
+
+# ----------------------------
+# Codigo
+# ----------------------------
+
+# Duración en segundos de las temporalidades de paso fijo
+FIXED_SECONDS = {"H1": 3600, "H4": 4 * 3600, "D1": 86400}
+
+# Temporalidades que se pueden derivar de cada temporalidad base
+DERIVABLE = {"H1": ["H4", "D1", "W1", "MN1"], "H4": ["D1", "W1", "MN1"], "D1": ["W1", "MN1"]}
+
+# Límites de sesión de un broker (hora del servidor de MetaTrader):
+#   day_offset_hours: desplazamiento del inicio del día de trading respecto a las 00:00
+#   week_start: día en que empieza la barra semanal (MetaTrader usa el domingo)
+# Los de cada broker se configuran en Common/config.py (stages.extract.sessions)
+DEFAULT_SESSION = {"day_offset_hours": 0, "week_start": "SUN"}
+
+WEEKDAYS = {"MON": 0, "TUE": 1, "WED": 2, "THU": 3, "FRI": 4, "SAT": 5, "SUN": 6}
+
+# Agregación OHLCV; spread toma el mínimo del periodo como las barras de MetaTrader
+AGGREGATIONS = {
+    "open": "first", "high": "max", "low": "min", "close": "last",
+    "tick_volume": "sum", "spread": "min", "real_volume": "sum",
+}
+
+
+def session_for(broker: str, sessions: dict = None) -> dict:
+    """
+    Límites de sesión de un broker.
+
+    Args:
+        broker (str): Nombre del broker.
+        sessions (dict): Límites por broker (stages.extract.sessions de la configuración); los
+            brokers sin entrada usan DEFAULT_SESSION.
+    """
+    session = {**DEFAULT_SESSION, **(sessions or {}).get(broker, {})}
+    if session["week_start"] not in WEEKDAYS:
+        raise ValueError(f"week_start desconocido para {broker}: {session['week_start']}")
+    return session
+
+
+def _to_seconds(time: pd.Series) -> np.ndarray:
+    if pd.api.types.is_numeric_dtype(time):
+        return time.to_numpy(dtype="int64")
+    time = pd.to_datetime(time)
+    if time.dt.tz is not None:
+        time = time.dt.tz_localize(None)
+    return time.astype("datetime64[s]").to_numpy().view("int64")
+
+
+def bucket_starts(seconds: np.ndarray, target: str, session: dict = None) -> np.ndarray:
+    """
+    Inicio (segundos desde epoch, hora del servidor) de la barra target a la que pertenece
+    cada instante.
+
+    Args:
+        seconds (np.ndarray): Tiempos de apertura de las barras base.
+        target (str): 'H4', 'D1', 'W1' o 'MN1'.
+        session (dict): Límites de sesión del broker (ver session_for).
+    """
+    session = session or DEFAULT_SESSION
+    offset = int(session["day_offset_hours"] * 3600)
+    shifted = seconds - offset
+    if target in FIXED_SECONDS:
+        step = FIXED_SECONDS[target]
+        starts = shifted // step * step
+    elif target == "W1":
+        days = shifted // 86400
+        # 1970-01-01 fue jueves (weekday 3 con lunes = 0)
+        weekday = (days + 3) % 7
+        starts = (days - (weekday - WEEKDAYS[session["week_start"]]) % 7) * 86400
+    elif target == "MN1":
+        months = shifted.astype("datetime64[s]").astype("datetime64[M]")
+        starts = months.astype("datetime64[s]").view("int64")
+    else:
+        raise ValueError(f"Temporalidad no soportada para remuestreo: {target}")
+    return starts + offset
+
+
+def earliest_bucket_start(moment, targets: list, session: dict = None):
+    """
+    Inicio más temprano de las barras targets que contienen moment. Las barras derivadas
+    solo están completas si la temporalidad base se descarga desde ese instante.
+
+    Args:
+        moment (datetime): Instante (hora del servidor).
+        targets (list): Temporalidades derivadas, p. ej. DERIVABLE["H1"].
+        session (dict): Límites de sesión del broker.
+    """
+    seconds = _to_seconds(pd.Series([pd.Timestamp(moment)]))
+    starts = [int(bucket_starts(seconds, target, session)[0]) for target in targets]
+    return pd.Timestamp(min(starts), unit="s").to_pydatetime()
+
+
+@mem_profile
+def resample_bars(df: pd.DataFrame, target: str, session: dict = None) -> pd.DataFrame:
+    """
+    Construye barras de la temporalidad target a partir de barras base ordenadas por tiempo.
+
+    Args:
+        df (pd.DataFrame): Barras base (time, open, high, low, close, tick_volume, spread,
+            real_volume) tal como las devuelve copy_rates_range.
+        target (str): Temporalidad a construir.
+        session (dict): Límites de sesión del broker.
+
+    Returns:
+        pd.DataFrame: Barras target con las mismas columnas que df.
+    """
+    if df.empty:
+        return df.iloc[0:0].copy()
+    df = df.sort_values("time", kind="stable")
+    seconds = _to_seconds(df["time"])
+    starts = bucket_starts(seconds, target, session)
+    # Las barras base están ordenadas: cada grupo es un tramo contiguo (reduceat)
+    first = np.concatenate(([0], np.flatnonzero(np.diff(starts)) + 1))
+    last = np.concatenate((first[1:] - 1, [len(starts) - 1]))
+
+    result = {}
+    for column, how in AGGREGATIONS.items():
+        if column not in df.columns:
+            continue
+        values = df[column].to_numpy()
+        if how == "first":
+            result[column] = values[first]
+        elif how == "last":
+            result[column] = values[last]
+        elif how == "max":
+            result[column] = np.maximum.reduceat(values, first)
+        elif how == "min":
+            result[column] = np.minimum.reduceat(values, first)
+        else:
+            result[column] = np.add.reduceat(values, first)
+
+    out = pd.DataFrame(result)
+    bucket_seconds = starts[first]
+    if pd.api.types.is_numeric_dtype(df["time"]):
+        out.insert(0, "time", bucket_seconds)
+    else:
+        out.insert(0, "time", pd.to_datetime(bucket_seconds, unit="s"))
+    return out[[c for c in df.columns if c in out.columns]]
+
+
+@mem_profile
+def verify_sample(derived: pd.DataFrame, reference: pd.DataFrame, price_tolerance: float = 1e-9,
+                  max_mismatch_ratio: float = 0.01) -> dict:
+    """
+    Compara barras derivadas con las del broker en los tiempos comunes.
+
+    Se comparan OHLC (con tolerancia absoluta) y la presencia de cada barra de referencia.
+    Las diferencias de volumen no invalidan la muestra porque el historial H1 del broker puede
+    estar incompleto en periodos antiguos.
+
+    Returns:
+        dict: reference_rows, matched_rows, mismatched_rows, missing_rows y ok.
+    """
+    if reference is None or reference.empty:
+        return {"reference_rows": 0, "matched_rows": 0, "mismatched_rows": 0, "missing_rows": 0, "ok": True}
+    left = derived.assign(_t=_to_seconds(derived["time"])).set_index("_t")
+    right = reference.assign(_t=_to_seconds(reference["time"])).set_index("_t")
+    common = right.index.intersection(left.index)
+    prices = ["open", "high", "low", "close"]
+    diff = (left.loc[common, prices] - right.loc[common, prices]).abs()
+    mismatched = int((diff > price_tolerance).any(axis=1).sum())
+    missing = len(right) - len(common)
+    ratio = (mismatched + missing) / len(right)
+    return {
+        "reference_rows": len(right),
+        "matched_rows": len(common) - mismatched,
+        "mismatched_rows": mismatched,
+        "missing_rows": missing,
+        "ok": ratio <= max_mismatch_ratio,
+    }
@@ -5,7 +5,10 @@
 en diferentes temporalidades. Define la clase WorkerState para almacenar el estado global de los
 workers,la función worker_initializer para inicializar las variables y la conexión a MT5, y la
 función download_symbol_data, que descarga los datos por rangos mensuales, los procesa y los
-guarda en un archivo CSV, manejando posibles errores."""
+guarda en un archivo CSV, manejando posibles errores. Con la política de extracción "resample"
+solo se descarga la temporalidad base (H1) y las superiores se construyen localmente, verificando
+una muestra contra las barras del broker. Los workers persistentes del modo servicio usan
+refresh_symbol_data, que solo descarga las barras posteriores a las ya guardadas."""
 # ----------------------------
 # librerias y dependencias
 # ----------------------------
@@ -17,6 +20,8 @@ import os
 import pandas as pd
 import MetaTrader5 as mt5
 from profiling_utils import mem_profile
+from performance.function_profiles import profile_task
+from performance.sampling_profiler import start_sampling
 
 # ----------------------------
 # Conexiones
@@ -24,6 +29,11 @@ from profiling_utils import mem_profile
 
 from .mt5_connection import MT5Connection
 from .utils import generate_month_ranges
+from .resampler import DERIVABLE, DEFAULT_SESSION, earliest_bucket_start, resample_bars, verify_sample
+
+# Componentes compartidos entre etapas (test/src/ETLQ/Common)
+from Common.tracing import span
+from Common.metrics import registry, SIZE_BUCKETS
 
 # ----------------------------
 # Codigo
@@ -35,59 +45,245 @@ class WorkerState:
 
     credentials = None
     data_directory = None
+    broker = None
     date_range = (None, None)
+    policy = "full"
+    session = DEFAULT_SESSION
+
+
+# Políticas de extracción: temporalidad base que se descarga (None = descargar todas)
+EXTRACTION_POLICIES = {"full": None, "resample": "H1"}
+
+# Meses finales que se descargan del broker para verificar las temporalidades derivadas; los
+# meses anteriores no se comparan con el broker
+VERIFY_MONTHS = 2
+
+TIMEFRAMES = {
+    "H1": mt5.TIMEFRAME_H1,
+    "H4": mt5.TIMEFRAME_H4,
+    "D1": mt5.TIMEFRAME_D1,
+    "W1": mt5.TIMEFRAME_W1,
+    "MN1": mt5.TIMEFRAME_MN1,
+}
+TIMEFRAME_LABELS = {value: label for label, value in TIMEFRAMES.items()}
 
 
 @mem_profile
-def worker_initializer(credentials: dict, data_directory: str, date_range: tuple):
+def worker_initializer(credentials: dict, data_directory: str, date_range: tuple,
+                       policy: str = "full", session: dict = None):
     """
     Inicializa las variables necesarias en cada proceso worker.
     """
+    if policy not in EXTRACTION_POLICIES:
+        raise ValueError(f"Política de extracción desconocida: {policy}")
     WorkerState.credentials = credentials
     WorkerState.data_directory = data_directory
+    # La carpeta de datos del worker es <data_storage>/<broker>
+    WorkerState.broker = os.path.basename(os.path.normpath(data_directory))
     WorkerState.date_range = date_range
+    WorkerState.policy = policy
+    WorkerState.session = session or DEFAULT_SESSION
+    # Muestreo de pilas del worker (solo con HERMESDB_SAMPLING="on")
+    start_sampling("worker")
 
     connection = MT5Connection(WorkerState.credentials)
     connection.initialize()
 
 
+def _download_timeframe(symbol: str, tf_value: int, month_ranges: list) -> pd.DataFrame:
+    """Descarga una temporalidad por rangos mensuales; None si no hay datos."""
+    metrics = registry()
+    tf_label = TIMEFRAME_LABELS.get(tf_value, str(tf_value))
+    latency = metrics.histogram(
+        "mt5_copy_rates_range_seconds", "Latencia de copy_rates_range", timeframe=tf_label
+    )
+    bars = metrics.histogram(
+        "mt5_copy_rates_range_bars", "Barras devueltas por llamada", buckets=SIZE_BUCKETS, timeframe=tf_label
+    )
+    empty = metrics.counter(
+        "mt5_copy_rates_range_empty_total", "Llamadas sin barras (None o vacías)", timeframe=tf_label
+    )
+    dfs = []
+    for month_start, month_end in month_ranges:
+        with span(f"{month_start:%Y-%m}", cat="month", detail=True) as month_span, latency.time():
+            rates = mt5.copy_rates_range(  # pylint: disable=no-member
+                symbol, tf_value, month_start, month_end
+            )
+            month_span.set(rows=0 if rates is None else len(rates))
+        bars.observe(0 if rates is None else len(rates))
+        if rates is None or len(rates) == 0:
+            empty.inc()
+        if rates is not None and len(rates) > 0:
+            dfs.append(pd.DataFrame(rates))
+    if not dfs:
+        return None
+    df_tf = pd.concat(dfs, ignore_index=True)
+    df_tf["time"] = pd.to_datetime(df_tf["time"], unit="s")
+    return df_tf
+
+
+def _derive_timeframe(symbol: str, base_df: pd.DataFrame, tf_label: str, month_ranges: list):
+    """
+    Construye tf_label desde la temporalidad base y verifica los últimos VERIFY_MONTHS meses
+    contra las barras del broker. Si la verificación falla se descarga la temporalidad completa.
+    Se descartan las barras que empiezan antes del rango descargado (month_ranges[0][0]):
+    se construirían con una parte de sus barras base.
+
+    Returns:
+        tuple: (DataFrame o None, origen, resultado de la verificación)
+    """
+    derived = resample_bars(base_df, tf_label, WorkerState.session)
+    derived = derived[derived["time"] >= month_ranges[0][0]].reset_index(drop=True)
+    reference = _download_timeframe(symbol, TIMEFRAMES[tf_label], month_ranges[-VERIFY_MONTHS:])
+    verification = verify_sample(derived, reference)
+    if verification["ok"]:
+        return derived, "resampled", verification
+    return _download_timeframe(symbol, TIMEFRAMES[tf_label], month_ranges), "downloaded", verification
+
+
+@mem_profile
+def list_symbols() -> list:
+    """
+    Símbolos del broker del worker (nombre, decimales y punto) usando la sesión de MT5 que
+    abrió worker_initializer, de modo que el proceso principal no necesita conectarse.
+    """
+    with registry().histogram("mt5_symbols_get_seconds", "Latencia de symbols_get", broker=WorkerState.broker).time():
+        symbols = mt5.symbols_get()  # pylint: disable=no-member
+    if symbols is None:
+        raise RuntimeError(f"No se pudieron obtener símbolos para broker {WorkerState.broker}")
+    return [{"name": s.name, "digits": s.digits, "point": s.point} for s in symbols]
+
+
+@profile_task
 @mem_profile
 def download_symbol_data(symbol: str) -> dict:
     """
     Descarga los datos históricos para el símbolo dado en diferentes temporalidades.
     Los datos se descargan por rangos mensuales, se procesan y se guardan en un archivo CSV.
+    Con la política "resample" solo se descarga la temporalidad base y el resto se deriva.
+    La tarea se registra como un span "symbol" (ver Common/tracing.py) y el símbolo en curso
+    del worker se publica en el registro de métricas para el panel en vivo.
     """
+    return _run_symbol_task(symbol)
+
+
+@profile_task
+@mem_profile
+def refresh_symbol_data(task: tuple) -> dict:
+    """
+    Descarga incremental de un símbolo para los workers persistentes (ver broker_session.py).
+
+    Args:
+        task (tuple): (símbolo, fin del rango). Solo se piden las barras desde la última
+            guardada en el CSV del símbolo y se combinan con las existentes; sin CSV previo
+            se descarga desde el inicio del rango del worker.
+    """
+    symbol, end_timestamp = task
+    WorkerState.date_range = (WorkerState.date_range[0], end_timestamp)
+    return _run_symbol_task(symbol, incremental=True)
+
+
+def _run_symbol_task(symbol: str, incremental: bool = False) -> dict:
+    """Ejecuta la descarga de un símbolo con su span y sus métricas de avance."""
+    metrics = registry()
+    # Una sola serie por worker: se elimina al terminar la tarea (ver PipelineStatus)
+    labels = {"pid": os.getpid(), "broker": WorkerState.broker, "symbol": symbol}
+    metrics.gauge("extract_worker_symbol", "1 mientras el worker descarga el símbolo", **labels).set(1)
+    metrics.flush()
+    try:
+        with span(symbol, cat="symbol") as symbol_span:
+            result = _download_symbol(symbol, incremental)
+            symbol_span.set(error=result["error"])
+    finally:
+        metrics.remove("extract_worker_symbol", **labels)
+    metrics.counter(
+        "extract_symbols_total", "Símbolos procesados",
+        broker=WorkerState.broker, status="error" if result["error"] else "ok",
+    ).inc()
+    # El worker termina sin atexit: el snapshot se guarda al final de cada tarea
+    metrics.flush()
+    return result
+
+
+def _last_stored_time(output_file: str):
+    """
+    Inicio de la descarga incremental: la más antigua de las últimas barras guardadas de cada
+    temporalidad, de modo que todas vuelven a descargarse desde su última barra (que pudo
+    guardarse incompleta). None si no hay datos guardados.
+    """
+    if not os.path.exists(output_file) or os.path.getsize(output_file) == 0:
+        return None
+    try:
+        stored = pd.read_csv(output_file, usecols=["time", "timeframe"])
+    except (ValueError, pd.errors.EmptyDataError):
+        return None
+    if stored.empty:
+        return None
+    # Las barras de D1 o superiores se guardan sin hora ("YYYY-MM-DD")
+    last_bars = pd.to_datetime(stored["time"], format="ISO8601").groupby(stored["timeframe"]).max()
+    return last_bars.min().to_pydatetime()
+
+
+def _merge_stored(output_file: str, new_df: pd.DataFrame) -> pd.DataFrame:
+    """Combina las barras nuevas con las del CSV existente, por temporalidad y fecha."""
+    try:
+        stored = pd.read_csv(output_file)
+        stored["time"] = pd.to_datetime(stored["time"], format="ISO8601")
+    except (FileNotFoundError, KeyError, ValueError, pd.errors.EmptyDataError):
+        return new_df
+    if new_df.empty:
+        return stored
+    # Los volúmenes de MT5 son uint64 y los del CSV int64: concatenarlos daría float64
+    new_df = new_df.astype({c: stored[c].dtype for c in stored.columns if c in new_df.columns and c != "time"})
+    merged = pd.concat([stored, new_df], ignore_index=True)
+    # La última barra guardada pudo descargarse incompleta: se conserva la nueva
+    merged.drop_duplicates(subset=["time", "timeframe"], keep="last", inplace=True)
+    order = {label: i for i, label in enumerate(TIMEFRAMES)}
+    merged.sort_values(
+        ["timeframe", "time"], kind="stable", inplace=True,
+        key=lambda col: col.map(order) if col.name == "timeframe" else col,
+    )
+    return merged
+
+
+def _download_symbol(symbol: str, incremental: bool = False) -> dict:
+    """Cuerpo de download_symbol_data: descarga, combina y guarda las temporalidades."""
     try:
-        timeframes = {
-            "H1": mt5.TIMEFRAME_H1,
-            "H4": mt5.TIMEFRAME_H4,
-            "D1": mt5.TIMEFRAME_D1,
-            "W1": mt5.TIMEFRAME_W1,
-            "MN1": mt5.TIMEFRAME_MN1,
-        }
         collected_dfs = []
         timeframe_log = {}
 
+        safe_symbol = symbol.replace("/", "_")
+        output_file = os.path.join(WorkerState.data_directory, f"{safe_symbol}.csv")
         begin_date, fin_date = WorkerState.date_range
+        base_label = EXTRACTION_POLICIES[WorkerState.policy]
+        if incremental:
+            since = _last_stored_time(output_file)
+            if since is not None and base_label is not None:
+                # La barra W1 que contiene el inicio de mes de la última MN1 empieza antes:
+                # la base se descarga desde el inicio más temprano para reconstruirla completa
+                since = earliest_bucket_start(since, DERIVABLE[base_label], WorkerState.session)
+            if since is not None:
+                begin_date = max(begin_date, since)
         month_ranges = generate_month_ranges(begin_date, fin_date)
+        base_df = None
 
-        for tf_label, tf_value in timeframes.items():
-            dfs = []
-            for month_start, month_end in month_ranges:
-                rates = mt5.copy_rates_range(  # pylint: disable=no-member
-                    symbol, tf_value, month_start, month_end
-                )
-                if rates is not None and len(rates) > 0:
-                    df_temp = pd.DataFrame(rates)
-                    dfs.append(df_temp)
-            if dfs:
-                df_tf = pd.concat(dfs, ignore_index=True)
-                df_tf["time"] = pd.to_datetime(df_tf["time"], unit="s")
+        for tf_label, tf_value in TIMEFRAMES.items():
+            verification = None
+            with span(tf_label, cat="timeframe", symbol=symbol) as tf_span:
+                if base_label is not None and base_df is not None and tf_label in DERIVABLE[base_label]:
+                    df_tf, source, verification = _derive_timeframe(symbol, base_df, tf_label, month_ranges)
+                else:
+                    df_tf, source = _download_timeframe(symbol, tf_value, month_ranges), "downloaded"
+                tf_span.set(source=source, rows=0 if df_tf is None else len(df_tf))
+            if tf_label == base_label:
+                base_df = df_tf
+            if df_tf is not None and not df_tf.empty:
                 df_tf["timeframe"] = tf_label
                 timeframe_log[tf_label] = {
                     "rows": len(df_tf),
                     "first_date": str(df_tf["time"].min()),
                     "last_date": str(df_tf["time"].max()),
+                    "source": source,
                 }
                 collected_dfs.append(df_tf)
             else:
@@ -95,22 +291,40 @@ def download_symbol_data(symbol: str) -> dict:
                     "rows": 0,
                     "first_date": None,
                     "last_date": None,
+                    "source": source,
                 }
+            if verification is not None:
+                timeframe_log[tf_label]["verification"] = verification
 
         if collected_dfs:
             final_df = pd.concat(collected_dfs, ignore_index=True)
             final_df.drop_duplicates(subset=["time", "timeframe"], inplace=True)
         else:
             final_df = pd.DataFrame()
-
-        safe_symbol = symbol.replace("/", "_")
-        output_file = os.path.join(WorkerState.data_directory, f"{safe_symbol}.csv")
-        final_df.to_csv(output_file, index=False)
+        changed = True
+        if incremental:
+            final_df = _merge_stored(output_file, final_df)
+            content = final_df.to_csv(index=False)
+            # Sin barras nuevas ni modificadas el CSV no se reescribe: la limpieza incremental
+            # del modo servicio lo reconoce por su tamaño y fecha de modificación
+            if os.path.exists(output_file):
+                with open(output_file, encoding="utf-8", newline="") as f:
+                    changed = f.read() != content
+            if changed:
+                with open(output_file, "w", encoding="utf-8", newline="") as f:
+                    f.write(content)
+        else:
+            final_df.to_csv(output_file, index=False)
+        if changed:
+            registry().counter(
+                "csv_bytes_written_total", "Bytes de CSV escritos", stage="extract"
+            ).inc(os.path.getsize(output_file))
 
         return {
             "symbol": symbol,
             "log": timeframe_log,
             "file": output_file,
+            "changed": changed,
             "error": None,
         }
 
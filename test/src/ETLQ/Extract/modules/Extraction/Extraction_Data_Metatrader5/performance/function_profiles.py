@@ -10,6 +10,13 @@ como el número de llamadas, tiempo total, tiempo promedio, tiempo en CPU y tiem
 espera por función, además de asociar el uso de memoria si está disponible. Luego,
 organiza estos datos en un DataFrame de pandas y los guarda en un archivo CSV, permitiendo
 un análisis detallado del rendimiento del código.
+
+Para los procesos worker del pool, profile_task perfila cada tarea dentro del worker y
+adjunta al resultado sus estadísticas (pstats y memoria de profiling_utils) junto con el
+PID. ProfileAggregator las fusiona en el proceso padre y ProfileExporter exporta un único
+informe con el desglose por PID y el total de todos los procesos. Cada fila lleva el run_id
+de la ejecución y un id, y opcionalmente se guardan las estadísticas totales en formato
+pstats para compararlas o generar flamegraphs con profile_diff.py.
 """
 # ----------------------------
 # librerias y dependencias
@@ -18,6 +25,7 @@ un análisis detallado del rendimiento del código.
 # Standard library imports
 import os
 import cProfile
+import functools
 import pstats
 
 # Third-party imports
@@ -27,29 +35,119 @@ import pandas as pd
 # Conexiones
 # ----------------------------
 
+import profiling_utils
+
+# Componentes compartidos entre etapas (test/src/ETLQ/Common)
+from Common.run_context import current_run_id
 
 # ----------------------------
 # Codigo
 # ----------------------------
 
 
+COLUMNS = [
+    "run_id",
+    "id",
+    "pid",
+    "function_name",
+    "total_time",
+    "call_count",
+    "avg_time",
+    "cpu_time",
+    "wait_time",
+    "memory_usage",
+    "file",
+]
+
+
+class _RawStats:
+    """Adapta un diccionario de pstats recibido de otro proceso para pstats.Stats."""
+
+    def __init__(self, stats: dict):
+        self.stats = stats
+
+    def create_stats(self):
+        """pstats.Stats llama a este método antes de leer self.stats."""
+
+
+def profile_task(func):
+    """
+    Decorador para la función que ejecuta cada tarea del pool (p. ej. download_symbol_data).
+
+    Si la instrumentación está activa (HERMESDB_PROFILE distinto de "off"), la tarea se
+    perfila con un cProfile propio y el resultado (dict) recibe la clave "profile" con el
+    PID, las estadísticas de pstats de la tarea y la memoria por función del worker.
+    Con la instrumentación desactivada devuelve func sin envolver.
+    """
+    if profiling_utils.profile_mode() == "off":
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            profiler.disable()
+        profiler.create_stats()
+        if isinstance(result, dict):
+            result["profile"] = {
+                "pid": os.getpid(),
+                "stats": profiler.stats,
+                "memory": dict(profiling_utils.memory_usage_dict),
+            }
+        return result
+
+    return wrapper
+
+
+class ProfileAggregator:
+    """
+    Fusiona en el proceso padre los perfiles enviados por los workers (profile_task).
+
+    Las estadísticas de pstats se suman por PID; la memoria por función de cada worker es
+    acumulativa en el worker, por lo que se conserva la última recibida de cada PID.
+    """
+
+    def __init__(self):
+        self.stats_by_pid = {}
+        self.memory_by_pid = {}
+
+    def add(self, profile: dict):
+        """Incorpora la clave "profile" del resultado de una tarea (se ignora None)."""
+        if not profile:
+            return
+        pid = profile["pid"]
+        task_stats = pstats.Stats(_RawStats(profile["stats"]))
+        if pid in self.stats_by_pid:
+            self.stats_by_pid[pid].add(task_stats)
+        else:
+            self.stats_by_pid[pid] = task_stats
+        self.memory_by_pid[pid] = profile.get("memory", {})
+
+    def add_results(self, results: list):
+        """Incorpora y retira los perfiles de una lista de resultados de tareas."""
+        for result in results:
+            if isinstance(result, dict):
+                self.add(result.pop("profile", None))
+
+
 class ProfileExporter:
     """
     Encapsula la lógica para exportar los perfiles de rendimiento a CSV.
     Cumple con el Single Responsibility Principle (SRP).
     """
 
-    def __init__(self, profiler: cProfile.Profile, memory_mapping: dict = None):
+    def __init__(self, profiler: cProfile.Profile, memory_mapping: dict = None,
+                 aggregator: ProfileAggregator = None):
         self.profiler = profiler
         self.memory_mapping = memory_mapping or {}
+        self.aggregator = aggregator
 
-    def export_to_csv(self, csv_output: str):
-        """
-        Exporta el perfil de cProfile a un archivo CSV con las columnas requeridas.
-        """
-        stats_obj = pstats.Stats(self.profiler)
+    @staticmethod
+    def _rows(stats_obj: pstats.Stats, memory_mapping: dict, pid) -> list:
         stats_data = []
-
         for func_desc, func_stats in stats_obj.stats.items():
             filename, _, func_name = func_desc
             call_count = func_stats[0]
@@ -60,10 +158,11 @@ class ProfileExporter:
             file_name = os.path.basename(filename)
 
             key = (file_name, func_name)
-            mem_used = self.memory_mapping.get(key, None)
+            mem_used = memory_mapping.get(key, None)
 
             stats_data.append(
                 {
+                    "pid": pid,
                     "function_name": func_name,
                     "total_time": total_time,
                     "call_count": call_count,
@@ -74,19 +173,42 @@ class ProfileExporter:
                     "file": file_name,
                 }
             )
+        return stats_data
+
+    def export_to_csv(self, csv_output: str, stats_output: str = None, run_id: str = None):
+        """
+        Exporta el perfil de cProfile a un archivo CSV con las columnas requeridas.
+
+        Con un ProfileAggregator se añaden las filas de cada worker (columna pid) y las
+        filas "all" con la suma de todos los procesos; la memoria de "all" es el máximo
+        por función entre procesos.
+
+        Args:
+            csv_output (str): Ruta del CSV.
+            stats_output (str, optional): Ruta donde guardar las estadísticas totales en
+                formato pstats (incluyen los llamadores de cada función, necesarios para el
+                flamegraph de profile_diff.py).
+            run_id (str, optional): Identificador de la ejecución. Defaults al run_id en curso.
+        """
+        stats_obj = pstats.Stats(self.profiler)
+        stats_data = self._rows(stats_obj, self.memory_mapping, os.getpid())
+        total = stats_obj
+
+        if self.aggregator is not None and self.aggregator.stats_by_pid:
+            total = pstats.Stats(self.profiler)
+            total_memory = dict(self.memory_mapping)
+            for pid, worker_stats in self.aggregator.stats_by_pid.items():
+                worker_memory = self.aggregator.memory_by_pid.get(pid, {})
+                stats_data += self._rows(worker_stats, worker_memory, pid)
+                total.add(worker_stats)
+                for key, value in worker_memory.items():
+                    total_memory[key] = max(total_memory.get(key, value), value)
+            stats_data += self._rows(total, total_memory, "all")
 
-        df = pd.DataFrame(
-            stats_data,
-            columns=[
-                "function_name",
-                "total_time",
-                "call_count",
-                "avg_time",
-                "cpu_time",
-                "wait_time",
-                "memory_usage",
-                "file",
-            ],
-        )
+        df = pd.DataFrame(stats_data, columns=COLUMNS)
+        df["run_id"] = run_id or current_run_id()
+        df["id"] = range(1, len(df) + 1)
         df.to_csv(csv_output, index=False)
         print(f"Resultados exportados a {csv_output}")
+        if stats_output:
+            total.dump_stats(stats_output)
@@ -0,0 +1,302 @@
+# ----------------------------
+# Descripcion
+# ----------------------------
+"""
+Herramienta de comparación de perfiles exportados por ProfileExporter (function_profiles.csv).
+
+Carga dos o más CSV de ejecuciones distintas, normaliza la identidad de cada función
+(archivo sin ruta + nombre, con las filas repetidas de una misma función sumadas) y compara
+cada ejecución con la primera (línea base): ordena las funciones por el cambio en tottime
+(tiempo propio), cumtime (tiempo acumulado con subllamadas), número de llamadas y memoria, e
+imprime un informe de regresiones y mejoras. Con --fail-over termina con código 1 si alguna
+función empeora más de ese porcentaje de tottime.
+
+Opcionalmente genera un archivo de pilas colapsadas ("collapsed stacks", formato de
+flamegraph.pl, speedscope o inferno) a partir de las estadísticas pstats guardadas con
+export_to_csv(stats_output=...). Como pstats solo guarda las aristas llamador -> llamado,
+el tiempo de cada función se reparte entre sus rutas de llamada en proporción al tiempo
+acumulado de cada arista.
+
+Uso:
+    python profile_diff.py base.csv nuevo.csv [otro.csv ...] --top 20
+    python profile_diff.py base.csv nuevo.csv --collapsed nuevo.folded --stats nuevo.prof
+    python profile_diff.py base.csv nuevo.csv --fail-over 25 --min-seconds 0.05
+
+También acepta los CSV antiguos sin columnas run_id/pid (p. ej. profile_results.csv).
+"""
+# ----------------------------
+# librerias y dependencias
+# ----------------------------
+
+# Standard library imports
+import os
+import sys
+import argparse
+import ntpath
+import pstats
+from collections import defaultdict
+
+# Third-party imports
+import pandas as pd
+
+# ----------------------------
+# Conexiones
+# ----------------------------
+
+
+# ----------------------------
+# Codigo
+# ----------------------------
+
+# Columnas de ProfileExporter -> métricas del informe. En el CSV total_time es el tiempo
+# acumulado (cumtime) y cpu_time el tiempo propio sin subllamadas (tottime).
+METRICS = {
+    "tottime": "cpu_time",
+    "cumtime": "total_time",
+    "calls": "call_count",
+    "memory": "memory_usage",
+}
+
+
+def function_key(file_name, function_name) -> str:
+    """
+    Identidad de una función estable entre ejecuciones y máquinas: nombre del archivo sin
+    ruta (separadores de Windows o POSIX) y nombre de la función. Las funciones internas
+    de C (archivo "~") se identifican solo por su nombre.
+    """
+    file_name = "" if pd.isna(file_name) else ntpath.basename(str(file_name).replace("/", "\\"))
+    function_name = str(function_name).strip()
+    if file_name in ("", "~"):
+        return function_name
+    return f"{file_name}:{function_name}"
+
+
+def load_profile(path: str, pid: str = "all") -> pd.DataFrame:
+    """
+    Carga un function_profiles.csv y devuelve una fila por función (índice: function_key).
+
+    Args:
+        path (str): Ruta del CSV exportado por ProfileExporter.
+        pid (str): Filas a usar cuando el CSV tiene columna pid: "all" (total de todos los
+            procesos; si no existe, el proceso principal), "main" (proceso principal) o un PID.
+
+    Returns:
+        pd.DataFrame: Columnas tottime, cumtime, calls y memory; attrs["run_id"] con el run.
+    """
+    df = pd.read_csv(path)
+    missing = [column for column in ("function_name", *METRICS.values()) if column not in df.columns]
+    if missing:
+        raise ValueError(f"{path} no es un perfil de ProfileExporter (faltan {', '.join(missing)}).")
+    if "pid" in df.columns:
+        pids = df["pid"].astype(str)
+        if pid == "all" and (pids == "all").any():
+            df = df[pids == "all"]
+        elif pid in ("all", "main"):
+            # El proceso principal es el primero que escribe ProfileExporter
+            df = df[pids == pids.iloc[0]]
+        else:
+            df = df[pids == str(pid)]
+    file_column = df["file"] if "file" in df.columns else pd.Series("", index=df.index)
+    keys = [function_key(f, n) for f, n in zip(file_column, df["function_name"])]
+    profile = pd.DataFrame({metric: pd.to_numeric(df[column], errors="coerce").to_numpy()
+                            for metric, column in METRICS.items()}, index=keys)
+    profile.index.name = "function"
+    # Una misma función puede aparecer varias veces (distintas líneas o definiciones)
+    grouped = profile.groupby(level=0)
+    profile = grouped[["tottime", "cumtime", "calls"]].sum()
+    profile["memory"] = grouped["memory"].max()
+    if "run_id" in df.columns and df["run_id"].notna().any():
+        profile.attrs["run_id"] = str(df["run_id"].dropna().iloc[0])
+    else:
+        profile.attrs["run_id"] = os.path.splitext(os.path.basename(path))[0]
+    return profile
+
+
+def diff_profiles(base: pd.DataFrame, other: pd.DataFrame) -> pd.DataFrame:
+    """
+    Compara dos perfiles por función. Las funciones que solo existen en uno cuentan con 0
+    en el otro (la memoria queda vacía).
+
+    Returns:
+        pd.DataFrame: Para cada métrica, columnas <métrica>_base, <métrica>_new,
+        <métrica>_delta y <métrica>_pct (cambio relativo en %, inf si la base es 0).
+    """
+    joined = base.join(other, how="outer", lsuffix="_base", rsuffix="_new")
+    for metric in METRICS:
+        old, new = f"{metric}_base", f"{metric}_new"
+        if metric != "memory":
+            joined[[old, new]] = joined[[old, new]].fillna(0)
+        joined[f"{metric}_delta"] = joined[new] - joined[old]
+        joined[f"{metric}_pct"] = (joined[f"{metric}_delta"] / joined[old].abs()) * 100
+    return joined
+
+
+def _format_row(function: str, row: pd.Series, metric: str) -> str:
+    old, new, delta, pct = (row[f"{metric}_{suffix}"] for suffix in ("base", "new", "delta", "pct"))
+    pct_text = "nuevo" if pd.isna(pct) or pct == float("inf") else f"{pct:+.1f}%"
+    if metric == "calls":
+        values = f"{old:>12.0f} {new:>12.0f} {delta:>+12.0f}"
+    else:
+        values = f"{old:>12.4f} {new:>12.4f} {delta:>+12.4f}"
+    return f"  {values} {pct_text:>9}  {function}"
+
+
+def print_report(diff: pd.DataFrame, base_label: str, new_label: str, top: int = 15) -> None:
+    """Imprime, por métrica, las funciones que más empeoran y las que más mejoran."""
+    print(f"\n=== {base_label} -> {new_label} ===")
+    totals = diff[["tottime_base", "tottime_new"]].sum()
+    print(f"tottime total: {totals['tottime_base']:.4f} s -> {totals['tottime_new']:.4f} s")
+    units = {"tottime": "s", "cumtime": "s", "calls": "llamadas", "memory": "MiB"}
+    for metric in METRICS:
+        delta = diff[f"{metric}_delta"].dropna()
+        if delta.empty:
+            continue
+        header = f"  {'base':>12} {'nuevo':>12} {'delta':>12} {'cambio':>9}  función"
+        worse = delta[delta > 0].sort_values(ascending=False).head(top)
+        better = delta[delta < 0].sort_values().head(top)
+        if not worse.empty:
+            print(f"\n{metric} ({units[metric]}) - regresiones:")
+            print(header)
+            for function in worse.index:
+                print(_format_row(function, diff.loc[function], metric))
+        if not better.empty:
+            print(f"\n{metric} ({units[metric]}) - mejoras:")
+            print(header)
+            for function in better.index:
+                print(_format_row(function, diff.loc[function], metric))
+
+
+def regressions(diff: pd.DataFrame, fail_over: float, min_seconds: float) -> pd.DataFrame:
+    """Funciones cuyo tottime empeora más de fail_over % y al menos min_seconds segundos."""
+    mask = (diff["tottime_delta"] >= min_seconds) & (diff["tottime_pct"] > fail_over)
+    return diff[mask].sort_values("tottime_delta", ascending=False)
+
+
+def trend(profiles: list, labels: list, metric: str = "tottime", top: int = 15) -> pd.DataFrame:
+    """Tabla metric por función y ejecución para las funciones con más variación."""
+    table = pd.concat([p[metric].rename(label) for p, label in zip(profiles, labels)], axis=1).fillna(0)
+    spread = table.max(axis=1) - table.min(axis=1)
+    return table.loc[spread.sort_values(ascending=False).head(top).index]
+
+
+# ----------------------------
+# Flamegraph (pilas colapsadas)
+# ----------------------------
+
+def _frame_name(func: tuple) -> str:
+    filename, line, name = func
+    key = function_key(filename, name)
+    return key.replace(";", ":")
+
+
+def collapsed_stacks(stats: pstats.Stats, max_depth: int = 64, min_seconds: float = 1e-6) -> dict:
+    """
+    Reconstruye pilas de llamada a partir de las aristas llamador -> llamado de pstats.
+
+    Se recorre el grafo desde las funciones sin llamadores. Para cada ruta, la fracción del
+    tiempo de un llamado atribuida a la ruta es la fracción de la ruta en su llamador por el
+    peso de la arista (tiempo acumulado de la arista / tiempo acumulado del llamado). Las
+    recursiones se cortan y se descartan las ramas con menos de min_seconds.
+
+    Returns:
+        dict: {"f1;f2;f3": tiempo propio en segundos}
+    """
+    raw = stats.stats
+    callees = defaultdict(list)
+    for func, (_, _, _, _, callers) in raw.items():
+        for caller, edge in callers.items():
+            # En Python 3 cada arista es (cc, nc, tt, ct); en versiones antiguas, un entero
+            edge_time = edge[3] if isinstance(edge, tuple) else 0
+            callees[caller].append((func, edge_time))
+
+    stacks = defaultdict(float)
+
+    def walk(func, path, on_path, weight):
+        _, _, tottime, _, _ = raw[func]
+        own = tottime * weight
+        if own >= min_seconds:
+            stacks[";".join(path)] += own
+        if len(path) >= max_depth:
+            return
+        for callee, edge_time in callees.get(func, ()):
+            if callee in on_path or callee not in raw:
+                continue
+            callee_cumtime = raw[callee][3]
+            if callee_cumtime <= 0:
+                continue
+            callee_weight = weight * min(edge_time / callee_cumtime, 1.0)
+            if callee_weight * callee_cumtime < min_seconds:
+                continue
+            on_path.add(callee)
+            path.append(_frame_name(callee))
+            walk(callee, path, on_path, callee_weight)
+            path.pop()
+            on_path.discard(callee)
+
+    roots = [func for func, value in raw.items() if not value[4]]
+    for root in roots:
+        walk(root, [_frame_name(root)], {root}, 1.0)
+    return dict(stacks)
+
+
+def write_collapsed(stats_path: str, output_path: str, max_depth: int = 64) -> str:
+    """Escribe las pilas colapsadas de un archivo pstats (una línea "f1;f2;f3 microsegundos")."""
+    stacks = collapsed_stacks(pstats.Stats(stats_path), max_depth=max_depth)
+    with open(output_path, "w", encoding="utf-8") as f:
+        for stack, seconds in sorted(stacks.items()):
+            microseconds = int(round(seconds * 1e6))
+            if microseconds > 0:
+                f.write(f"{stack} {microseconds}\n")
+    return output_path
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Compara perfiles exportados por ProfileExporter.")
+    parser.add_argument("profiles", nargs="+", help="CSV de perfiles; el primero es la línea base.")
+    parser.add_argument("--pid", default="all", help='Filas a comparar: "all", "main" o un PID.')
+    parser.add_argument("--top", type=int, default=15, help="Funciones por métrica en el informe.")
+    parser.add_argument("--fail-over", type=float,
+                        help="Termina con código 1 si el tottime de una función empeora más de este %%.")
+    parser.add_argument("--min-seconds", type=float, default=0.01,
+                        help="Cambio mínimo de tottime (s) para contar como regresión.")
+    parser.add_argument("--collapsed", help="Archivo de pilas colapsadas a generar (flamegraph).")
+    parser.add_argument("--stats", help="pstats para --collapsed. Por defecto <último CSV>.prof.")
+    args = parser.parse_args(argv)
+
+    if len(args.profiles) < 2 and not args.collapsed:
+        parser.error("Se necesitan al menos dos perfiles para comparar.")
+
+    profiles = [load_profile(path, args.pid) for path in args.profiles]
+    labels = [p.attrs["run_id"] for p in profiles]
+    # Etiquetas únicas aunque dos CSV compartan run_id
+    labels = [label if labels.count(label) == 1 else f"{label}#{i}" for i, label in enumerate(labels)]
+
+    failed = False
+    for profile, label in zip(profiles[1:], labels[1:]):
+        diff = diff_profiles(profiles[0], profile)
+        print_report(diff, labels[0], label, args.top)
+        if args.fail_over is not None:
+            regressed = regressions(diff, args.fail_over, args.min_seconds)
+            if not regressed.empty:
+                failed = True
+                print(f"\nREGRESIÓN ({label}): {len(regressed)} funciones superan +{args.fail_over}% de tottime:")
+                for function, row in regressed.head(args.top).iterrows():
+                    print(_format_row(function, row, "tottime"))
+
+    if len(profiles) > 2:
+        print("\n=== tottime por ejecución (funciones con más variación) ===")
+        print(trend(profiles, labels, "tottime", args.top).to_string(float_format=lambda v: f"{v:.4f}"))
+
+    if args.collapsed:
+        stats_path = args.stats or os.path.splitext(args.profiles[-1])[0] + ".prof"
+        if not os.path.exists(stats_path):
+            print(f"No se encontró el archivo pstats {stats_path}; use --stats.")
+            return 2
+        write_collapsed(stats_path, args.collapsed)
+        print(f"\nPilas colapsadas escritas en {args.collapsed} (flamegraph.pl, speedscope o inferno).")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
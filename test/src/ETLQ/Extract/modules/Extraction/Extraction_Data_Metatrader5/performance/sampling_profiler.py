@@ -0,0 +1,274 @@
+# ----------------------------
+# Descripcion
+# ----------------------------
+"""
+Perfilador por muestreo para dejar activo en las descargas largas (nocturnas).
+
+A diferencia de cProfile, que instrumenta cada llamada y solo cubre el proceso principal,
+SamplingProfiler ejecuta un hilo daemon que cada `interval` segundos captura las pilas de
+todos los hilos del proceso (sys._current_frames) y cuenta cuántas veces aparece cada pila.
+Es un perfil de tiempo real (wall clock): las esperas en llamadas al terminal de MT5 o en
+E/S aparecen igual que el tiempo de CPU. El coste se mide en cada muestra y, si supera
+max_overhead (2 % por defecto) del tiempo transcurrido, el intervalo se duplica.
+
+El proceso principal y cada worker del pool arrancan su propio muestreador con
+start_sampling(nombre). Como los workers terminan sin atexit, cada proceso guarda su
+acumulado periódicamente (y al salir) en <dir>/<run_id>/<pid>.json; export_collapsed()
+fusiona los del run y escribe un archivo de pilas colapsadas por proceso y otro por run
+(formato "f1;f2;f3 muestras", para flamegraph.pl, speedscope o inferno y comparable con el
+de profile_diff.py).
+
+Variables de entorno (los procesos hijos las heredan):
+- HERMESDB_SAMPLING: "off" (por defecto) u "on".
+- HERMESDB_SAMPLING_INTERVAL: segundos entre muestras (0.01 por defecto, 100 Hz).
+- HERMESDB_SAMPLING_DIR: carpeta de los acumulados por proceso. Por defecto,
+  <tmp>/hermesdb_samples. Las carpetas de runs antiguos se borran al empezar uno nuevo (ver
+  Common/run_context.py).
+"""
+# ----------------------------
+# librerias y dependencias
+# ----------------------------
+
+# Standard library imports
+import os
+import sys
+import atexit
+import glob
+import json
+import ntpath
+import tempfile
+import threading
+import time
+from collections import Counter
+from multiprocessing import util
+
+# ----------------------------
+# Conexiones
+# ----------------------------
+
+# Componentes compartidos entre etapas (test/src/ETLQ/Common)
+from Common.run_context import current_run_id, run_dir
+
+# ----------------------------
+# Codigo
+# ----------------------------
+
+SAMPLING_ENV = "HERMESDB_SAMPLING"
+SAMPLING_INTERVAL_ENV = "HERMESDB_SAMPLING_INTERVAL"
+SAMPLING_DIR_ENV = "HERMESDB_SAMPLING_DIR"
+
+DEFAULT_INTERVAL = 0.01
+# Intervalo máximo al que puede llegar la adaptación por sobrecoste
+MAX_INTERVAL = 1.0
+MAX_OVERHEAD = 0.02
+# Segundos entre guardados del acumulado (los workers pueden terminar sin aviso)
+FLUSH_INTERVAL = 30.0
+MAX_DEPTH = 128
+
+
+def sampling_enabled() -> bool:
+    return os.environ.get(SAMPLING_ENV, "off").strip().lower() in ("on", "1", "true", "yes")
+
+
+def sampling_interval() -> float:
+    return float(os.environ.get(SAMPLING_INTERVAL_ENV) or DEFAULT_INTERVAL)
+
+
+def sampling_dir() -> str:
+    return os.environ.get(SAMPLING_DIR_ENV) or os.path.join(tempfile.gettempdir(), "hermesdb_samples")
+
+
+class SamplingProfiler:
+    """
+    Muestreador de pilas de un proceso en un hilo daemon.
+
+    Args:
+        name (str): Nombre del proceso en los archivos colapsados (p. ej. "extract", "worker").
+        interval (float, optional): Segundos entre muestras. Defaults a HERMESDB_SAMPLING_INTERVAL.
+        max_overhead (float): Fracción máxima del tiempo dedicada a muestrear antes de
+            duplicar el intervalo.
+        flush_interval (float): Segundos entre guardados del acumulado.
+    """
+
+    def __init__(self, name: str, interval: float = None, max_overhead: float = MAX_OVERHEAD,
+                 flush_interval: float = FLUSH_INTERVAL, run_id: str = None, directory: str = None):
+        self.name = name
+        self.interval = interval or sampling_interval()
+        self.max_overhead = max_overhead
+        self.flush_interval = flush_interval
+        self.run_id = run_id or current_run_id()
+        self.directory = directory or sampling_dir()
+        self.pid = os.getpid()
+        self.stacks = Counter()
+        self.samples = 0
+        self.sampling_time = 0.0
+        self._labels = {}
+        self._thread_names = {}
+        self._started = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="SamplingProfiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Detiene el muestreo y guarda el acumulado (idempotente)."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+        self.flush()
+
+    @property
+    def overhead(self) -> float:
+        """Fracción del tiempo transcurrido dedicada a muestrear y guardar."""
+        if self._started is None:
+            return 0.0
+        elapsed = time.perf_counter() - self._started
+        return self.sampling_time / elapsed if elapsed > 0 else 0.0
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            # Mismo formato que profile_diff.function_key; ";" separa los marcos en el formato colapsado
+            file_name = ntpath.basename(code.co_filename.replace("/", "\\"))
+            label = self._labels[code] = f"{file_name}:{code.co_name}".replace(";", ":")
+        return label
+
+    def _thread_name(self, ident: int) -> str:
+        name = self._thread_names.get(ident)
+        if name is None:
+            self._thread_names = {t.ident: t.name for t in threading.enumerate()}
+            name = self._thread_names.get(ident, f"thread-{ident}")
+        return name
+
+    def sample_once(self):
+        """Captura la pila de cada hilo del proceso (excepto el del muestreador)."""
+        own = threading.get_ident()
+        for ident, frame in sys._current_frames().items():  # pylint: disable=protected-access
+            if ident == own:
+                continue
+            labels = []
+            while frame is not None and len(labels) < MAX_DEPTH:
+                labels.append(self._label(frame.f_code))
+                frame = frame.f_back
+            labels.append(self._thread_name(ident))
+            self.stacks[tuple(reversed(labels))] += 1
+        self.samples += 1
+
+    def _run(self):
+        next_flush = time.monotonic() + self.flush_interval
+        while not self._stop.wait(self.interval):
+            start = time.perf_counter()
+            self.sample_once()
+            if time.monotonic() >= next_flush:
+                self.flush()
+                next_flush = time.monotonic() + self.flush_interval
+            self.sampling_time += time.perf_counter() - start
+            # Con suficientes muestras para estimarlo, se reduce la frecuencia si el coste es alto
+            if self.samples >= 100 and self.overhead > self.max_overhead and self.interval < MAX_INTERVAL:
+                self.interval = min(self.interval * 2, MAX_INTERVAL)
+
+    def snapshot(self) -> dict:
+        stacks = dict(self.stacks)
+        return {
+            "name": self.name,
+            "pid": self.pid,
+            "samples": self.samples,
+            "interval": self.interval,
+            "overhead": self.overhead,
+            "stacks": {";".join(stack): count for stack, count in stacks.items()},
+        }
+
+    def spool_path(self) -> str:
+        return os.path.join(self.directory, self.run_id, f"{self.pid}.json")
+
+    def flush(self):
+        """Guarda el acumulado de este proceso (sustituye al anterior)."""
+        if not self.samples:
+            return
+        path = self.spool_path()
+        run_dir(self.directory, self.run_id)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+
+
+_sampler = None
+
+
+def start_sampling(name: str) -> SamplingProfiler:
+    """
+    Arranca el muestreador del proceso actual si HERMESDB_SAMPLING está activo (uno por
+    proceso). Se detiene y guarda al salir, también en los workers de multiprocessing.
+
+    Returns:
+        SamplingProfiler o None si el muestreo está desactivado.
+    """
+    global _sampler  # pylint: disable=global-statement
+    if not sampling_enabled():
+        return None
+    if _sampler is None or _sampler.pid != os.getpid():
+        _sampler = SamplingProfiler(name).start()
+        atexit.register(_sampler.stop)
+        # Los workers de un Pool no ejecutan atexit, pero sí los finalizadores de multiprocessing
+        util.Finalize(None, _sampler.stop, exitpriority=10)
+    return _sampler
+
+
+def stop_sampling():
+    """Detiene el muestreador del proceso actual (si lo hay) y guarda su acumulado."""
+    if _sampler is not None and _sampler.pid == os.getpid():
+        _sampler.stop()
+
+
+def collect(run_id: str = None, directory: str = None) -> list:
+    """Acumulados de todos los procesos del run, incluido el actual."""
+    if _sampler is not None and _sampler.pid == os.getpid():
+        _sampler.flush()
+    run_dir = os.path.join(directory or sampling_dir(), run_id or current_run_id())
+    snapshots = []
+    for path in sorted(glob.glob(os.path.join(run_dir, "*.json"))):
+        with open(path, encoding="utf-8") as f:
+            snapshots.append(json.load(f))
+    return snapshots
+
+
+def _write_folded(path: str, stacks: dict):
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, count in sorted(stacks.items()):
+            f.write(f"{stack} {count}\n")
+
+
+def export_collapsed(output_dir: str, run_id: str = None, directory: str = None) -> dict:
+    """
+    Escribe las pilas colapsadas del run en output_dir:
+    - <nombre>_<pid>.folded: un archivo por proceso.
+    - run_<run_id>.folded: todos los procesos, con el nombre del proceso como marco raíz
+      (los workers se agregan bajo "worker").
+
+    Returns:
+        dict: {"processes": [rutas], "run": ruta, "summary": [{name, pid, samples, interval, overhead}]}
+    """
+    run_id = run_id or current_run_id()
+    os.makedirs(output_dir, exist_ok=True)
+    merged = Counter()
+    paths, summary = [], []
+    for snapshot in collect(run_id, directory):
+        path = os.path.join(output_dir, f"{snapshot['name']}_{snapshot['pid']}.folded")
+        _write_folded(path, snapshot["stacks"])
+        paths.append(path)
+        for stack, count in snapshot["stacks"].items():
+            merged[f"{snapshot['name']};{stack}"] += count
+        summary.append({key: snapshot[key] for key in ("name", "pid", "samples", "interval", "overhead")})
+    run_path = os.path.join(output_dir, f"run_{run_id}.folded")
+    _write_folded(run_path, merged)
+    return {"processes": paths, "run": run_path, "summary": summary}
@@ -4,14 +4,18 @@
 
 """
 El código define la clase SystemMonitor, diseñada para monitorear en tiempo real el
-uso de recursos del sistema, incluyendo CPU, memoria, disco y red, y almacenar las
-métricas en un archivo CSV. Utiliza psutil para capturar información sobre el consumo
-de CPU global y por núcleo, memoria utilizada en MB, actividad del disco y tráfico de
-red en intervalos configurables. La monitorización se ejecuta en un hilo separado
-mediante threading, asegurando que la captura de datos no afecte el rendimiento del
-proceso principal. Los datos se almacenan en una lista protegida por un Lock para
-evitar problemas de concurrencia, y al detener el monitoreo, se exportan a un archivo
-CSV en la ruta especificada, garantizando la persistencia de la información.
+uso de recursos del sistema y del propio pipeline, y almacenar las métricas en un archivo
+CSV. Utiliza psutil para capturar el consumo de CPU global y por núcleo, la memoria
+utilizada en MB, y las tasas de disco y red (MB/s calculadas entre muestras). Además
+atribuye CPU y RSS al árbol de procesos del pipeline (proceso principal y workers del
+pool), con el detalle por PID. Cada muestra lleva el run_id de la ejecución y un id
+secuencial. La monitorización se ejecuta en un hilo separado y las muestras se escriben
+de forma incremental al CSV cada flush_every muestras desde un buffer acotado, de modo
+que un fallo no pierde lo ya capturado y las ejecuciones largas no crecen en memoria.
+Si el CSV ya existe con otras columnas (de una versión anterior), se renombra a
+<nombre>.<fecha>.csv y se empieza uno nuevo, en vez de añadir filas con otro formato.
+Con publish_metrics, la CPU y el RSS de cada proceso se publican además como gauges en el
+registro de métricas del run (Common/metrics.py) en cada muestra, para el panel en vivo.
 """
 
 # ----------------------------
@@ -23,6 +27,7 @@ import os
 import threading
 import json
 import time
+from collections import deque
 from datetime import datetime
 
 # Third-party imports
@@ -34,85 +39,225 @@ import pandas as pd
 # Conexiones
 # ----------------------------
 
+# Componentes compartidos entre etapas (test/src/ETLQ/Common)
+from Common.run_context import current_run_id
+from Common.metrics import registry
+
 
 # ----------------------------
 # Codigo
 # ----------------------------
 
+COLUMNS = [
+    "id",
+    "run_id",
+    "timestamp",
+    "cpu_usage",
+    "memory_usage",
+    "disk_usage",
+    "disk_read_rate",
+    "disk_write_rate",
+    "network_usage",
+    "cpu_usage_per_core",
+    "process_count",
+    "process_cpu_usage",
+    "process_memory_usage",
+    "process_details",
+]
+
 
 class SystemMonitor:
     """
-    Monitorea los recursos del sistema (CPU, memoria, disco y red) y los almacena en un CSV.
+    Monitorea los recursos del sistema (CPU, memoria, disco y red) y del árbol de procesos
+    del pipeline, y los escribe de forma incremental en un CSV.
     """
 
-    def __init__(self, csv_path: str, interval: float = 2.0) -> None:
+    def __init__(
+        self,
+        csv_path: str,
+        interval: float = 2.0,
+        run_id: str = None,
+        root_pid: int = None,
+        flush_every: int = 30,
+        max_buffer: int = 1000,
+        publish_metrics: bool = True,
+    ) -> None:
         """
         Inicializa la instancia del monitor del sistema.
 
         Args:
-            csv_path (str): Ruta del archivo CSV donde se guardarán las métricas.
+            csv_path (str): Ruta del archivo CSV donde se guardarán las métricas. Si ya
+                existe con las mismas columnas, las muestras se añaden al final (se distinguen
+                por run_id); si sus columnas son otras, se renombra antes de escribir.
             interval (float, optional): Intervalo en segundos entre cada captura. Defaults a 2.0.
+            run_id (str, optional): Identificador de la ejecución. Defaults al run_id en curso.
+            root_pid (int, optional): Proceso raíz del pipeline. Defaults al proceso actual.
+            flush_every (int, optional): Muestras acumuladas antes de escribir al CSV.
+            max_buffer (int, optional): Máximo de muestras en memoria si la escritura falla;
+                se descartan las más antiguas.
+            publish_metrics (bool, optional): Publicar CPU, RSS y procesos vivos por PID como
+                gauges (process_cpu_percent, process_rss_mib, process_alive) en cada muestra.
         """
         self.csv_path = csv_path
         self.interval = interval
+        self.run_id = run_id or current_run_id()
+        self.root_pid = root_pid or os.getpid()
+        self.flush_every = flush_every
+        self.publish_metrics = publish_metrics
         self.running = False
         self.thread = None
-        self.metrics = []
+        self.metrics = deque(maxlen=max_buffer)
         self.lock = threading.Lock()
-        net_counters = psutil.net_io_counters()
-        self.last_net_bytes = net_counters.bytes_sent + net_counters.bytes_recv
+        self._stop_event = threading.Event()
+        self._sample_id = 0
+        self._header_checked = False
+        self._processes = {}
+        self._last_time = None
+        self._last_disk = None
+        self._last_net = None
+
+    def _rate(self, current: int, last: int, elapsed: float) -> float:
+        if last is None or elapsed <= 0:
+            return 0.0
+        return max(current - last, 0) / elapsed / (1024**2)
+
+    def _process_metrics(self) -> tuple:
+        """CPU (%) y RSS (MB) del árbol de procesos; conserva los objetos Process entre muestras."""
+        try:
+            root = psutil.Process(self.root_pid)
+            tree = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return 0, 0.0, 0.0, "{}"
+        alive = {}
+        details = {}
+        total_cpu = 0.0
+        total_rss = 0.0
+        for process in tree:
+            # El primer cpu_percent de un proceso devuelve 0; los siguientes, el uso desde la muestra anterior
+            process = self._processes.get(process.pid, process)
+            try:
+                cpu = process.cpu_percent(None)
+                rss_mb = process.memory_info().rss / (1024**2)
+            except psutil.Error:
+                continue
+            alive[process.pid] = process
+            details[process.pid] = {"cpu": cpu, "rss_mb": round(rss_mb, 2)}
+            total_cpu += cpu
+            total_rss += rss_mb
+        if self.publish_metrics:
+            self._publish(details, set(self._processes) - set(alive))
+        self._processes = alive
+        return len(alive), total_cpu, total_rss, json.dumps(details)
+
+    @staticmethod
+    def _publish(details: dict, finished: set) -> None:
+        """Publica los recursos por PID en el registro de métricas y guarda su snapshot."""
+        metrics = registry()
+        for pid, values in details.items():
+            metrics.gauge("process_cpu_percent", "CPU del proceso (%)", pid=pid).set(values["cpu"])
+            metrics.gauge("process_rss_mib", "RSS del proceso (MiB)", pid=pid).set(values["rss_mb"])
+            metrics.gauge("process_alive", "1 mientras el proceso sigue vivo", pid=pid).set(1)
+        for pid in finished:
+            metrics.gauge("process_alive", "1 mientras el proceso sigue vivo", pid=pid).set(0)
+        metrics.flush()
+
+    def sample(self) -> dict:
+        """Captura una muestra de métricas."""
+        now = time.monotonic()
+        elapsed = now - self._last_time if self._last_time is not None else 0.0
+        disk = psutil.disk_io_counters()
+        net = psutil.net_io_counters()
+        read_rate = self._rate(disk.read_bytes, self._last_disk and self._last_disk.read_bytes, elapsed)
+        write_rate = self._rate(disk.write_bytes, self._last_disk and self._last_disk.write_bytes, elapsed)
+        net_bytes = net.bytes_sent + net.bytes_recv
+        network_rate = self._rate(net_bytes, self._last_net, elapsed)
+        self._last_time, self._last_disk, self._last_net = now, disk, net_bytes
+
+        process_count, process_cpu, process_rss, process_details = self._process_metrics()
+        self._sample_id += 1
+        return {
+            "id": self._sample_id,
+            "run_id": self.run_id,
+            "timestamp": datetime.now(),
+            "cpu_usage": psutil.cpu_percent(),
+            "memory_usage": psutil.virtual_memory().used / (1024**2),
+            "disk_usage": read_rate + write_rate,
+            "disk_read_rate": read_rate,
+            "disk_write_rate": write_rate,
+            "network_usage": network_rate,
+            "cpu_usage_per_core": json.dumps(psutil.cpu_percent(percpu=True)),
+            "process_count": process_count,
+            "process_cpu_usage": process_cpu,
+            "process_memory_usage": process_rss,
+            "process_details": process_details,
+        }
+
+    def flush(self) -> None:
+        """Escribe en el CSV las muestras pendientes del buffer."""
+        with self.lock:
+            if not self.metrics:
+                return
+            pending = list(self.metrics)
+            self.metrics.clear()
+        parent_dir = os.path.dirname(self.csv_path)
+        if parent_dir:
+            os.makedirs(parent_dir, exist_ok=True)
+        try:
+            if not self._header_checked:
+                self._rotate_if_incompatible()
+                self._header_checked = True
+            header = not os.path.exists(self.csv_path) or os.path.getsize(self.csv_path) == 0
+            pd.DataFrame(pending, columns=COLUMNS).to_csv(
+                self.csv_path, mode="a", header=header, index=False
+            )
+        except OSError:
+            # Se devuelven al buffer (acotado) para reintentar en la próxima escritura
+            with self.lock:
+                self.metrics.extendleft(reversed(pending))
+
+    def _rotate_if_incompatible(self) -> None:
+        """Renombra el CSV existente si su cabecera no coincide con COLUMNS."""
+        if not os.path.exists(self.csv_path) or os.path.getsize(self.csv_path) == 0:
+            return
+        with open(self.csv_path, "r", encoding="utf-8", newline="") as file:
+            header = file.readline().strip()
+        if header == ",".join(COLUMNS):
+            return
+        stem, ext = os.path.splitext(self.csv_path)
+        stamp = datetime.fromtimestamp(os.path.getmtime(self.csv_path)).strftime("%Y%m%d_%H%M%S")
+        os.replace(self.csv_path, f"{stem}.{stamp}{ext or '.csv'}")
 
     def log_metrics(self) -> None:
         """
-        Captura las métricas del sistema en intervalos regulares y las almacena en la
-        lista de métricas.
+        Captura las métricas en intervalos regulares y las escribe al CSV cada
+        flush_every muestras.
         """
-        while self.running:
-            timestamp = datetime.now()
-            cpu_usage = psutil.cpu_percent()
-            cpu_usage_per_core = json.dumps(psutil.cpu_percent(percpu=True))
-            memory_used_mb = psutil.virtual_memory().used / (1024**2)
-            disk_counters = psutil.disk_io_counters()
-            disk_usage_mb = (disk_counters.read_bytes + disk_counters.write_bytes) / (
-                1024**2
-            )
-            net_counters = psutil.net_io_counters()
-            current_net_bytes = net_counters.bytes_sent + net_counters.bytes_recv
-            delta_net_bytes = current_net_bytes - self.last_net_bytes
-            network_usage_mbs = delta_net_bytes / self.interval / (1024**2)
-            self.last_net_bytes = current_net_bytes
-
-            metrics_dict = {
-                "timestamp": timestamp,
-                "cpu_usage": cpu_usage,
-                "memory_usage": memory_used_mb,
-                "disk_usage": disk_usage_mb,
-                "network_usage": network_usage_mbs,
-                "cpu_usage_per_core": cpu_usage_per_core,
-            }
-
+        # Muestra inicial: fija las referencias de las tasas y de cpu_percent
+        self.sample()
+        self._sample_id = 0
+        while not self._stop_event.wait(self.interval):
+            metrics_dict = self.sample()
             with self.lock:
                 self.metrics.append(metrics_dict)
-            time.sleep(self.interval)
+                pending = len(self.metrics)
+            if pending >= self.flush_every:
+                self.flush()
 
     def start(self) -> None:
         """
         Inicia la monitorización del sistema en un hilo separado.
         """
         self.running = True
+        self._stop_event.clear()
         self.thread = threading.Thread(target=self.log_metrics, daemon=True)
         self.thread.start()
 
     def stop(self) -> None:
         """
-        Detiene la monitorización y exporta las métricas capturadas a un archivo CSV.
+        Detiene la monitorización y escribe las métricas pendientes en el CSV.
         """
         self.running = False
+        self._stop_event.set()
         if self.thread:
             self.thread.join()
-
-        parent_dir = os.path.dirname(self.csv_path)
-        os.makedirs(parent_dir, exist_ok=True)
-
-        df = pd.DataFrame(self.metrics)
-        df.to_csv(self.csv_path, index=False)
+        self.flush()
@@ -2,14 +2,19 @@
 # Descripcion
 # ----------------------------
 """
-El código define un decorador llamado mem_profile, que mide el uso de memoria en MiB
-durante la ejecución de una función y almacena la máxima cantidad de memoria
-consumida en el diccionario global memory_usage_dict, usando como clave una tupla
-(nombre_archivo, nombre_función). Utiliza memory_usage de memory_profiler para capturar
-el consumo de memoria antes y después de la ejecución de la función decorada y registra
-la diferencia. También emplea functools.wraps para preservar los metadatos originales
-de la función. Esto permite realizar un monitoreo eficiente del uso de memoria en
-diferentes funciones dentro del proyecto.
+El código define el decorador mem_profile, la capa de instrumentación de las funciones del
+extractor. El modo se elige con la variable de entorno HERMESDB_PROFILE (o con configure()
+antes de importar los módulos decorados):
+
+- "off" (por defecto): el decorador devuelve la función original, sin ningún coste.
+- "time": número de llamadas y tiempos por función (total, media y percentiles).
+- "rss": además, el incremento de RSS del proceso durante la llamada (psutil, una sola
+  lectura de /proc o del contador del sistema antes y después).
+- "tracemalloc": además, el pico de memoria asignada por Python durante la llamada.
+
+Las estadísticas se guardan por clave (nombre_archivo, nombre_función) en function_stats; el
+incremento máximo de memoria en MiB se mantiene en memory_usage_dict para ProfileExporter.
+Los procesos hijos creados con spawn heredan la variable de entorno y, con ella, el modo.
 """
 
 # ----------------------------
@@ -19,9 +24,15 @@ diferentes funciones dentro del proyecto.
 # Standard library imports
 import functools
 import os
+import random
+import threading
+import time
+import tracemalloc
 
 # Third-party imports
-from memory_profiler import memory_usage
+import numpy as np
+import pandas as pd
+import psutil
 
 # ----------------------------
 # Conexiones
@@ -32,30 +43,171 @@ from memory_profiler import memory_usage
 # Codigo
 # ----------------------------
 
+PROFILE_ENV = "HERMESDB_PROFILE"
+PROFILE_MODES = ("off", "time", "rss", "tracemalloc")
+
+# Número máximo de duraciones guardadas por función para los percentiles (muestreo reservoir)
+MAX_SAMPLES = 10000
+
 # Diccionario global para almacenar el consumo de memoria por función
 # La clave será una tupla: (nombre_archivo, nombre_función)
 memory_usage_dict = {}
 
+# Estadísticas de llamadas y tiempos por función, misma clave que memory_usage_dict
+function_stats = {}
+
+_process = psutil.Process()
+
+# Picos de tracemalloc de las llamadas decoradas en curso (una pila por hilo): cada llamada
+# reinicia el pico de tracemalloc, así que antes se guarda el de la llamada exterior
+_peaks = threading.local()
+
+
+def profile_mode() -> str:
+    """Modo de instrumentación activo según HERMESDB_PROFILE."""
+    mode = os.environ.get(PROFILE_ENV, "off").strip().lower() or "off"
+    if mode in ("0", "false", "no"):
+        return "off"
+    if mode in ("1", "true", "yes"):
+        return "rss"
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Modo de perfilado desconocido en {PROFILE_ENV}: {mode}")
+    return mode
+
+
+def configure(mode: str):
+    """
+    Fija el modo de instrumentación. Debe llamarse antes de importar los módulos decorados
+    (el decorador decide al decorar); se propaga a los workers por la variable de entorno.
+    """
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Modo de perfilado desconocido: {mode}")
+    os.environ[PROFILE_ENV] = mode
+
+
+class FunctionStats:
+    """Acumulador de llamadas, tiempos y memoria de una función."""
+
+    __slots__ = ("calls", "total_time", "max_time", "samples", "max_memory")
+
+    def __init__(self):
+        self.calls = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.samples = []
+        self.max_memory = None
+
+    def add(self, elapsed: float, memory_mib: float = None):
+        self.calls += 1
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(elapsed)
+        else:
+            slot = random.randrange(self.calls)
+            if slot < MAX_SAMPLES:
+                self.samples[slot] = elapsed
+        if memory_mib is not None:
+            self.max_memory = memory_mib if self.max_memory is None else max(self.max_memory, memory_mib)
+
+
+def _record(key: tuple, elapsed: float, memory_mib: float = None):
+    stats = function_stats.get(key)
+    if stats is None:
+        stats = function_stats[key] = FunctionStats()
+    stats.add(elapsed, memory_mib)
+    if memory_mib is not None:
+        # Si ya se ha medido antes, se toma el máximo
+        memory_usage_dict[key] = max(memory_usage_dict.get(key, 0), memory_mib)
+
 
 def mem_profile(func):
     """
-    Decorador para medir el incremento de memoria (en MiB) durante la ejecución de una función.
-    Almacena el valor medido en memory_usage_dict con clave (nombre_archivo, nombre_función).
+    Decorador de instrumentación por función. Con el modo "off" devuelve func sin envolver;
+    en el resto registra llamadas y tiempos y, según el modo, el incremento de memoria (MiB).
     """
+    mode = profile_mode()
+    if mode == "off":
+        return func
+
+    # Se obtiene el nombre del archivo de la función
+    key = (os.path.basename(func.__code__.co_filename), func.__name__)
 
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        mem_before = memory_usage()[0]
-        result = func(*args, **kwargs)
-        mem_after = memory_usage()[0]
-        mem_used = mem_after - mem_before
+    if mode == "time":
 
-        # Se obtiene el nombre del archivo de la función
-        filename = os.path.basename(func.__code__.co_filename)
-        key = (filename, func.__name__)
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _record(key, time.perf_counter() - start)
 
-        # Si ya se ha medido antes, se toma el máximo (o podrías acumular, según lo requieras)
-        memory_usage_dict[key] = max(memory_usage_dict.get(key, 0), mem_used)
-        return result
+    elif mode == "rss":
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            rss_before = _process.memory_info().rss
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                _record(key, elapsed, (_process.memory_info().rss - rss_before) / 1024**2)
+
+    else:
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            stack = _peaks.__dict__.setdefault("stack", [])
+            current_before, peak_so_far = tracemalloc.get_traced_memory()
+            if stack:
+                # Pico de la llamada exterior hasta ahora, antes de reiniciarlo
+                stack[-1] = max(stack[-1], peak_so_far)
+            stack.append(current_before)
+            tracemalloc.reset_peak()
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                _, peak = tracemalloc.get_traced_memory()
+                peak = max(peak, stack.pop())
+                if stack:
+                    # El pico de esta llamada también es pico de la exterior
+                    stack[-1] = max(stack[-1], peak)
+                _record(key, elapsed, (peak - current_before) / 1024**2)
 
     return wrapper
+
+
+def stats_frame() -> pd.DataFrame:
+    """Estadísticas por función: llamadas, tiempos (total, media, p50, p90, p99, máx.) y memoria."""
+    rows = []
+    for (file_name, func_name), stats in function_stats.items():
+        samples = np.asarray(stats.samples)
+        p50, p90, p99 = np.percentile(samples, [50, 90, 99]) if len(samples) else (None, None, None)
+        rows.append({
+            "function_name": func_name,
+            "file": file_name,
+            "call_count": stats.calls,
+            "total_time": stats.total_time,
+            "avg_time": stats.total_time / stats.calls if stats.calls else 0,
+            "p50_time": p50,
+            "p90_time": p90,
+            "p99_time": p99,
+            "max_time": stats.max_time,
+            "memory_usage": stats.max_memory,
+        })
+    return pd.DataFrame(rows, columns=[
+        "function_name", "file", "call_count", "total_time", "avg_time",
+        "p50_time", "p90_time", "p99_time", "max_time", "memory_usage",
+    ])
+
+
+def reset_stats():
+    """Vacía las estadísticas acumuladas en este proceso."""
+    function_stats.clear()
+    memory_usage_dict.clear()
@@ -3,8 +3,8 @@
 """Este módulo se encarga de gestionar y administrar la importación de datos, asegurando una integración eficiente entre los módulos de procesamiento ETL y el almacenamiento en la carpeta data. Su función principal es facilitar la comunicación entre estos componentes, garantizando un flujo de datos estructurado y optimizado para su posterior análisis y transformación."""
 
 #==============================# Importamos las librerias necesarias #==============================#
-import pandas as pd
-import numpy as np
+# Componentes compartidos entre etapas (test/src/ETLQ/Common)
+from Common.config import data_path
 
 #==============================#      Fuction main [Interface]       #==============================#
 def ImportInterface(Option):
@@ -14,5 +14,6 @@ def ImportInterface(Option):
             return credentials
 #==============================#           modules funtion           #==============================
 def Extract(): 
-    df = pd.read_csv(r"C:\Users\spinz\OneDrive\Documentos\Portafolio oficial\HERMESDB\HERMESDB\test\data\raw\config.csv")
+    import pandas as pd  # Solo al leer las credenciales
+    df = pd.read_csv(data_path("credentials"))
     return df
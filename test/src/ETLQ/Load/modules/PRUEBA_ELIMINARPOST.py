@@ -1,9 +1,16 @@
+import os
+import sys
 import pandas as pd
 from rich.progress import Progress
 
+# Componentes compartidos entre etapas (test/src/ETLQ/Common)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from Common.memory_governor import MemoryGovernor
+
 filename = r'C:\Users\spinz\OneDrive\Documentos\Portafolio oficial\HERMESDB\HERMESDB\test\data\backup\Table_Datos_historicos.csv'
 output_file = r'C:\Users\spinz\OneDrive\Documentos\Portafolio oficial\HERMESDB\HERMESDB\test\data\backup\duplicados.csv'
-chunksize = 100000  # Puedes ajustar el tamaño del chunk según la memoria disponible
+chunksize = 100000  # Tamaño máximo del chunk; el MemoryGovernor lo reduce si falta memoria
+governor = MemoryGovernor.shared()
 
 # Función para generar clave como string
 def generar_key(df):
@@ -22,7 +29,7 @@ key_counts = {}
 
 with Progress() as progress:
     task = progress.add_task("[cyan]Contando ocurrencias...", total=total_lines)
-    for chunk in pd.read_csv(filename, chunksize=chunksize, engine='c'):
+    for chunk in governor.read_csv_chunks(filename, max_rows=chunksize, engine='c'):
         chunk_len = len(chunk)
         chunk.reset_index(drop=True, inplace=True)
         
@@ -47,7 +54,7 @@ global_index = 0
 
 with Progress() as progress:
     task = progress.add_task("[cyan]Extrayendo duplicados...", total=total_lines)
-    for chunk in pd.read_csv(filename, chunksize=chunksize, engine='c'):
+    for chunk in governor.read_csv_chunks(filename, max_rows=chunksize, engine='c'):
         chunk_len = len(chunk)
         chunk.reset_index(drop=True, inplace=True)
         chunk['global_index'] = range(global_index, global_index + chunk_len)
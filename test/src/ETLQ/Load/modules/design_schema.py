@@ -0,0 +1,116 @@
+import os
+import re
+
+# Ruta por defecto del diseño de la base de datos (formato dbdiagram.io)
+DESIGN_PATH = os.path.abspath(os.path.join(
+    os.path.dirname(__file__), "..", "..", "..", "..", "..",
+    "Project Architecture", "Arquitecture table Database", "Design.sql"
+))
+
+# Traducción de los tipos de dbdiagram a tipos de PostgreSQL
+POSTGRES_TYPES = {
+    'integer': 'INTEGER',
+    'bigint': 'BIGINT',
+    'numeric': 'NUMERIC',
+    'timestamptz': 'TIMESTAMPTZ',
+    'date': 'DATE',
+}
+
+_TABLE_RE = re.compile(r"^Table\s+(\w+)\s*\{")
+_COLUMN_RE = re.compile(r"^(\w+)\s+([\w()]+)\s*(?:\[(.*)\])?$")
+_INDEX_RE = re.compile(r"^(\(([^)]*)\)|\w+)\s*(?:\[(.*)\])?$")
+_NAME_RE = re.compile(r"name:\s*'([^']*)'")
+_DEFAULT_RE = re.compile(r"default:\s*([^,\]]+)")
+
+
+def _parse_settings(settings: str) -> set:
+    """Devuelve el conjunto de banderas simples (pk, increment, unique, not null) de un bloque [..]."""
+    if not settings:
+        return set()
+    return {part.strip().lower() for part in settings.split(',') if ':' not in part}
+
+
+def parse_design(path: str = DESIGN_PATH) -> dict:
+    """
+    Lee el diseño de la base de datos escrito para dbdiagram.io y devuelve la definición
+    de cada tabla.
+
+    Args:
+        path (str): Ruta del archivo Design.sql.
+
+    Returns:
+        dict: {nombre_tabla: {'name', 'columns', 'indexes'}} donde cada columna es un dict
+            con las claves 'name', 'type', 'pk', 'increment', 'not_null', 'unique' y 'default',
+            y cada índice un dict con 'name', 'columns' y 'unique'.
+    """
+    tables = {}
+    current = None
+    in_indexes = False
+    with open(path, encoding='utf-8') as f:
+        for raw_line in f:
+            line = raw_line.split('//')[0].strip()
+            if not line:
+                continue
+            if current is None:
+                match = _TABLE_RE.match(line)
+                if match:
+                    current = {'name': match.group(1), 'columns': [], 'indexes': []}
+                continue
+            if line.startswith('indexes'):
+                in_indexes = True
+                continue
+            if line == '}':
+                if in_indexes:
+                    in_indexes = False
+                else:
+                    tables[current['name']] = current
+                    current = None
+                continue
+            if in_indexes:
+                match = _INDEX_RE.match(line)
+                if match:
+                    columns = match.group(2) if match.group(2) is not None else match.group(1)
+                    name = _NAME_RE.search(match.group(3) or '')
+                    current['indexes'].append({
+                        'name': name.group(1) if name else None,
+                        'columns': [c.strip() for c in columns.split(',')],
+                        'unique': 'unique' in _parse_settings(match.group(3)),
+                    })
+                continue
+            match = _COLUMN_RE.match(line)
+            if match:
+                flags = _parse_settings(match.group(3))
+                default = _DEFAULT_RE.search(match.group(3) or '')
+                current['columns'].append({
+                    'name': match.group(1),
+                    'type': match.group(2).lower(),
+                    'pk': 'pk' in flags,
+                    'increment': 'increment' in flags,
+                    'not_null': 'not null' in flags,
+                    'unique': 'unique' in flags,
+                    'default': default.group(1).strip() if default else None,
+                })
+    return tables
+
+
+def load_design_table(table_name: str, path: str = DESIGN_PATH) -> dict:
+    """
+    Devuelve la definición de una única tabla del diseño.
+
+    Raises:
+        KeyError: Si la tabla no existe en el diseño.
+    """
+    tables = parse_design(path)
+    if table_name not in tables:
+        raise KeyError(f"La tabla '{table_name}' no existe en {path}.")
+    return tables[table_name]
+
+
+def postgres_type(column: dict) -> str:
+    """Traduce el tipo de una columna del diseño a su tipo en PostgreSQL."""
+    col_type = column['type']
+    if column['increment']:
+        return 'BIGSERIAL' if col_type == 'bigint' else 'SERIAL'
+    if col_type.startswith('varchar'):
+        return col_type.upper()
+    return POSTGRES_TYPES.get(col_type, col_type.upper())
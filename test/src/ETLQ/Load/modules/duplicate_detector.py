@@ -0,0 +1,186 @@
+import os
+import sys
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# Ejecución directa del módulo (ver el bloque __main__): test/src/ETLQ en sys.path para
+# importar Common. Importado como biblioteca, la ruta la fija el punto de entrada.
+if __name__ == "__main__":
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+# Componentes compartidos entre etapas (test/src/ETLQ/Common)
+from Common.memory_governor import MemoryGovernor
+from Common.config import data_path
+
+KEY_COLUMNS = ['activo_id', 'broker_id', 'timestamp', 'timeframe']
+
+# Registro que se vuelca a disco por fila: hash de la llave compuesta y registro_id
+RECORD_DTYPE = np.dtype([('hash', '<u8'), ('registro_id', '<i8')])
+PLAN_DTYPE = np.dtype([('registro_id', '<i8'), ('duplicado_de', '<i8')])
+
+
+def hash_keys(df: pd.DataFrame, key_columns: list = KEY_COLUMNS) -> np.ndarray:
+    """
+    Hash de 64 bits de la llave compuesta de cada fila.
+
+    Las columnas se normalizan antes de hashear para que el mismo valor produzca el mismo
+    hash aunque pandas lo lea con otro tipo en otro chunk (p. ej. 3 y 3.0 en los ids, o
+    timestamps con distinto formato de texto).
+    """
+    normalized = {}
+    for column in key_columns:
+        series = df[column]
+        if column == 'timestamp':
+            timestamps = pd.to_datetime(series, utc=True, errors='coerce')
+            normalized[column] = timestamps.dt.tz_localize(None).astype('datetime64[ns]').to_numpy().view('i8')
+        elif column == 'timeframe':
+            normalized[column] = series.astype(str).to_numpy()
+        else:
+            normalized[column] = pd.to_numeric(series, errors='coerce').astype('float64').to_numpy()
+    return pd.util.hash_pandas_object(pd.DataFrame(normalized), index=False).to_numpy()
+
+
+class HashPartitionDeduplicator:
+    """
+    Detecta duplicados de Datos_Historicos (misma llave activo_id, broker_id, timestamp,
+    timeframe) en memoria externa y genera un plan de borrado por registro_id.
+
+    - Una sola lectura del CSV: cada fila se reduce a (hash uint64, registro_id) = 16 bytes
+      y se reparte por los bits altos del hash en n_partitions archivos temporales.
+    - Cada partición se procesa por separado (np.fromfile + ordenación), de modo que solo
+      una partición está en memoria a la vez. El número de particiones se calcula con el
+      margen del MemoryGovernor si no se indica.
+    - Dentro de cada grupo de llave igual se conserva el menor registro_id y el resto pasa
+      al plan de borrado (registro_id, duplicado_de).
+
+    La probabilidad de colisión de un hash de 64 bits es despreciable para cientos de
+    millones de filas (~n²/2⁶⁵), por lo que no se compara la llave original.
+    """
+
+    def __init__(self, file_path: str, key_columns: list = KEY_COLUMNS, n_partitions: int = None,
+                 work_dir: str = None, chunksize: int = 1_000_000):
+        self.file_path = file_path
+        self.key_columns = list(key_columns)
+        self.n_partitions = n_partitions
+        self.work_dir = work_dir
+        self.chunksize = chunksize
+        self.governor = MemoryGovernor.shared()
+        self.rows_scanned = 0
+
+    def _partition_count(self) -> int:
+        # Estimación de filas por tamaño de archivo (~60 bytes por fila en los CSV exportados)
+        # y ~4 copias de cada registro al ordenar una partición
+        estimated_rows = os.path.getsize(self.file_path) / 60
+        partition_bytes = max(self.governor.headroom() * self.governor.chunk_fraction, 64 * 1024**2)
+        needed = int(np.ceil(estimated_rows * RECORD_DTYPE.itemsize * 4 / partition_bytes))
+        # Potencia de dos para repartir por los bits altos del hash
+        return 1 << max(needed - 1, 0).bit_length()
+
+    def _spill(self, tmp_dir: str, n_partitions: int) -> list:
+        """Primera pasada: lee el CSV y vuelca (hash, registro_id) en una partición por hash."""
+        paths = [os.path.join(tmp_dir, f"part_{i:05d}.bin") for i in range(n_partitions)]
+        shift = np.uint64(64 - (n_partitions.bit_length() - 1))
+        files = [open(path, 'wb') for path in paths]
+        try:
+            usecols = lambda column: column in self.key_columns or column == 'registro_id'
+            for chunk in self.governor.read_csv_chunks(self.file_path, max_rows=self.chunksize, usecols=usecols):
+                records = np.empty(len(chunk), dtype=RECORD_DTYPE)
+                records['hash'] = hash_keys(chunk, self.key_columns)
+                if 'registro_id' in chunk.columns:
+                    records['registro_id'] = chunk['registro_id'].to_numpy(dtype='int64')
+                else:
+                    # Sin registro_id (p. ej. datos_pre_mapping.csv) se usa la posición de la fila
+                    records['registro_id'] = np.arange(self.rows_scanned, self.rows_scanned + len(chunk))
+                self.rows_scanned += len(chunk)
+                if n_partitions == 1:
+                    records.tofile(files[0])
+                    continue
+                partition = (records['hash'] >> shift).astype(np.intp)
+                order = np.argsort(partition, kind='stable')
+                bounds = np.searchsorted(partition[order], np.arange(n_partitions + 1))
+                for i in np.flatnonzero(np.diff(bounds)):
+                    records[order[bounds[i]:bounds[i + 1]]].tofile(files[i])
+        finally:
+            for f in files:
+                f.close()
+        return paths
+
+    @staticmethod
+    def _partition_plan(path: str) -> np.ndarray:
+        """Duplicados de una partición: todas las filas de cada grupo salvo la de menor registro_id."""
+        records = np.fromfile(path, dtype=RECORD_DTYPE)
+        if len(records) < 2:
+            return np.empty(0, dtype=PLAN_DTYPE)
+        records = records[np.lexsort((records['registro_id'], records['hash']))]
+        hashes = records['hash']
+        is_dup = np.empty(len(records), dtype=bool)
+        is_dup[0] = False
+        is_dup[1:] = hashes[1:] == hashes[:-1]
+        if not is_dup.any():
+            return np.empty(0, dtype=PLAN_DTYPE)
+        # Índice de la primera fila (la conservada) del grupo de cada fila
+        first = np.maximum.accumulate(np.where(is_dup, 0, np.arange(len(records))))
+        plan = np.empty(int(is_dup.sum()), dtype=PLAN_DTYPE)
+        plan['registro_id'] = records['registro_id'][is_dup]
+        plan['duplicado_de'] = records['registro_id'][first[is_dup]]
+        return plan
+
+    def run(self) -> pd.DataFrame:
+        """
+        Ejecuta la detección completa.
+
+        Returns:
+            pd.DataFrame: Plan de borrado con columnas registro_id y duplicado_de (registro
+            que se conserva), ordenado por registro_id.
+        """
+        n_partitions = self.n_partitions or self._partition_count()
+        tmp_dir = tempfile.mkdtemp(prefix="hermesdb_dedup_", dir=self.work_dir)
+        self.rows_scanned = 0
+        try:
+            plans = [self._partition_plan(path) for path in self._spill(tmp_dir, n_partitions)]
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        plan = np.concatenate(plans) if plans else np.empty(0, dtype=PLAN_DTYPE)
+        plan.sort(order='registro_id')
+        return pd.DataFrame({'registro_id': plan['registro_id'], 'duplicado_de': plan['duplicado_de']})
+
+
+def delete_ranges(registro_ids) -> list:
+    """Comprime una lista de registro_id en rangos consecutivos [(inicio, fin), ...]."""
+    ids = np.unique(np.asarray(registro_ids, dtype='int64'))
+    if len(ids) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(ids) != 1)
+    starts = np.concatenate(([ids[0]], ids[breaks + 1]))
+    ends = np.concatenate((ids[breaks], [ids[-1]]))
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def delete_plan_sql(plan: pd.DataFrame, table: str = 'Datos_Historicos', batch_size: int = 1000) -> list:
+    """
+    Genera las sentencias DELETE del plan, agrupando ids consecutivos en BETWEEN y
+    hasta batch_size rangos por sentencia.
+    """
+    ranges = delete_ranges(plan['registro_id'])
+    statements = []
+    for i in range(0, len(ranges), batch_size):
+        conditions = [
+            f"registro_id = {start}" if start == end else f"registro_id BETWEEN {start} AND {end}"
+            for start, end in ranges[i:i + batch_size]
+        ]
+        statements.append(f"DELETE FROM {table} WHERE " + " OR ".join(conditions) + ";")
+    return statements
+
+
+if __name__ == "__main__":
+    file_path = data_path("backup", "Table_Datos_historicos.csv")
+    plan_path = data_path("backup", "plan_borrado_duplicados.csv")
+
+    deduplicator = HashPartitionDeduplicator(file_path)
+    plan = deduplicator.run()
+    plan.to_csv(plan_path, index=False)
+    print(f"Filas analizadas: {deduplicator.rows_scanned}. Duplicados a borrar: {len(plan)}")
+    print(f"Plan de borrado guardado en: {plan_path}")
@@ -0,0 +1,198 @@
+import os
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from design_schema import DESIGN_PATH, load_design_table, postgres_type
+
+
+class PartitionSchemaGenerator:
+    """
+    Genera el DDL de PostgreSQL para Datos_Historicos particionada por rango de tiempo
+    y subparticionada por lista de timeframe, a partir del diseño en Design.sql.
+
+    La jerarquía resultante es:
+        datos_historicos                          (PARTITION BY RANGE (timestamp))
+          datos_historicos_2015q1                 (PARTITION BY LIST (timeframe))
+            datos_historicos_2015q1_h1            FOR VALUES IN ('1h')
+            ...
+            datos_historicos_2015q1_default       DEFAULT
+
+    Las restricciones únicas e índices secundarios se devuelven por separado en
+    index_ddl() para poder crearlos una sola vez al final de la carga masiva.
+    El índice sobre timeframe se omite porque lo sustituye la subpartición por lista.
+    """
+    # Meses que abarca cada partición de rango
+    PERIOD_MONTHS = {'month': 1, 'quarter': 3, 'year': 12}
+    # Timeframes de CSVToPostgresAdapter.TIMEFRAME_MAPPING y sufijo seguro para el nombre
+    # de la partición ('1m' y '1M' colisionarían al pasar a minúsculas)
+    TIMEFRAME_SUFFIX = {
+        '1m': 'm1', '5m': 'm5', '15m': 'm15', '30m': 'm30',
+        '1h': 'h1', '4h': 'h4', '1d': 'd1', '1w': 'w1', '1M': 'mn1'
+    }
+
+    def __init__(self, table: dict, period: str = 'quarter', timeframes: list = None,
+                 time_column: str = 'timestamp', list_column: str = 'timeframe'):
+        assert period in self.PERIOD_MONTHS, f"period debe ser uno de {list(self.PERIOD_MONTHS)}."
+        self.table = table
+        self.table_name = table['name'].lower()
+        self.period = period
+        self.months = self.PERIOD_MONTHS[period]
+        self.timeframes = list(timeframes) if timeframes is not None else list(self.TIMEFRAME_SUFFIX)
+        self.time_column = time_column
+        self.list_column = list_column
+
+    @classmethod
+    def from_design(cls, path: str = DESIGN_PATH, table_name: str = 'Datos_Historicos', **kwargs):
+        """Construye el generador leyendo la tabla indicada de Design.sql."""
+        return cls(load_design_table(table_name, path), **kwargs)
+
+    # ------------------------------------------------------------------ #
+    # Nombres y límites de particiones
+    # ------------------------------------------------------------------ #
+    def period_start(self, ts) -> datetime:
+        """Devuelve el inicio (UTC) del periodo al que pertenece ts."""
+        ts = pd.Timestamp(ts)
+        ts = ts.tz_localize('UTC') if ts.tzinfo is None else ts.tz_convert('UTC')
+        month = (ts.month - 1) // self.months * self.months + 1
+        return datetime(ts.year, month, 1, tzinfo=timezone.utc)
+
+    def period_end(self, start: datetime) -> datetime:
+        """Devuelve el inicio del periodo siguiente a start (límite superior exclusivo)."""
+        month_index = start.month - 1 + self.months
+        return datetime(start.year + month_index // 12, month_index % 12 + 1, 1, tzinfo=timezone.utc)
+
+    def period_starts(self, start, end) -> list:
+        """Lista los inicios de periodo que cubren el intervalo [start, end]."""
+        current = self.period_start(start)
+        last = self.period_start(end)
+        periods = []
+        while current <= last:
+            periods.append(current)
+            current = self.period_end(current)
+        return periods
+
+    def partition_name(self, start: datetime, timeframe: str = None) -> str:
+        """Nombre de la partición de rango o, si se indica timeframe, de la subpartición."""
+        if self.period == 'year':
+            label = f"{start.year}"
+        elif self.period == 'quarter':
+            label = f"{start.year}q{(start.month - 1) // 3 + 1}"
+        else:
+            label = f"{start.year}m{start.month:02d}"
+        name = f"{self.table_name}_{label}"
+        if timeframe is None:
+            return name
+        return f"{name}_{self.timeframe_suffix(timeframe)}"
+
+    def timeframe_suffix(self, timeframe: str) -> str:
+        """Sufijo de la subpartición de un timeframe; los no listados van a la partición default."""
+        if timeframe in self.timeframes:
+            return self.TIMEFRAME_SUFFIX.get(timeframe, timeframe.lower())
+        return 'default'
+
+    # ------------------------------------------------------------------ #
+    # DDL
+    # ------------------------------------------------------------------ #
+    def parent_ddl(self) -> str:
+        """CREATE TABLE de la tabla padre, sin restricciones ni índices."""
+        lines = []
+        for column in self.table['columns']:
+            not_null = column['not_null'] or column['pk'] or column['name'] in (self.time_column, self.list_column)
+            line = f"  {column['name']} {postgres_type(column)}"
+            if not_null:
+                line += " NOT NULL"
+            if column['default'] is not None:
+                line += f" DEFAULT {column['default']}"
+            lines.append(line)
+        return (f"CREATE TABLE IF NOT EXISTS {self.table_name} (\n"
+                + ",\n".join(lines)
+                + f"\n) PARTITION BY RANGE ({self.time_column});")
+
+    def partition_ddl(self, start: datetime) -> list:
+        """DDL de una partición de rango y de todas sus subparticiones por timeframe."""
+        end = self.period_end(start)
+        range_name = self.partition_name(start)
+        statements = [
+            f"CREATE TABLE IF NOT EXISTS {range_name} PARTITION OF {self.table_name} "
+            f"FOR VALUES FROM ('{start:%Y-%m-%d %H:%M:%S}+00') TO ('{end:%Y-%m-%d %H:%M:%S}+00') "
+            f"PARTITION BY LIST ({self.list_column});"
+        ]
+        for timeframe in self.timeframes:
+            statements.append(
+                f"CREATE TABLE IF NOT EXISTS {self.partition_name(start, timeframe)} "
+                f"PARTITION OF {range_name} FOR VALUES IN ('{timeframe}');"
+            )
+        statements.append(
+            f"CREATE TABLE IF NOT EXISTS {range_name}_default PARTITION OF {range_name} DEFAULT;"
+        )
+        return statements
+
+    def _key_columns(self, columns: list) -> list:
+        """Las restricciones únicas de una tabla particionada deben incluir las llaves de partición."""
+        return columns + [c for c in (self.time_column, self.list_column) if c not in columns]
+
+    def index_ddl(self) -> list:
+        """DDL de clave primaria, restricciones únicas e índices a crear tras la carga masiva."""
+        statements = []
+        pk_columns = [c['name'] for c in self.table['columns'] if c['pk']]
+        if pk_columns:
+            statements.append(
+                f"ALTER TABLE {self.table_name} ADD CONSTRAINT pk_{self.table_name} "
+                f"PRIMARY KEY ({', '.join(self._key_columns(pk_columns))});"
+            )
+        for index in self.table['indexes']:
+            if index['columns'] == [self.list_column]:
+                continue
+            name = index['name'] or f"idx_{self.table_name}_{'_'.join(index['columns'])}"
+            if index['unique']:
+                statements.append(
+                    f"ALTER TABLE {self.table_name} ADD CONSTRAINT {name} "
+                    f"UNIQUE ({', '.join(self._key_columns(index['columns']))});"
+                )
+            else:
+                statements.append(
+                    f"CREATE INDEX IF NOT EXISTS {name} ON {self.table_name} ({', '.join(index['columns'])});"
+                )
+        return statements
+
+    def drop_index_ddl(self) -> list:
+        """DDL inverso de index_ddl(), usado antes de una carga masiva sobre una tabla existente."""
+        statements = []
+        if any(c['pk'] for c in self.table['columns']):
+            statements.append(f"ALTER TABLE {self.table_name} DROP CONSTRAINT IF EXISTS pk_{self.table_name};")
+        for index in self.table['indexes']:
+            if index['columns'] == [self.list_column]:
+                continue
+            name = index['name'] or f"idx_{self.table_name}_{'_'.join(index['columns'])}"
+            if index['unique']:
+                statements.append(f"ALTER TABLE {self.table_name} DROP CONSTRAINT IF EXISTS {name};")
+            else:
+                statements.append(f"DROP INDEX IF EXISTS {name};")
+        return statements
+
+    def schema_ddl(self, start, end, include_indexes: bool = True) -> str:
+        """Script completo: tabla padre, particiones entre start y end y, opcionalmente, índices."""
+        statements = [self.parent_ddl()]
+        for period in self.period_starts(start, end):
+            statements.extend(self.partition_ddl(period))
+        if include_indexes:
+            statements.extend(self.index_ddl())
+        return "\n\n".join(statements) + "\n"
+
+    def write_sql(self, output_path: str, start, end, include_indexes: bool = True) -> str:
+        """Escribe schema_ddl() en output_path y devuelve la ruta."""
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(self.schema_ddl(start, end, include_indexes))
+        return output_path
+
+
+# =====================================================
+# Ejemplo de uso
+# =====================================================
+if __name__ == "__main__":
+    generator = PartitionSchemaGenerator.from_design(period='quarter')
+    output = os.path.join(os.path.dirname(__file__), "Estructure_datos_historicos_partitioned.sql")
+    generator.write_sql(output, datetime(2000, 1, 1), datetime.now())
+    print(f"Esquema particionado generado en: {output}")
@@ -0,0 +1,147 @@
+import io
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from partition_schema import PartitionSchemaGenerator
+
+# Componentes compartidos entre etapas (test/src/ETLQ/Common)
+from Common.tracing import span
+from Common.metrics import registry, SIZE_BUCKETS
+
+
+class PartitionedLoader:
+    """
+    Carga lotes de Datos_Historicos en la tabla particionada generada por
+    PartitionSchemaGenerator usando COPY directamente sobre cada subpartición.
+
+    - Enruta cada lote a su partición (periodo, timeframe) de forma vectorizada, evitando
+      el enrutamiento fila a fila que PostgreSQL hace al insertar en la tabla padre.
+    - Crea las particiones que falten la primera vez que llega un dato de ese periodo.
+    - Con defer_indexes=True elimina clave primaria, restricciones únicas e índices al
+      empezar y los construye una sola vez en finish(), en lugar de mantenerlos fila a fila.
+      Con defer_indexes=False se mantienen durante la carga; si la tabla no existía, begin()
+      los crea junto con ella.
+
+    La conexión es cualquier conexión DB-API de psycopg2 (se usa cursor.copy_expert).
+    Los lotes son los DataFrames de CSVToPostgresAdapter con map_ids=True.
+    """
+
+    def __init__(self, connection, generator: PartitionSchemaGenerator = None, defer_indexes: bool = True):
+        self.connection = connection
+        self.generator = generator if generator is not None else PartitionSchemaGenerator.from_design()
+        self.defer_indexes = defer_indexes
+        self.table_columns = [c['name'] for c in self.generator.table['columns']]
+        self._known_partitions = set()
+        self.rows_loaded = 0
+
+    def _execute(self, statements: list):
+        with self.connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+    def _load_existing_partitions(self):
+        # Particiones de rango ya creadas bajo la tabla padre
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT c.relname FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid "
+                "JOIN pg_class p ON p.oid = i.inhparent "
+                "WHERE p.relname = %s",
+                (self.generator.table_name,)
+            )
+            self._known_partitions = {row[0] for row in cursor.fetchall()}
+
+    def _table_exists(self) -> bool:
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (self.generator.table_name,))
+            return bool(cursor.fetchone()[0])
+
+    def begin(self):
+        """
+        Crea la tabla padre si no existe. Si se difieren índices, los elimina antes de cargar
+        (finish() los vuelve a crear); si no, una tabla recién creada recibe aquí su clave
+        primaria, restricciones únicas e índices (parent_ddl() no los incluye).
+        """
+        created = not self._table_exists()
+        self._execute([self.generator.parent_ddl()])
+        if self.defer_indexes:
+            self._execute(self.generator.drop_index_ddl())
+        elif created:
+            self._execute(self.generator.index_ddl())
+        self._load_existing_partitions()
+        self.connection.commit()
+
+    def ensure_partition(self, start) -> str:
+        """Crea la partición de rango del periodo start (y sus subparticiones) si no existe."""
+        name = self.generator.partition_name(start)
+        if name not in self._known_partitions:
+            self._execute(self.generator.partition_ddl(start))
+            self._known_partitions.add(name)
+        return name
+
+    def _copy(self, target: str, df: pd.DataFrame):
+        buffer = io.StringIO()
+        df.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        with self.connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {target} ({', '.join(df.columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+            )
+
+    def load_batch(self, df: pd.DataFrame) -> int:
+        """
+        Enruta un lote a sus subparticiones y lo copia en una única transacción.
+
+        Las filas sin timestamp o sin timeframe no tienen partición y se descartan.
+
+        Returns:
+            int: Número de filas cargadas.
+        """
+        metrics = registry()
+        latency = metrics.histogram("load_batch_seconds", "Latencia de load_batch", loader="postgres")
+        with span("batch", cat="batch", detail=True, rows=len(df)), latency.time():
+            loaded = self._copy_batch(df)
+        metrics.histogram("load_batch_rows", "Filas por lote", buckets=SIZE_BUCKETS, loader="postgres").observe(len(df))
+        metrics.counter("load_rows_total", "Filas cargadas", loader="postgres").inc(loaded)
+        metrics.counter("load_rows_dropped_total", "Filas sin partición (sin timestamp o timeframe)",
+                        loader="postgres").inc(len(df) - loaded)
+        return loaded
+
+    def _copy_batch(self, df: pd.DataFrame) -> int:
+        if df.empty:
+            return 0
+        columns = [c for c in self.table_columns if c in df.columns]
+        df = df[columns]
+        time_column = self.generator.time_column
+        timestamps = pd.to_datetime(df[time_column], utc=True)
+        # Inicio de periodo vectorizado: año y primer mes del periodo
+        months = self.generator.months
+        period_keys = timestamps.dt.year * 100 + (timestamps.dt.month - 1) // months * months + 1
+        timeframes = df[self.generator.list_column]
+        loaded = 0
+        for (period_key, timeframe), part in df.groupby([period_keys, timeframes], sort=False):
+            start = datetime(int(period_key) // 100, int(period_key) % 100, 1, tzinfo=timezone.utc)
+            self.ensure_partition(start)
+            self._copy(self.generator.partition_name(start, timeframe), part)
+            loaded += len(part)
+        self.connection.commit()
+        self.rows_loaded += loaded
+        return loaded
+
+    def load(self, batches) -> int:
+        """Carga todos los lotes de un iterable (p. ej. CSVToPostgresAdapter.transform_generator())."""
+        with span("load", cat="stage", table=self.generator.table_name):
+            self.begin()
+            for df in batches:
+                self.load_batch(df)
+            with span("finish", cat="stage"):
+                self.finish()
+        return self.rows_loaded
+
+    def finish(self):
+        """Construye los índices diferidos y actualiza las estadísticas del planificador."""
+        if self.defer_indexes:
+            self._execute(self.generator.index_ddl())
+        self._execute([f"ANALYZE {self.generator.table_name};"])
+        self.connection.commit()
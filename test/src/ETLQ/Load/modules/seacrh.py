@@ -1,21 +1,46 @@
 import os
+import sys
 import pandas as pd
 from rich.progress import Progress, SpinnerColumn, TextColumn
 
-def search_by_registro_ids_efficient(file_path: str, target_ids: list, chunksize: int = 100000) -> list:
+# Ejecución directa del módulo (ver el bloque __main__): test/src/ETLQ en sys.path para
+# importar Common. Importado como biblioteca, la ruta la fija el punto de entrada.
+if __name__ == "__main__":
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+# Componentes compartidos entre etapas (test/src/ETLQ/Common)
+from Common.memory_governor import MemoryGovernor
+from Common.registro_index import RegistroOffsetIndex
+
+def search_by_registro_ids_efficient(file_path: str, target_ids: list, chunksize: int = 100000,
+                                     use_index: bool = True) -> list:
     """
     Returns a list of rows (as dictionaries) from a CSV file that contain
-    'registro_id' values within target_ids, processing the file in chunks
-    to reduce memory usage. A Rich progress bar is displayed to track progress.
+    'registro_id' values within target_ids.
+
+    By default it uses the sparse registro_id offset index stored next to the CSV
+    (built at export time, or built and saved here on first use) and reads only the
+    blocks that contain the requested ids. If the file cannot be indexed (no ascending
+    registro_id) or use_index is False, it scans the file in chunks with a Rich
+    progress bar; a failed index build is recorded next to the CSV, so later calls go
+    straight to the scan until the file changes.
 
     Parameters:
         file_path (str): Path to the CSV file.
         target_ids (list): List of registro_id values to search for.
-        chunksize (int): Number of rows to read per chunk.
+        chunksize (int): Maximum number of rows per chunk when scanning; the shared
+            MemoryGovernor shrinks it when the pipeline is close to its memory budget.
+        use_index (bool): Whether to use the registro_id offset index.
     
     Returns:
         List[dict]: A list of matching rows.
     """
+    if use_index:
+        try:
+            return RegistroOffsetIndex.open(file_path).lookup(target_ids).to_dict(orient='records')
+        except ValueError:
+            pass
+
     results = []
     
     # Initialize the rich progress bar with an indefinite total
@@ -27,7 +52,7 @@ def search_by_registro_ids_efficient(file_path: str, target_ids: list, chunksize
     
     with progress:
         # Process the CSV file in chunks
-        for chunk in pd.read_csv(file_path, chunksize=chunksize):
+        for chunk in MemoryGovernor.shared().read_csv_chunks(file_path, max_rows=chunksize):
             if 'registro_id' not in chunk.columns:
                 raise ValueError("El CSV no contiene la columna 'registro_id'.")
             
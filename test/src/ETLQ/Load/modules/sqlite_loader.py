@@ -0,0 +1,257 @@
+import os
+import sqlite3
+
+import pandas as pd
+
+from design_schema import DESIGN_PATH, parse_design
+
+# Componentes compartidos entre etapas (test/src/ETLQ/Common)
+from Common.tracing import span
+from Common.metrics import registry, SIZE_BUCKETS
+
+# Traducción de los tipos de dbdiagram a las afinidades de SQLite.
+# Los timestamptz se guardan como segundos UTC desde epoch (INTEGER) para que los
+# filtros por rango de tiempo comparen enteros.
+SQLITE_TYPES = {
+    'integer': 'INTEGER',
+    'bigint': 'INTEGER',
+    'numeric': 'REAL',
+    'timestamptz': 'INTEGER',
+    'date': 'TEXT',
+}
+
+
+class SQLiteLoader:
+    """
+    Carga el esquema de Design.sql en un único archivo SQLite, sin servidor de base de datos.
+
+    - Crea todas las tablas del diseño; los índices se crean en finish(), después de la carga.
+      Si la llave de un índice único se repite, finish() falla salvo con drop_duplicates=True,
+      que borra las copias antiguas (se conserva la última cargada) e informa cuántas.
+    - Inserta por lotes con executemany dentro de una transacción por lote. Sobre una base ya
+      indexada (una segunda carga) la inserción es un upsert por la llave única: la fila
+      nueva reemplaza a la existente.
+    - Ajusta page_size, journal_mode, synchronous, cache_size y temp_store para cargas masivas
+      y deja synchronous=NORMAL al terminar.
+
+    Los lotes de Datos_Historicos son directamente la salida de
+    CSVToPostgresAdapter._transform_chunk (vía transform_generator):
+
+        loader = SQLiteLoader("hermesdb.sqlite")
+        loader.load_table('Activos', assets_df)
+        loader.load(adapter.transform_generator(map_ids=True))
+    """
+    HISTORIC_TABLE = 'Datos_Historicos'
+
+    def __init__(self, db_path: str, design_path: str = DESIGN_PATH, page_size: int = 32768,
+                 cache_size_mb: int = 256, journal_mode: str = 'WAL'):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        self.tables = parse_design(design_path)
+        self.page_size = page_size
+        self.cache_size_mb = cache_size_mb
+        self.journal_mode = journal_mode
+        self.rows_loaded = 0
+        # isolation_level=None: las transacciones se controlan explícitamente con BEGIN/COMMIT
+        self.connection = sqlite3.connect(db_path, isolation_level=None)
+        self._configure()
+        self.create_schema()
+
+    def _configure(self):
+        cursor = self.connection.cursor()
+        # page_size solo tiene efecto antes de crear la primera tabla
+        cursor.execute(f"PRAGMA page_size = {int(self.page_size)}")
+        cursor.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+        cursor.execute("PRAGMA synchronous = OFF")
+        cursor.execute(f"PRAGMA cache_size = {-int(self.cache_size_mb) * 1024}")
+        cursor.execute("PRAGMA temp_store = MEMORY")
+
+    @staticmethod
+    def _column_ddl(column: dict) -> str:
+        if column['pk']:
+            # INTEGER PRIMARY KEY es alias del rowid: inserciones con ids crecientes al final del árbol
+            return f"{column['name']} INTEGER PRIMARY KEY"
+        col_type = SQLITE_TYPES.get(column['type'], 'TEXT')
+        ddl = f"{column['name']} {col_type}"
+        if column['not_null']:
+            ddl += " NOT NULL"
+        if column['unique']:
+            ddl += " UNIQUE"
+        if column['default'] is not None:
+            ddl += f" DEFAULT {column['default']}"
+        return ddl
+
+    def create_schema(self):
+        """Crea las tablas del diseño que aún no existan (sin índices secundarios)."""
+        for table in self.tables.values():
+            columns = ",\n  ".join(self._column_ddl(c) for c in table['columns'])
+            self.connection.execute(f"CREATE TABLE IF NOT EXISTS {table['name']} (\n  {columns}\n)")
+
+    def _indexes(self):
+        """(tabla, nombre, columnas, único) de cada índice del diseño."""
+        for table in self.tables.values():
+            column_names = [c['name'] for c in table['columns']]
+            for index in table['indexes']:
+                columns = list(index['columns'])
+                # Igual que en Estructure_database.sql: la llave única de las series incluye
+                # timeframe, ya que varios timeframes comparten timestamp
+                if index['unique'] and 'timeframe' in column_names and 'timeframe' not in columns:
+                    columns.append('timeframe')
+                name = index['name'] or f"idx_{table['name'].lower()}_{'_'.join(columns)}"
+                yield table['name'], name, columns, index['unique']
+
+    def index_ddl(self) -> list:
+        """DDL de los índices del diseño, a ejecutar tras la carga."""
+        return [
+            f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {table_name} ({', '.join(columns)})"
+            for table_name, name, columns, unique in self._indexes()
+        ]
+
+    def unique_keys(self, table_name: str = None) -> list:
+        """Columnas de cada índice único del diseño (de una tabla o de todas) como (tabla, columnas)."""
+        return [(t, columns) for t, _, columns, unique in self._indexes()
+                if unique and table_name in (None, t)]
+
+    def _existing_indexes(self) -> set:
+        return {row[0] for row in self.connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+    def _conflict_keys(self, table_name: str) -> list:
+        """
+        Llaves únicas de la tabla ya aplicadas en la base: columnas UNIQUE del diseño y
+        los índices únicos que finish() ya creó.
+        """
+        keys = [[c['name']] for c in self.tables[table_name]['columns'] if c['unique'] and not c['pk']]
+        existing = self._existing_indexes()
+        keys += [columns for t, name, columns, unique in self._indexes()
+                 if t == table_name and unique and name in existing]
+        return keys
+
+    def _pending_duplicates(self):
+        """(tabla, índice, columnas, condición de copia antigua) de cada índice único aún no creado."""
+        existing = self._existing_indexes()
+        for table_name, name, columns, unique in self._indexes():
+            if not unique or name in existing:
+                continue
+            # Las llaves con algún NULL no chocan en un índice único
+            not_null = " AND ".join(f"{c} IS NOT NULL" for c in columns)
+            older = (f"rowid IN (SELECT rowid FROM (SELECT rowid, ROW_NUMBER() OVER (PARTITION BY "
+                     f"{', '.join(columns)} ORDER BY rowid DESC) AS n FROM {table_name} WHERE {not_null}) "
+                     f"WHERE n > 1)")
+            yield table_name, name, columns, older
+
+    def count_duplicates(self) -> int:
+        """Filas que repiten la llave de un índice único aún no creado (sin contar la última)."""
+        return sum(self.connection.execute(f"SELECT COUNT(*) FROM {table_name} WHERE {older}").fetchone()[0]
+                   for table_name, _, _, older in self._pending_duplicates())
+
+    def remove_duplicates(self) -> int:
+        """
+        Borra las filas que repiten la llave de un índice único antes de crearlo (los índices
+        se difieren, así que la primera carga no las rechaza). Se conserva la de mayor rowid,
+        la última cargada, igual que el upsert sobre una base ya indexada.
+        """
+        removed = 0
+        for table_name, name, columns, older in self._pending_duplicates():
+            cursor = self.connection.execute(f"DELETE FROM {table_name} WHERE {older}")
+            if cursor.rowcount > 0:
+                print(f"{table_name}: {cursor.rowcount} filas con la llave de {name} "
+                      f"({', '.join(columns)}) repetida borradas; se conserva la última cargada.")
+                removed += cursor.rowcount
+        registry().counter("load_duplicates_removed_total", "Filas con llave única repetida borradas",
+                           loader="sqlite").inc(removed)
+        return removed
+
+    @staticmethod
+    def _to_epoch_seconds(series: pd.Series) -> pd.Series:
+        timestamps = pd.to_datetime(series, utc=True, errors='coerce')
+        seconds = (timestamps - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1)
+        return seconds.astype('Int64')
+
+    def _rows(self, table_name: str, df: pd.DataFrame):
+        """Devuelve (columnas, filas) con tipos nativos de Python listos para sqlite3."""
+        table = self.tables[table_name]
+        columns = [c['name'] for c in table['columns'] if c['name'] in df.columns]
+        values = []
+        for column in table['columns']:
+            if column['name'] not in df.columns:
+                continue
+            series = df[column['name']]
+            if column['type'] == 'timestamptz':
+                series = self._to_epoch_seconds(series)
+            values.append(series.astype(object).where(series.notna(), None).tolist())
+        return columns, zip(*values)
+
+    def load_table(self, table_name: str, df: pd.DataFrame) -> int:
+        """
+        Inserta un DataFrame en cualquier tabla del diseño en una única transacción. Las filas
+        cuya llave única ya existe en la base la actualizan (gana la fila nueva).
+        """
+        if df.empty:
+            return 0
+        columns, rows = self._rows(table_name, df)
+        placeholders = ", ".join("?" for _ in columns)
+        sql = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders})"
+        for key in self._conflict_keys(table_name):
+            if not set(key) <= set(columns):
+                continue
+            updates = [f"{c} = excluded.{c}" for c in columns if c not in key]
+            sql += (f" ON CONFLICT ({', '.join(key)}) DO UPDATE SET {', '.join(updates)}"
+                    if updates else f" ON CONFLICT ({', '.join(key)}) DO NOTHING")
+        cursor = self.connection.cursor()
+        cursor.execute("BEGIN")
+        try:
+            cursor.executemany(sql, rows)
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+        return len(df)
+
+    def load_batch(self, df: pd.DataFrame) -> int:
+        """Inserta un lote de Datos_Historicos; si no trae registro_id, SQLite lo asigna consecutivo."""
+        metrics = registry()
+        latency = metrics.histogram("load_batch_seconds", "Latencia de load_batch", loader="sqlite")
+        with span("batch", cat="batch", detail=True, rows=len(df)), latency.time():
+            loaded = self.load_table(self.HISTORIC_TABLE, df)
+        metrics.histogram("load_batch_rows", "Filas por lote", buckets=SIZE_BUCKETS, loader="sqlite").observe(len(df))
+        metrics.counter("load_rows_total", "Filas cargadas", loader="sqlite").inc(loaded)
+        self.rows_loaded += loaded
+        return loaded
+
+    def load(self, batches, drop_duplicates: bool = False) -> int:
+        """Carga todos los lotes de un iterable y construye los índices al final (ver finish)."""
+        with span("load", cat="stage", table=self.HISTORIC_TABLE):
+            for df in batches:
+                self.load_batch(df)
+            with span("finish", cat="stage"):
+                self.finish(drop_duplicates)
+        return self.rows_loaded
+
+    def finish(self, drop_duplicates: bool = False) -> int:
+        """
+        Crea los índices diferidos, actualiza estadísticas y deja la base en modo durable.
+
+        Args:
+            drop_duplicates (bool): Si hay filas que repiten la llave de un índice único aún
+                no creado, borrar las copias antiguas (ver remove_duplicates). Si es False,
+                se lanza ValueError con el número de filas repetidas y no se crea ningún índice.
+
+        Returns:
+            int: Filas borradas.
+        """
+        if drop_duplicates:
+            removed = self.remove_duplicates()
+        else:
+            removed = 0
+            duplicates = self.count_duplicates()
+            if duplicates:
+                raise ValueError(f"{duplicates} filas repiten la llave de un índice único; "
+                                 f"use drop_duplicates=True para conservar solo la última cargada.")
+        for statement in self.index_ddl():
+            self.connection.execute(statement)
+        self.connection.execute("ANALYZE")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        return removed
+
+    def close(self):
+        self.connection.close()
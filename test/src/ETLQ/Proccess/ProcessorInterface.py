@@ -3,6 +3,16 @@
 """Este modulo sera el orquestador de todo el proceso de Limpieza Transformacion y Validacion."""
 
 #==============================# Importamos los módulos necesarios #==============================#
+import os
+import sys
+
+# Punto de entrada: test/src/ETLQ (Common) y la carpeta Processor (módulos hermanos de DataClear)
+# en sys.path (ver Common/__init__.py)
+ETLQ_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+for path in (ETLQ_DIR, os.path.join(ETLQ_DIR, "Proccess", "modules", "Processor")):
+    if path not in sys.path:
+        sys.path.append(path)
+
 from modules.Facade.ImportInterface import * #eSTE MODULO GESTIONA LAS DIRECCIONES DE importacin LOS ARCHIVOS DE LOGS Y DATOS
 from modules.Facade.ExportInterface import * #eSTE MODULO GESTIONA LAS DIRECCIONES DE exportacion LOS ARCHIVOS DE LOGS Y DATOS
 
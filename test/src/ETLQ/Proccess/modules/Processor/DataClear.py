@@ -1,15 +1,193 @@
 import os
+import json
+import shutil
 import pandas as pd
 import numpy as np
 from tqdm import tqdm  # Barra de progreso
 import multiprocessing
 
+# Módulos hermanos: la carpeta Processor está en sys.path (lo fija el punto de entrada)
+import bar_store
+import price_encoding
+from bar_store import BarStore
+from price_encoding import SymbolDigits, PRICE_COLUMNS
+
+# Componentes compartidos entre etapas (test/src/ETLQ/Common)
+from Common.tracing import span
+from Common.metrics import registry
+from Common.pipeline_status import progress_bars_enabled
+from Common.stage_cache import StageCache
+from Common.config import config as pipeline_config
+
+# Código del que depende el CSV limpio (clave de la caché de la etapa)
+CLEAN_CODE = [__file__, bar_store.__file__, price_encoding.__file__]
+
+
 def process_broker(args):
     """
     Función para procesar un broker (carpeta) completa.
     Se reciben los parámetros necesarios en una tupla: (input_dir, output_dir, broker, config)
     """
     input_dir, output_dir, broker, config = args
+    # Caché de etapas (HERMESDB_STAGE_CACHE): si la carpeta del broker, la configuración y el
+    # código de la limpieza (CLEAN_CODE) no cambiaron, se restaura el CSV limpio. Solo se guarda
+    # si todos los archivos del broker se limpiaron sin error. Con bar_store la etapa escribe
+    # también fuera de output_file, por lo que no se cachea.
+    cache = StageCache.from_env() if not config.get("bar_store_dir") else None
+    with span(broker, cat="broker") as broker_span:
+        output_file = os.path.join(output_dir, f"{broker}.csv")
+        key = None
+        if cache is not None:
+            key = cache.key("clean", [os.path.join(input_dir, broker)], params=dict(config, broker=broker), code=CLEAN_CODE)
+        if key is not None and cache.restore(key, [output_file], stage="clean"):
+            broker_span.set(cache="hit")
+            print(f"Broker '{broker}' sin cambios: restaurado de la caché en {output_file}")
+        else:
+            output_file, failed = _process_broker(input_dir, output_dir, broker, config)
+            if failed:
+                broker_span.set(failed=len(failed))
+            elif key is not None:
+                cache.store(key, [output_file], stage="clean")
+    # El worker termina sin atexit: el snapshot de métricas se guarda por broker
+    registry().flush()
+    return output_file
+
+
+# Limpieza incremental (modo servicio): un CSV limpio por activo en <output_dir>/.parts/<broker>
+PARTS_DIR_NAME = ".parts"
+
+
+def update_broker(args):
+    """
+    Limpieza incremental de un broker para el modo servicio (daemon_service.py).
+    Mismos parámetros que process_broker: (input_dir, output_dir, broker, config).
+
+    Cada activo se limpia en su propio CSV (<output_dir>/.parts/<broker>/) y solo se vuelve a
+    limpiar si su archivo de entrada cambió (tamaño o fecha de modificación) o si cambió la
+    configuración; el CSV del broker se reconstruye concatenando esos archivos byte a byte, sin
+    volver a parsearlos. Con bar_store se limpia el broker completo (process_broker).
+
+    Returns:
+        dict: output_file, activos limpiados (cleaned, sus CSV en parts) y reutilizados (reused).
+    """
+    input_dir, output_dir, broker, config = args
+    output_file = os.path.join(output_dir, f"{broker}.csv")
+    if config.get("bar_store_dir"):
+        return {"output_file": process_broker(args), "cleaned": None, "reused": 0, "parts": {}}
+
+    broker_path = os.path.join(input_dir, broker)
+    parts_dir = os.path.join(output_dir, PARTS_DIR_NAME, broker)
+    manifest_file = os.path.join(parts_dir, "manifest.json")
+    os.makedirs(parts_dir, exist_ok=True)
+    manifest = {}
+    if os.path.exists(manifest_file):
+        with open(manifest_file, encoding="utf-8") as f:
+            manifest = json.load(f)
+    config_key = json.dumps(config, sort_keys=True, default=str)
+    if manifest.get("config") != config_key:
+        manifest = {"config": config_key, "files": {}}
+
+    csv_files = sorted(f for f in os.listdir(broker_path) if f.lower().endswith('.csv'))
+    metrics = registry()
+    rows_read = metrics.counter("process_rows_read_total", "Filas leídas por la limpieza", broker=broker)
+    rows_dropped = metrics.counter("process_rows_dropped_total", "Filas eliminadas por NaN/Inf en OHLC", broker=broker)
+    cleaned, parts = [], {}
+    with span(broker, cat="broker", incremental=True) as broker_span:
+        for file_name in csv_files:
+            stat = os.stat(os.path.join(broker_path, file_name))
+            signature = [stat.st_size, stat.st_mtime_ns]
+            part_file = os.path.join(parts_dir, file_name)
+            parts[file_name] = part_file
+            if manifest["files"].get(file_name) == signature and os.path.exists(part_file):
+                continue
+            with span(os.path.splitext(file_name)[0], cat="symbol"):
+                df = pd.read_csv(os.path.join(broker_path, file_name), low_memory=True)
+                rows_read.inc(len(df))
+                _clean_frame(df, broker, file_name, config, rows_dropped).to_csv(part_file, index=False)
+            manifest["files"][file_name] = signature
+            cleaned.append(file_name)
+
+        # Activos que ya no están en la carpeta de entrada
+        removed = set(manifest["files"]) - set(csv_files)
+        for file_name in removed:
+            manifest["files"].pop(file_name)
+            if os.path.exists(os.path.join(parts_dir, file_name)):
+                os.remove(os.path.join(parts_dir, file_name))
+
+        if cleaned or removed or not os.path.exists(output_file):
+            _concat_parts([parts[f] for f in csv_files], output_file)
+            registry().counter("csv_bytes_written_total", "Bytes de CSV escritos", stage="process").inc(
+                os.path.getsize(output_file))
+        with open(manifest_file, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        broker_span.set(cleaned=len(cleaned), reused=len(csv_files) - len(cleaned))
+    registry().flush()
+    return {
+        "output_file": output_file,
+        "cleaned": cleaned,
+        "reused": len(csv_files) - len(cleaned),
+        "parts": {f: parts[f] for f in cleaned},
+    }
+
+
+def _concat_parts(part_files, output_file):
+    """Une los CSV limpios de los activos (misma cabecera) en el CSV del broker."""
+    tmp_file = output_file + ".tmp"
+    header = None
+    with open(tmp_file, "wb") as out:
+        for part_file in part_files:
+            with open(part_file, "rb") as part:
+                part_header = part.readline()
+                if header is None:
+                    header = part_header
+                    out.write(header)
+                elif part_header != header:
+                    raise ValueError(f"Cabecera distinta en {part_file}")
+                shutil.copyfileobj(part, out)
+    os.replace(tmp_file, output_file)
+
+
+def _clean_frame(df, broker, file_name, config, rows_dropped=None):
+    """
+    Limpia el DataFrame de un archivo de activo: hora en UTC, filas con NaN/Inf en OHLC
+    eliminadas y columnas broker y asset añadidas.
+    """
+    # Asegurar que la columna 'time' tenga el formato adecuado:
+    # Si la fecha no contiene hora, se le añade " 00:00:00"
+    df['time'] = df['time'].apply(lambda x: x if " " in str(x) else f"{x} 00:00:00")
+
+    # Convertir la columna 'time' a datetime (pandas infiere el formato por defecto)
+    df['time'] = pd.to_datetime(df['time'], errors='coerce')
+
+    # Obtener offset para el broker (si existe) y ajustar a UTC
+    offset = config["timezone_offsets"].get(broker, 0)
+    if offset != 0:
+        tz_str = f'Etc/GMT{-offset}'
+        df['time'] = df['time'].dt.tz_localize(tz_str, ambiguous='NaT', nonexistent='NaT').dt.tz_convert('UTC')
+    else:
+        df['time'] = df['time'].dt.tz_localize('UTC')
+
+    # Limpiar datos: reemplazar Inf y -Inf, eliminar filas con NaN en columnas OHLC
+    df.replace([np.inf, -np.inf], np.nan, inplace=True)
+    rows_before = len(df)
+    df.dropna(subset=config["columns_to_clean"], inplace=True)
+    if rows_dropped is not None:
+        rows_dropped.inc(rows_before - len(df))
+
+    # Agregar información adicional
+    df['broker'] = broker
+    df['asset'] = os.path.splitext(file_name)[0]
+    return df
+
+
+def _process_broker(input_dir, output_dir, broker, config):
+    """
+    Limpia todos los archivos de un broker en <output_dir>/<broker>.csv. Un archivo que falla
+    se informa y se omite del CSV.
+
+    Returns:
+        tuple: (output_file, lista de archivos que no se pudieron limpiar)
+    """
     broker_path = os.path.join(input_dir, broker)
     output_file = os.path.join(output_dir, f"{broker}.csv")
     
@@ -17,51 +195,59 @@ def process_broker(args):
     if os.path.exists(output_file):
         os.remove(output_file)
     
+    # Almacén de barras mapeado en memoria (opcional, config["bar_store_dir"])
+    bar_store = None
+    if config.get("bar_store_dir"):
+        bar_store = BarStore(config["bar_store_dir"], encoded=config.get("bar_store_encoded", False))
+        symbol_digits = SymbolDigits(input_dir)
+    
     # Obtener la lista de archivos CSV en la carpeta del broker
     csv_files = [f for f in os.listdir(broker_path) if f.lower().endswith('.csv')]
     print(f"Procesando broker: {broker} con {len(csv_files)} archivos.")
     
-    for file_name in tqdm(csv_files, desc=f"Procesando {broker}", unit="archivo"):
+    metrics = registry()
+    rows_read = metrics.counter("process_rows_read_total", "Filas leídas por la limpieza", broker=broker)
+    rows_dropped = metrics.counter("process_rows_dropped_total", "Filas eliminadas por NaN/Inf en OHLC", broker=broker)
+    bytes_written = metrics.counter("csv_bytes_written_total", "Bytes de CSV escritos", stage="process")
+    files_failed = metrics.counter("process_files_failed_total", "Archivos que no se pudieron limpiar", broker=broker)
+    failed = []
+    
+    for file_name in tqdm(csv_files, desc=f"Procesando {broker}", unit="archivo", disable=not progress_bars_enabled()):
         file_path = os.path.join(broker_path, file_name)
         try:
-            # Leer CSV con bajo consumo de memoria
-            df = pd.read_csv(file_path, low_memory=True)
-            
-            # Asegurar que la columna 'time' tenga el formato adecuado:
-            # Si la fecha no contiene hora, se le añade " 00:00:00"
-            df['time'] = df['time'].apply(lambda x: x if " " in str(x) else f"{x} 00:00:00")
-            
-            # Convertir la columna 'time' a datetime, permitiendo inferir el formato
-            df['time'] = pd.to_datetime(df['time'], errors='coerce', infer_datetime_format=True)
+            with span(os.path.splitext(file_name)[0], cat="symbol"):
+                # Leer CSV con bajo consumo de memoria
+                df = pd.read_csv(file_path, low_memory=True)
+                rows_read.inc(len(df))
             
-            # Obtener offset para el broker (si existe) y ajustar a UTC
-            offset = config["timezone_offsets"].get(broker, 0)
-            if offset != 0:
-                tz_str = f'Etc/GMT{-offset}'
-                df['time'] = df['time'].dt.tz_localize(tz_str, ambiguous='NaT', nonexistent='NaT').dt.tz_convert('UTC')
-            else:
-                df['time'] = df['time'].dt.tz_localize('UTC')
+                df = _clean_frame(df, broker, file_name, config, rows_dropped)
+                asset_name = os.path.splitext(file_name)[0]
             
-            # Limpiar datos: reemplazar Inf y -Inf, eliminar filas con NaN en columnas OHLC
-            df.replace([np.inf, -np.inf], np.nan, inplace=True)
-            df.dropna(subset=config["columns_to_clean"], inplace=True)
+                # Guardar el DataFrame procesado de forma incremental
+                if not os.path.exists(output_file):
+                    size_before = 0
+                    df.to_csv(output_file, index=False)
+                else:
+                    size_before = os.path.getsize(output_file)
+                    df.to_csv(output_file, mode='a', header=False, index=False)
+                bytes_written.inc(os.path.getsize(output_file) - size_before)
             
-            # Agregar información adicional
-            df['broker'] = broker
-            asset_name = os.path.splitext(file_name)[0]
-            df['asset'] = asset_name
-            
-            # Guardar el DataFrame procesado de forma incremental
-            if not os.path.exists(output_file):
-                df.to_csv(output_file, index=False)
-            else:
-                df.to_csv(output_file, mode='a', header=False, index=False)
+                # Añadir las barras nuevas al almacén de registros de ancho fijo
+                if bar_store is not None:
+                    digits = None
+                    if bar_store.encoded:
+                        digits = symbol_digits.digits(broker, asset_name, df[PRICE_COLUMNS].to_numpy().ravel())
+                    bar_store.append_frame(broker, asset_name, df, digits=digits)
         
         except Exception as e:
             print(f"Error al procesar el archivo {file_path}: {e}")
+            files_failed.inc()
+            failed.append(file_name)
     
     print(f"Broker '{broker}' procesado. Archivo de salida: {output_file}")
-    return output_file
+    if failed:
+        print(f"Broker '{broker}': {len(failed)} archivos con error, la salida no se guarda en la caché.")
+    return output_file, failed
 
 class DataCleaner:
     """
@@ -72,6 +258,9 @@ class DataCleaner:
       - Convertir la columna 'time' al formato datetime64 y ajustar la hora a UTC.
       - Unificar los archivos CSV de cada broker (carpeta) en un único CSV y guardarlo en disco.
       - Optimización en el uso de memoria, procesando archivo por archivo.
+      - Opcionalmente (config["bar_store_dir"]), escribir cada serie broker/activo/timeframe
+        en el almacén de barras mapeado en memoria (bar_store.BarStore) para los backtests;
+        con config["bar_store_encoded"] los precios se guardan como enteros en puntos del símbolo.
       
     Se asume que:
       - La estructura de carpetas es: 
@@ -88,20 +277,11 @@ class DataCleaner:
     def __init__(self, input_dir, output_dir, config=None):
         self.input_dir = input_dir
         self.output_dir = output_dir
-        # Configuración por defecto
-        self.config = config if config is not None else {
-            "columns_to_clean": ['open', 'high', 'low', 'close'],
-            "timezone_offsets": {
-                "Dukascopy": 2,
-                "Darwinex": 2,
-                "Pepperstone": 2,
-                "Tickmill": 2,
-                "Oanda": 2
-            }
-        }
+        # Configuración por defecto: parámetros de la etapa "process" (Common/config.py)
+        self.config = config if config is not None else pipeline_config().stage("process")
         
         # Lista de brokers permitidos
-        self.allowed_brokers = {"Darwinex", "Pepperstone", "Tickmill", "Oanda", "Dukascopy"}
+        self.allowed_brokers = set(pipeline_config().brokers)
         
         # Crear directorio de salida si no existe
         os.makedirs(self.output_dir, exist_ok=True)
@@ -122,7 +302,7 @@ class DataCleaner:
         num_workers = max(multiprocessing.cpu_count() - 1, 1)
         print(f"Usando {num_workers} procesos en paralelo.")
         
-        with multiprocessing.Pool(processes=num_workers) as pool:
+        with span("process", cat="stage"), multiprocessing.Pool(processes=num_workers) as pool:
             results = pool.map(process_broker, args_list)
         
         return results
@@ -1,36 +1,103 @@
 import os
-import re
+import sys
+import queue
+import threading
+import multiprocessing
 import pandas as pd
-import psutil
 from tqdm import tqdm
 
+# Ejecución directa del módulo (ver el bloque __main__): test/src/ETLQ en sys.path para
+# importar Common. Importado como biblioteca, la ruta la fija el punto de entrada.
+if __name__ == "__main__":
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+
+from symbol_canonicalizer import SymbolCanonicalizer, IdMapper
+from export_sinks import CSVSink, PreviewSink, ValidationStatsSink
+
+# Componentes compartidos entre etapas (test/src/ETLQ/Common)
+from Common.memory_governor import MemoryGovernor
+from Common.tracing import span
+from Common.metrics import registry
+from Common.pipeline_status import progress_bars_enabled
+from Common.config import config, data_path
+
+class IdBlockAllocator:
+    """
+    Reserva bloques consecutivos de registro_id en el orden de lectura de los chunks.
+    Como _transform_chunk no elimina filas, el bloque se reserva antes de transformar y
+    los ids quedan densos y crecientes aunque los chunks se transformen en paralelo.
+    """
+
+    def __init__(self, start: int = 1):
+        self.next_id = start
+        self._lock = threading.Lock()
+
+    def allocate(self, n_rows: int) -> int:
+        """Reserva n_rows ids y devuelve el primero del bloque."""
+        with self._lock:
+            start = self.next_id
+            self.next_id += n_rows
+        return start
+
+
+class TransformWorkerState:
+    """Adaptador disponible en cada proceso worker de la transformación paralela."""
+    adapter = None
+
+
+def transform_worker_initializer(adapter):
+    """Inicializa el adaptador una sola vez por worker (evita enviarlo con cada chunk)."""
+    TransformWorkerState.adapter = adapter
+
+
+def transform_numbered_chunk(args):
+    """Transforma un chunk (sin mapear ids) y le asigna su bloque de registro_id."""
+    chunk, start_id = args
+    df = TransformWorkerState.adapter._observed_transform(chunk, map_ids=False, start_id=start_id)
+    df.insert(0, 'registro_id', range(start_id, start_id + len(df)))
+    # El worker termina sin atexit: el snapshot de métricas se guarda por chunk
+    registry().flush()
+    return df
+
+
 class CSVToPostgresAdapter:
     # Archivos permitidos y mapeos fijos
-    ALLOWED_FILES = {'Darwinex.csv', 'Pepperstone.csv', 'Tickmill.csv', 'Dukascopy.csv', 'Oanda.csv'}
+    ALLOWED_FILES = {f'{broker}.csv' for broker in config().brokers}
     DEFAULT_MERCADO_ID = 1
     TIMEFRAME_MAPPING = {
         'H1': '1h', 'M1': '1m', 'M5': '5m', 'M15': '15m', 'M30': '30m',
         'H4': '4h', 'D1': '1d', 'W1': '1w', 'MN': '1M'
     }
+    # Columnas de baja cardinalidad que se leen directamente como categóricas
+    CATEGORY_DTYPES = {'broker': 'category', 'asset': 'category', 'timeframe': 'category'}
     
     def __init__(self, folder_path: str, chunksize: int = 100000, spread_divisor: int = 10**5,
                  auto_adjust: bool = False, safety_factor: float = 0.5, sample_size: int = 1000,
-                 assets_df: pd.DataFrame = None, brokers_df: pd.DataFrame = None):
+                 assets_df: pd.DataFrame = None, brokers_df: pd.DataFrame = None, symbol_digits=None):
         # Validaciones básicas
         assert os.path.isdir(folder_path), "La ruta de la carpeta no es válida."
         assert 0 < safety_factor <= 1, "El safety_factor debe estar entre 0 y 1."
         
         self.folder_path = folder_path
         self.chunksize = chunksize
+        self.auto_adjust = auto_adjust
         self.spread_divisor = spread_divisor
         self.safety_factor = safety_factor
         self.sample_size = sample_size
         self.assets_df = assets_df
         self.brokers_df = brokers_df
+        # Decimales por broker/símbolo (price_encoding.SymbolDigits): el spread se convierte a
+        # precio con el punto de cada símbolo; sin metadatos se usa spread_divisor
+        self.symbol_digits = symbol_digits
         
-        # Precompilar regex para mejorar el rendimiento
-        self._regex_cfd = re.compile(r"_CFD.*$")
-        self._regex_suffix = re.compile(r"\.(?!IDX$|HK$)[A-Za-z0-9-]+$")
+        # Canonicalización de símbolos con caché compartida entre chunks y mapeos de ids
+        # construidos una sola vez
+        self.canonicalizer = SymbolCanonicalizer.shared()
+        self._asset_mapper = IdMapper(assets_df['simbolo'], assets_df['activo_id']) if assets_df is not None else None
+        self._broker_mapper = IdMapper(brokers_df['nombre'], brokers_df['broker_id']) if brokers_df is not None else None
+        # Presupuesto global de memoria compartido por todos los lectores por chunks.
+        # safety_factor es la fracción del margen libre del presupuesto que puede ocupar un chunk.
+        self.governor = MemoryGovernor.shared()
         
         if auto_adjust:
             csv_files = [os.path.join(self.folder_path, f) for f in os.listdir(self.folder_path)
@@ -43,10 +110,15 @@ class CSVToPostgresAdapter:
                 print("No se encontraron archivos permitidos para el ajuste automático.")
     
     def _estimate_chunk_size(self, file_path: str) -> int:
-        sample = pd.read_csv(file_path, nrows=self.sample_size)
-        memory_per_row = sample.memory_usage(deep=True).sum() / self.sample_size
-        target_memory = psutil.virtual_memory().available * self.safety_factor
-        return int(target_memory // memory_per_row)
+        sample = pd.read_csv(file_path, nrows=self.sample_size, dtype=self.CATEGORY_DTYPES)
+        return self.governor.estimate_rows(sample, chunk_fraction=self.safety_factor)
+
+    def _read_chunks(self, file_path: str):
+        # Lectura por chunks controlada por el MemoryGovernor: con auto_adjust el tamaño se
+        # recalcula entre chunks; sin él, chunksize es el tamaño máximo
+        max_rows = None if self.auto_adjust else self.chunksize
+        return self.governor.read_csv_chunks(file_path, max_rows=max_rows, chunk_fraction=self.safety_factor,
+                                             dtype=self.CATEGORY_DTYPES)
     
     def _transform_chunk(self, df: pd.DataFrame, map_ids: bool = True) -> pd.DataFrame:
         # Renombrar columnas de forma vectorizada
@@ -57,17 +129,18 @@ class CSVToPostgresAdapter:
         }
         df.rename(columns=rename_map, inplace=True)
         # Calcular precios Ask sin usar funciones lambda en cada elemento
+        divisor = self._spread_divisors(df)
         for col in ['open', 'high', 'low', 'close']:
             bid_col = f'bid_{col}'
             ask_col = f'ask_{col}'
-            df[ask_col] = df[bid_col] + (df['spread_promedio'] / self.spread_divisor)
+            df[ask_col] = df[bid_col] + (df['spread_promedio'] / divisor)
         # Convertir timeframe de forma vectorizada
-        df['timeframe'] = df['timeframe'].map(self.TIMEFRAME_MAPPING).fillna(df['timeframe'])
+        timeframe = df['timeframe'].astype(object)
+        df['timeframe'] = timeframe.map(self.TIMEFRAME_MAPPING).fillna(timeframe)
         # Asignar valores originales para luego mapear
-        df['broker_id'] = df['broker']
-        df['activo_id'] = df['asset'].astype(str)
-        # Eliminar sufijos en activos de forma vectorizada
-        df['activo_id'] = df['activo_id'].apply(lambda x: self._regex_suffix.sub("", self._regex_cfd.sub("", x)))
+        df['broker_id'] = df['broker'].astype('category')
+        # Eliminar sufijos en activos: se resuelve una vez por símbolo distinto (categorías)
+        df['activo_id'] = self.canonicalizer.canonicalize(df['asset'])
         # Asignar valores fijos y convertir timestamp
         df['mercado_id'] = self.DEFAULT_MERCADO_ID
         df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce')
@@ -81,12 +154,36 @@ class CSVToPostgresAdapter:
         df = df[cols]
         # Mapear IDs si corresponde
         if map_ids:
-            if self.assets_df is not None:
-                asset_map = dict(zip(self.assets_df['simbolo'], self.assets_df['activo_id']))
-                df['activo_id'] = df['activo_id'].map(asset_map)
-            if self.brokers_df is not None:
-                broker_map = dict(zip(self.brokers_df['nombre'], self.brokers_df['broker_id']))
-                df['broker_id'] = df['broker_id'].map(broker_map)
+            df = self._map_ids(df)
+        return df
+
+    def _observed_transform(self, chunk: pd.DataFrame, map_ids: bool = True, **span_args) -> pd.DataFrame:
+        # _transform_chunk con span (modo detail) y métricas de chunks, filas y latencia
+        metrics = registry()
+        latency = metrics.histogram("process_chunk_transform_seconds", "Latencia de _transform_chunk")
+        with span("chunk", cat="chunk", detail=True, rows=len(chunk), **span_args), latency.time():
+            df = self._transform_chunk(chunk, map_ids)
+        metrics.counter("process_chunks_transformed_total", "Chunks transformados").inc()
+        metrics.counter("process_rows_transformed_total", "Filas transformadas").inc(len(df))
+        return df
+
+    def _spread_divisors(self, df: pd.DataFrame):
+        # 10**digits de cada fila según el símbolo; spread_divisor si no hay metadatos
+        if self.symbol_digits is None:
+            return self.spread_divisor
+        divisor = pd.Series(float(self.spread_divisor), index=df.index)
+        for (broker, asset), index in df.groupby(['broker', 'asset'], observed=True).groups.items():
+            digits = self.symbol_digits.get(broker, asset)
+            if digits is not None:
+                divisor.loc[index] = float(10**digits)
+        return divisor
+
+    def _map_ids(self, df: pd.DataFrame) -> pd.DataFrame:
+        # Reemplaza símbolo y broker por sus ids usando los mapeos precalculados
+        if self._asset_mapper is not None:
+            df['activo_id'] = self._asset_mapper.map(df['activo_id'])
+        if self._broker_mapper is not None:
+            df['broker_id'] = self._broker_mapper.map(df['broker_id'])
         return df
 
     def _iter_files(self):
@@ -99,57 +196,158 @@ class CSVToPostgresAdapter:
         # Generador que procesa cada archivo en chunks
         for file in self._iter_files():
             print(f"Procesando: {os.path.basename(file)}")
-            for chunk in tqdm(pd.read_csv(file, chunksize=self.chunksize), desc=f"Chunks {os.path.basename(file)}"):
-                yield self._transform_chunk(chunk.copy(), map_ids)
+            yield from self.transform_file(file, map_ids)
+
+    def transform_file(self, file: str, map_ids: bool = True):
+        # Chunks transformados de un único archivo (un broker), p. ej. para cargar cada broker
+        # en cuanto termina su limpieza. El span incluye el tiempo del consumidor entre chunks
+        with span(os.path.basename(file), cat="broker"):
+            for chunk in tqdm(self._read_chunks(file), desc=f"Chunks {os.path.basename(file)}",
+                              disable=not progress_bars_enabled()):
+                yield self._observed_transform(chunk.copy(), map_ids)
     
     def preview(self, n: int = 5, map_ids: bool = True) -> pd.DataFrame:
         # Vista previa del primer chunk del primer archivo
         files = list(self._iter_files())
         if files:
-            chunk = next(pd.read_csv(files[0], chunksize=self.chunksize))
+            chunk = next(self._read_chunks(files[0]))
             return self._transform_chunk(chunk.copy(), map_ids).head(n)
         return pd.DataFrame()
     
-    def export_dataframe(self, output_folder: str, output_filename: str, map_ids: bool = True):
+    def export_dataframe(self, output_folder: str, output_filename: str, map_ids: bool = True, workers: int = 1,
+                         index_block_rows: int = None):
         # Exporta el dataframe unificado con columna incremental 'registro_id'
-        os.makedirs(output_folder, exist_ok=True)
-        output_path = os.path.join(output_folder, output_filename)
-        registro_id = 1
-        first = True
-        for df in self.transform_generator(map_ids):
-            n_rows = len(df)
-            df.insert(0, 'registro_id', range(registro_id, registro_id + n_rows))
-            registro_id += n_rows
-            mode = 'w' if first else 'a'
-            header = first
-            df.to_csv(output_path, index=False, mode=mode, header=header)
-            first = False
-        print(f"Exportación completada en: {output_path}")
+        # (con index_block_rows se genera además el índice de offsets por registro_id)
+        sink = CSVSink(output_folder, output_filename, map_ids=map_ids, index_block_rows=index_block_rows)
+        self.export_multi([sink], workers=workers)
+
+    def numbered_generator(self):
+        # Generador secuencial de chunks transformados (sin mapear) con 'registro_id'
+        allocator = IdBlockAllocator()
+        for df in self.transform_generator(map_ids=False):
+            start_id = allocator.allocate(len(df))
+            df.insert(0, 'registro_id', range(start_id, start_id + len(df)))
+            yield df
+
+    def parallel_numbered_generator(self, workers: int = None, max_pending: int = None):
+        """
+        Versión en pipeline de numbered_generator: un hilo lector lee los chunks y reserva
+        su bloque de registro_id, un pool de procesos ejecuta _transform_chunk y el
+        consumidor (escritor) recibe los resultados en el orden original.
+
+        La cola entre lector y escritor está acotada a max_pending chunks en vuelo, por lo
+        que la memoria no crece aunque la escritura sea más lenta que la lectura.
+
+        Args:
+            workers (int): Procesos de transformación. Por defecto, núcleos - 1.
+            max_pending (int): Chunks en vuelo como máximo. Por defecto, 2 * workers.
+        """
+        workers = workers or max(multiprocessing.cpu_count() - 1, 1)
+        max_pending = max_pending or 2 * workers
+        pending = queue.Queue(maxsize=max_pending)
+        stop = threading.Event()
+        done = object()
+        allocator = IdBlockAllocator()
+
+        with multiprocessing.Pool(processes=workers, initializer=transform_worker_initializer,
+                                  initargs=(self,)) as pool:
+            def reader():
+                try:
+                    for file in self._iter_files():
+                        print(f"Procesando: {os.path.basename(file)}")
+                        with span(os.path.basename(file), cat="broker"):
+                            for chunk in tqdm(self._read_chunks(file), desc=f"Chunks {os.path.basename(file)}",
+                                              disable=not progress_bars_enabled()):
+                                if stop.is_set():
+                                    return
+                                start_id = allocator.allocate(len(chunk))
+                                pending.put(pool.apply_async(transform_numbered_chunk, ((chunk, start_id),)))
+                except Exception as e:
+                    pending.put(e)
+                finally:
+                    pending.put(done)
+
+            thread = threading.Thread(target=reader, daemon=True)
+            thread.start()
+            try:
+                while True:
+                    item = pending.get()
+                    if item is done:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    yield item.get()
+            finally:
+                # Si el consumidor se detiene antes de tiempo, liberar al lector
+                stop.set()
+                while thread.is_alive():
+                    try:
+                        pending.get(timeout=0.1)
+                    except queue.Empty:
+                        pass
+                thread.join()
+
+    def export_multi(self, sinks: list, workers: int = 1, max_pending: int = None):
+        """
+        Exporta a varios destinos (ExportSink) con una única lectura y transformación.
+
+        Cada chunk se transforma una vez sin mapear ids; la vista con ids mapeados se
+        deriva solo si algún sink la pide. Todas las vistas comparten el mismo 'registro_id'.
+
+        Args:
+            sinks (list): Destinos de la exportación (CSVSink, LoaderSink, PreviewSink,
+                ValidationStatsSink u otro ExportSink).
+            workers (int): Con workers > 1 la transformación se ejecuta en paralelo
+                (parallel_numbered_generator); la escritura sigue el orden original.
+            max_pending (int): Chunks en vuelo como máximo en modo paralelo.
+        """
+        need_mapped = any(sink.map_ids for sink in sinks)
+        if workers > 1:
+            chunks = self.parallel_numbered_generator(workers, max_pending)
+        else:
+            chunks = self.numbered_generator()
+        with span("transform", cat="stage", workers=workers):
+            for sink in sinks:
+                sink.open()
+            success = False
+            try:
+                for df in chunks:
+                    # Copia superficial: _map_ids reemplaza columnas sin tocar la vista original
+                    mapped = self._map_ids(df.copy(deep=False)) if need_mapped else None
+                    for sink in sinks:
+                        sink.write(mapped if sink.map_ids else df)
+                success = True
+            finally:
+                for sink in sinks:
+                    sink.close(success)
 
 # =====================================================
 # Ejemplo de uso
 # =====================================================
 if __name__ == "__main__":
     # Cargar dataframes de Assets y Brokers
-    assets_df = pd.read_csv(r"C:\Users\spinz\OneDrive\Documentos\Portafolio oficial\HERMESDB\HERMESDB\test\data\backup\Table_Assets.csv")  # columnas: ['activo_id', 'simbolo']
-    brokers_df = pd.read_csv(r"C:\Users\spinz\OneDrive\Documentos\Portafolio oficial\HERMESDB\HERMESDB\test\data\backup\Table_Broker.csv")   # columnas: ['broker_id', 'nombre']
-    folder = r"C:\Users\spinz\OneDrive\Documentos\Portafolio oficial\HERMESDB\HERMESDB\test\data\processed"
+    assets_df = pd.read_csv(data_path("table_assets"))  # columnas: ['activo_id', 'simbolo']
+    brokers_df = pd.read_csv(data_path("table_broker"))   # columnas: ['broker_id', 'nombre']
+    folder = data_path("processed")
     
     adapter = CSVToPostgresAdapter(
         folder_path=folder,
         chunksize=100000,
         spread_divisor=10**5,
         auto_adjust=True,
-        safety_factor=0.9,
+        safety_factor=0.25,
         sample_size=100000,
         assets_df=assets_df,
         brokers_df=brokers_df
     )
     
-    # Vista previa
-    print(adapter.preview(n=5))
-    
-    # Exportar datos mapeados y pre-mapeo (se controla con el parámetro map_ids)
-    output_folder = r"C:\Users\spinz\OneDrive\Documentos\Portafolio oficial\HERMESDB\HERMESDB\test\data\backup"
-    adapter.export_dataframe(output_folder, 'Table_Datos_historicos.csv', map_ids=True)
-    adapter.export_dataframe(output_folder, 'datos_pre_mapping.csv', map_ids=False)
+    # Exportar datos mapeados y pre-mapeo en una sola pasada (una lectura por archivo)
+    output_folder = data_path("backup")
+    preview = PreviewSink(n=5)
+    adapter.export_multi([
+        preview,
+        CSVSink(output_folder, 'Table_Datos_historicos.csv', map_ids=True, index_block_rows=10000),
+        CSVSink(output_folder, 'datos_pre_mapping.csv', map_ids=False, index_block_rows=10000),
+        ValidationStatsSink(os.path.join(output_folder, 'export_stats.csv'), map_ids=True),
+    ], workers=max(multiprocessing.cpu_count() - 1, 1))
+    print(preview.frame)
@@ -1,16 +1,48 @@
+import os
+import sys
 import pandas as pd
-import re
 from typing import Dict
 
+# Ejecución directa del módulo (ver el bloque __main__): test/src/ETLQ en sys.path para
+# importar Common. Importado como biblioteca, la ruta la fija el punto de entrada.
+if __name__ == "__main__":
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+
+import symbol_canonicalizer
+from symbol_canonicalizer import SymbolCanonicalizer
+
+# Componentes compartidos entre etapas (test/src/ETLQ/Common)
+from Common.stage_cache import StageCache
+from Common.config import data_path
+
 class ETLProcessor:
     """
     Clase ETLProcessor encargada de realizar procesos de extracción, transformación y carga (ETL)
     para diferentes tablas (sectores, activos). Cada método se encarga de una única responsabilidad,
     siguiendo el principio de responsabilidad única del SOLID.
+
+    process_table_sector y process_actives usan la caché de etapas (Common/stage_cache.py,
+    HERMESDB_STAGE_CACHE): si sus CSV de entrada y el código no cambiaron, se restaura el CSV
+    de salida y se devuelve leído de él en lugar de recalcularlo.
     """
 
-    def __init__(self) -> None:
-        pass
+    def __init__(self, cache: StageCache = None) -> None:
+        self.cache = cache if cache is not None else StageCache.from_env()
+
+    def _cached(self, stage: str, func, inputs: list, output_path: str, *args) -> pd.DataFrame:
+        """
+        Ejecuta func(*args), que escribe output_path, o restaura output_path de la caché si
+        las entradas, el código de este módulo y el de la canonicalización no cambiaron.
+        Con la caché activa se devuelve output_path releído, tanto si se restaura como si se
+        calcula, para que el resultado sea el mismo en ambos casos.
+        """
+        if self.cache is None:
+            return func(*args)
+        key = self.cache.key(stage, inputs, code=[__file__, symbol_canonicalizer.__file__])
+        if not self.cache.restore(key, [output_path], stage=stage):
+            func(*args)
+            self.cache.store(key, [output_path], stage=stage)
+        return pd.read_csv(output_path)
 
     @staticmethod
     def _read_and_normalize_csv(path: str, usecols: list, normalize_cols: Dict[str, str] = None) -> pd.DataFrame:
@@ -35,6 +67,11 @@ class ETLProcessor:
         return df
 
     def process_table_sector(self, symbol_info_path: str, market_path: str, output_path: str) -> pd.DataFrame:
+        """Tabla de sectores (ver _process_table_sector), restaurada de la caché si no hay cambios."""
+        return self._cached("table_sector", self._process_table_sector, [symbol_info_path, market_path],
+                            output_path, symbol_info_path, market_path, output_path)
+
+    def _process_table_sector(self, symbol_info_path: str, market_path: str, output_path: str) -> pd.DataFrame:
         """
         Procesa y une la información de sectores con el mapeo de mercados para generar una tabla de sectores.
 
@@ -99,8 +136,8 @@ class ETLProcessor:
         df.drop(columns=[col for col in columns_to_drop if col in df.columns], inplace=True, errors='ignore')
 
         if "Symbol" in df.columns:
-            df["Symbol"] = df["Symbol"].apply(lambda x: re.sub(r"_CFD.*$", "", x))
-            df["Symbol"] = df["Symbol"].str.replace(r"\.(?!IDX$|HK$)[A-Za-z0-9-]+$", "", regex=True)
+            # Misma canonicalización (y caché) que CSVToPostgresAdapter
+            df["Symbol"] = SymbolCanonicalizer.shared().canonicalize(df["Symbol"]).astype(object)
         return df
 
     def replace_market_in_actives(self, df_actives: pd.DataFrame, market_path: str) -> pd.DataFrame:
@@ -153,6 +190,11 @@ class ETLProcessor:
         return df
 
     def process_actives(self, actives_input_path: str, market_path: str, sector_mapping_path: str, assets_output_path: str) -> pd.DataFrame:
+        """Tabla de activos (ver _process_actives), restaurada de la caché si no hay cambios."""
+        return self._cached("actives", self._process_actives, [actives_input_path, market_path, sector_mapping_path],
+                            assets_output_path, actives_input_path, market_path, sector_mapping_path, assets_output_path)
+
+    def _process_actives(self, actives_input_path: str, market_path: str, sector_mapping_path: str, assets_output_path: str) -> pd.DataFrame:
         """
         Ejecuta el proceso completo de transformación y exportación de la tabla de activos.
 
@@ -218,12 +260,12 @@ class ETLProcessor:
 if __name__ == "__main__":
     etl = ETLProcessor()
 
-    # Rutas de ejemplo (ajustar según el entorno)
-    symbol_info_path   = r"C:\Users\spinz\OneDrive\Documentos\Portafolio oficial\HERMESDB\HERMESDB\test\data\processed\symbol_info_procesado.csv"
-    market_path        = r"C:\Users\spinz\OneDrive\Documentos\Portafolio oficial\HERMESDB\HERMESDB\test\data\backup\Table_market.csv"
-    sector_output_path = r"C:\Users\spinz\OneDrive\Documentos\Portafolio oficial\HERMESDB\HERMESDB\test\data\backup\Table_Sector.csv"
+    # Rutas del registro de configuración (Common/config.py)
+    symbol_info_path   = data_path("symbol_info_processed")
+    market_path        = data_path("table_market")
+    sector_output_path = data_path("table_sector")
     actives_input_path = symbol_info_path  # Se puede ajustar si es diferente
-    assets_output_path = r"C:\Users\spinz\OneDrive\Documentos\Portafolio oficial\HERMESDB\HERMESDB\test\data\backup\Table_Assets.csv"
+    assets_output_path = data_path("table_assets")
 
     # Procesar la tabla de sectores
     df_sector = etl.process_table_sector(symbol_info_path, market_path, sector_output_path)
@@ -1,13 +1,126 @@
 import pandas as pd
 import os
+import sys
 from tqdm import tqdm  # Asegúrate de tener instalada la librería: pip install tqdm
 
+# Ejecución directa del módulo (ver el bloque __main__): test/src/ETLQ en sys.path para
+# importar Common. Importado como biblioteca, la ruta la fija el punto de entrada.
+if __name__ == "__main__":
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+
+# Componentes compartidos entre etapas (test/src/ETLQ/Common)
+from Common.memory_governor import MemoryGovernor
+from Common.config import config, data_path
+
 class DataFrameValidator:
     REQUIRED_COLUMNS = [
         "time", "open", "high", "low", "close", "tick_volume", "spread", "real_volume", "timeframe", "broker", "asset"
     ]
-    TIMEFRAME_VALUES = {"H1", "H4", "D1", "W1", "MN1"}
-    BROKER_VALUES = {"Darwinex", "Dukascopy", "Oanda", "Tickmill", "Pepperstone"}
+    TIMEFRAME_VALUES = set(config().stage("validate")["timeframes"])
+    BROKER_VALUES = set(config().brokers)
+    
+    @staticmethod
+    def validate_file(file_path: str, broker_name: str) -> dict:
+        """
+        Valida un CSV limpio de un broker por chunks y devuelve el resultado de cada prueba
+        (misma fila que el reporte detallado de validate_csv_files_and_report).
+        """
+        # Inicializar las variables de validación
+        columns_valid = True
+        broker_valid = True
+        time_valid = True
+        open_valid = True
+        high_valid = True
+        low_valid = True
+        close_valid = True
+        tick_volume_valid = True
+        spread_valid = True
+        real_volume_valid = True
+        timeframe_valid = True
+        asset_valid = True
+        
+        try:
+            # El tamaño de cada chunk lo ajusta el MemoryGovernor según el presupuesto de memoria
+            for chunk in MemoryGovernor.shared().read_csv_chunks(file_path):
+                # Validar estructura de columnas
+                if list(chunk.columns) != DataFrameValidator.REQUIRED_COLUMNS:
+                    columns_valid = False
+                
+                # Validar que la columna "broker" contenga el nombre esperado
+                if not chunk["broker"].eq(broker_name).all():
+                    broker_valid = False
+                
+                # Validar la columna "time" convirtiéndola a datetime
+                time_series = pd.to_datetime(chunk["time"], errors='coerce')
+                if time_series.isna().any():
+                    time_valid = False
+                
+                # Validar columnas numéricas
+                for col, flag in zip(
+                    ["open", "high", "low", "close", "tick_volume", "spread", "real_volume"],
+                    ["open_valid", "high_valid", "low_valid", "close_valid", "tick_volume_valid", "spread_valid", "real_volume_valid"]
+                ):
+                    try:
+                        chunk[col].astype(float)
+                    except Exception:
+                        if col == "open":
+                            open_valid = False
+                        elif col == "high":
+                            high_valid = False
+                        elif col == "low":
+                            low_valid = False
+                        elif col == "close":
+                            close_valid = False
+                        elif col == "tick_volume":
+                            tick_volume_valid = False
+                        elif col == "spread":
+                            spread_valid = False
+                        elif col == "real_volume":
+                            real_volume_valid = False
+                
+                # Validar la columna "timeframe"
+                if not chunk["timeframe"].isin(DataFrameValidator.TIMEFRAME_VALUES).all():
+                    timeframe_valid = False
+                
+                # Validar la columna "asset" (que sean strings)
+                if not chunk["asset"].apply(lambda x: isinstance(x, str)).all():
+                    asset_valid = False
+        except Exception as e:
+            # Si ocurre cualquier error durante la lectura, se marca todo como inválido
+            columns_valid = False
+            broker_valid = False
+            time_valid = False
+            open_valid = False
+            high_valid = False
+            low_valid = False
+            close_valid = False
+            tick_volume_valid = False
+            spread_valid = False
+            real_volume_valid = False
+            timeframe_valid = False
+            asset_valid = False
+        
+        return {
+            "file": os.path.basename(file_path),
+            "broker": broker_name,
+            "columns_valid": columns_valid,
+            "broker_valid": broker_valid,
+            "time_valid": time_valid,
+            "open_valid": open_valid,
+            "high_valid": high_valid,
+            "low_valid": low_valid,
+            "close_valid": close_valid,
+            "tick_volume_valid": tick_volume_valid,
+            "spread_valid": spread_valid,
+            "real_volume_valid": real_volume_valid,
+            "timeframe_valid": timeframe_valid,
+            "asset_valid": asset_valid
+        }
+    
+    @staticmethod
+    def is_valid(detailed: dict) -> bool:
+        """True si el archivo pasó todas las pruebas de validate_file."""
+        return all(value for key, value in detailed.items() if key.endswith("_valid"))
     
     @staticmethod
     def validate_csv_files_and_report(input_directory: str, output_directory: str):
@@ -25,108 +138,13 @@ class DataFrameValidator:
             if broker_name not in DataFrameValidator.BROKER_VALUES:
                 continue
             
-            # Inicializar las variables de validación
-            columns_valid = True
-            broker_valid = True
-            time_valid = True
-            open_valid = True
-            high_valid = True
-            low_valid = True
-            close_valid = True
-            tick_volume_valid = True
-            spread_valid = True
-            real_volume_valid = True
-            timeframe_valid = True
-            asset_valid = True
-            
-            chunk_size = 100000  # Ajustable según memoria disponible
-            try:
-                for chunk in pd.read_csv(file_path, chunksize=chunk_size):
-                    # Validar estructura de columnas
-                    if list(chunk.columns) != DataFrameValidator.REQUIRED_COLUMNS:
-                        columns_valid = False
-                    
-                    # Validar que la columna "broker" contenga el nombre esperado
-                    if not chunk["broker"].eq(broker_name).all():
-                        broker_valid = False
-                    
-                    # Validar la columna "time" convirtiéndola a datetime
-                    time_series = pd.to_datetime(chunk["time"], errors='coerce')
-                    if time_series.isna().any():
-                        time_valid = False
-                    
-                    # Validar columnas numéricas
-                    for col, flag in zip(
-                        ["open", "high", "low", "close", "tick_volume", "spread", "real_volume"],
-                        ["open_valid", "high_valid", "low_valid", "close_valid", "tick_volume_valid", "spread_valid", "real_volume_valid"]
-                    ):
-                        try:
-                            chunk[col].astype(float)
-                        except Exception:
-                            if col == "open":
-                                open_valid = False
-                            elif col == "high":
-                                high_valid = False
-                            elif col == "low":
-                                low_valid = False
-                            elif col == "close":
-                                close_valid = False
-                            elif col == "tick_volume":
-                                tick_volume_valid = False
-                            elif col == "spread":
-                                spread_valid = False
-                            elif col == "real_volume":
-                                real_volume_valid = False
-                    
-                    # Validar la columna "timeframe"
-                    if not chunk["timeframe"].isin(DataFrameValidator.TIMEFRAME_VALUES).all():
-                        timeframe_valid = False
-                    
-                    # Validar la columna "asset" (que sean strings)
-                    if not chunk["asset"].apply(lambda x: isinstance(x, str)).all():
-                        asset_valid = False
-            except Exception as e:
-                # Si ocurre cualquier error durante la lectura, se marca todo como inválido
-                columns_valid = False
-                broker_valid = False
-                time_valid = False
-                open_valid = False
-                high_valid = False
-                low_valid = False
-                close_valid = False
-                tick_volume_valid = False
-                spread_valid = False
-                real_volume_valid = False
-                timeframe_valid = False
-                asset_valid = False
-            
-            overall_valid = (columns_valid and broker_valid and time_valid and open_valid and high_valid 
-                             and low_valid and close_valid and tick_volume_valid and spread_valid 
-                             and real_volume_valid and timeframe_valid and asset_valid)
-            
-            # Acumular resultados generales
+            # Acumular resultados detallados por cada prueba y el resultado general
+            detailed = DataFrameValidator.validate_file(file_path, broker_name)
+            detailed_results.append(detailed)
             overall_results.append({
                 "file": file,
                 "broker": broker_name,
-                "overall_valid": overall_valid
-            })
-            
-            # Acumular resultados detallados por cada prueba
-            detailed_results.append({
-                "file": file,
-                "broker": broker_name,
-                "columns_valid": columns_valid,
-                "broker_valid": broker_valid,
-                "time_valid": time_valid,
-                "open_valid": open_valid,
-                "high_valid": high_valid,
-                "low_valid": low_valid,
-                "close_valid": close_valid,
-                "tick_volume_valid": tick_volume_valid,
-                "spread_valid": spread_valid,
-                "real_volume_valid": real_volume_valid,
-                "timeframe_valid": timeframe_valid,
-                "asset_valid": asset_valid
+                "overall_valid": DataFrameValidator.is_valid(detailed)
             })
         
         # Convertir resultados a DataFrame y exportar CSV
@@ -143,9 +161,10 @@ class DataFrameValidator:
         
         return overall_csv_path, detailed_csv_path
 
-# Ejemplo de uso:
-input_dir = r"C:\Users\spinz\OneDrive\Documentos\Portafolio oficial\HERMESDB\HERMESDB\test\data\processed"
-output_dir = r"C:\Users\spinz\OneDrive\Documentos\Portafolio oficial\HERMESDB\HERMESDB\test\data\logs"  # Aquí indicas la carpeta donde se guardarán los CSV
+# Ejemplo de uso (solo al ejecutar el archivo, para poder importar el validador):
+if __name__ == "__main__":
+    input_dir = data_path("processed")
+    output_dir = data_path("logs")  # Aquí indicas la carpeta donde se guardarán los CSV
 
-report_paths = DataFrameValidator.validate_csv_files_and_report(input_dir, output_dir)
-print("Reportes generados:", report_paths)
+    report_paths = DataFrameValidator.validate_csv_files_and_report(input_dir, output_dir)
+    print("Reportes generados:", report_paths)
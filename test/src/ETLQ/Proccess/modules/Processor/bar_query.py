@@ -0,0 +1,293 @@
+import io
+import os
+import sys
+import json
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Ejecución directa del módulo (ver el bloque __main__): test/src/ETLQ en sys.path para
+# importar Common. Importado como biblioteca, la ruta la fija el punto de entrada.
+if __name__ == "__main__":
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+
+from symbol_canonicalizer import SymbolCanonicalizer
+from TL_table_Date_historic import CSVToPostgresAdapter
+
+CATALOG_SUFFIX = ".blocks.json"
+# Timeframes en formato Metatrader ('H1') a partir del formato de la base de datos ('1h')
+TIMEFRAME_CODES = {db: mt5 for mt5, db in CSVToPostgresAdapter.TIMEFRAME_MAPPING.items()}
+
+
+def normalize_timeframe(timeframe: str) -> str:
+    """Acepta 'H1' o '1h' y devuelve el código de Metatrader usado en los CSV procesados."""
+    return TIMEFRAME_CODES.get(timeframe, timeframe)
+
+
+def to_utc_ns(value) -> int:
+    """Convierte una fecha (str, datetime, Timestamp) a nanosegundos UTC desde epoch."""
+    timestamp = pd.Timestamp(value)
+    timestamp = timestamp.tz_localize('UTC') if timestamp.tzinfo is None else timestamp.tz_convert('UTC')
+    return timestamp.value
+
+
+class BlockCatalog:
+    """
+    Estadísticas por bloque de un CSV procesado por broker (salida de DataCleaner).
+
+    Los CSV procesados se escriben activo a activo, así que las filas de un mismo
+    (asset, timeframe) son contiguas. El catálogo parte el archivo en bloques homogéneos de
+    hasta block_rows filas y guarda de cada uno asset, timeframe, tiempo mínimo y máximo,
+    offset y longitud en bytes. Se guarda junto al CSV (<archivo>.blocks.json) y se
+    reconstruye si cambia el tamaño o la fecha de modificación del CSV.
+    """
+    STAT_COLUMNS = ['time', 'timeframe', 'asset']
+
+    def __init__(self, csv_path: str, columns: list, blocks: pd.DataFrame):
+        self.csv_path = csv_path
+        self.columns = list(columns)
+        self.blocks = blocks
+        stat = os.stat(csv_path)
+        self.size, self.mtime_ns = stat.st_size, stat.st_mtime_ns
+
+    def is_current(self) -> bool:
+        """Indica si el CSV no cambió desde que se construyó el catálogo."""
+        stat = os.stat(self.csv_path)
+        return stat.st_size == self.size and stat.st_mtime_ns == self.mtime_ns
+
+    @staticmethod
+    def catalog_path(csv_path: str) -> str:
+        return csv_path + CATALOG_SUFFIX
+
+    @classmethod
+    def build(cls, csv_path: str, block_rows: int = 50000, buffer_bytes: int = 64 * 1024**2) -> "BlockCatalog":
+        """
+        Construye el catálogo con una pasada en binario: cada buffer se corta en el último
+        salto de línea, los offsets de las filas salen de las posiciones de '\\n' y solo se
+        parsean las columnas time, timeframe y asset.
+        """
+        frames = []
+        with open(csv_path, 'rb') as f:
+            header = f.readline()
+            columns = header.decode('utf-8').rstrip('\r\n').split(',')
+            base = f.tell()
+            pending = b''
+            while True:
+                data = f.read(buffer_bytes)
+                buffer = pending + data
+                if not data:
+                    if buffer.strip():
+                        buffer += b'\n'
+                    else:
+                        break
+                cut = buffer.rfind(b'\n') + 1
+                lines, pending = buffer[:cut], buffer[cut:]
+                if lines:
+                    frames.append(cls._buffer_blocks(lines, base, columns, block_rows))
+                    base += len(lines)
+                if not data:
+                    break
+        blocks = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
+            columns=['asset', 'timeframe', 'min_time', 'max_time', 'offset', 'length', 'rows'])
+        return cls(csv_path, columns, blocks)
+
+    @classmethod
+    def _buffer_blocks(cls, lines: bytes, base: int, columns: list, block_rows: int) -> pd.DataFrame:
+        ends = np.flatnonzero(np.frombuffer(lines, dtype=np.uint8) == 10) + 1
+        starts = np.concatenate(([0], ends[:-1]))
+        df = pd.read_csv(io.BytesIO(lines), header=None, names=columns, usecols=cls.STAT_COLUMNS,
+                         dtype={'timeframe': str, 'asset': str}, skip_blank_lines=False)
+        if len(df) != len(ends):
+            raise ValueError(f"No se pudieron alinear filas y offsets en {len(ends)} líneas.")
+        # Un bloque nuevo empieza al cambiar (asset, timeframe) o cada block_rows filas
+        asset, timeframe = df['asset'], df['timeframe']
+        change = (asset != asset.shift()) | (timeframe != timeframe.shift())
+        run = change.cumsum()
+        position = run.groupby(run).cumcount()
+        block = (change | (position % block_rows == 0)).cumsum()
+        time = pd.to_datetime(df['time'], utc=True, errors='coerce').dt.tz_localize(None).astype('datetime64[ns]')
+        grouped = pd.DataFrame({
+            'asset': asset, 'timeframe': timeframe, 'time': time,
+            'start': starts + base, 'end': ends + base, 'block': block,
+        }).groupby('block', sort=False)
+        blocks = grouped.agg(asset=('asset', 'first'), timeframe=('timeframe', 'first'),
+                             min_time=('time', 'min'), max_time=('time', 'max'),
+                             offset=('start', 'first'), end=('end', 'last'), rows=('start', 'size'))
+        blocks['length'] = blocks.pop('end') - blocks['offset']
+        for column in ('min_time', 'max_time'):
+            blocks[column] = blocks[column].astype('datetime64[ns]').to_numpy().view('i8')
+        return blocks.reset_index(drop=True)
+
+    def save(self):
+        with open(self.catalog_path(self.csv_path), 'w', encoding='utf-8') as f:
+            json.dump({
+                'size': self.size, 'mtime_ns': self.mtime_ns, 'columns': self.columns,
+                'blocks': self.blocks.to_dict(orient='list'),
+            }, f)
+
+    @classmethod
+    def load(cls, csv_path: str):
+        """Carga el catálogo guardado; None si no existe o el CSV cambió."""
+        path = cls.catalog_path(csv_path)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        stat = os.stat(csv_path)
+        if data['size'] != stat.st_size or data['mtime_ns'] != stat.st_mtime_ns:
+            return None
+        return cls(csv_path, data['columns'], pd.DataFrame(data['blocks']))
+
+    @classmethod
+    def open(cls, csv_path: str, block_rows: int = 50000) -> "BlockCatalog":
+        catalog = cls.load(csv_path)
+        if catalog is None:
+            catalog = cls.build(csv_path, block_rows=block_rows)
+            catalog.save()
+        return catalog
+
+
+class BlockCache:
+    """Caché LRU de bloques ya parseados, limitada por memoria (bytes de los DataFrames)."""
+
+    def __init__(self, max_mb: float = 256):
+        self.max_bytes = int(max_mb * 1024**2)
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+
+    def get(self, key):
+        item = self._items.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return item[0]
+
+    def put(self, key, df: pd.DataFrame):
+        size = int(df.memory_usage(deep=True).sum())
+        if size > self.max_bytes:
+            return
+        if key in self._items:
+            self.current_bytes -= self._items.pop(key)[1]
+        self._items[key] = (df, size)
+        self.current_bytes += size
+        while self.current_bytes > self.max_bytes:
+            _, (_, evicted) = self._items.popitem(last=False)
+            self.current_bytes -= evicted
+
+    def clear(self):
+        self._items.clear()
+        self.current_bytes = 0
+
+
+class BarQueryEngine:
+    """
+    Consultas de barras por (activo, broker, timeframe, rango de tiempo, columnas) sobre los
+    CSV procesados de DataCleaner.
+
+    - Poda por partición: solo se abre el archivo del broker.
+    - Poda por estadísticas: del catálogo de bloques solo se leen los bloques del activo
+      (comparando formas canónicas), del timeframe y cuyo rango [min_time, max_time] corta
+      el rango pedido.
+    - Proyección: de cada bloque solo se parsean las columnas pedidas (y time).
+    - Los bloques parseados se guardan en una caché LRU para consultas repetidas.
+
+        engine = BarQueryEngine(processed_folder)
+        df = engine.query('EURUSD', 'Oanda', 'H1', '2015-01-01', '2019-01-01', ['open', 'close'])
+    """
+
+    def __init__(self, folder_path: str, cache_mb: float = 256, block_rows: int = 50000):
+        assert os.path.isdir(folder_path), "La ruta de la carpeta no es válida."
+        self.folder_path = folder_path
+        self.block_rows = block_rows
+        self.cache = BlockCache(cache_mb)
+        self.canonicalizer = SymbolCanonicalizer.shared()
+        self._catalogs = {}
+
+    def catalog(self, broker: str) -> BlockCatalog:
+        path = os.path.join(self.folder_path, f"{broker}.csv")
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No existe el archivo procesado del broker: {path}")
+        catalog = self._catalogs.get(broker)
+        if catalog is None or not catalog.is_current():
+            catalog = BlockCatalog.open(path, block_rows=self.block_rows)
+            self._catalogs[broker] = catalog
+        return catalog
+
+    def _select_blocks(self, catalog: BlockCatalog, asset: str, timeframe: str, start_ns, end_ns) -> pd.DataFrame:
+        blocks = catalog.blocks
+        canonical = self.canonicalizer.canonical(asset)
+        asset_match = blocks['asset'].map(lambda a: self.canonicalizer.canonical(a) == canonical)
+        mask = asset_match & (blocks['timeframe'] == normalize_timeframe(timeframe))
+        if start_ns is not None:
+            mask &= blocks['max_time'] >= start_ns
+        if end_ns is not None:
+            mask &= blocks['min_time'] < end_ns
+        return blocks[mask]
+
+    def _read_block(self, catalog: BlockCatalog, block, columns: list) -> pd.DataFrame:
+        key = (catalog.csv_path, catalog.mtime_ns, int(block.offset), tuple(columns))
+        df = self.cache.get(key)
+        if df is None:
+            with open(catalog.csv_path, 'rb') as f:
+                f.seek(int(block.offset))
+                data = f.read(int(block.length))
+            df = pd.read_csv(io.BytesIO(data), header=None, names=catalog.columns, usecols=columns)
+            df['time'] = pd.to_datetime(df['time'], utc=True, errors='coerce')
+            df = df[columns]
+            self.cache.put(key, df)
+        return df
+
+    def query(self, asset: str, broker: str, timeframe: str, start=None, end=None, columns: list = None,
+              as_numpy: bool = False):
+        """
+        Devuelve las barras de un activo/broker/timeframe en [start, end).
+
+        Args:
+            asset (str): Símbolo (se compara por forma canónica, p. ej. 'EURUSD' y 'EURUSD.a').
+            broker (str): Broker (nombre del CSV procesado).
+            timeframe (str): 'H1' o '1h'.
+            start, end: Límites del rango (end excluido); None para no limitar.
+            columns (list): Columnas a devolver además de time; None para todas las de precio.
+            as_numpy (bool): Si es True devuelve un dict columna -> np.ndarray.
+
+        Returns:
+            pd.DataFrame | dict: Barras ordenadas como en el archivo.
+        """
+        catalog = self.catalog(broker)
+        if columns is None:
+            columns = [c for c in catalog.columns if c not in ('time', 'timeframe', 'broker', 'asset')]
+        columns = ['time'] + [c for c in columns if c != 'time']
+        start_ns = to_utc_ns(start) if start is not None else None
+        end_ns = to_utc_ns(end) if end is not None else None
+
+        frames = [self._read_block(catalog, block, columns)
+                  for block in self._select_blocks(catalog, asset, timeframe, start_ns, end_ns).itertuples()]
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+        if frames and (start_ns is not None or end_ns is not None):
+            time_ns = df['time'].dt.tz_localize(None).astype('datetime64[ns]').to_numpy().view('i8')
+            mask = np.ones(len(df), dtype=bool)
+            if start_ns is not None:
+                mask &= time_ns >= start_ns
+            if end_ns is not None:
+                mask &= time_ns < end_ns
+            df = df[mask].reset_index(drop=True)
+        if as_numpy:
+            return {column: df[column].to_numpy() for column in columns}
+        return df
+
+
+# =====================================================
+# Ejemplo de uso
+# =====================================================
+if __name__ == "__main__":
+    from Common.config import data_path
+    folder = data_path("processed")
+    engine = BarQueryEngine(folder)
+    bars = engine.query('EURUSD', 'Oanda', 'H1', '2015-01-01', '2019-01-01', ['open', 'high', 'low', 'close'])
+    print(bars.head())
+    print(f"Caché: {engine.cache.hits} aciertos, {engine.cache.misses} fallos")
@@ -0,0 +1,369 @@
+import os
+import json
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from price_encoding import PRICE_COLUMNS, encode_prices, decode_prices, infer_digits
+
+# Registro de ancho fijo de una barra: time en segundos UTC desde epoch
+BAR_DTYPE = np.dtype([
+    ('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'),
+    ('tick_volume', '<i8'), ('spread', '<i4'), ('real_volume', '<i8'),
+])
+# Registro codificado de trabajo: precios en int64 por punto del símbolo (digits en la
+# cabecera) y volumen de ticks y spread en enteros estrechos, con time absoluto. Es el formato
+# de las barras nuevas antes de escribirlas y de las series codificadas antiguas.
+ENCODED_BAR_DTYPE = np.dtype([
+    ('time', '<i8'), ('open', '<i8'), ('high', '<i8'), ('low', '<i8'), ('close', '<i8'),
+    ('tick_volume', '<u4'), ('spread', '<i2'), ('real_volume', '<i8'),
+])
+# Registro codificado en disco de una serie nueva (ver encoded_dtype): time como
+# desplazamiento u4 desde meta['time_base'] (el inicio de la serie; ordenado, así que se sigue
+# pudiendo buscar por tiempo en el mapeo), precios en i4 y real_volume en u4. 30 bytes por barra.
+NARROW_BAR_DTYPE = np.dtype([
+    ('time', '<u4'), ('open', '<i4'), ('high', '<i4'), ('low', '<i4'), ('close', '<i4'),
+    ('tick_volume', '<u4'), ('spread', '<i2'), ('real_volume', '<u4'),
+])
+# Margen de crecimiento al elegir los tipos estrechos de una serie nueva: un campo solo se
+# estrecha si sus primeras barras caben NARROW_HEADROOM veces en el tipo
+NARROW_HEADROOM = 4
+MAGIC = b"HERMESBARS"
+HEADER_SIZE = 512
+BAR_SUFFIX = ".bars"
+
+
+def _write_header(f, dtype: np.dtype, meta: dict):
+    payload = json.dumps({'descr': dtype.descr, 'meta': meta}).encode('utf-8')
+    header = MAGIC + b"\n" + payload
+    if len(header) >= HEADER_SIZE:
+        raise ValueError("La cabecera del archivo de barras excede HEADER_SIZE.")
+    f.write(header + b" " * (HEADER_SIZE - len(header) - 1) + b"\n")
+
+
+def _read_header(path: str):
+    with open(path, 'rb') as f:
+        header = f.read(HEADER_SIZE)
+    if not header.startswith(MAGIC):
+        raise ValueError(f"El archivo no es un almacén de barras: {path}")
+    info = json.loads(header[len(MAGIC) + 1:].decode('utf-8'))
+    dtype = np.dtype([tuple(field) for field in info['descr']])
+    return dtype, info['meta']
+
+
+def frame_to_records(df: pd.DataFrame, dtype: np.dtype = BAR_DTYPE, digits: int = None) -> np.ndarray:
+    """
+    Convierte barras del CSV procesado (time, open, ..., real_volume) a registros ordenados por time.
+    Con digits los precios se codifican como int64 en puntos (10**-digits).
+
+    Raises:
+        OverflowError: Si un volumen o spread no cabe en el tipo entero del registro.
+    """
+    time = pd.to_datetime(df['time'], utc=True, errors='coerce')
+    valid = time.notna().to_numpy()
+    records = np.zeros(int(valid.sum()), dtype=dtype)
+    records['time'] = (time[valid] - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1)
+    for name in dtype.names[1:]:
+        if name not in df.columns:
+            continue
+        values = pd.to_numeric(df[name], errors='coerce').to_numpy()[valid]
+        if digits is not None and name in PRICE_COLUMNS:
+            values = encode_prices(values, digits)
+        elif records[name].dtype.kind in 'iu':
+            values = np.nan_to_num(values, nan=0)
+            info = np.iinfo(records[name].dtype)
+            if len(values) and (values.min() < info.min or values.max() > info.max):
+                raise OverflowError(f"La columna {name} no cabe en {records[name].dtype}.")
+        records[name] = values
+    return records[np.argsort(records['time'], kind='stable')]
+
+
+def _out_of_range(values: np.ndarray, dtype: np.dtype, headroom: int = 1) -> bool:
+    if not len(values):
+        return False
+    info = np.iinfo(dtype)
+    low, high = int(values.min()), int(values.max())
+    return low < info.min // headroom or high > info.max // headroom
+
+
+def encoded_dtype(records: np.ndarray, time_base: int = 0) -> np.dtype:
+    """
+    Registro en disco de una serie codificada nueva a partir de sus primeras barras
+    (ENCODED_BAR_DTYPE): NARROW_BAR_DTYPE, con int64 en los campos cuyos valores no caben
+    NARROW_HEADROOM veces en el tipo estrecho.
+    """
+    return _widen(NARROW_BAR_DTYPE, records, time_base, NARROW_HEADROOM)
+
+
+def _widen(dtype: np.dtype, records: np.ndarray, time_base: int, headroom: int = 1) -> np.dtype:
+    """dtype con int64 en los campos en los que no caben los valores de records."""
+    fields = []
+    for name in dtype.names:
+        field = dtype.fields[name][0]
+        values = records[name].astype('int64') - (time_base if name == 'time' else 0)
+        fields.append((name, '<i8' if _out_of_range(values, field, headroom) else field.str))
+    return np.dtype(fields)
+
+
+def _pack(records: np.ndarray, dtype: np.dtype, time_base: int) -> np.ndarray:
+    """
+    Registros de trabajo -> registros en disco (time relativo a time_base).
+
+    Raises:
+        OverflowError: Si un campo no cabe en su tipo (ver _widen).
+    """
+    packed = np.zeros(len(records), dtype=dtype)
+    for name in dtype.names:
+        values = records[name].astype('int64') - (time_base if name == 'time' else 0)
+        if _out_of_range(values, dtype.fields[name][0]):
+            raise OverflowError(f"La columna {name} no cabe en {dtype.fields[name][0]}.")
+        packed[name] = values
+    return packed
+
+
+class BarSeries:
+    """
+    Serie de barras de un archivo .bars mapeada en memoria (solo lectura).
+
+    El mapeo es compartido (MAP_SHARED): varios procesos que abren la misma serie usan las
+    mismas páginas de la caché del sistema operativo sin copiarlas ni parsear texto.
+    Los cortes por tiempo devuelven vistas del mapeo, no copias. En series codificadas
+    (meta['digits']) los precios de records están en puntos y time es el desplazamiento desde
+    meta['time_base']; prices() y to_frame() devuelven precios y tiempos decodificados.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.records = None
+        self.refresh()
+
+    def refresh(self):
+        """
+        Vuelve a mapear el archivo para ver las barras añadidas después de abrirlo (o la serie
+        reescrita con un registro más ancho: se vuelve a leer la cabecera).
+        """
+        self.close()
+        self.dtype, self.meta = _read_header(self.path)
+        self.digits = self.meta.get('digits')
+        self.time_base = self.meta.get('time_base', 0)
+        size = os.path.getsize(self.path) - HEADER_SIZE
+        n_records = size // self.dtype.itemsize
+        if n_records == 0:
+            self.records = np.zeros(0, dtype=self.dtype)
+        else:
+            self.records = np.memmap(self.path, dtype=self.dtype, mode='r', offset=HEADER_SIZE, shape=(n_records,))
+
+    def close(self):
+        """
+        Libera el mapeo del archivo. En Windows un archivo mapeado no se puede reemplazar ni
+        truncar; BarStore cierra así las series que abrió antes de reescribirlas. Si quedan
+        vistas de between() en uso, el mapeo se libera cuando se liberan ellas.
+        """
+        records, self.records = self.records, None
+        mapping = getattr(records, '_mmap', None)
+        del records
+        if mapping is not None:
+            try:
+                mapping.close()
+            except BufferError:
+                pass
+
+    def __len__(self):
+        return len(self.records)
+
+    @staticmethod
+    def _seconds(value) -> int:
+        if isinstance(value, (int, np.integer)):
+            return int(value)
+        timestamp = pd.Timestamp(value)
+        timestamp = timestamp.tz_localize('UTC') if timestamp.tzinfo is None else timestamp.tz_convert('UTC')
+        return int(timestamp.value // 10**9)
+
+    def index_of(self, time, side: str = 'left') -> int:
+        """Posición de time en la serie por búsqueda binaria sobre la columna time ordenada."""
+        return int(np.searchsorted(self.records['time'], self._seconds(time) - self.time_base, side=side))
+
+    def between(self, start=None, end=None) -> np.ndarray:
+        """Vista (sin copia) de las barras con start <= time < end."""
+        first = self.index_of(start) if start is not None else 0
+        last = self.index_of(end) if end is not None else len(self.records)
+        return self.records[first:last]
+
+    def prices(self, column: str, start=None, end=None) -> np.ndarray:
+        """Precios de una columna en el rango, como float64."""
+        values = self.between(start, end)[column]
+        return decode_prices(values, self.digits) if self.digits is not None else values
+
+    def to_frame(self, start=None, end=None) -> pd.DataFrame:
+        """Copia de las barras del rango como DataFrame con time en UTC."""
+        df = pd.DataFrame(np.asarray(self.between(start, end)))
+        df['time'] = pd.to_datetime(df['time'].astype('int64') + self.time_base, unit='s', utc=True)
+        if self.digits is not None:
+            for column in PRICE_COLUMNS:
+                df[column] = decode_prices(df[column], self.digits)
+            # Mismos tipos que ENCODED_BAR_DTYPE, sea cual sea el registro de la serie
+            for column in ('tick_volume', 'spread', 'real_volume'):
+                if column in df.columns:
+                    df[column] = df[column].astype(ENCODED_BAR_DTYPE.fields[column][0])
+        return df
+
+
+class BarStore:
+    """
+    Almacén de barras en archivos de registros de ancho fijo, uno por broker/símbolo/timeframe:
+
+        root/<broker>/<símbolo>_<timeframe>.bars
+
+    Cada archivo tiene una cabecera de HEADER_SIZE bytes (dtype de los registros y metadatos)
+    seguida de los registros ordenados por time. append() añade solo las barras posteriores
+    a la última guardada, de modo que las descargas incrementales no duplican barras.
+
+    Con encoded=True los precios se guardan como enteros en puntos del símbolo (comparaciones
+    exactas) y cada serie nueva elige su registro con encoded_dtype: NARROW_BAR_DTYPE, 30 bytes
+    por barra frente a 60 (la mitad), salvo en los campos que no caben, que van en int64 (p. ej.
+    precios de más de ~5·10^8 puntos: 46 bytes). Si una barra añadida después no cabe, la serie
+    se reescribe con ese campo en int64. Las series codificadas con ENCODED_BAR_DTYPE (54 bytes)
+    se siguen leyendo y ampliando con su registro.
+    """
+
+    def __init__(self, root: str, dtype: np.dtype = BAR_DTYPE, encoded: bool = False):
+        self.root = root
+        self.encoded = encoded
+        self.dtype = ENCODED_BAR_DTYPE if encoded else dtype
+        # Series abiertas con open() por ruta, para cerrarlas antes de reescribir su archivo
+        self._open_series = {}
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, broker: str, symbol: str, timeframe: str) -> str:
+        return os.path.join(self.root, broker, f"{symbol}_{timeframe}{BAR_SUFFIX}")
+
+    def series(self) -> list:
+        """Lista de (broker, símbolo, timeframe) guardados."""
+        result = []
+        for broker in sorted(os.listdir(self.root)):
+            broker_dir = os.path.join(self.root, broker)
+            if not os.path.isdir(broker_dir):
+                continue
+            for filename in sorted(os.listdir(broker_dir)):
+                if filename.endswith(BAR_SUFFIX):
+                    symbol, _, timeframe = filename[:-len(BAR_SUFFIX)].rpartition('_')
+                    result.append((broker, symbol, timeframe))
+        return result
+
+    @staticmethod
+    def _last_time(path: str, dtype: np.dtype, time_base: int = 0):
+        size = os.path.getsize(path) - HEADER_SIZE
+        if size < dtype.itemsize:
+            return None
+        with open(path, 'rb') as f:
+            f.seek(HEADER_SIZE + (size // dtype.itemsize - 1) * dtype.itemsize)
+            return int(np.frombuffer(f.read(dtype.itemsize), dtype=dtype)['time'][0]) + time_base
+
+    def _release(self, path: str) -> list:
+        """Cierra los mapeos de las series abiertas de path; devuelve esas series."""
+        series = list(self._open_series.get(path, ()))
+        for item in series:
+            item.close()
+        return series
+
+    def _rewrite(self, path: str, dtype: np.dtype, new_dtype: np.dtype, meta: dict):
+        """
+        Reescribe la serie con new_dtype (archivo temporal y reemplazo atómico). Las series
+        abiertas se cierran antes del reemplazo y se vuelven a mapear después.
+        """
+        n_records = (os.path.getsize(path) - HEADER_SIZE) // dtype.itemsize
+        stored = np.fromfile(path, dtype=dtype, count=n_records, offset=HEADER_SIZE)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            _write_header(f, new_dtype, meta)
+            f.write(stored.astype(new_dtype).tobytes())
+        released = self._release(path)
+        os.replace(tmp_path, path)
+        for series in released:
+            series.refresh()
+
+    def append_records(self, broker: str, symbol: str, timeframe: str, records: np.ndarray, meta: dict = None) -> int:
+        """
+        Añade registros (ya ordenados por time) al final de la serie.
+
+        Returns:
+            int: Número de barras añadidas.
+        """
+        path = self.path(broker, symbol, timeframe)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if not os.path.exists(path):
+            dtype = self.dtype
+            stored_meta = {'broker': broker, 'symbol': symbol, 'timeframe': timeframe, **(meta or {})}
+            if self.encoded:
+                stored_meta['time_base'] = int(records['time'][0]) if len(records) else 0
+                dtype = encoded_dtype(records, stored_meta['time_base'])
+            with open(path, 'wb') as f:
+                _write_header(f, dtype, stored_meta)
+        else:
+            dtype, stored_meta = _read_header(path)
+            if not self.encoded and dtype != self.dtype:
+                raise ValueError(f"El dtype de {path} no coincide con el del almacén.")
+            if meta and meta.get('digits') != stored_meta.get('digits'):
+                raise ValueError(f"Los decimales de {path} no coinciden con los de las barras nuevas.")
+            # Se descarta un posible registro incompleto de una escritura interrumpida
+            size = os.path.getsize(path) - HEADER_SIZE
+            if size % dtype.itemsize:
+                released = self._release(path)
+                with open(path, 'r+b') as f:
+                    f.truncate(HEADER_SIZE + size - size % dtype.itemsize)
+                for series in released:
+                    series.refresh()
+            last_time = self._last_time(path, dtype, stored_meta.get('time_base', 0))
+            if last_time is not None:
+                records = records[records['time'] > last_time]
+        if len(records):
+            if self.encoded:
+                time_base = stored_meta.get('time_base', 0)
+                wider = _widen(dtype, records, time_base)
+                if wider != dtype:
+                    self._rewrite(path, dtype, wider, stored_meta)
+                    dtype = wider
+                records = _pack(records, dtype, time_base)
+            with open(path, 'ab') as f:
+                f.write(records.astype(dtype, copy=False).tobytes())
+        return len(records)
+
+    def _series_digits(self, broker: str, symbol: str, timeframe: str, df: pd.DataFrame, digits: int = None) -> int:
+        path = self.path(broker, symbol, timeframe)
+        if os.path.exists(path):
+            return _read_header(path)[1]['digits']
+        if digits is None:
+            digits = infer_digits(df[PRICE_COLUMNS].to_numpy().ravel())
+        return int(digits)
+
+    def append_frame(self, broker: str, symbol: str, df: pd.DataFrame, digits: int = None) -> int:
+        """
+        Añade las barras de un DataFrame procesado, separadas por su columna timeframe.
+
+        Args:
+            digits (int): Decimales del símbolo para el almacén codificado (de SymbolDigits);
+                si no se indican se usan los de la serie existente o se infieren de los precios.
+        """
+        added = 0
+        for timeframe, part in df.groupby('timeframe', sort=False):
+            timeframe = str(timeframe)
+            meta, series_digits = None, None
+            if self.encoded:
+                series_digits = self._series_digits(broker, symbol, timeframe, part, digits)
+                meta = {'digits': series_digits}
+            records = frame_to_records(part, self.dtype, series_digits)
+            added += self.append_records(broker, symbol, timeframe, records, meta)
+        return added
+
+    def open(self, broker: str, symbol: str, timeframe: str) -> BarSeries:
+        """
+        Abre una serie mapeada en memoria. El almacén la recuerda (sin impedir que se libere)
+        para cerrarla y volver a mapearla si una escritura posterior reescribe el archivo.
+        """
+        path = self.path(broker, symbol, timeframe)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No existe la serie de barras: {path}")
+        series = BarSeries(path)
+        self._open_series.setdefault(path, weakref.WeakSet()).add(series)
+        return series
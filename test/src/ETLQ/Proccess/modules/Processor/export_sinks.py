@@ -0,0 +1,168 @@
+import os
+from abc import ABC, abstractmethod
+
+import pandas as pd
+
+# Componentes compartidos entre etapas (test/src/ETLQ/Common)
+from Common.registro_index import RegistroIndexWriter
+from Common.metrics import registry
+
+
+class ExportSink(ABC):
+    """
+    Destino de una exportación de CSVToPostgresAdapter.export_multi.
+
+    Cada sink declara si quiere los ids mapeados (map_ids=True) o los símbolos y brokers
+    originales (map_ids=False); el adaptador transforma cada chunk una sola vez y entrega
+    a cada sink la vista que pidió, con el mismo registro_id.
+    """
+    map_ids = True
+
+    def open(self):
+        """Se llama una vez antes del primer chunk."""
+
+    @abstractmethod
+    def write(self, df: pd.DataFrame):
+        """Recibe cada chunk transformado (con registro_id). No debe modificar df."""
+
+    def close(self, success: bool = True):
+        """
+        Se llama una vez al terminar, incluso si la exportación falla (success=False): el
+        sink libera sus recursos y, en ese caso, no da por buena una salida incompleta.
+        """
+
+
+class CSVSink(ExportSink):
+    """
+    Escribe los chunks en un único CSV, igual que export_dataframe.
+
+    Con index_block_rows construye a la vez el índice de offsets por registro_id
+    (Common/registro_index.py), escribiendo cada chunk en bloques de ese número de filas.
+    """
+
+    def __init__(self, output_folder: str, output_filename: str, map_ids: bool = True,
+                 index_block_rows: int = None):
+        self.map_ids = map_ids
+        self.output_path = os.path.join(output_folder, output_filename)
+        self.index_block_rows = index_block_rows
+        self.index = None
+        self._file = None
+        self._index_writer = None
+
+    def open(self):
+        os.makedirs(os.path.dirname(self.output_path) or '.', exist_ok=True)
+        self._file = open(self.output_path, 'w', newline='', encoding='utf-8')
+        self._index_writer = None
+        self.index = None
+
+    def write(self, df: pd.DataFrame):
+        if self.index_block_rows is None:
+            df.to_csv(self._file, index=False, header=self._file.tell() == 0)
+            return
+        if self._index_writer is None:
+            df.head(0).to_csv(self._file, index=False)
+            self._index_writer = RegistroIndexWriter(self.output_path, df.columns, self._file.tell())
+        for start in range(0, len(df), self.index_block_rows):
+            block = df.iloc[start:start + self.index_block_rows]
+            self._index_writer.add_block(self._file.tell(), block['registro_id'])
+            block.to_csv(self._file, index=False, header=False)
+
+    def close(self, success: bool = True):
+        if self._file is None:
+            return
+        registry().counter("csv_bytes_written_total", "Bytes de CSV escritos", stage="process").inc(self._file.tell())
+        self._file.close()
+        self._file = None
+        if not success:
+            print(f"Exportación interrumpida: {self.output_path} está incompleto.")
+            return
+        if self._index_writer is not None:
+            self.index = self._index_writer.finish()
+        print(f"Exportación completada en: {self.output_path}")
+
+
+class LoaderSink(ExportSink):
+    """
+    Adapta un cargador de base de datos (PartitionedLoader, SQLiteLoader) como sink.
+    Usa begin()/finish() del cargador si existen y load_batch() para cada chunk; finish()
+    (índices y estadísticas) solo se llama si la exportación terminó sin error.
+    """
+
+    def __init__(self, loader, map_ids: bool = True):
+        self.loader = loader
+        self.map_ids = map_ids
+
+    def open(self):
+        begin = getattr(self.loader, 'begin', None)
+        if begin is not None:
+            begin()
+
+    def write(self, df: pd.DataFrame):
+        self.loader.load_batch(df)
+
+    def close(self, success: bool = True):
+        finish = getattr(self.loader, 'finish', None)
+        if success and finish is not None:
+            finish()
+
+
+class PreviewSink(ExportSink):
+    """Conserva las primeras n filas exportadas (sustituye a preview() sin releer el archivo)."""
+
+    def __init__(self, n: int = 5, map_ids: bool = True):
+        self.n = n
+        self.map_ids = map_ids
+        self.frame = None
+
+    def write(self, df: pd.DataFrame):
+        if self.frame is None:
+            self.frame = df.head(self.n).copy()
+        elif len(self.frame) < self.n:
+            self.frame = pd.concat([self.frame, df.head(self.n - len(self.frame))])
+
+
+class ValidationStatsSink(ExportSink):
+    """
+    Acumula estadísticas de validación de la exportación: filas totales, nulos por columna,
+    rango de timestamps y filas por (broker_id, timeframe). Con map_ids=True los nulos en
+    activo_id/broker_id corresponden a símbolos o brokers sin id en las tablas de mapeo.
+    """
+
+    def __init__(self, output_path: str = None, map_ids: bool = True):
+        self.output_path = output_path
+        self.map_ids = map_ids
+        self.rows = 0
+        self.null_counts = {}
+        self.min_timestamp = None
+        self.max_timestamp = None
+        self.group_counts = {}
+
+    def write(self, df: pd.DataFrame):
+        self.rows += len(df)
+        for column, n in df.isna().sum().items():
+            self.null_counts[column] = self.null_counts.get(column, 0) + int(n)
+        timestamps = df['timestamp'].dropna()
+        if not timestamps.empty:
+            low, high = timestamps.min(), timestamps.max()
+            self.min_timestamp = low if self.min_timestamp is None else min(self.min_timestamp, low)
+            self.max_timestamp = high if self.max_timestamp is None else max(self.max_timestamp, high)
+        counts = df.groupby(['broker_id', 'timeframe'], observed=True, dropna=False).size()
+        for key, n in counts.items():
+            self.group_counts[key] = self.group_counts.get(key, 0) + int(n)
+
+    def report(self) -> pd.DataFrame:
+        """Devuelve las estadísticas como tabla (metric, value)."""
+        records = [
+            {'metric': 'rows', 'value': self.rows},
+            {'metric': 'min_timestamp', 'value': self.min_timestamp},
+            {'metric': 'max_timestamp', 'value': self.max_timestamp},
+        ]
+        records += [{'metric': f'nulls.{col}', 'value': n} for col, n in self.null_counts.items()]
+        records += [{'metric': f'rows.{broker}.{timeframe}', 'value': n}
+                    for (broker, timeframe), n in self.group_counts.items()]
+        return pd.DataFrame(records, columns=['metric', 'value'])
+
+    def close(self, success: bool = True):
+        if success and self.output_path:
+            os.makedirs(os.path.dirname(self.output_path) or '.', exist_ok=True)
+            self.report().to_csv(self.output_path, index=False)
@@ -0,0 +1,74 @@
+import os
+import json
+
+import numpy as np
+
+# Metadatos de símbolos guardados por la extracción en la carpeta de cada broker
+SYMBOL_METADATA_FILE = "symbols_metadata.json"
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+MAX_DIGITS = 8
+
+
+def infer_digits(prices, max_digits: int = MAX_DIGITS) -> int:
+    """
+    Menor número de decimales d tal que todos los precios son múltiplos de 10**-d.
+    Se usa cuando no hay metadatos del símbolo.
+    """
+    values = np.asarray(prices, dtype='float64')
+    values = values[np.isfinite(values)]
+    for digits in range(max_digits + 1):
+        scaled = values * 10**digits
+        if np.all(np.abs(scaled - np.rint(scaled)) <= np.maximum(1e-6, np.abs(scaled) * 1e-12)):
+            return digits
+    return max_digits
+
+
+def encode_prices(prices, digits: int) -> np.ndarray:
+    """Precios float -> int64 en múltiplos del punto del símbolo (10**-digits)."""
+    return np.rint(np.asarray(prices, dtype='float64') * 10**digits).astype('int64')
+
+
+def decode_prices(values, digits: int) -> np.ndarray:
+    """
+    int64 en puntos -> float64. Se divide por 10**digits (en lugar de multiplicar por el punto)
+    para obtener el double más cercano al precio decimal original.
+    """
+    return np.asarray(values, dtype='int64') / 10**digits
+
+
+class SymbolDigits:
+    """
+    Decimales (punto = 10**-digits) de cada símbolo por broker.
+
+    Lee los symbols_metadata.json que la extracción guarda junto a los CSV de cada broker
+    (input_dir/<broker>/symbols_metadata.json, con name, digits y point de symbol_info de
+    MetaTrader 5). Si el símbolo no tiene metadatos, los decimales se infieren de los precios.
+    """
+
+    def __init__(self, input_dir: str = None):
+        self.input_dir = input_dir
+        self._metadata = {}
+
+    def _broker_metadata(self, broker: str) -> dict:
+        if broker not in self._metadata:
+            metadata = {}
+            path = os.path.join(self.input_dir, broker, SYMBOL_METADATA_FILE) if self.input_dir else None
+            if path and os.path.exists(path):
+                with open(path, encoding='utf-8') as f:
+                    metadata = {s['name']: int(s['digits']) for s in json.load(f)}
+            self._metadata[broker] = metadata
+        return self._metadata[broker]
+
+    def get(self, broker: str, symbol: str, default=None):
+        """Decimales del símbolo según los metadatos, o default si no los hay."""
+        return self._broker_metadata(broker).get(symbol, default)
+
+    def digits(self, broker: str, symbol: str, prices=None) -> int:
+        """Decimales del símbolo; infiere desde prices si no hay metadatos."""
+        digits = self.get(broker, symbol)
+        if digits is None:
+            if prices is None:
+                raise KeyError(f"Sin metadatos de decimales para {broker}/{symbol}.")
+            digits = infer_digits(prices)
+        return digits
+
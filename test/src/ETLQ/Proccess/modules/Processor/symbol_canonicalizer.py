@@ -0,0 +1,137 @@
+import os
+import re
+import json
+import numpy as np
+import pandas as pd
+
+# Componentes compartidos entre etapas (test/src/ETLQ/Common)
+from Common.config import data_path
+
+
+def _take_by_codes(category_values, codes: np.ndarray, index) -> pd.Series:
+    """
+    Expande un valor por categoría a un valor por fila usando los códigos categóricos.
+    Los códigos -1 (valores nulos) producen NaN.
+    """
+    values = pd.Series(category_values).to_numpy()
+    if (codes < 0).any():
+        values = np.append(values, np.nan)
+        codes = np.where(codes < 0, len(values) - 1, codes)
+    return pd.Series(values[codes], index=index)
+
+
+class SymbolCanonicalizer:
+    """
+    Normaliza símbolos de broker a su forma canónica eliminando el sufijo '_CFD...' y los
+    sufijos de cuenta ('.a', '.pro', ...) salvo '.IDX' y '.HK'.
+
+    Cada símbolo distinto se resuelve una sola vez y se guarda en caché: la caché se
+    comparte entre chunks (instancia compartida por proceso, ver shared()) y, con cache_path,
+    entre ejecuciones: canonicalize() la guarda cuando aparecen símbolos nuevos y se descarta
+    al cargarla si cambiaron los patrones. La aplicación a un DataFrame trabaja sobre las categorías
+    de la columna, de modo que el coste depende del número de símbolos distintos y no del
+    número de filas.
+    """
+    CFD_PATTERN = r"_CFD.*$"
+    SUFFIX_PATTERN = r"\.(?!IDX$|HK$)[A-Za-z0-9-]+$"
+
+    _shared = None
+
+    def __init__(self, cache_path: str = None):
+        self._regex_cfd = re.compile(self.CFD_PATTERN)
+        self._regex_suffix = re.compile(self.SUFFIX_PATTERN)
+        self.cache_path = cache_path
+        self._cache = {}
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, encoding='utf-8') as f:
+                    stored = json.load(f)
+                if stored.get('patterns') == [self.CFD_PATTERN, self.SUFFIX_PATTERN]:
+                    self._cache = stored['symbols']
+            except (OSError, ValueError, AttributeError, KeyError):
+                # Caché ilegible o de otro formato: se reconstruye
+                self._cache = {}
+
+    @classmethod
+    def shared(cls) -> "SymbolCanonicalizer":
+        """
+        Instancia única por proceso, usada por ETLProcessor y CSVToPostgresAdapter, con la
+        caché persistida en data_path("symbol_cache").
+        """
+        if cls._shared is None:
+            cls._shared = cls(cache_path=data_path("symbol_cache"))
+        return cls._shared
+
+    def canonical(self, symbol) -> str:
+        """Forma canónica de un único símbolo (con caché)."""
+        symbol = str(symbol)
+        result = self._cache.get(symbol)
+        if result is None:
+            result = self._regex_suffix.sub("", self._regex_cfd.sub("", symbol))
+            self._cache[symbol] = result
+        return result
+
+    def canonicalize(self, values: pd.Series) -> pd.Series:
+        """
+        Devuelve una Serie categórica con la forma canónica de cada valor.
+
+        Args:
+            values (pd.Series): Símbolos originales (object o categórica).
+
+        Returns:
+            pd.Series: Serie categórica alineada con values; los nulos se conservan.
+        """
+        categorical = values.astype('category')
+        known = len(self._cache)
+        canonical = [self.canonical(c) for c in categorical.cat.categories]
+        if len(self._cache) > known:
+            self.save()
+        # Varios símbolos originales pueden compartir forma canónica: se refactorizan
+        inverse, uniques = pd.factorize(np.array(canonical, dtype=object))
+        codes = categorical.cat.codes.to_numpy()
+        new_codes = np.where(codes >= 0, inverse[codes], -1) if len(inverse) else codes
+        return pd.Series(
+            pd.Categorical.from_codes(new_codes, categories=uniques),
+            index=values.index, name=values.name
+        )
+
+    def save(self):
+        """
+        Persiste la caché en cache_path (con los patrones que la generaron) para reutilizarla
+        en próximas ejecuciones. Se escribe en un temporal y se reemplaza, de modo que varios
+        procesos pueden guardarla a la vez; si no se puede escribir, se sigue sin persistir.
+        """
+        if not self.cache_path:
+            return
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'patterns': [self.CFD_PATTERN, self.SUFFIX_PATTERN], 'symbols': self._cache},
+                          f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+        except OSError:
+            pass
+
+    def __len__(self):
+        return len(self._cache)
+
+
+class IdMapper:
+    """
+    Mapeo nombre -> id (p. ej. simbolo -> activo_id o nombre -> broker_id) construido una
+    sola vez. Sobre columnas categóricas solo se buscan las categorías y el resultado se
+    expande por códigos.
+    """
+
+    def __init__(self, keys: pd.Series, ids: pd.Series):
+        lookup = pd.Series(ids.to_numpy(), index=keys.to_numpy())
+        # Igual que dict(zip(keys, ids)): ante claves repetidas prevalece la última
+        self._lookup = lookup[~lookup.index.duplicated(keep='last')]
+
+    def map(self, values: pd.Series) -> pd.Series:
+        """Devuelve el id de cada valor; NaN si no existe en el mapeo."""
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            category_ids = self._lookup.reindex(values.cat.categories)
+            return _take_by_codes(category_ids, values.cat.codes.to_numpy(), values.index).rename(values.name)
+        return values.map(self._lookup)
@@ -0,0 +1,235 @@
+#==============================#            Description            #==============================#
+
+"""Punto de entrada único del pipeline ETLQ. Cada subcomando importa sus dependencias pesadas
+(pandas, MetaTrader5, psutil, textual) solo al ejecutarse, de modo que `--help`, `config` o
+`cache` arrancan en lo que tarda el propio intérprete. Las rutas y los parámetros por defecto
+salen del registro de configuración (Common/config.py).
+
+Uso:
+    python cli.py config [--path processed]      Rutas, brokers y parámetros de etapa.
+    python cli.py extract [--brokers Oanda]      Descarga histórica de MetaTrader 5 ([--profile rss]).
+    python cli.py process                        Limpieza de los CSV por broker.
+    python cli.py validate                       Reportes de validación de los CSV limpios.
+    python cli.py pipeline [...]                 Grafo por broker (argumentos de pipeline_runner.py).
+    python cli.py monitor [run_id]               Panel de operaciones en vivo.
+    python cli.py profile-diff a.csv b.csv [...] Comparación de perfiles (argumentos de profile_diff.py).
+    python cli.py cache {stats,clear}            Caché de salidas de etapas.
+    python cli.py daemon serve|submit|status|... Servicio residente (argumentos de daemon_service.py).
+    python cli.py startup [--runs 10]            Mide el arranque en frío frente a COLD_START_TARGET_MS."""
+
+#==============================# Importamos los módulos necesarios #==============================#
+
+# Solo librería estándar a nivel de módulo: lo demás se importa dentro de cada subcomando
+import os
+import sys
+import argparse
+
+ETLQ_DIR = os.path.dirname(os.path.abspath(__file__))
+EXTRACTION_DIR = os.path.join(ETLQ_DIR, "Extract", "modules", "Extraction", "Extraction_Data_Metatrader5")
+PROCESSOR_DIR = os.path.join(ETLQ_DIR, "Proccess", "modules", "Processor")
+if ETLQ_DIR not in sys.path:
+    sys.path.insert(0, ETLQ_DIR)
+
+from Common.config import config, data_path
+
+# Objetivo de arranque en frío (mediana de `python cli.py --help` y `python cli.py config`)
+COLD_START_TARGET_MS = 150.0
+
+# Modos de instrumentación de profiling_utils (PROFILE_ENV, PROFILE_MODES), sin importarlo
+PROFILE_ENV = "HERMESDB_PROFILE"
+PROFILE_MODES = ("off", "time", "rss", "tracemalloc")
+
+# Módulos que no deben cargarse al arrancar la CLI ni en los subcomandos ligeros
+HEAVY_MODULES = ("pandas", "numpy", "MetaTrader5", "psutil", "textual", "tqdm")
+
+#==============================#            Subcomandos             #==============================#
+
+def _cmd_config(args, extra) -> int:
+    import json  # pylint: disable=import-outside-toplevel
+    if args.path:
+        print(data_path(args.path))
+    else:
+        print(json.dumps(config().as_dict(), indent=2, ensure_ascii=False))
+    return 0
+
+
+def _cmd_extract(args, extra) -> int:
+    # Instrumentación de los workers (profiling_utils): se fija antes de importar el extractor
+    os.environ[PROFILE_ENV] = args.profile or os.environ.get(PROFILE_ENV) or config().stage("extract")["profile"]
+    from datetime import datetime  # pylint: disable=import-outside-toplevel
+    from pipeline_runner import create_downloader  # pylint: disable=import-outside-toplevel
+    end_date = datetime.strptime(args.end, "%Y-%m-%d") if args.end else datetime.now()
+    downloader = create_downloader(args.credentials, data_path("external"), data_path("logs"),
+                                   datetime.strptime(args.start, "%Y-%m-%d"), end_date)
+    if not args.brokers:
+        downloader.process_all_brokers()
+    for broker in args.brokers or ():
+        downloader.process_broker(broker)
+    return 0
+
+
+def _cmd_process(args, extra) -> int:
+    sys.path.append(PROCESSOR_DIR)
+    from DataClear import DataCleaner  # pylint: disable=import-outside-toplevel
+    results = DataCleaner(data_path("external"), data_path("processed")).process()
+    print("Archivos generados:", results)
+    return 0
+
+
+def _cmd_validate(args, extra) -> int:
+    sys.path.append(PROCESSOR_DIR)
+    from Validation import DataFrameValidator  # pylint: disable=import-outside-toplevel
+    report_paths = DataFrameValidator.validate_csv_files_and_report(data_path("processed"), data_path("logs"))
+    print("Reportes generados:", report_paths)
+    return 0
+
+
+def _cmd_pipeline(args, extra) -> int:
+    import pipeline_runner  # pylint: disable=import-outside-toplevel
+    return pipeline_runner.main(extra)
+
+
+def _cmd_daemon(args, extra) -> int:
+    import daemon_service  # pylint: disable=import-outside-toplevel
+    return daemon_service.main(extra)
+
+
+def _cmd_monitor(args, extra) -> int:
+    from main import PipelineApp  # pylint: disable=import-outside-toplevel
+    PipelineApp(args.run_id).run()
+    return 0
+
+
+def _cmd_profile_diff(args, extra) -> int:
+    sys.path.append(EXTRACTION_DIR)
+    from performance import profile_diff  # pylint: disable=import-outside-toplevel
+    return profile_diff.main(extra)
+
+
+def _cmd_cache(args, extra) -> int:
+    from Common.stage_cache import StageCache  # pylint: disable=import-outside-toplevel
+    cache = StageCache()
+    if args.action == "clear":
+        cache.clear()
+        print(f"Caché vaciada: {cache.root}")
+        return 0
+    entries = cache.entries()
+    total = sum(entry["size"] for entry in entries)
+    print(f"Caché: {cache.root}")
+    print(f"Entradas: {len(entries)}  Tamaño: {total / 1024**2:.1f} MiB de {cache.max_bytes / 1024**2:.0f} MiB")
+    for entry in sorted(entries, key=lambda e: e["last_used"], reverse=True):
+        print(f"  {entry['stage']:<12} {entry['key'][:12]}  {entry['size'] / 1024**2:>8.2f} MiB")
+    return 0
+
+
+def measure_startup(runs: int = 10) -> dict:
+    """
+    Mide el arranque en frío de la CLI en procesos nuevos.
+
+    Devuelve la mediana y el mínimo (ms) de `--help` y `config` y, como referencia, de
+    `import pandas` (lo que costaba arrancar cuando la CLI importaba todos los módulos), y los
+    módulos pesados (HEAVY_MODULES) que quedan cargados tras `config`.
+    """
+    import time  # pylint: disable=import-outside-toplevel
+    import statistics  # pylint: disable=import-outside-toplevel
+    import subprocess  # pylint: disable=import-outside-toplevel
+    script = os.path.abspath(__file__)
+    commands = {
+        "--help": [sys.executable, script, "--help"],
+        "config": [sys.executable, script, "config", "--path", "raw"],
+        "import pandas": [sys.executable, "-c", "import pandas"],
+    }
+    timings = {}
+    for name, command in commands.items():
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+            samples.append((time.perf_counter() - start) * 1000)
+            if result.returncode != 0:
+                samples = None
+                break
+        if samples:
+            timings[name] = {"median_ms": statistics.median(samples), "min_ms": min(samples)}
+
+    probe = (f"import sys; sys.path.insert(0, {ETLQ_DIR!r}); import cli; cli.main(['config', '--path', 'raw']); "
+             f"print('heavy:' + ','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    output = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=False).stdout
+    marker = [line for line in output.splitlines() if line.startswith("heavy:")]
+    heavy = [m for m in marker[-1][len("heavy:"):].split(",") if m] if marker else ["(sin respuesta)"]
+    return {"timings": timings, "heavy_modules": heavy}
+
+
+def _cmd_startup(args, extra) -> int:
+    result = measure_startup(args.runs)
+    over_target = False
+    print(f"Arranque en frío ({args.runs} ejecuciones, objetivo {args.target_ms:.0f} ms):")
+    for name, timing in result["timings"].items():
+        reference = name == "import pandas"
+        over = not reference and timing["median_ms"] > args.target_ms
+        over_target = over_target or over
+        mark = "referencia" if reference else ("SUPERA EL OBJETIVO" if over else "ok")
+        print(f"  {name:<14} mediana {timing['median_ms']:>7.1f} ms  mínimo {timing['min_ms']:>7.1f} ms  {mark}")
+    if result["heavy_modules"]:
+        print(f"Módulos pesados cargados por `config`: {', '.join(result['heavy_modules'])}")
+    return 1 if over_target or result["heavy_modules"] else 0
+
+#==============================#      Fuction main [Interface]       #==============================#
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="cli.py", description="Pipeline ETLQ de HERMESDB.")
+    commands = parser.add_subparsers(dest="command", required=True, metavar="comando")
+
+    command = commands.add_parser("config", help="Rutas, brokers y parámetros de etapa del registro.")
+    command.add_argument("--path", help="Imprime solo la ruta con este nombre.")
+    command.set_defaults(handler=_cmd_config)
+
+    settings = config()
+    command = commands.add_parser("extract", help="Descarga histórica de MetaTrader 5 a la carpeta external.")
+    command.add_argument("--credentials", default=data_path("credentials"), help="CSV de credenciales.")
+    command.add_argument("--brokers", nargs="*", help="Brokers a descargar. Por defecto, todos los del CSV.")
+    command.add_argument("--start", default=settings.stage("extract")["start_date"], help="Inicio (YYYY-MM-DD).")
+    command.add_argument("--end", help="Fin (YYYY-MM-DD). Por defecto, ahora.")
+    command.add_argument("--profile", choices=PROFILE_MODES,
+                         help="Instrumentación por función. Por defecto, HERMESDB_PROFILE o la configuración (off).")
+    command.set_defaults(handler=_cmd_extract)
+
+    command = commands.add_parser("process", help="Limpia los CSV de external y los unifica por broker en processed.")
+    command.set_defaults(handler=_cmd_process)
+
+    command = commands.add_parser("validate", help="Valida los CSV de processed y guarda los reportes en logs.")
+    command.set_defaults(handler=_cmd_validate)
+
+    # Subcomandos que delegan en otro script: sus argumentos (incluido -h) se pasan sin tocar
+    command = commands.add_parser("pipeline", add_help=False, help="Grafo por broker (pipeline_runner.py).")
+    command.set_defaults(handler=_cmd_pipeline, passthrough=True)
+    command = commands.add_parser("profile-diff", add_help=False, help="Compara perfiles (performance/profile_diff.py).")
+    command.set_defaults(handler=_cmd_profile_diff, passthrough=True)
+    command = commands.add_parser("daemon", add_help=False, help="Servicio residente (daemon_service.py).")
+    command.set_defaults(handler=_cmd_daemon, passthrough=True)
+
+    command = commands.add_parser("monitor", help="Panel de operaciones en vivo.")
+    command.add_argument("run_id", nargs="?", help="Run a seguir. Por defecto, el más reciente.")
+    command.set_defaults(handler=_cmd_monitor)
+
+    command = commands.add_parser("cache", help="Caché de salidas de etapas (HERMESDB_STAGE_CACHE_DIR).")
+    command.add_argument("action", choices=("stats", "clear"), nargs="?", default="stats")
+    command.set_defaults(handler=_cmd_cache)
+
+    command = commands.add_parser("startup", help="Mide el arranque en frío de la CLI.")
+    command.add_argument("--runs", type=int, default=10, help="Ejecuciones por comando.")
+    command.add_argument("--target-ms", type=float, default=COLD_START_TARGET_MS, help="Objetivo de la mediana (ms).")
+    command.set_defaults(handler=_cmd_startup)
+    return parser
+
+
+def main(argv: list = None) -> int:
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if extra and not getattr(args, "passthrough", False):
+        parser.error(f"argumentos no reconocidos: {' '.join(extra)}")
+    return args.handler(args, extra)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
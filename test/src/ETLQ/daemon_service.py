@@ -0,0 +1,640 @@
+#==============================#            Description            #==============================#
+
+"""Modo servicio del pipeline ETLQ. Cada ejecución de main.py o pipeline_runner.py crea pools de
+procesos nuevos (spawn), vuelve a importar pandas y MetaTrader5 en cada worker e inicia sesión
+en cada terminal; en las actualizaciones intradía ese coste fijo supera al trabajo real. El
+servicio se queda residente con:
+
+- Una sesión persistente por broker (BrokerSession): un pool de workers con la sesión de MT5
+  abierta que descarga de forma incremental solo las barras nuevas de cada símbolo.
+- Un pool de cómputo persistente que limpia (DataClear.update_broker) y valida cada broker en
+  cuanto termina su actualización, mientras se actualiza el siguiente. La limpieza es
+  incremental: solo se limpian y validan los activos cuyo CSV descargado cambió (los workers no
+  reescriben un CSV sin barras nuevas) y el CSV del broker se une byte a byte.
+- Una cola de trabajos que se ejecutan de uno en uno, alimentada por un socket TCP local (una
+  petición JSON por línea) y por un programador de actualizaciones periódicas.
+
+Cada trabajo registra si tuvo que abrir sesiones (arranque en frío) o las encontró abiertas (en
+caliente); `report` compara ambas latencias y el informe se guarda al detener el servicio. La
+latencia de una actualización es la del trabajo completo sin la espera en cola: descarga de las
+barras nuevas, combinación con el CSV de cada símbolo (que se lee y reescribe entero, así que
+sigue creciendo con el historial del símbolo), limpieza y validación de los activos cambiados
+y unión del CSV del broker.
+
+Uso:
+    python daemon_service.py serve [--brokers Oanda Darwinex] [--interval 60] [--warm]
+    python daemon_service.py submit refresh [--brokers Oanda] [--symbols EURUSD] [--no-wait]
+    python daemon_service.py status | report | stop
+    (o bien python cli.py daemon ...)
+
+Los valores por defecto (host, puerto, intervalo, workers) salen de la etapa "daemon" del
+registro de configuración (Common/config.py). El servicio solo escucha en la máquina local: el
+socket no tiene autenticación, así que serve rechaza un --host que no sea de loopback."""
+
+#==============================# Importamos los módulos necesarios #==============================#
+
+# Solo librería estándar a nivel de módulo: los clientes (submit, status...) no cargan pandas
+import os
+import sys
+import json
+import time
+import queue
+import socket
+import argparse
+import ipaddress
+import itertools
+import threading
+import statistics
+import socketserver
+import multiprocessing as mp
+from collections import deque
+from datetime import datetime
+
+ETLQ_DIR = os.path.dirname(os.path.abspath(__file__))
+EXTRACTION_DIR = os.path.join(ETLQ_DIR, "Extract", "modules", "Extraction", "Extraction_Data_Metatrader5")
+PROCESSOR_DIR = os.path.join(ETLQ_DIR, "Proccess", "modules", "Processor")
+if ETLQ_DIR not in sys.path:
+    sys.path.insert(0, ETLQ_DIR)
+
+from Common.config import config, data_path
+from Common.run_context import current_run_id
+from Common.tracing import span, set_process_name, trace_mode, export_chrome_trace
+from Common.metrics import registry
+
+# Tipos de trabajo:
+# - "refresh": actualización incremental de los brokers (y limpieza/validación si process).
+# - "process": solo limpieza y validación de los brokers.
+# - "open" / "close": abre o cierra las sesiones persistentes de los brokers.
+JOB_KINDS = ("refresh", "process", "open", "close")
+
+# Qué mide la latencia de las actualizaciones del informe
+MEASURED = ("Duración de cada trabajo refresh sin la espera en cola: descarga incremental de MT5, "
+            "combinación con el CSV de cada símbolo (lectura y escritura completas), limpieza y "
+            "validación de los activos con barras nuevas y unión del CSV de cada broker. "
+            "warm_phases desglosa por broker la descarga (refresh) y la limpieza (process).")
+
+# Trabajos terminados que se conservan para status y report
+HISTORY_SIZE = 200
+
+
+def check_local_host(host: str) -> str:
+    """
+    Comprueba que host sea una dirección de la máquina local: el socket no tiene autenticación
+    y acepta submit y stop, así que no se expone en otras interfaces.
+
+    Raises:
+        ValueError: Si host (o alguna de sus direcciones) no es de loopback.
+    """
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, None)}
+    except socket.gaierror as e:
+        raise ValueError(f"No se pudo resolver el host del servicio {host}: {e}") from e
+    remote = sorted(a for a in addresses if not ipaddress.ip_address(a.split("%")[0]).is_loopback)
+    if remote:
+        raise ValueError(f"El servicio solo escucha en la máquina local; {host} resuelve a {', '.join(remote)}.")
+    return host
+
+#==============================#       Tareas del pool de cómputo     #==============================#
+
+def _warm_up_process_worker(_) -> int:
+    """Importa los módulos de limpieza y validación en un worker del pool de cómputo."""
+    import DataClear  # pylint: disable=import-outside-toplevel,unused-import
+    import pipeline_runner  # pylint: disable=import-outside-toplevel,unused-import
+    return os.getpid()
+
+
+def clean_and_validate(raw_dir: str, clean_dir: str, broker: str, clean_config: dict) -> dict:
+    """
+    Limpieza incremental de un broker (DataClear.update_broker): solo se limpian y validan los
+    activos cuyo CSV cambió en la actualización; falla si alguno no es válido.
+    """
+    from DataClear import update_broker  # pylint: disable=import-outside-toplevel
+    from pipeline_runner import validate_clean_file  # pylint: disable=import-outside-toplevel
+    begin = time.perf_counter()
+    result = update_broker((raw_dir, clean_dir, broker, clean_config))
+    if result["cleaned"] is None:
+        # Con bar_store se limpió el broker completo
+        validate_clean_file(result["output_file"], broker)
+    for part_file in result["parts"].values():
+        validate_clean_file(part_file, broker)
+    return {"clean_file": result["output_file"], "cleaned": len(result["cleaned"] or ()), "reused": result["reused"],
+            "process_seconds": round(time.perf_counter() - begin, 3)}
+
+#==============================#              Servicio              #==============================#
+
+def _percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[int(round(fraction * (len(ordered) - 1)))]
+
+
+def _summary(values: list) -> dict:
+    if not values:
+        return {"jobs": 0, "median_seconds": None, "p95_seconds": None, "max_seconds": None}
+    return {
+        "jobs": len(values),
+        "median_seconds": round(statistics.median(values), 3),
+        "p95_seconds": round(_percentile(values, 0.95), 3),
+        "max_seconds": round(max(values), 3),
+    }
+
+
+class Job:
+    """Trabajo de la cola del servicio."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, kind: str, params: dict, source: str = "client"):
+        self.id = next(self._ids)
+        self.kind = kind
+        self.params = params
+        self.source = source
+        self.status = "queued"
+        self.queued = time.time()
+        self.start = None
+        self.end = None
+        self.result = None
+        self.error = None
+        # True si el trabajo tuvo que abrir alguna sesión de broker (arranque en frío)
+        self.cold = False
+        self.session_seconds = 0.0
+        self.done = threading.Event()
+
+    @property
+    def seconds(self) -> float:
+        return self.end - self.start if self.start is not None and self.end is not None else None
+
+    def as_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "source": self.source,
+            "params": self.params,
+            "status": self.status,
+            "queued": datetime.fromtimestamp(self.queued).isoformat(timespec="seconds"),
+            "queue_seconds": round(self.start - self.queued, 3) if self.start is not None else None,
+            "seconds": round(self.seconds, 3) if self.seconds is not None else None,
+            "start": "cold" if self.cold else "warm",
+            "session_seconds": round(self.session_seconds, 3),
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class HermesDaemon:
+    """
+    Servicio residente con sesiones persistentes por broker, pool de cómputo persistente,
+    cola de trabajos y actualización incremental programada (ver la descripción del módulo).
+
+    Args:
+        credentials_csv (str): CSV de credenciales (columna Tipo y una por broker).
+        raw_dir (str): Datos descargados (una carpeta por broker).
+        clean_dir (str): CSV limpios por broker.
+        logs_dir (str): Logs de la descarga e informe del servicio.
+        brokers (list): Brokers del servicio. Por defecto, los del CSV de credenciales.
+        workers_per_broker (int): Procesos de cada sesión. Por defecto, los núcleos.
+        cpu (int): Procesos del pool de limpieza y validación. Por defecto, núcleos - 1.
+        process (bool): Limpiar y validar cada broker tras actualizarlo.
+        interval_minutes (float): Periodo de la actualización programada (None o 0 = ninguna).
+        policy (str): Política de extracción de los workers ("full" o "resample").
+    """
+
+    def __init__(self, credentials_csv: str = None, raw_dir: str = None, clean_dir: str = None,
+                 logs_dir: str = None, brokers: list = None, workers_per_broker: int = None,
+                 cpu: int = None, process: bool = None, interval_minutes: float = None,
+                 policy: str = "full"):
+        settings = config().stage("daemon")
+        self.credentials_csv = credentials_csv or data_path("credentials")
+        self.raw_dir = raw_dir or data_path("external")
+        self.clean_dir = clean_dir or data_path("processed")
+        self.logs_dir = logs_dir or data_path("daemon_logs")
+        self.brokers = brokers
+        self.workers_per_broker = workers_per_broker or settings["workers_per_broker"]
+        self.cpu = cpu or settings["cpu"] or max(mp.cpu_count() - 1, 1)
+        self.process = settings["process"] if process is None else process
+        self.interval_minutes = settings["interval_minutes"] if interval_minutes is None else interval_minutes
+        self.policy = policy
+
+        self.sessions = {}
+        self.startup = {}
+        self.downloader = None
+        self.executor = None
+        self.clean_config = None
+        self.server = None
+        self.started = time.time()
+        self.current = None
+        self.history = deque(maxlen=HISTORY_SIZE)
+        self._queue = queue.Queue()
+        self._stopping = threading.Event()
+        self._schedule_pending = threading.Event()
+        self._threads = []
+
+    # ---------------------------------------------------------------- arranque y parada
+
+    def start(self, warm: bool = False):
+        """
+        Importa las dependencias, crea el descargador y el pool de cómputo (con sus workers ya
+        importados) y arranca la cola y el programador. Con warm=True se abren además las
+        sesiones de todos los brokers antes de aceptar trabajos.
+        """
+        # pylint: disable=import-outside-toplevel
+        begin = time.perf_counter()
+        for path in (EXTRACTION_DIR, PROCESSOR_DIR):
+            if path not in sys.path:
+                sys.path.append(path)
+        import pandas as pd
+        from concurrent.futures import ProcessPoolExecutor
+        from modules.historical_data_downloader import HistoricalDataDownloader
+        from DataClear import DataCleaner
+        self.startup["imports_seconds"] = round(time.perf_counter() - begin, 3)
+
+        os.makedirs(self.logs_dir, exist_ok=True)
+        self.downloader = HistoricalDataDownloader(
+            authentication_df=pd.read_csv(self.credentials_csv),
+            logs_path=self.logs_dir,
+            data_storage=self.raw_dir,
+            start_timestamp=datetime.strptime(config().stage("extract")["start_date"], "%Y-%m-%d"),
+            extraction_policy=self.policy,
+        )
+        self.brokers = self.brokers or [c for c in self.downloader.authentication_df.columns if c != "Tipo"]
+
+        if self.process:
+            begin = time.perf_counter()
+            self.clean_config = DataCleaner(self.raw_dir, self.clean_dir).config
+            self.executor = ProcessPoolExecutor(max_workers=self.cpu, mp_context=mp.get_context("spawn"))
+            list(self.executor.map(_warm_up_process_worker, range(self.cpu)))
+            self.startup["process_pool_seconds"] = round(time.perf_counter() - begin, 3)
+
+        self._start_loops()
+        if warm:
+            self.submit("open", {}, source="start").done.wait()
+
+    def _start_loops(self):
+        """Arranca el hilo de la cola de trabajos y, con interval_minutes, el del programador."""
+        self._threads = [threading.Thread(target=self._job_loop, name="daemon-jobs", daemon=True)]
+        if self.interval_minutes:
+            self._threads.append(threading.Thread(target=self._schedule_loop, name="daemon-schedule", daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def shutdown(self) -> str:
+        """Termina el trabajo en curso, cierra sesiones y pools y guarda el informe."""
+        self._stopping.set()
+        self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        for session in self.sessions.values():
+            session.close()
+        self.sessions.clear()
+        if self.executor is not None:
+            self.executor.shutdown()
+        report_path = os.path.join(self.logs_dir, f"daemon_report_{current_run_id()}.json")
+        os.makedirs(self.logs_dir, exist_ok=True)
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(self.latency_report(), f, indent=2, ensure_ascii=False, default=str)
+        registry().flush()
+        if trace_mode() != "off":
+            export_chrome_trace(os.path.join(self.logs_dir, "trace.json"))
+        return report_path
+
+    # ---------------------------------------------------------------- trabajos
+
+    def submit(self, kind: str, params: dict = None, source: str = "client") -> Job:
+        """Encola un trabajo (ver JOB_KINDS) y lo devuelve; job.done se activa al terminar."""
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Trabajo desconocido: {kind}. Disponibles: {', '.join(JOB_KINDS)}")
+        job = Job(kind, params or {}, source)
+        self._queue.put(job)
+        return job
+
+    def _schedule_loop(self):
+        while not self._stopping.wait(self.interval_minutes * 60):
+            # No se acumulan actualizaciones programadas si la anterior sigue en cola
+            if not self._schedule_pending.is_set():
+                self._schedule_pending.set()
+                self.submit("refresh", {}, source="schedule")
+
+    def _job_loop(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            if job.source == "schedule":
+                self._schedule_pending.clear()
+            self.current = job
+            job.status = "running"
+            job.start = time.time()
+            try:
+                with span(f"{job.kind}:{job.id}", cat="job", source=job.source):
+                    job.result = self._run_job(job)
+                failed = any("error" in result or result.get("errors") for result in job.result.values())
+                job.status = "failed" if failed else "done"
+            except Exception as e:  # pylint: disable=broad-except
+                job.status = "failed"
+                job.error = f"{type(e).__name__}: {e}"
+            finally:
+                job.end = time.time()
+                self.current = None
+                self.history.append(job)
+                metrics = registry()
+                metrics.histogram("daemon_job_seconds", "Duración de los trabajos del servicio",
+                                  job=job.kind, start="cold" if job.cold else "warm").observe(job.seconds)
+                metrics.counter("daemon_jobs_total", "Trabajos del servicio", job=job.kind, status=job.status).inc()
+                metrics.flush()
+                job.done.set()
+
+    def _session(self, job: Job, broker: str):
+        """Sesión persistente del broker; si no existe se abre (el trabajo cuenta como frío)."""
+        # pylint: disable=import-outside-toplevel
+        from modules.broker_session import BrokerSession
+        session = self.sessions.get(broker)
+        if session is None:
+            session = self.sessions[broker] = BrokerSession(self.downloader, broker, self.workers_per_broker)
+            job.cold = True
+            job.session_seconds += session.startup_seconds
+        return session
+
+    def _drop_session(self, broker: str):
+        """Descarta una sesión rota (worker caído, terminal desconectado); se reabre al usarla."""
+        session = self.sessions.pop(broker, None)
+        if session is not None:
+            session.pool.terminate()
+
+    def _run_job(self, job: Job) -> dict:
+        brokers = job.params.get("brokers") or self.brokers
+        unknown = set(brokers) - set(self.brokers)
+        if unknown:
+            raise ValueError(f"Brokers fuera del servicio: {', '.join(sorted(unknown))}")
+        results = {broker: {} for broker in brokers}
+
+        if job.kind == "close":
+            for broker in brokers:
+                session = self.sessions.pop(broker, None)
+                if session is not None:
+                    session.close()
+                results[broker]["closed"] = session is not None
+            return results
+
+        process = job.kind == "process" or (job.kind == "refresh" and job.params.get("process", self.process))
+        if process and self.executor is None:
+            raise RuntimeError("El servicio se inició sin pool de limpieza (--no-process).")
+        futures = {}
+        for broker in brokers:
+            if job.kind in ("refresh", "open"):
+                try:
+                    session = self._session(job, broker)
+                    if job.kind == "refresh":
+                        begin = time.perf_counter()
+                        results[broker].update(session.refresh(job.params.get("symbols")))
+                        results[broker]["refresh_seconds"] = round(time.perf_counter() - begin, 3)
+                except Exception as e:  # pylint: disable=broad-except
+                    self._drop_session(broker)
+                    results[broker]["error"] = f"{type(e).__name__}: {e}"
+                    continue
+            if process:
+                # La limpieza del broker se solapa con la actualización del siguiente
+                futures[broker] = self.executor.submit(clean_and_validate, self.raw_dir, self.clean_dir,
+                                                       broker, self.clean_config)
+        for broker, future in futures.items():
+            try:
+                results[broker].update(future.result())
+            except Exception as e:  # pylint: disable=broad-except
+                results[broker]["error"] = f"{type(e).__name__}: {e}"
+        return results
+
+    # ---------------------------------------------------------------- estado
+
+    def status(self) -> dict:
+        return {
+            "run_id": current_run_id(),
+            "pid": os.getpid(),
+            "uptime_seconds": round(time.time() - self.started, 1),
+            "brokers": self.brokers,
+            "sessions": {broker: {"workers": s.workers, "refreshes": s.refreshes,
+                                  "symbols": len(s.symbols_metadata)} for broker, s in self.sessions.items()},
+            "queued": self._queue.qsize(),
+            "current": self.current.as_dict() if self.current else None,
+            "interval_minutes": self.interval_minutes,
+            "last_jobs": [job.as_dict() for job in list(self.history)[-5:]],
+        }
+
+    def latency_report(self) -> dict:
+        """
+        Latencia de las actualizaciones en frío (abrieron sesiones) frente a en caliente, el
+        arranque de cada sesión y del servicio, y los últimos trabajos.
+        """
+        refreshes = [job for job in self.history if job.kind == "refresh" and job.seconds is not None]
+        cold = _summary([job.seconds for job in refreshes if job.cold])
+        warm = _summary([job.seconds for job in refreshes if not job.cold])
+        # Fases de las actualizaciones en caliente, por broker
+        warm_results = [r for job in refreshes if not job.cold and job.result for r in job.result.values()]
+        phases = {
+            "refresh": _summary([r["refresh_seconds"] for r in warm_results if "refresh_seconds" in r]),
+            "process": _summary([r["process_seconds"] for r in warm_results if "process_seconds" in r]),
+        }
+        speedup = None
+        if cold["median_seconds"] and warm["median_seconds"]:
+            speedup = round(cold["median_seconds"] / warm["median_seconds"], 2)
+        return {
+            "run_id": current_run_id(),
+            "uptime_seconds": round(time.time() - self.started, 1),
+            "startup": self.startup,
+            "sessions": {broker: {"startup_seconds": round(s.startup_seconds, 3), "workers": s.workers,
+                                  "refreshes": s.refreshes} for broker, s in self.sessions.items()},
+            "measured": MEASURED,
+            "cold_refresh": cold,
+            "warm_refresh": warm,
+            "warm_phases": phases,
+            # Cuántas veces más tarda una actualización que abre sesiones que una en caliente
+            "speedup": speedup,
+            "jobs": [job.as_dict() for job in list(self.history)[-20:]],
+        }
+
+    # ---------------------------------------------------------------- socket
+
+    def handle_request(self, request: dict) -> dict:
+        """Atiende una petición del socket: submit, status, report, ping o stop."""
+        command = request.get("command")
+        if command == "submit":
+            try:
+                job = self.submit(request.get("job"), request.get("params"))
+            except ValueError as e:
+                return {"ok": False, "error": str(e)}
+            if request.get("wait", True):
+                job.done.wait(request.get("timeout"))
+            return {"ok": True, "job": job.as_dict()}
+        if command == "status":
+            return {"ok": True, "status": self.status()}
+        if command == "report":
+            return {"ok": True, "report": self.latency_report()}
+        if command == "ping":
+            return {"ok": True, "pid": os.getpid()}
+        if command == "stop":
+            # serve_forever se detiene desde otro hilo para poder responder antes
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return {"ok": True}
+        return {"ok": False, "error": f"Comando desconocido: {command}"}
+
+    def serve(self, host: str = None, port: int = None):
+        """
+        Atiende peticiones hasta recibir stop o Ctrl+C y después detiene el servicio.
+
+        Raises:
+            ValueError: Si host no es una dirección local (ver check_local_host).
+        """
+        settings = config().stage("daemon")
+        host = check_local_host(host or settings["host"])
+        self.server = _Server((host, port or settings["port"]), _RequestHandler)
+        self.server.service = self
+        print(f"Servicio {current_run_id()} escuchando en {self.server.server_address[0]}:{self.server.server_address[1]}")
+        try:
+            self.server.serve_forever(poll_interval=0.5)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.server.server_close()
+            print(f"Informe de latencias: {self.shutdown()}")
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline().decode("utf-8"))
+            response = self.server.service.handle_request(request)
+        except ValueError:
+            response = {"ok": False, "error": "La petición no es JSON válido."}
+        self.wfile.write((json.dumps(response, ensure_ascii=False, default=str) + "\n").encode("utf-8"))
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+#==============================#              Cliente               #==============================#
+
+def send_request(request: dict, host: str = None, port: int = None, timeout: float = None) -> dict:
+    """Envía una petición JSON al servicio y devuelve su respuesta."""
+    settings = config().stage("daemon")
+    with socket.create_connection((host or settings["host"], port or settings["port"]), timeout=timeout) as sock:
+        sock.sendall((json.dumps(request) + "\n").encode("utf-8"))
+        with sock.makefile("r", encoding="utf-8") as reader:
+            line = reader.readline()
+    if not line:
+        raise ConnectionError("El servicio cerró la conexión sin responder.")
+    return json.loads(line)
+
+
+def format_job(job: dict) -> str:
+    lines = [f"Trabajo {job['id']} {job['kind']}: {job['status']} en {job['seconds'] or 0:.2f} s "
+             f"({'en frío, sesiones ' + format(job['session_seconds'], '.2f') + ' s' if job['start'] == 'cold' else 'en caliente'})"]
+    if job["error"]:
+        lines.append(f"  Error: {job['error']}")
+    for broker, result in (job["result"] or {}).items():
+        details = ", ".join(f"{key}={value}" for key, value in result.items() if key != "errors")
+        if result.get("errors"):
+            details += f", {len(result['errors'])} símbolos con error"
+        lines.append(f"  {broker}: {details or '-'}")
+    return "\n".join(lines)
+
+
+def format_latency_report(report: dict) -> str:
+    def seconds(value):
+        return "-" if value is None else f"{value:.2f} s"
+    lines = [f"Servicio {report['run_id']} ({report['uptime_seconds']:.0f} s activo)"]
+    if report["startup"]:
+        lines.append("Arranque: " + ", ".join(f"{k} {v:.2f} s" for k, v in report["startup"].items()))
+    for broker, session in report["sessions"].items():
+        lines.append(f"  Sesión {broker:<12} arranque {seconds(session['startup_seconds'])}, "
+                     f"{session['workers']} workers, {session['refreshes']} actualizaciones")
+    for label, key in (("En frío", "cold_refresh"), ("En caliente", "warm_refresh")):
+        summary = report[key]
+        lines.append(f"{label:<12} {summary['jobs']:>3} trabajos  mediana {seconds(summary['median_seconds'])}  "
+                     f"p95 {seconds(summary['p95_seconds'])}")
+    phases = report.get("warm_phases", {})
+    if phases:
+        lines.append("Fases en caliente (por broker): " + ", ".join(
+            f"{name} mediana {seconds(summary['median_seconds'])}" for name, summary in phases.items()))
+    lines.append(f"Medido: {report['measured']}")
+    if report["speedup"]:
+        lines.append(f"Una actualización en caliente es {report['speedup']:.1f}x más rápida que en frío.")
+    return "\n".join(lines)
+
+#==============================#      Fuction main [Interface]       #==============================#
+
+def main(argv: list = None) -> int:
+    settings = config().stage("daemon")
+    parser = argparse.ArgumentParser(description="Servicio residente del pipeline ETLQ.")
+    parser.add_argument("--host", default=settings["host"],
+                        help="Dirección local del servicio (solo loopback: 127.0.0.1, ::1, localhost).")
+    parser.add_argument("--port", type=int, default=settings["port"], help="Puerto del servicio.")
+    commands = parser.add_subparsers(dest="command", required=True, metavar="comando")
+
+    serve = commands.add_parser("serve", help="Arranca el servicio en primer plano.")
+    serve.add_argument("--brokers", nargs="*", help="Brokers del servicio. Por defecto, los de --credentials.")
+    serve.add_argument("--credentials", help="CSV de credenciales. Por defecto, el del registro.")
+    serve.add_argument("--raw-dir", help="Datos descargados. Por defecto, external.")
+    serve.add_argument("--clean-dir", help="CSV limpios. Por defecto, processed.")
+    serve.add_argument("--logs-dir", help="Logs e informe del servicio. Por defecto, logs/daemon.")
+    serve.add_argument("--workers", type=int, help="Workers de cada sesión de broker.")
+    serve.add_argument("--cpu", type=int, help="Workers del pool de limpieza y validación.")
+    serve.add_argument("--interval", type=float, help="Minutos entre actualizaciones programadas (0 = ninguna).")
+    serve.add_argument("--policy", default="full", choices=("full", "resample"), help="Política de extracción.")
+    serve.add_argument("--no-process", action="store_true", help="Solo descargar; sin limpieza ni validación.")
+    serve.add_argument("--warm", action="store_true", help="Abrir las sesiones de todos los brokers al arrancar.")
+
+    submit = commands.add_parser("submit", help="Encola un trabajo y espera su resultado.")
+    submit.add_argument("job", choices=JOB_KINDS)
+    submit.add_argument("--brokers", nargs="*", help="Brokers del trabajo. Por defecto, todos los del servicio.")
+    submit.add_argument("--symbols", nargs="*", help="Símbolos a actualizar. Por defecto, todos.")
+    submit.add_argument("--no-process", action="store_true", help="No limpiar ni validar tras la actualización.")
+    submit.add_argument("--no-wait", action="store_true", help="Encolar sin esperar el resultado.")
+
+    for name, help_text in (("status", "Estado del servicio."), ("report", "Latencias en frío y en caliente."),
+                            ("stop", "Detiene el servicio."), ("ping", "Comprueba que el servicio responde.")):
+        commands.add_parser(name, help=help_text)
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        # Antes de abrir sesiones: el socket sin autenticación no se expone fuera de la máquina
+        try:
+            check_local_host(args.host)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return 2
+        mp.set_start_method("spawn", force=True)
+        set_process_name("daemon")
+        service = HermesDaemon(args.credentials, args.raw_dir, args.clean_dir, args.logs_dir, args.brokers,
+                               args.workers, args.cpu, False if args.no_process else None, args.interval,
+                               args.policy)
+        service.start(warm=args.warm)
+        service.serve(args.host, args.port)
+        return 0
+
+    request = {"command": args.command}
+    if args.command == "submit":
+        params = {key: value for key, value in (("brokers", args.brokers), ("symbols", args.symbols)) if value}
+        if args.no_process:
+            params["process"] = False
+        request.update(job=args.job, params=params, wait=not args.no_wait)
+    try:
+        # Un submit que espera puede durar lo que la actualización: sin timeout
+        response = send_request(request, args.host, args.port, timeout=None if args.command == "submit" else 30)
+    except OSError as e:
+        print(f"No se pudo contactar con el servicio en {args.host}:{args.port}: {e}")
+        return 2
+    if not response.get("ok"):
+        print(f"Error: {response.get('error')}")
+        return 1
+    if args.command == "submit":
+        print(format_job(response["job"]))
+        return 1 if response["job"]["status"] == "failed" else 0
+    if args.command == "report":
+        print(format_latency_report(response["report"]))
+    elif args.command == "status":
+        print(json.dumps(response["status"], indent=2, ensure_ascii=False))
+    else:
+        print("ok")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
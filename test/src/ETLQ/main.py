@@ -4,10 +4,15 @@
 
 #==============================# Importamos los módulos necesarios #==============================#
 
+import sys
+from datetime import timedelta
+
 from textual.app import App, ComposeResult
 from textual.screen import Screen
 from textual.containers import Container
-from textual.widgets import Header, Footer, Button, Static
+from textual.widgets import Header, Footer, Button, Static, DataTable
+
+from Common.pipeline_status import PipelineStatus
 
 class InstallScreen(Screen):
     CSS = """
@@ -28,6 +33,112 @@ class InstallScreen(Screen):
         yield Static("Instalación iniciada...\nPor favor, espere.", id="message")
         yield Footer()
 
+def _format_eta(seconds) -> str:
+    return "-" if seconds is None else str(timedelta(seconds=int(seconds)))
+
+
+def _format_number(value, decimals: int = 0) -> str:
+    return "-" if value is None else f"{value:,.{decimals}f}"
+
+
+class PipelineScreen(Screen):
+    """
+    Panel de operaciones en vivo del pipeline. Lee el registro de métricas del run
+    (Common/pipeline_status.py) cada refresh_interval segundos: avance por broker, símbolos/s
+    y barras/s, workers activos con su símbolo, CPU y RSS, errores y ETA por etapa.
+    Sustituye a las barras de tqdm de los procesos (ejecutar las etapas con HERMESDB_PROGRESS=off).
+    """
+
+    CSS = """
+    PipelineScreen {
+        background: #1c1c1c;
+    }
+    #summary {
+        background: #2e2e2e;
+        border: round $accent;
+        padding: 0 1;
+        color: white;
+    }
+    DataTable {
+        height: auto;
+        max-height: 16;
+        margin-top: 1;
+    }
+    """
+    BINDINGS = [("escape", "app.pop_screen", "Volver")]
+
+    # Máximo de filas de workers para acotar el coste de cada refresco
+    MAX_WORKER_ROWS = 32
+
+    def __init__(self, run_id: str = None, refresh_interval: float = 1.0):
+        super().__init__()
+        self.status = PipelineStatus(run_id)
+        self.refresh_interval = refresh_interval
+
+    def compose(self) -> ComposeResult:
+        yield Header(show_clock=True)
+        yield Static("Esperando métricas del pipeline...", id="summary")
+        yield DataTable(id="brokers")
+        yield DataTable(id="stages")
+        yield DataTable(id="workers")
+        yield Footer()
+
+    def on_mount(self) -> None:
+        self.query_one("#brokers", DataTable).add_columns(
+            "Broker", "Símbolos", "Avance", "Símbolos/s", "Workers", "Errores", "ETA")
+        self.query_one("#stages", DataTable).add_columns("Etapa", "Avance", "Unidad", "Tasa/s", "ETA")
+        self.query_one("#workers", DataTable).add_columns("PID", "Broker", "Símbolo", "CPU %", "RSS MiB")
+        self.update_status()
+        self.set_interval(self.refresh_interval, self.update_status)
+
+    def update_status(self) -> None:
+        state = self.status.refresh()
+        if state["run_id"] is None:
+            return
+        self.query_one("#summary", Static).update(
+            f"Run {state['run_id']}  |  {state['symbols_per_sec']:.2f} símbolos/s  |  "
+            f"{state['bars_per_sec']:,.0f} barras/s  |  workers activos: "
+            f"{sum(1 for w in state['workers'] if w['symbol'])}  |  errores: {state['errors']:.0f}"
+        )
+
+        brokers = self.query_one("#brokers", DataTable)
+        brokers.clear()
+        for row in state["brokers"]:
+            progress = f"{row['done'] / row['planned']:.0%}" if row["planned"] else "-"
+            brokers.add_row(
+                row["broker"], f"{row['done']:.0f}/{row['planned']:.0f}", progress,
+                f"{row['symbols_per_sec']:.2f}", f"{row['active']}/{row['workers']:.0f}",
+                f"{row['errors']:.0f}", _format_eta(row["eta"]),
+            )
+
+        stages = self.query_one("#stages", DataTable)
+        stages.clear()
+        for row in state["stages"]:
+            done = _format_number(row["done"])
+            if row["total"]:
+                done = f"{done}/{_format_number(row['total'])}"
+            stages.add_row(row["stage"], done, row["unit"], _format_number(row["rate"], 1), _format_eta(row["eta"]))
+
+        workers = self.query_one("#workers", DataTable)
+        workers.clear()
+        for row in state["workers"][:self.MAX_WORKER_ROWS]:
+            workers.add_row(
+                row["pid"], row["broker"], row["symbol"] or "-",
+                _format_number(row["cpu"], 1), _format_number(row["rss_mib"], 1),
+            )
+
+
+class PipelineApp(App):
+    """Abre directamente el panel de operaciones (python main.py --monitor [run_id])."""
+
+    def __init__(self, run_id: str = None):
+        super().__init__()
+        self.run_id = run_id
+
+    def on_mount(self) -> None:
+        self.push_screen(PipelineScreen(self.run_id))
+
+
 class InstallApp(App):
     CSS = """
     Screen {
@@ -45,7 +156,7 @@ class InstallApp(App):
         color: white;
         margin-bottom: 1;
     }
-    #install_button {
+    #install_button, #monitor_button {
         margin: 1;  /* Se reemplazó '1 auto' por '1' para evitar el error */
         width: 50%;
         align: center middle;
@@ -56,6 +167,7 @@ class InstallApp(App):
         yield Container(
             Static("Bienvenido al Instalador Profesional", id="title"),
             Button("INSTALAR", id="install_button"),
+            Button("MONITOR", id="monitor_button"),
             id="main-container"
         )
         yield Footer()
@@ -63,6 +175,13 @@ class InstallApp(App):
     def on_button_pressed(self, event: Button.Pressed) -> None:
         if event.button.id == "install_button":
             self.push_screen(InstallScreen())
+        elif event.button.id == "monitor_button":
+            self.push_screen(PipelineScreen())
 
 if __name__ == "__main__":
-    InstallApp().run()
+    if "--monitor" in sys.argv:
+        # Run concreto opcional tras --monitor; por defecto, el más reciente
+        args = sys.argv[sys.argv.index("--monitor") + 1:]
+        PipelineApp(args[0] if args else None).run()
+    else:
+        InstallApp().run()
@@ -0,0 +1,226 @@
+#==============================#            Description            #==============================#
+
+"""Ejecuta el pipeline ETLQ como un grafo de tareas por broker (Common/stage_dag.py) en lugar de
+lanzar cada etapa a mano sobre todo el dataset: extract (HistoricalDataDownloader) -> process
+(DataClear) -> validate (DataFrameValidator) -> load (transformación de CSVToPostgresAdapter y
+carga en SQLite), más un paso final que crea los índices. Cada broker avanza en cuanto su etapa
+anterior termina, de modo que se limpia Oanda mientras Darwinex aún se descarga.
+
+La concurrencia se limita por recursos: una descarga a la vez (conexión de MT5 del proceso
+principal), que ocupa --extract-workers de las --cpu unidades de cómputo mientras dura su
+pool, y un único escritor de la base de datos. Las
+barras cuya llave única (activo, broker, timestamp, timeframe) ya está en la base se
+actualizan con la nueva descarga; si la primera carga trae la llave repetida, finish falla
+salvo con --drop-duplicates, que conserva la última copia. Al terminar se guardan los
+reportes de validación y el informe del run con la ruta crítica.
+
+Uso:
+    python pipeline_runner.py [--raw-dir data/external] [--clean-dir data/processed] [--db data/hermesdb.sqlite] \\
+        [--report-dir data/logs/pipeline] [--credentials credenciales.csv] [--assets Table_Assets.csv \\
+        --brokers-table Table_Broker.csv] [--brokers Oanda Darwinex] [--cpu 4] [--extract-workers 2] [--drop-duplicates]
+
+Las carpetas, la base de datos y los parámetros omitidos se toman del registro de configuración
+(Common/config.py). Sin --credentials no se descarga nada y se procesan los brokers ya presentes
+en --raw-dir."""
+
+#==============================# Importamos los módulos necesarios #==============================#
+
+import os
+import sys
+import argparse
+import multiprocessing as mp
+from datetime import datetime
+
+import pandas as pd
+
+ETLQ_DIR = os.path.dirname(os.path.abspath(__file__))
+EXTRACTION_DIR = os.path.join(ETLQ_DIR, "Extract", "modules", "Extraction", "Extraction_Data_Metatrader5")
+PROCESSOR_DIR = os.path.join(ETLQ_DIR, "Proccess", "modules", "Processor")
+LOAD_DIR = os.path.join(ETLQ_DIR, "Load", "modules")
+sys.path.extend([ETLQ_DIR, PROCESSOR_DIR, LOAD_DIR])
+
+from Common.stage_dag import StageDAG, format_report, write_report
+from Common.run_context import current_run_id
+from Common.tracing import set_process_name, trace_mode, export_chrome_trace
+from Common.metrics import registry
+from Common.config import config, data_path
+from DataClear import DataCleaner, process_broker
+from Validation import DataFrameValidator
+from TL_table_Date_historic import CSVToPostgresAdapter
+from price_encoding import SymbolDigits
+from sqlite_loader import SQLiteLoader
+
+#==============================#        Tareas de cada etapa        #==============================#
+
+def validate_clean_file(clean_file: str, broker: str) -> dict:
+    """Valida el CSV limpio de un broker; si no pasa, falla la tarea y no se carga."""
+    detailed = DataFrameValidator.validate_file(clean_file, broker)
+    if not DataFrameValidator.is_valid(detailed):
+        failed = [key for key, value in detailed.items() if key.endswith("_valid") and not value]
+        raise ValueError(f"{os.path.basename(clean_file)} no pasó la validación: {', '.join(failed)}")
+    return detailed
+
+
+def load_clean_file(clean_file: str, db_path: str, raw_dir: str, assets_csv: str = None,
+                    brokers_csv: str = None) -> int:
+    """Transforma el CSV limpio de un broker por chunks y lo carga en SQLite."""
+    adapter = CSVToPostgresAdapter(
+        os.path.dirname(clean_file),
+        auto_adjust=True,
+        assets_df=pd.read_csv(assets_csv) if assets_csv else None,
+        brokers_df=pd.read_csv(brokers_csv) if brokers_csv else None,
+        symbol_digits=SymbolDigits(raw_dir),
+    )
+    loader = SQLiteLoader(db_path)
+    (_, key), = loader.unique_keys(SQLiteLoader.HISTORIC_TABLE)
+    duplicates = registry().counter("load_duplicates_dropped_total", "Filas con llave repetida en un chunk",
+                                    loader="sqlite")
+    try:
+        for df in adapter.transform_file(clean_file, map_ids=True):
+            # Repetidas dentro del chunk: gana la última, igual que en el upsert de la carga
+            rows = len(df)
+            df = df.drop_duplicates(subset=key, keep="last")
+            duplicates.inc(rows - len(df))
+            loader.load_batch(df)
+    finally:
+        loader.close()
+    # El proceso del pool termina sin atexit: se guarda el snapshot de métricas por tarea
+    registry().flush()
+    return loader.rows_loaded
+
+
+def finish_database(db_path: str, drop_duplicates: bool = False) -> int:
+    """
+    Crea los índices diferidos una vez cargados todos los brokers. Con drop_duplicates borra
+    antes las copias antiguas de las llaves únicas repetidas (ver SQLiteLoader.finish).
+    Devuelve las filas borradas.
+    """
+    loader = SQLiteLoader(db_path)
+    try:
+        removed = loader.finish(drop_duplicates)
+    finally:
+        loader.close()
+    registry().flush()
+    return removed
+
+
+def create_downloader(credentials_csv: str, raw_dir: str, logs_dir: str, start_date: datetime, end_date: datetime,
+                      workers: int = None):
+    """
+    HistoricalDataDownloader para la etapa extract (importa MetaTrader5 solo si se descarga).
+    workers: procesos del pool de descarga de cada broker (por defecto, los núcleos).
+    """
+    sys.path.append(EXTRACTION_DIR)
+    from modules.historical_data_downloader import HistoricalDataDownloader  # pylint: disable=import-outside-toplevel
+    return HistoricalDataDownloader(
+        authentication_df=pd.read_csv(credentials_csv),
+        logs_path=logs_dir,
+        data_storage=raw_dir,
+        start_timestamp=start_date,
+        end_timestamp=end_date,
+        workers=workers,
+    )
+
+#==============================#          Grafo de tareas           #==============================#
+
+def build_pipeline(brokers: list, raw_dir: str, clean_dir: str, db_path: str, downloader=None,
+                   assets_csv: str = None, brokers_csv: str = None, limits: dict = None,
+                   min_headroom: float = 0.1, drop_duplicates: bool = False) -> StageDAG:
+    """
+    Construye el grafo extract -> process -> validate -> load por broker y el paso final
+    finish (índices) que depende de todas las cargas. Sin downloader se omite extract.
+    """
+    dag = StageDAG(limits, min_headroom=min_headroom)
+    clean_config = DataCleaner(raw_dir, clean_dir).config
+    loads = []
+    for broker in brokers:
+        deps = []
+        if downloader is not None:
+            # La descarga arranca su propio pool de downloader.workers procesos: ocupa esas
+            # unidades de cpu (como máximo, la capacidad) mientras dura
+            extract_cpu = min(downloader.workers, dag.limits["cpu"])
+            deps = [dag.add("extract", broker, downloader.process_broker, broker,
+                            resources={"mt5": 1, "cpu": extract_cpu})]
+        clean = dag.add("process", broker, process_broker, (raw_dir, clean_dir, broker, clean_config),
+                        deps=deps, resources={"cpu": 1}, mode="process")
+        clean_file = os.path.join(clean_dir, f"{broker}.csv")
+        validate = dag.add("validate", broker, validate_clean_file, clean_file, broker,
+                           deps=[clean], resources={"cpu": 1}, mode="process")
+        loads.append(dag.add("load", broker, load_clean_file, clean_file, db_path, raw_dir, assets_csv, brokers_csv,
+                             deps=[validate], resources={"cpu": 1, "db": 1}, mode="process"))
+    dag.add("finish", "db", finish_database, db_path, drop_duplicates, deps=loads, resources={"db": 1},
+            mode="process")
+    return dag
+
+
+def write_validation_reports(dag: StageDAG, report_dir: str):
+    """Reportes general y detallado de validación (mismo formato que validate_csv_files_and_report)."""
+    detailed = [task.result for task in dag.tasks if task.stage == "validate" and task.result]
+    failed = [{"file": f"{task.key}.csv", "broker": task.key, "overall_valid": False}
+              for task in dag.tasks if task.stage == "validate" and task.status == "failed"]
+    overall = [{"file": row["file"], "broker": row["broker"], "overall_valid": True} for row in detailed] + failed
+    pd.DataFrame(overall).to_csv(os.path.join(report_dir, "overall_report.csv"), index=False)
+    pd.DataFrame(detailed).to_csv(os.path.join(report_dir, "detailed_report.csv"), index=False)
+
+#==============================#      Fuction main [Interface]       #==============================#
+
+def main(argv: list = None) -> int:
+    settings = config()
+    parser = argparse.ArgumentParser(description="Pipeline ETLQ por broker con etapas solapadas.")
+    parser.add_argument("--raw-dir", default=data_path("external"), help="Datos descargados (una carpeta por broker).")
+    parser.add_argument("--clean-dir", default=data_path("processed"), help="CSV limpios por broker.")
+    parser.add_argument("--db", default=data_path("database"), help="Base de datos SQLite de destino.")
+    parser.add_argument("--report-dir", default=data_path("pipeline_reports"),
+                        help="Reportes de validación e informe del run.")
+    parser.add_argument("--brokers", nargs="*", help="Brokers a procesar. Por defecto, los de --credentials o --raw-dir.")
+    parser.add_argument("--credentials", help="CSV de credenciales (columna Tipo y una por broker); activa la descarga.")
+    parser.add_argument("--logs-dir", help="Logs de la descarga. Por defecto, --report-dir.")
+    parser.add_argument("--start", default=settings.stage("extract")["start_date"],
+                        help="Inicio de la descarga (YYYY-MM-DD).")
+    parser.add_argument("--end", help="Fin de la descarga (YYYY-MM-DD). Por defecto, ahora.")
+    parser.add_argument("--assets", help="Table_Assets.csv (activo_id, simbolo) para mapear ids.")
+    parser.add_argument("--brokers-table", help="Table_Broker.csv (broker_id, nombre) para mapear ids.")
+    parser.add_argument("--cpu", type=int, default=settings.stage("pipeline")["cpu"],
+                        help="Tareas de cómputo simultáneas. Por defecto, núcleos - 1.")
+    parser.add_argument("--extract-workers", type=int, default=settings.stage("pipeline")["extract_workers"],
+                        help="Procesos de descarga de cada broker (ocupan unidades de --cpu). Por defecto, --cpu / 2.")
+    parser.add_argument("--min-headroom", type=float, default=settings.stage("pipeline")["min_headroom"],
+                        help="Fracción del presupuesto de memoria libre para arrancar otra tarea de cómputo.")
+    parser.add_argument("--drop-duplicates", action="store_true", default=settings.stage("pipeline")["drop_duplicates"],
+                        help="Borrar las barras con la llave única repetida antes de indexar (se conserva la última).")
+    args = parser.parse_args(argv)
+
+    mp.set_start_method("spawn", force=True)
+    set_process_name("pipeline")
+    run_id = current_run_id()
+    os.makedirs(args.report_dir, exist_ok=True)
+    os.makedirs(os.path.dirname(os.path.abspath(args.db)), exist_ok=True)
+
+    limits = {"cpu": args.cpu} if args.cpu else None
+    downloader = None
+    if args.credentials:
+        end_date = datetime.strptime(args.end, "%Y-%m-%d") if args.end else datetime.now()
+        cpu = args.cpu or StageDAG(limits).limits["cpu"]
+        downloader = create_downloader(args.credentials, args.raw_dir, args.logs_dir or args.report_dir,
+                                       datetime.strptime(args.start, "%Y-%m-%d"), end_date,
+                                       workers=args.extract_workers or max(cpu // 2, 1))
+        brokers = args.brokers or [c for c in downloader.authentication_df.columns if c != "Tipo"]
+    else:
+        brokers = args.brokers or sorted(d for d in os.listdir(args.raw_dir)
+                                         if os.path.isdir(os.path.join(args.raw_dir, d)))
+
+    dag = build_pipeline(brokers, args.raw_dir, args.clean_dir, args.db, downloader,
+                         args.assets, args.brokers_table, limits, args.min_headroom, args.drop_duplicates)
+    report = dag.run()
+
+    write_validation_reports(dag, args.report_dir)
+    write_report(report, os.path.join(args.report_dir, f"pipeline_report_{run_id}.json"))
+    registry().collect().export_text(os.path.join(args.report_dir, "metrics.prom"))
+    if trace_mode() != "off":
+        export_chrome_trace(os.path.join(args.report_dir, "trace.json"))
+    print(format_report(report))
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
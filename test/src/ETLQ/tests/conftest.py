@@ -0,0 +1,15 @@
+import os
+import sys
+import tempfile
+
+# Rutas de importación de las pruebas (los módulos de las etapas importan Common como paquete)
+ETLQ_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+EXTRACTION_DIR = os.path.join(ETLQ_DIR, "Extract", "modules", "Extraction", "Extraction_Data_Metatrader5")
+PROCESSOR_DIR = os.path.join(ETLQ_DIR, "Proccess", "modules", "Processor")
+for path in (ETLQ_DIR, EXTRACTION_DIR, PROCESSOR_DIR, os.path.join(ETLQ_DIR, "Load", "modules")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+# Las salidas con ruta por defecto del registro de configuración (p. ej. la caché de símbolos)
+# van a una carpeta temporal y no a test/data
+os.environ.setdefault("HERMESDB_DATA_ROOT", tempfile.mkdtemp(prefix="hermesdb_tests_"))
@@ -0,0 +1,78 @@
+"""BarQueryEngine: las consultas devuelven lo mismo que filtrar el CSV procesado, una consulta
+repetida sale de la caché de bloques, la caché LRU respeta su límite de memoria y un CSV
+reescrito no devuelve bloques antiguos."""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bar_query import BarQueryEngine, BlockCache
+
+
+def _write_clean(path, periods=40, shift=0.0):
+    frames = []
+    for asset in ("EURUSD.a", "GBPUSD"):
+        for timeframe, freq in (("H1", "h"), ("D1", "D")):
+            close = np.round(1.1 + shift + np.arange(periods) / 1000, 5)
+            frames.append(pd.DataFrame({
+                "time": pd.date_range("2024-01-01", periods=periods, freq=freq, tz="UTC").astype(str),
+                "open": close, "high": close, "low": close, "close": close,
+                "tick_volume": 10, "spread": 3, "real_volume": 0,
+                "timeframe": timeframe, "broker": "Oanda", "asset": asset,
+            }))
+    pd.concat(frames).to_csv(path, index=False)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    _write_clean(tmp_path / "Oanda.csv")
+    return BarQueryEngine(str(tmp_path), block_rows=8)
+
+
+def test_query_matches_a_filtered_read(engine, tmp_path):
+    full = pd.read_csv(tmp_path / "Oanda.csv")
+    full["time"] = pd.to_datetime(full["time"], utc=True)
+    expected = full[(full["asset"] == "EURUSD.a") & (full["timeframe"] == "H1")
+                    & (full["time"] >= "2024-01-01 05:00+00:00") & (full["time"] < "2024-01-01 20:00+00:00")]
+
+    # Forma canónica y timeframe en formato de la base de datos
+    df = engine.query("EURUSD", "Oanda", "1h", "2024-01-01 05:00", "2024-01-01 20:00", ["close"])
+    pd.testing.assert_frame_equal(df, expected[["time", "close"]].reset_index(drop=True))
+    assert engine.query("EURUSD", "Oanda", "H1", "2030-01-01")["time"].empty
+
+
+def test_repeated_query_is_served_from_the_block_cache(engine):
+    first = engine.query("GBPUSD", "Oanda", "D1", columns=["open", "close"])
+    misses = engine.cache.misses
+    assert misses == 5 and engine.cache.hits == 0
+
+    second = engine.query("GBPUSD", "Oanda", "D1", columns=["open", "close"])
+    pd.testing.assert_frame_equal(first, second)
+    assert engine.cache.misses == misses and engine.cache.hits == 5
+
+
+def test_rewritten_csv_is_not_served_from_stale_blocks(engine, tmp_path):
+    before = engine.query("GBPUSD", "Oanda", "H1", columns=["close"])
+    _write_clean(tmp_path / "Oanda.csv", shift=1.0)
+    os.utime(tmp_path / "Oanda.csv", ns=(1, 1))
+
+    after = engine.query("GBPUSD", "Oanda", "H1", columns=["close"])
+    np.testing.assert_allclose(after["close"], before["close"] + 1.0)
+
+
+def test_block_cache_evicts_least_recently_used():
+    block = pd.DataFrame({"close": np.zeros(1000)})
+    size = int(block.memory_usage(deep=True).sum())
+    cache = BlockCache(max_mb=2.5 * size / 1024**2)
+    cache.put("a", block)
+    cache.put("b", block)
+    assert cache.get("a") is block
+    cache.put("c", block)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is block and cache.get("c") is block
+    assert cache.current_bytes == 2 * size
+    cache.put("grande", pd.DataFrame({"close": np.zeros(4000)}))
+    assert cache.get("grande") is None
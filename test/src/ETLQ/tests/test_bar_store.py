@@ -0,0 +1,96 @@
+"""BarStore codificado: registros estrechos por serie (30 bytes por barra), lectura igual a
+la del almacén sin codificar y ensanchado de la serie cuando una barra nueva no cabe, con las
+series abiertas cerradas antes de reemplazar el archivo."""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bar_store import BarStore, HEADER_SIZE, NARROW_BAR_DTYPE
+
+
+def _bars(start: str, periods: int, price: float = 1.1, digits: int = 5) -> pd.DataFrame:
+    rng = np.random.default_rng(3)
+    close = np.round(price + np.cumsum(rng.normal(0, 10 ** -digits * 20, periods)), digits)
+    return pd.DataFrame({
+        "time": pd.date_range(start, periods=periods, freq="h", tz="UTC"),
+        "open": close, "high": np.round(close + 10 ** -digits * 7, digits),
+        "low": np.round(close - 10 ** -digits * 7, digits), "close": close,
+        "tick_volume": rng.integers(1, 1000, periods), "spread": rng.integers(0, 20, periods),
+        "real_volume": np.zeros(periods, dtype="int64"), "timeframe": "H1",
+    })
+
+
+def test_encoded_series_uses_narrow_records(tmp_path):
+    df = _bars("2024-01-01", 500)
+    plain = BarStore(str(tmp_path / "plain"))
+    encoded = BarStore(str(tmp_path / "encoded"), encoded=True)
+    plain.append_frame("Oanda", "EURUSD", df)
+    encoded.append_frame("Oanda", "EURUSD", df, digits=5)
+
+    series = encoded.open("Oanda", "EURUSD", "H1")
+    assert series.dtype == NARROW_BAR_DTYPE and series.dtype.itemsize == 30
+    size = os.path.getsize(series.path) - HEADER_SIZE
+    assert size * 2 == os.path.getsize(plain.path("Oanda", "EURUSD", "H1")) - HEADER_SIZE
+
+    expected = plain.open("Oanda", "EURUSD", "H1").to_frame()
+    pd.testing.assert_frame_equal(series.to_frame(), expected, check_dtype=False)
+    assert series.index_of(df["time"].iloc[100]) == 100
+    assert len(series.between(df["time"].iloc[10], df["time"].iloc[20])) == 10
+
+
+def test_append_widens_the_series_when_prices_do_not_fit(tmp_path):
+    store = BarStore(str(tmp_path), encoded=True)
+    first = _bars("2024-01-01", 50, price=100.0, digits=2)
+    store.append_frame("Oanda", "BTCUSD", first, digits=2)
+    # 3·10^7 con 2 decimales = 3·10^9 puntos: no cabe en int32
+    later = _bars("2024-03-01", 50, price=3e7, digits=2)
+    assert store.append_frame("Oanda", "BTCUSD", later, digits=2) == 50
+
+    series = store.open("Oanda", "BTCUSD", "H1")
+    assert series.dtype.fields["close"][0] == np.dtype("<i8")
+    assert len(series) == 100
+    np.testing.assert_allclose(series.prices("close"), np.concatenate([first["close"], later["close"]]))
+    assert series.to_frame()["time"].iloc[-1] == later["time"].iloc[-1]
+
+
+def test_append_skips_stored_bars(tmp_path):
+    store = BarStore(str(tmp_path), encoded=True)
+    df = _bars("2024-01-01", 100)
+    store.append_frame("Oanda", "EURUSD", df.iloc[:60], digits=5)
+    assert store.append_frame("Oanda", "EURUSD", df, digits=5) == 40
+    assert len(store.open("Oanda", "EURUSD", "H1")) == 100
+
+
+@pytest.mark.parametrize("encoded", [False, True])
+def test_open_missing_series(tmp_path, encoded):
+    with pytest.raises(FileNotFoundError):
+        BarStore(str(tmp_path), encoded=encoded).open("Oanda", "EURUSD", "H1")
+
+
+def test_widening_rewrite_closes_and_remaps_open_series(tmp_path, monkeypatch):
+    store = BarStore(str(tmp_path), encoded=True)
+    first = _bars("2024-01-01", 50, price=100.0, digits=2)
+    store.append_frame("Oanda", "BTCUSD", first, digits=2)
+    series = store.open("Oanda", "BTCUSD", "H1")
+    assert len(series) == 50
+
+    # En Windows os.replace falla sobre un archivo mapeado: el mapeo debe estar cerrado antes
+    replace = os.replace
+
+    def replace_unmapped(source, target):
+        assert series.records is None
+        replace(source, target)
+
+    monkeypatch.setattr(os, "replace", replace_unmapped)
+    store.append_frame("Oanda", "BTCUSD", _bars("2024-03-01", 50, price=3e7, digits=2), digits=2)
+
+    # La serie abierta se volvió a mapear con el registro ancho; las barras añadidas, con refresh()
+    assert series.dtype.fields["close"][0] == np.dtype("<i8")
+    np.testing.assert_allclose(series.prices("close"), first["close"])
+    series.refresh()
+    assert len(series) == 100
+    reopened = store.open("Oanda", "BTCUSD", "H1")
+    pd.testing.assert_frame_equal(reopened.to_frame(), series.to_frame())
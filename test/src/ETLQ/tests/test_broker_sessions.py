@@ -0,0 +1,30 @@
+"""Los límites de sesión de la política "resample" salen de la configuración de cada broker."""
+
+import pandas as pd
+import pytest
+
+from Common.config import Config, DEFAULT_BROKERS
+from modules.resampler import DEFAULT_SESSION, bucket_starts, session_for
+
+
+def test_every_default_broker_has_a_session():
+    sessions = Config().stage("extract")["sessions"]
+    assert set(sessions) == set(DEFAULT_BROKERS)
+    for broker in DEFAULT_BROKERS:
+        assert session_for(broker, sessions) == DEFAULT_SESSION
+
+
+def test_config_overrides_the_broker_session():
+    config = Config(overrides={"stages": {"extract": {"sessions": {"Oanda": {"week_start": "MON"}}}}})
+    session = session_for("Oanda", config.stage("extract")["sessions"])
+    assert session == {"day_offset_hours": 0, "week_start": "MON"}
+
+    # Miércoles 2026-06-03: la semana empieza el lunes 1 y no el domingo 31
+    seconds = pd.Series([pd.Timestamp("2026-06-03 10:00")]).astype("datetime64[s]").to_numpy().view("int64")
+    start = pd.Timestamp(int(bucket_starts(seconds, "W1", session)[0]), unit="s")
+    assert start == pd.Timestamp("2026-06-01")
+
+
+def test_unknown_week_start_is_rejected():
+    with pytest.raises(ValueError):
+        session_for("Oanda", {"Oanda": {"week_start": "LUN"}})
@@ -0,0 +1,64 @@
+"""Registro de configuración y CLI: las sobrescrituras se combinan con los valores por defecto
+(por parámetro de etapa, no por etapa completa), el archivo se toma de HERMESDB_CONFIG o de
+<data_root>/hermesdb.json y los subcomandos ligeros de la CLI no importan dependencias pesadas."""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import cli
+from Common.config import CONFIG_ENV, CONFIG_FILE_NAME, DATA_ROOT_ENV, DEFAULT_STAGES, Config
+
+
+def test_overrides_are_merged_with_the_defaults(tmp_path):
+    settings = Config(str(tmp_path), {
+        "paths": {"processed": "clean"},
+        "brokers": ["Oanda"],
+        "stages": {"process": {"timezone_offsets": {"Oanda": 3}}, "custom": {"enabled": True}},
+    })
+    assert settings.path("processed", "Oanda.csv") == os.path.join(str(tmp_path), "clean", "Oanda.csv")
+    assert settings.path("raw") == os.path.join(str(tmp_path), "raw")
+    assert settings.brokers == ["Oanda"]
+    process = settings.stage("process")
+    assert process["timezone_offsets"] == {"Oanda": 3}
+    assert process["columns_to_clean"] == DEFAULT_STAGES["process"]["columns_to_clean"]
+    assert settings.stage("custom") == {"enabled": True}
+    # stage() devuelve una copia
+    process["columns_to_clean"].append("spread")
+    assert settings.stage("process")["columns_to_clean"] == DEFAULT_STAGES["process"]["columns_to_clean"]
+    with pytest.raises(KeyError):
+        settings.path("desconocida")
+
+
+def test_load_reads_the_override_file(tmp_path, monkeypatch):
+    monkeypatch.setenv(DATA_ROOT_ENV, str(tmp_path))
+    monkeypatch.delenv(CONFIG_ENV, raising=False)
+    assert Config.load().stages == DEFAULT_STAGES
+
+    (tmp_path / CONFIG_FILE_NAME).write_text(json.dumps({"brokers": ["Darwinex"]}), encoding="utf-8")
+    assert Config.load().brokers == ["Darwinex"]
+
+    other = tmp_path / "otro.json"
+    other.write_text(json.dumps({"stages": {"daemon": {"port": 9000}}}), encoding="utf-8")
+    monkeypatch.setenv(CONFIG_ENV, str(other))
+    loaded = Config.load()
+    assert loaded.data_root == str(tmp_path)
+    assert loaded.stage("daemon")["port"] == 9000 and loaded.stage("daemon")["host"] == "127.0.0.1"
+
+
+def test_light_commands_do_not_import_heavy_modules(tmp_path):
+    (tmp_path / CONFIG_FILE_NAME).write_text(json.dumps({"paths": {"raw": "crudos"}}), encoding="utf-8")
+    probe = (f"import sys; sys.path.insert(0, {cli.ETLQ_DIR!r}); import cli\n"
+             "cli.main(['config', '--path', 'raw'])\n"
+             "try:\n    cli.main(['--help'])\nexcept SystemExit:\n    pass\n"
+             f"print('heavy:' + ','.join(m for m in {cli.HEAVY_MODULES!r} if m in sys.modules))")
+    env = {key: value for key, value in os.environ.items() if key != CONFIG_ENV}
+    env[DATA_ROOT_ENV] = str(tmp_path)
+    output = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, env=env,
+                            check=True).stdout.splitlines()
+
+    assert output[0] == os.path.join(str(tmp_path), "crudos")
+    assert output[-1] == "heavy:"
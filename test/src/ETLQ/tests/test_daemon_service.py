@@ -0,0 +1,152 @@
+"""Modo servicio: el socket solo se abre en loopback, una actualización en caliente reutiliza
+la sesión del broker, la cola ejecuta los trabajos de uno en uno, el programador no acumula
+actualizaciones y DataClear.update_broker solo vuelve a limpiar los activos que cambiaron."""
+
+import sys
+import time
+import types
+import threading
+
+import pandas as pd
+import pytest
+
+import daemon_service
+from Common.config import config
+from DataClear import update_broker
+
+
+class FakeSession:
+    """BrokerSession sin MetaTrader5: cuenta aperturas y actualizaciones."""
+
+    opened = []
+    gate = None
+
+    def __init__(self, downloader, broker, workers=None):
+        self.broker = broker
+        self.workers = workers or 1
+        self.refreshes = 0
+        self.symbols_metadata = []
+        self.startup_seconds = 0.01
+        self.closed = False
+        FakeSession.opened.append(broker)
+
+    def refresh(self, symbols=None):
+        if FakeSession.gate is not None:
+            FakeSession.gate.wait(5)
+        self.refreshes += 1
+        return {"broker": self.broker, "symbols": 1, "downloaded": 1, "changed": 1, "errors": []}
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def service(monkeypatch, tmp_path):
+    module = types.ModuleType("modules.broker_session")
+    module.BrokerSession = FakeSession
+    monkeypatch.setitem(sys.modules, "modules.broker_session", module)
+    monkeypatch.setattr(FakeSession, "opened", [])
+    monkeypatch.setattr(FakeSession, "gate", None)
+
+    def build(interval_minutes=0):
+        daemon = daemon_service.HermesDaemon(logs_dir=str(tmp_path / "logs"), brokers=["Oanda", "Darwinex"],
+                                             process=False, interval_minutes=interval_minutes)
+        daemon.downloader = object()
+        daemon._start_loops()
+        return daemon
+    return build
+
+
+@pytest.mark.parametrize("host", ["127.0.0.1", "localhost", "::1"])
+def test_loopback_hosts_are_accepted(host):
+    assert daemon_service.check_local_host(host) == host
+
+
+def test_serve_rejects_non_loopback_host(monkeypatch):
+    with pytest.raises(ValueError):
+        daemon_service.check_local_host("0.0.0.0")
+    # El servicio no llega a crearse ni a abrir sesiones
+    monkeypatch.setattr(daemon_service, "HermesDaemon", None)
+    assert daemon_service.main(["--host", "0.0.0.0", "serve"]) == 2
+
+
+def test_warm_refresh_reuses_the_broker_session(service):
+    daemon = service()
+    cold = daemon.submit("refresh")
+    assert cold.done.wait(5)
+    warm = daemon.submit("refresh", {"brokers": ["Oanda"]})
+    assert warm.done.wait(5)
+
+    assert FakeSession.opened == ["Oanda", "Darwinex"]
+    assert cold.cold and cold.status == "done"
+    assert not warm.cold and warm.status == "done"
+    assert daemon.sessions["Oanda"].refreshes == 2
+    report = daemon.latency_report()
+    assert report["cold_refresh"]["jobs"] == 1 and report["warm_refresh"]["jobs"] == 1
+
+    sessions = list(daemon.sessions.values())
+    daemon.shutdown()
+    assert all(session.closed for session in sessions)
+
+
+def test_jobs_run_one_at_a_time_in_order(service):
+    daemon = service()
+    FakeSession.gate = threading.Event()
+    first = daemon.submit("refresh")
+    second = daemon.submit("close", {"brokers": ["Oanda"]})
+    unknown = daemon.submit("refresh", {"brokers": ["Pepperstone"]})
+    time.sleep(0.2)
+    assert first.status == "running" and second.status == "queued"
+
+    FakeSession.gate.set()
+    assert unknown.done.wait(5)
+    assert first.end <= second.start and second.end <= unknown.start
+    assert second.result == {"Oanda": {"closed": True}}
+    assert unknown.status == "failed" and "Pepperstone" in unknown.error
+    assert daemon.handle_request({"command": "submit", "job": "restart"})["ok"] is False
+    daemon.shutdown()
+
+
+def test_scheduler_does_not_pile_up_refreshes(service):
+    FakeSession.gate = threading.Event()
+    # 0.001 minutos: una actualización programada cada 60 ms
+    daemon = service(interval_minutes=0.001)
+    time.sleep(0.5)
+    # La primera sigue en curso; como mucho una más espera en cola
+    assert daemon._queue.qsize() <= 1
+
+    FakeSession.gate.set()
+    daemon.shutdown()
+    scheduled = [job for job in daemon.history if job.source == "schedule"]
+    assert 1 <= len(scheduled) <= 3
+    assert all(job.kind == "refresh" and job.status == "done" for job in scheduled)
+
+
+def _write_raw(path, start, periods):
+    close = [1.1 + i / 1000 for i in range(periods)]
+    pd.DataFrame({
+        "time": pd.date_range(start, periods=periods, freq="h").strftime("%Y-%m-%d %H:%M:%S"),
+        "open": close, "high": close, "low": close, "close": close, "tick_volume": 10,
+        "spread": 1, "real_volume": 0, "timeframe": "H1",
+    }).to_csv(path, index=False)
+
+
+def test_update_broker_recleans_only_changed_assets(tmp_path):
+    raw_dir, clean_dir = tmp_path / "raw", tmp_path / "clean"
+    (raw_dir / "Oanda").mkdir(parents=True)
+    _write_raw(raw_dir / "Oanda" / "EURUSD.csv", "2024-01-01", 10)
+    _write_raw(raw_dir / "Oanda" / "GBPUSD.csv", "2024-01-01", 10)
+    args = (str(raw_dir), str(clean_dir), "Oanda", config().stage("process"))
+
+    first = update_broker(args)
+    assert first["cleaned"] == ["EURUSD.csv", "GBPUSD.csv"] and first["reused"] == 0
+    unchanged = update_broker(args)
+    assert unchanged["cleaned"] == [] and unchanged["reused"] == 2 and unchanged["parts"] == {}
+
+    _write_raw(raw_dir / "Oanda" / "GBPUSD.csv", "2024-01-01", 15)
+    changed = update_broker(args)
+    assert changed["cleaned"] == ["GBPUSD.csv"] and changed["reused"] == 1
+    assert list(changed["parts"]) == ["GBPUSD.csv"]
+
+    merged = pd.read_csv(changed["output_file"])
+    assert merged.groupby("asset").size().to_dict() == {"EURUSD": 10, "GBPUSD": 15}
@@ -0,0 +1,66 @@
+"""HashPartitionDeduplicator: el plan de borrado coincide con pandas.duplicated sobre la llave
+compuesta con cualquier número de particiones, conserva el menor registro_id de cada grupo y
+reconoce la misma llave escrita con otro tipo o formato en otro chunk."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from duplicate_detector import HashPartitionDeduplicator, KEY_COLUMNS, delete_plan_sql, delete_ranges
+
+
+@pytest.fixture
+def historic_csv(tmp_path):
+    rng = np.random.default_rng(7)
+    n = 2000
+    df = pd.DataFrame({
+        "registro_id": np.arange(1, n + 1),
+        "activo_id": rng.integers(1, 4, n),
+        "broker_id": rng.integers(1, 3, n),
+        "timestamp": pd.to_datetime(rng.integers(0, 300, n), unit="h", utc=True).astype(str),
+        "timeframe": rng.choice(["1h", "4h"], n),
+        "bid_close": rng.random(n),
+    })
+    path = tmp_path / "Table_Datos_historicos.csv"
+    df.to_csv(path, index=False)
+    return path, df
+
+
+@pytest.mark.parametrize("n_partitions", [1, 8])
+def test_plan_matches_pandas_duplicated(historic_csv, tmp_path, n_partitions):
+    path, df = historic_csv
+    deduplicator = HashPartitionDeduplicator(str(path), n_partitions=n_partitions, work_dir=str(tmp_path),
+                                             chunksize=300)
+    plan = deduplicator.run()
+
+    expected = df.loc[df.duplicated(KEY_COLUMNS, keep="first"), "registro_id"]
+    assert deduplicator.rows_scanned == len(df)
+    assert len(plan) == len(expected) > 0
+    assert plan["registro_id"].tolist() == expected.tolist()
+    # Se conserva la primera fila (menor registro_id) de cada llave
+    kept = df.groupby(KEY_COLUMNS)["registro_id"].transform("min")
+    assert plan["duplicado_de"].tolist() == kept[expected.index].tolist()
+    assert not list(tmp_path.glob("hermesdb_dedup_*"))
+
+
+def test_same_key_with_other_types_is_a_duplicate(tmp_path):
+    path = tmp_path / "datos.csv"
+    path.write_text(
+        "registro_id,activo_id,broker_id,timestamp,timeframe\n"
+        "1,3,2,2024-01-01 00:00:00+00:00,1h\n"
+        "2,3.0,2,2024-01-01T00:00:00Z,1h\n"
+        "3,3,2,2024-01-01 01:00:00+00:00,1h\n",
+        encoding="utf-8",
+    )
+    # Un chunk por fila: cada chunk se lee con su propio tipo y formato
+    plan = HashPartitionDeduplicator(str(path), n_partitions=2, chunksize=1).run()
+    assert plan.to_dict(orient="records") == [{"registro_id": 2, "duplicado_de": 1}]
+
+
+def test_delete_plan_groups_consecutive_ids():
+    plan = pd.DataFrame({"registro_id": [9, 4, 5, 6, 12, 13]})
+    assert delete_ranges(plan["registro_id"]) == [(4, 6), (9, 9), (12, 13)]
+    assert delete_plan_sql(plan, batch_size=2) == [
+        "DELETE FROM Datos_Historicos WHERE registro_id BETWEEN 4 AND 6 OR registro_id = 9;",
+        "DELETE FROM Datos_Historicos WHERE registro_id BETWEEN 12 AND 13;",
+    ]
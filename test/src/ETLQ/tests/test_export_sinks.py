@@ -0,0 +1,80 @@
+"""export_multi reparte una única transformación entre varios ExportSink y, si la exportación
+falla, los sinks se cierran sin dar por buena la salida incompleta."""
+
+import pandas as pd
+import pytest
+
+from export_sinks import CSVSink, ExportSink, LoaderSink, PreviewSink, ValidationStatsSink
+from TL_table_Date_historic import CSVToPostgresAdapter
+
+
+class RecordingLoader:
+    def __init__(self):
+        self.batches = []
+        self.finished = False
+
+    def load_batch(self, df):
+        self.batches.append(df.copy())
+
+    def finish(self):
+        self.finished = True
+
+
+class FailingSink(ExportSink):
+    def write(self, df):
+        raise RuntimeError("destino caído")
+
+
+@pytest.fixture
+def adapter(tmp_path):
+    folder = tmp_path / "clean"
+    folder.mkdir()
+    pd.DataFrame({
+        "time": pd.date_range("2024-01-01", periods=7, freq="h", tz="UTC").astype(str),
+        "open": 1.1, "high": 1.2, "low": 1.0, "close": 1.15,
+        "tick_volume": 10, "spread": 3, "real_volume": 0,
+        "timeframe": "H1", "broker": "Oanda", "asset": "EURUSD.a",
+    }).to_csv(folder / "Oanda.csv", index=False)
+    return CSVToPostgresAdapter(
+        str(folder), chunksize=3,
+        assets_df=pd.DataFrame({"activo_id": [4], "simbolo": ["EURUSD"]}),
+        brokers_df=pd.DataFrame({"broker_id": [2], "nombre": ["Oanda"]}),
+    )
+
+
+def test_export_sink_requires_write():
+    with pytest.raises(TypeError):
+        ExportSink()
+
+
+def test_one_pass_feeds_every_sink(adapter, tmp_path):
+    loader = RecordingLoader()
+    csv_sink = CSVSink(str(tmp_path / "out"), "historicos.csv", index_block_rows=2)
+    raw_sink = CSVSink(str(tmp_path / "out"), "pre_mapping.csv", map_ids=False)
+    preview = PreviewSink(n=2)
+    stats = ValidationStatsSink(str(tmp_path / "out" / "stats.csv"))
+
+    adapter.export_multi([csv_sink, raw_sink, LoaderSink(loader), preview, stats])
+
+    exported = pd.read_csv(csv_sink.output_path)
+    assert exported["registro_id"].tolist() == list(range(1, 8))
+    assert set(exported["activo_id"]) == {4} and set(exported["broker_id"]) == {2}
+    assert set(pd.read_csv(raw_sink.output_path)["activo_id"]) == {"EURUSD"}
+    assert csv_sink.index is not None
+    assert [len(df) for df in loader.batches] == [3, 3, 1] and loader.finished
+    assert preview.frame["registro_id"].tolist() == [1, 2]
+    report = pd.read_csv(stats.output_path).set_index("metric")["value"]
+    assert report["rows"] == "7"
+
+
+def test_failed_export_skips_finish(adapter, tmp_path):
+    loader = RecordingLoader()
+    csv_sink = CSVSink(str(tmp_path / "out"), "historicos.csv", index_block_rows=2)
+    stats = ValidationStatsSink(str(tmp_path / "out" / "stats.csv"))
+
+    with pytest.raises(RuntimeError):
+        adapter.export_multi([csv_sink, LoaderSink(loader), stats, FailingSink()])
+
+    assert not loader.finished
+    assert csv_sink.index is None
+    assert not (tmp_path / "out" / "stats.csv").exists()
@@ -0,0 +1,64 @@
+"""Perfiles por función de los workers: profile_task adjunta el perfil de cada tarea,
+ProfileAggregator los suma por PID y ProfileExporter escribe las filas de cada proceso y la
+fila "all" con el total."""
+
+import cProfile
+import pstats
+
+import pandas as pd
+
+import profiling_utils
+from performance.function_profiles import ProfileAggregator, ProfileExporter, profile_task
+
+
+def busy(n):
+    return sum(range(n))
+
+
+def task(n):
+    return {"total": busy(n)}
+
+
+def _calls(stats: pstats.Stats, name: str) -> int:
+    return sum(values[0] for (_, _, func), values in stats.stats.items() if func == name)
+
+
+def test_profile_task_is_transparent_when_off(monkeypatch):
+    monkeypatch.setenv(profiling_utils.PROFILE_ENV, "off")
+    assert profile_task(task) is task
+
+
+def test_worker_profiles_are_merged_per_pid_and_in_total(monkeypatch, tmp_path):
+    monkeypatch.setenv(profiling_utils.PROFILE_ENV, "time")
+    profiled = profile_task(task)
+    results = [profiled(1000) for _ in range(5)]
+    assert all(result["profile"]["stats"] for result in results)
+    # Como si las tareas se hubieran repartido entre dos workers
+    for i, result in enumerate(results):
+        result["profile"]["pid"] = 101 if i < 3 else 202
+        result["profile"]["memory"] = {("test_function_profiles.py", "busy"): float(i)}
+
+    aggregator = ProfileAggregator()
+    aggregator.add_results(results)
+    aggregator.add(None)
+    assert all("profile" not in result for result in results)
+    assert _calls(aggregator.stats_by_pid[101], "busy") == 3
+    assert _calls(aggregator.stats_by_pid[202], "busy") == 2
+    # La memoria del worker es acumulativa: se conserva la última recibida
+    assert aggregator.memory_by_pid[101] == {("test_function_profiles.py", "busy"): 2.0}
+
+    parent = cProfile.Profile()
+    parent.enable()
+    busy(10)
+    parent.disable()
+    csv_path = tmp_path / "profiles.csv"
+    ProfileExporter(parent, aggregator=aggregator).export_to_csv(str(csv_path), str(tmp_path / "total.prof"),
+                                                                  run_id="run")
+
+    df = pd.read_csv(csv_path)
+    rows = df[df["function_name"] == "busy"].set_index("pid")
+    assert rows.loc["101", "call_count"] == 3 and rows.loc["202", "call_count"] == 2
+    assert rows.loc["all", "call_count"] == 6
+    assert rows.loc["all", "memory_usage"] == 4.0
+    assert (df["run_id"] == "run").all() and df["id"].tolist() == list(range(1, len(df) + 1))
+    assert _calls(pstats.Stats(str(tmp_path / "total.prof")), "busy") == 6
@@ -0,0 +1,102 @@
+"""Actualización incremental con la política "resample": el CSV resultante debe ser igual al
+de una descarga completa hasta la misma fecha (ninguna barra derivada se reconstruye con una
+parte de sus barras base)."""
+
+import sys
+import types
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.resampler import DEFAULT_SESSION, resample_bars
+
+H1_START = datetime(2026, 6, 1)
+H1_END = datetime(2026, 11, 1)
+COLUMNS = ["time", "open", "high", "low", "close", "tick_volume", "spread", "real_volume"]
+
+
+def _h1_bars() -> pd.DataFrame:
+    """Barras H1 con precios y volúmenes distintos en cada hora."""
+    seconds = np.arange(int(pd.Timestamp(H1_START).timestamp()), int(pd.Timestamp(H1_END).timestamp()), 3600)
+    rng = np.random.default_rng(7)
+    close = 1.1 + np.cumsum(rng.normal(0, 1e-4, len(seconds)))
+    return pd.DataFrame({
+        "time": seconds,
+        "open": np.round(close - 5e-5, 5),
+        "high": np.round(close + 2e-4, 5),
+        "low": np.round(close - 2e-4, 5),
+        "close": np.round(close, 5),
+        "tick_volume": rng.integers(1, 100, len(seconds)).astype("uint64"),
+        "spread": rng.integers(0, 10, len(seconds)).astype("int32"),
+        "real_volume": np.zeros(len(seconds), dtype="uint64"),
+    })
+
+
+def _fake_mt5() -> types.ModuleType:
+    """
+    MetaTrader5 mínimo: copy_rates_range devuelve las barras con apertura en [start, end) como
+    las vería el broker en el instante mt5.now (la última barra de cada temporalidad, en curso).
+    """
+    mt5 = types.ModuleType("MetaTrader5")
+    h1 = _h1_bars()
+    labels = {2: "H4", 3: "D1", 4: "W1", 5: "MN1"}
+    mt5.TIMEFRAME_H1, mt5.TIMEFRAME_H4, mt5.TIMEFRAME_D1, mt5.TIMEFRAME_W1, mt5.TIMEFRAME_MN1 = 1, 2, 3, 4, 5
+
+    def copy_rates_range(symbol, timeframe, start, end):
+        lower, upper = pd.Timestamp(start).timestamp(), pd.Timestamp(end).timestamp()
+        bars = h1[h1["time"] < pd.Timestamp(mt5.now).timestamp()]
+        if timeframe in labels:
+            bars = resample_bars(bars, labels[timeframe], DEFAULT_SESSION)
+        return bars[(bars["time"] >= lower) & (bars["time"] < upper)].to_records(index=False)
+
+    mt5.now = H1_END
+    mt5.copy_rates_range = copy_rates_range
+    return mt5
+
+
+@pytest.fixture
+def worker(monkeypatch):
+    monkeypatch.setitem(sys.modules, "MetaTrader5", _fake_mt5())
+    monkeypatch.setenv("HERMESDB_METRICS", "off")
+    monkeypatch.delitem(sys.modules, "modules.worker", raising=False)
+    from modules import worker as module  # pylint: disable=import-outside-toplevel
+    return module
+
+
+def _download(worker, directory, end, incremental):
+    directory.mkdir(exist_ok=True)
+    worker.WorkerState.data_directory = str(directory)
+    worker.WorkerState.broker = "Test"
+    worker.WorkerState.policy = "resample"
+    worker.WorkerState.session = DEFAULT_SESSION
+    worker.WorkerState.date_range = (datetime(2026, 6, 1), end)
+    worker.mt5.now = end
+    result = worker._download_symbol("EURUSD", incremental)  # pylint: disable=protected-access
+    assert result["error"] is None
+    return pd.read_csv(result["file"])
+
+
+def test_incremental_refresh_matches_full_download(worker, tmp_path):
+    # La última MN1 guardada empieza el 2026-07-01 y la W1 que la contiene, el 2026-06-28; la
+    # actualización abarca más de VERIFY_MONTHS meses, así que esa W1 no se verifica
+    _download(worker, tmp_path / "incremental", datetime(2026, 7, 15), incremental=False)
+    refreshed = _download(worker, tmp_path / "incremental", datetime(2026, 10, 20), incremental=True)
+    full = _download(worker, tmp_path / "full", datetime(2026, 10, 20), incremental=False)
+
+    assert list(refreshed.columns) == list(full.columns)
+    pd.testing.assert_frame_equal(refreshed.reset_index(drop=True), full.reset_index(drop=True))
+
+
+def test_derived_bars_before_range_are_dropped(worker, tmp_path):
+    # Rango que empieza un jueves: la W1 de esa semana no se guarda incompleta
+    worker.WorkerState.date_range = (datetime(2026, 7, 2), datetime(2026, 10, 1))
+    worker.mt5.now = datetime(2026, 10, 1)
+    worker.WorkerState.data_directory = str(tmp_path)
+    worker.WorkerState.broker = "Test"
+    worker.WorkerState.policy = "resample"
+    result = worker._download_symbol("EURUSD")  # pylint: disable=protected-access
+    stored = pd.read_csv(result["file"])
+    weekly = pd.to_datetime(stored.loc[stored["timeframe"] == "W1", "time"], format="ISO8601")
+    assert weekly.min() >= pd.Timestamp(2026, 7, 2)
@@ -0,0 +1,63 @@
+"""Métricas entre procesos: collect() fusiona los snapshots del run (contadores e histogramas
+sumados, gauges con el máximo), un flush repetido reemplaza el snapshot sin contar dos veces y
+export_text escribe el formato de texto de Prometheus."""
+
+import pytest
+
+from Common.metrics import MetricsRegistry
+
+
+def _registry(tmp_path, pid):
+    metrics = MetricsRegistry(enabled=True, run_id="run", directory=str(tmp_path))
+    metrics.pid = pid
+    return metrics
+
+
+def test_collect_merges_snapshots_of_every_process(tmp_path):
+    parent, worker = _registry(tmp_path, 1), _registry(tmp_path, 2)
+    for metrics, rows, queue, latencies in ((parent, 10, 3, [0.002]), (worker, 5, 7, [0.2, 40.0])):
+        metrics.counter("rows_total", "Filas", broker="Oanda").inc(rows)
+        metrics.gauge("queue_peak", "Pico de cola").set(queue)
+        for value in latencies:
+            metrics.histogram("call_seconds", "Latencia", buckets=(0.01, 1.0)).observe(value)
+    worker.counter("rows_total", broker="Darwinex").inc(1)
+    worker.flush()
+    # El worker guarda su estado acumulado tras cada tarea: el snapshot se reemplaza
+    worker.counter("rows_total", broker="Oanda").inc(2)
+    worker.flush()
+
+    merged = parent.collect()
+    assert merged.counter("rows_total", broker="Oanda").value == 17
+    assert merged.counter("rows_total", broker="Darwinex").value == 1
+    assert merged.gauge("queue_peak").value == 7
+    histogram = merged.histogram("call_seconds", buckets=(0.01, 1.0))
+    assert histogram.counts == [1, 1, 1] and histogram.count == 3
+    assert histogram.sum == pytest.approx(40.202)
+    assert merged.help["rows_total"] == "Filas"
+
+    path = merged.export_text(str(tmp_path / "metrics.prom"))
+    with open(path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert "# TYPE call_seconds histogram" in lines
+    assert 'call_seconds_bucket{le="1.0"} 2' in lines
+    assert 'call_seconds_bucket{le="+Inf"} 3' in lines
+    assert 'rows_total{broker="Oanda"} 17.0' in lines
+
+
+def test_incompatible_series_are_rejected(tmp_path):
+    metrics = _registry(tmp_path, 1)
+    metrics.counter("rows_total").inc()
+    with pytest.raises(TypeError):
+        metrics.gauge("rows_total")
+    histogram = metrics.histogram("call_seconds", buckets=(1.0,))
+    with pytest.raises(ValueError):
+        histogram.merge({"buckets": [2.0], "counts": [0, 0], "sum": 0, "count": 0})
+
+
+def test_disabled_registry_writes_nothing(tmp_path):
+    metrics = MetricsRegistry(enabled=False, run_id="run", directory=str(tmp_path))
+    metrics.counter("rows_total").inc()
+    with metrics.histogram("call_seconds").time():
+        pass
+    metrics.flush()
+    assert not metrics.metrics and not list(tmp_path.iterdir())
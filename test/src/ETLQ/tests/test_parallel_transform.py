@@ -0,0 +1,64 @@
+"""Transformación en paralelo de los chunks: IdBlockAllocator reparte bloques disjuntos y
+parallel_numbered_generator entrega los mismos chunks, con los mismos registro_id y en el mismo
+orden, que la versión secuencial."""
+
+import threading
+
+import pandas as pd
+import pytest
+
+from TL_table_Date_historic import CSVToPostgresAdapter, IdBlockAllocator
+
+
+@pytest.fixture
+def adapter(tmp_path):
+    folder = tmp_path / "clean"
+    folder.mkdir()
+    for broker, asset, periods in (("Oanda", "EURUSD.a", 11), ("Darwinex", "GBPUSD", 8)):
+        pd.DataFrame({
+            "time": pd.date_range("2024-01-01", periods=periods, freq="h", tz="UTC").astype(str),
+            "open": 1.1, "high": 1.2, "low": 1.0, "close": [1.1 + i / 100 for i in range(periods)],
+            "tick_volume": 10, "spread": 3, "real_volume": 0,
+            "timeframe": "H1", "broker": broker, "asset": asset,
+        }).to_csv(folder / f"{broker}.csv", index=False)
+    return CSVToPostgresAdapter(
+        str(folder), chunksize=3,
+        assets_df=pd.DataFrame({"activo_id": [4, 5], "simbolo": ["EURUSD", "GBPUSD"]}),
+        brokers_df=pd.DataFrame({"broker_id": [2, 3], "nombre": ["Oanda", "Darwinex"]}),
+    )
+
+
+def test_allocator_hands_out_disjoint_consecutive_blocks():
+    allocator = IdBlockAllocator(start=10)
+    blocks = []
+
+    def allocate():
+        for size in (1, 5, 2) * 50:
+            blocks.append((allocator.allocate(size), size))
+
+    threads = [threading.Thread(target=allocate) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    ids = sorted(i for start, size in blocks for i in range(start, start + size))
+    assert ids == list(range(10, 10 + 4 * 50 * 8))
+    assert allocator.next_id == 10 + 4 * 50 * 8
+
+
+def test_parallel_numbering_matches_the_sequential_order(adapter):
+    sequential = list(adapter.numbered_generator())
+    parallel = list(adapter.parallel_numbered_generator(workers=2, max_pending=2))
+
+    assert [len(df) for df in parallel] == [len(df) for df in sequential] == [3, 3, 3, 2, 3, 3, 2]
+    pd.testing.assert_frame_equal(pd.concat(parallel, ignore_index=True),
+                                  pd.concat(sequential, ignore_index=True))
+    assert pd.concat(parallel)["registro_id"].tolist() == list(range(1, 20))
+
+
+def test_consumer_can_stop_early(adapter):
+    chunks = adapter.parallel_numbered_generator(workers=2, max_pending=1)
+    first = next(chunks)
+    chunks.close()
+    assert first["registro_id"].tolist() == [1, 2, 3]
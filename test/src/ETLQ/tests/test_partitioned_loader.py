@@ -0,0 +1,88 @@
+"""PartitionedLoader crea la clave primaria, las restricciones únicas y los índices de la tabla
+particionada tanto si se difieren a finish() como si no."""
+
+import pytest
+
+from partition_schema import PartitionSchemaGenerator
+from partitioned_loader import PartitionedLoader
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self._result = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, statement, params=None):
+        if statement.startswith("SELECT to_regclass"):
+            self._result = [(self.connection.table_exists,)]
+        elif statement.startswith("SELECT c.relname"):
+            self._result = []
+        else:
+            self.connection.statements.append(statement)
+            if statement.startswith("CREATE TABLE IF NOT EXISTS"):
+                self.connection.table_exists = True
+
+    def fetchone(self):
+        return self._result[0]
+
+    def fetchall(self):
+        return self._result
+
+
+class FakeConnection:
+    """Conexión DB-API mínima que registra las sentencias ejecutadas."""
+
+    def __init__(self, table_exists=False):
+        self.table_exists = table_exists
+        self.statements = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+
+@pytest.fixture
+def generator():
+    return PartitionSchemaGenerator.from_design(period='quarter')
+
+
+@pytest.mark.parametrize("defer_indexes", [True, False])
+def test_new_table_gets_constraints_and_indexes(generator, defer_indexes):
+    connection = FakeConnection()
+    loader = PartitionedLoader(connection, generator, defer_indexes=defer_indexes)
+    loader.begin()
+    after_begin = list(connection.statements)
+    loader.finish()
+
+    index_ddl = generator.index_ddl()
+    assert index_ddl
+    for statement in index_ddl:
+        assert connection.statements.count(statement) == 1
+        # Sin diferir, existen antes de cargar el primer lote
+        assert (statement in after_begin) is not defer_indexes
+
+
+def test_deferred_indexes_are_dropped_and_rebuilt(generator):
+    connection = FakeConnection(table_exists=True)
+    loader = PartitionedLoader(connection, generator, defer_indexes=True)
+    loader.begin()
+    assert all(s in connection.statements for s in generator.drop_index_ddl())
+    assert not any(s in connection.statements for s in generator.index_ddl())
+    loader.finish()
+    assert all(s in connection.statements for s in generator.index_ddl())
+
+
+def test_existing_table_keeps_its_indexes_when_not_deferred(generator):
+    connection = FakeConnection(table_exists=True)
+    loader = PartitionedLoader(connection, generator, defer_indexes=False)
+    loader.begin()
+    loader.finish()
+    assert not any(s in connection.statements for s in generator.index_ddl() + generator.drop_index_ddl())
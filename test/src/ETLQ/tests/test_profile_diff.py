@@ -0,0 +1,77 @@
+"""profile_diff: los perfiles se comparan por función normalizada (archivo sin ruta y nombre),
+usando las filas "all" de ProfileExporter; las regresiones se ordenan por el aumento de
+tottime y --fail-over devuelve 1 solo si alguna supera el umbral. Las pilas colapsadas
+reparten el tiempo de cada función entre sus llamadores."""
+
+import types
+
+import pandas as pd
+import pytest
+
+from performance.profile_diff import collapsed_stacks, diff_profiles, load_profile, main, regressions
+
+
+def _write_profile(path, run_id, rows):
+    records = []
+    for pid, file_name, function, cpu_time, total_time, calls in rows:
+        records.append({"run_id": run_id, "pid": pid, "function_name": function, "total_time": total_time,
+                        "call_count": calls, "avg_time": 0, "cpu_time": cpu_time, "wait_time": 0,
+                        "memory_usage": None, "file": file_name})
+    pd.DataFrame(records).to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture
+def profiles(tmp_path):
+    base = _write_profile(tmp_path / "base.csv", "base", [
+        (10, "worker.py", "download", 9.0, 9.5, 1),
+        ("all", "worker.py", "download", 1.0, 2.0, 10),
+        ("all", "C:\\hermes\\utils.py", "parse", 0.5, 0.5, 100),
+        ("all", "~", "<built-in method time.sleep>", 3.0, 3.0, 5),
+    ])
+    new = _write_profile(tmp_path / "new.csv", "new", [
+        ("all", "/srv/hermes/worker.py", "download", 1.1, 2.2, 10),
+        ("all", "utils.py", "parse", 2.5, 2.5, 100),
+        ("all", "utils.py", "parse", 0.5, 0.5, 20),
+        ("all", "~", "<built-in method time.sleep>", 1.0, 1.0, 5),
+        ("all", "resampler.py", "resample_bars", 0.2, 0.2, 3),
+    ])
+    return base, new
+
+
+def test_diff_ranks_regressions_by_tottime(profiles):
+    base, new = load_profile(profiles[0]), load_profile(profiles[1])
+    assert base.attrs["run_id"] == "base"
+    assert base.loc["worker.py:download", "tottime"] == 1.0
+    # Rutas de Windows y POSIX y filas repetidas de una misma función
+    assert new.loc["utils.py:parse", "tottime"] == 3.0 and new.loc["utils.py:parse", "calls"] == 120
+
+    diff = diff_profiles(base, new)
+    ranked = diff["tottime_delta"].sort_values(ascending=False)
+    assert list(ranked.index) == ["utils.py:parse", "resampler.py:resample_bars", "worker.py:download",
+                                  "<built-in method time.sleep>"]
+    assert diff.loc["utils.py:parse", "tottime_pct"] == pytest.approx(500.0)
+    assert diff.loc["resampler.py:resample_bars", "tottime_base"] == 0
+
+    regressed = regressions(diff, fail_over=50, min_seconds=0.15)
+    assert list(regressed.index) == ["utils.py:parse", "resampler.py:resample_bars"]
+
+
+def test_fail_over_sets_the_exit_code(profiles, capsys):
+    assert main([*profiles, "--fail-over", "1000", "--min-seconds", "0.05"]) == 1
+    assert "REGRESIÓN" in capsys.readouterr().out
+    assert main([*profiles, "--fail-over", "1000", "--min-seconds", "5"]) == 0
+    assert main([*profiles, "--pid", "10"]) == 0
+
+
+def test_collapsed_stacks_split_time_between_callers():
+    main_frame, fast, slow, leaf = ("m.py", 1, "main"), ("m.py", 2, "fast"), ("m.py", 3, "slow"), ("m.py", 4, "leaf")
+    stats = types.SimpleNamespace(stats={
+        main_frame: (1, 1, 0.1, 4.1, {}),
+        fast: (1, 1, 0.0, 1.0, {main_frame: (1, 1, 0.0, 1.0)}),
+        slow: (1, 1, 0.0, 3.0, {main_frame: (1, 1, 0.0, 3.0)}),
+        leaf: (2, 2, 4.0, 4.0, {fast: (1, 1, 1.0, 1.0), slow: (1, 1, 3.0, 3.0)}),
+    })
+    stacks = collapsed_stacks(stats)
+    assert stacks == pytest.approx({"m.py:main": 0.1, "m.py:main;m.py:fast;m.py:leaf": 1.0,
+                                    "m.py:main;m.py:slow;m.py:leaf": 3.0})
@@ -0,0 +1,49 @@
+"""La instrumentación por función está desactivada por defecto y se activa desde la CLI o
+la configuración."""
+
+import os
+
+import pytest
+
+import cli
+import pipeline_runner
+import profiling_utils
+
+
+class FakeDownloader:
+    def __init__(self):
+        self.brokers = []
+
+    def process_broker(self, broker):
+        self.brokers.append(broker)
+
+
+@pytest.fixture
+def downloader(monkeypatch):
+    fake = FakeDownloader()
+    monkeypatch.setattr(pipeline_runner, "create_downloader", lambda *args: fake)
+    monkeypatch.delenv(profiling_utils.PROFILE_ENV, raising=False)
+    return fake
+
+
+def test_mem_profile_is_off_by_default(monkeypatch):
+    monkeypatch.delenv(profiling_utils.PROFILE_ENV, raising=False)
+
+    def download():
+        return 1
+
+    assert profiling_utils.profile_mode() == "off"
+    assert profiling_utils.mem_profile(download) is download
+
+
+def test_extract_keeps_profiling_off_by_default(downloader):
+    cli.main(["extract", "--brokers", "Oanda"])
+
+    assert downloader.brokers == ["Oanda"]
+    assert os.environ[profiling_utils.PROFILE_ENV] == "off"
+
+
+def test_extract_profile_flag_enables_instrumentation(downloader):
+    cli.main(["extract", "--brokers", "Oanda", "--profile", "rss"])
+
+    assert os.environ[profiling_utils.PROFILE_ENV] == "rss"
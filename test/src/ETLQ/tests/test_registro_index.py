@@ -0,0 +1,79 @@
+"""Índice registro_id -> offset: las búsquedas puntuales y por rango devuelven lo mismo que
+filtrar el CSV completo, el índice escrito durante la exportación equivale al construido
+después y se reconstruye si el CSV cambia; un CSV no indexable se anota junto al archivo y las
+búsquedas siguientes van directas al recorrido por chunks, sin releerlo en binario."""
+
+import pandas as pd
+
+import numpy as np
+
+from Common.registro_index import RegistroIndexWriter, RegistroOffsetIndex
+from seacrh import search_by_registro_ids_efficient
+
+
+def _write_csv(path, ids):
+    pd.DataFrame({"registro_id": ids, "close": [float(i) / 10 for i in ids]}).to_csv(path, index=False)
+
+
+def test_lookup_and_range_match_a_full_scan(tmp_path):
+    csv_path = str(tmp_path / "Table_Datos_historicos.csv")
+    ids = list(range(1, 101))
+    _write_csv(csv_path, ids)
+    index = RegistroOffsetIndex.open(csv_path, block_rows=7)
+    full = pd.read_csv(csv_path)
+
+    assert len(index.blocks) == 15
+    wanted = [1, 7, 8, 50, 100, 150, -3]
+    pd.testing.assert_frame_equal(index.lookup(wanted).sort_values("registro_id", ignore_index=True),
+                                  full[full["registro_id"].isin(wanted)].reset_index(drop=True))
+    pd.testing.assert_frame_equal(index.range(20, 44),
+                                  full[full["registro_id"].between(20, 44)].reset_index(drop=True))
+    assert index.lookup([500]).empty and index.range(200, 300).empty
+    assert search_by_registro_ids_efficient(csv_path, [8, 50]) == full[full["registro_id"].isin([8, 50])].to_dict(orient="records")
+
+
+def test_writer_index_matches_built_index_and_stale_index_is_rebuilt(tmp_path):
+    csv_path = str(tmp_path / "Table_Datos_historicos.csv")
+    _write_csv(csv_path, list(range(1, 11)))
+    with open(csv_path, "rb") as f:
+        data_start = len(f.readline())
+        offsets = [data_start]
+        for line in f:
+            offsets.append(offsets[-1] + len(line))
+    writer = RegistroIndexWriter(csv_path, ["registro_id", "close"], data_start)
+    for start in range(0, 10, 4):
+        writer.add_block(offsets[start], pd.Series(range(start + 1, min(start + 4, 10) + 1)))
+    written = writer.finish()
+    built = RegistroOffsetIndex.build(csv_path, block_rows=4)
+    np.testing.assert_array_equal(written.blocks, built.blocks)
+    assert RegistroOffsetIndex.load(csv_path) is not None
+
+    # El CSV cambió: el índice guardado deja de ser válido y open() lo reconstruye
+    _write_csv(csv_path, list(range(1, 31)))
+    assert RegistroOffsetIndex.load(csv_path) is None
+    assert RegistroOffsetIndex.open(csv_path).lookup([30])["registro_id"].tolist() == [30]
+
+
+def test_failed_index_build_is_remembered(tmp_path, monkeypatch):
+    csv_path = str(tmp_path / "Table_Datos_historicos.csv")
+    _write_csv(csv_path, [5, 3, 9, 1])
+    builds = []
+    build = RegistroOffsetIndex.build.__func__
+
+    def counting_build(cls, *args, **kwargs):
+        builds.append(args)
+        return build(cls, *args, **kwargs)
+
+    monkeypatch.setattr(RegistroOffsetIndex, "build", classmethod(counting_build))
+    for _ in range(3):
+        rows = search_by_registro_ids_efficient(csv_path, [9, 1])
+        assert sorted(row["registro_id"] for row in rows) == [1, 9]
+    assert len(builds) == 1
+    assert RegistroOffsetIndex.unindexable_reason(csv_path)
+
+    # Al reescribir el CSV con registro_id creciente se vuelve a intentar y se indexa
+    _write_csv(csv_path, [1, 3, 5, 9, 11])
+    rows = search_by_registro_ids_efficient(csv_path, [9, 1])
+    assert sorted(row["registro_id"] for row in rows) == [1, 9]
+    assert len(builds) == 2
+    assert RegistroOffsetIndex.unindexable_reason(csv_path) is None
@@ -0,0 +1,61 @@
+"""SamplingProfiler: cada muestra cuenta la pila de cada hilo con el nombre del hilo como raíz
+y export_collapsed une los acumulados de los procesos del run, con los workers agregados bajo
+el mismo marco raíz."""
+
+import threading
+from collections import Counter
+
+from performance import sampling_profiler
+from performance.sampling_profiler import SamplingProfiler, export_collapsed
+
+
+def wait_here(event):
+    event.wait(5)
+
+
+def _folded(path) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return {stack: int(count) for stack, count in (line.rsplit(" ", 1) for line in f)}
+
+
+def test_sample_counts_the_stack_of_each_thread(tmp_path):
+    event = threading.Event()
+    thread = threading.Thread(target=wait_here, args=(event,), name="descarga")
+    thread.start()
+    try:
+        profiler = SamplingProfiler("extract", run_id="run", directory=str(tmp_path))
+        for _ in range(3):
+            profiler.sample_once()
+    finally:
+        event.set()
+        thread.join()
+
+    stacks = [stack for stack in profiler.stacks if stack[0] == "descarga"]
+    assert len(stacks) == 1
+    assert "test_sampling_profiler.py:wait_here" in stacks[0]
+    assert profiler.stacks[stacks[0]] == 3 and profiler.samples == 3
+
+
+def test_export_collapsed_merges_the_processes_of_the_run(tmp_path):
+    processes = [("extract", 1, {("MainThread", "main.py:main"): 4}),
+                 ("worker", 2, {("MainThread", "worker.py:download"): 3}),
+                 ("worker", 3, {("MainThread", "worker.py:download"): 2, ("MainThread", "worker.py:parse"): 1})]
+    for name, pid, stacks in processes:
+        profiler = SamplingProfiler(name, run_id="run", directory=str(tmp_path / "spool"))
+        profiler.pid, profiler.stacks, profiler.samples = pid, Counter(stacks), sum(stacks.values())
+        profiler.flush()
+
+    result = export_collapsed(str(tmp_path / "out"), run_id="run", directory=str(tmp_path / "spool"))
+    assert [item["pid"] for item in result["summary"]] == [1, 2, 3]
+    assert _folded(result["run"]) == {
+        "extract;MainThread;main.py:main": 4,
+        "worker;MainThread;worker.py:download": 5,
+        "worker;MainThread;worker.py:parse": 1,
+    }
+    assert _folded(tmp_path / "out" / "worker_3.folded") == {"MainThread;worker.py:download": 2,
+                                                             "MainThread;worker.py:parse": 1}
+
+
+def test_sampling_is_off_by_default(monkeypatch):
+    monkeypatch.delenv(sampling_profiler.SAMPLING_ENV, raising=False)
+    assert sampling_profiler.start_sampling("extract") is None
@@ -0,0 +1,42 @@
+"""Las carpetas por run de métricas, trazas y muestreo no crecen sin límite: al crear la de
+un run nuevo se borran las antiguas."""
+
+import os
+import time
+
+from Common.metrics import MetricsRegistry
+from Common.run_context import SPOOL_KEEP_RUNS_ENV, SPOOL_MAX_AGE_ENV, prune_run_dirs
+
+
+def _make_runs(directory, names, age_days=0):
+    mtime = time.time() - age_days * 86400
+    for offset, name in enumerate(names):
+        path = directory / name
+        path.mkdir(parents=True)
+        (path / "1.json").write_text("{}")
+        os.utime(path / "1.json", (mtime + offset, mtime + offset))
+        os.utime(path, (mtime + offset, mtime + offset))
+
+
+def test_prune_keeps_the_most_recent_runs(tmp_path):
+    _make_runs(tmp_path, [f"run{i}" for i in range(5)])
+    removed = prune_run_dirs(str(tmp_path), keep="run0", keep_runs=3)
+    assert sorted(os.path.basename(p) for p in removed) == ["run1", "run2"]
+    assert sorted(os.listdir(tmp_path)) == ["run0", "run3", "run4"]
+
+
+def test_prune_removes_old_runs(tmp_path):
+    _make_runs(tmp_path, ["old"], age_days=10)
+    _make_runs(tmp_path, ["recent"])
+    prune_run_dirs(str(tmp_path), keep_runs=20, max_age_days=7)
+    assert os.listdir(tmp_path) == ["recent"]
+
+
+def test_metrics_flush_prunes_previous_runs(tmp_path, monkeypatch):
+    monkeypatch.setenv(SPOOL_KEEP_RUNS_ENV, "2")
+    monkeypatch.delenv(SPOOL_MAX_AGE_ENV, raising=False)
+    _make_runs(tmp_path, ["a", "b", "c"], age_days=1)
+    metrics = MetricsRegistry(enabled=True, run_id="current", directory=str(tmp_path))
+    metrics.counter("rows_total").inc()
+    metrics.flush()
+    assert sorted(os.listdir(tmp_path)) == ["c", "current"]
@@ -0,0 +1,102 @@
+"""SQLiteLoader: ida y vuelta de una carga por lotes y carga sobre una base ya indexada por una
+carga anterior."""
+
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from sqlite_loader import SQLiteLoader
+from pipeline_runner import finish_database, load_clean_file
+
+
+def bars(close: float, hours: int = 3) -> pd.DataFrame:
+    return pd.DataFrame({
+        "activo_id": 1, "broker_id": 2, "mercado_id": 1,
+        "timestamp": pd.date_range("2024-01-01", periods=hours, freq="h", tz="UTC"),
+        "timeframe": "1h",
+        "bid_open": 1.0, "bid_high": 1.2, "bid_low": 0.9, "bid_close": close,
+        "ask_open": 1.0, "ask_high": 1.2, "ask_low": 0.9, "ask_close": close,
+        "volumen_contratos": 10, "spread_promedio": 0.0001,
+    })
+
+
+def rows(db_path: str) -> list:
+    with sqlite3.connect(db_path) as connection:
+        return connection.execute("SELECT timestamp, bid_close FROM Datos_Historicos ORDER BY timestamp").fetchall()
+
+
+def test_batches_round_trip_with_epoch_timestamps_and_deferred_indexes(tmp_path):
+    db_path = str(tmp_path / "hermesdb.sqlite")
+    loader = SQLiteLoader(db_path)
+    first, second = bars(1.1), bars(1.2)
+    second["timestamp"] += pd.Timedelta(hours=3)
+    with sqlite3.connect(db_path) as connection:
+        assert not connection.execute("SELECT name FROM sqlite_master WHERE type = 'index' "
+                                      "AND name NOT LIKE 'sqlite_autoindex%'").fetchall()
+    assert loader.load([first, second]) == 6
+    loader.close()
+
+    with sqlite3.connect(db_path) as connection:
+        stored = pd.read_sql("SELECT * FROM Datos_Historicos ORDER BY registro_id", connection)
+        indexes = {row[0] for row in connection.execute("SELECT sql FROM sqlite_master WHERE type = 'index'")}
+    expected = pd.concat([first, second], ignore_index=True)
+    assert stored["registro_id"].tolist() == list(range(1, 7))
+    # timestamptz como segundos UTC desde epoch
+    assert stored["timestamp"].tolist() == [int(t.timestamp()) for t in expected["timestamp"]]
+    for column in ("bid_close", "ask_close", "volumen_contratos", "timeframe"):
+        assert stored[column].tolist() == expected[column].tolist()
+    key = ", ".join(next(columns for _, columns in loader.unique_keys(SQLiteLoader.HISTORIC_TABLE)))
+    assert any(sql and "UNIQUE" in sql and key in sql for sql in indexes)
+
+
+def test_second_load_on_an_indexed_database_keeps_the_newest_bars(tmp_path):
+    db_path = str(tmp_path / "hermesdb.sqlite")
+    loader = SQLiteLoader(db_path)
+    loader.load_batch(bars(1.1))
+    loader.finish()
+    loader.close()
+
+    loader = SQLiteLoader(db_path)
+    loader.load_batch(bars(1.15, hours=4))
+    loader.finish()
+    loader.close()
+
+    assert [close for _, close in rows(db_path)] == [1.15] * 4
+
+
+def test_repeated_keys_before_indexing_need_drop_duplicates(tmp_path):
+    db_path = str(tmp_path / "hermesdb.sqlite")
+    loader = SQLiteLoader(db_path)
+    loader.load_batch(bars(1.1))
+    loader.load_batch(bars(1.15))
+
+    with pytest.raises(ValueError, match="3 filas"):
+        loader.finish()
+    assert loader.finish(drop_duplicates=True) == 3
+    loader.close()
+
+    assert [close for _, close in rows(db_path)] == [1.15] * 3
+
+
+def test_pipeline_loads_the_same_clean_file_twice(tmp_path):
+    clean_dir = tmp_path / "clean"
+    clean_dir.mkdir()
+    clean_file = clean_dir / "Oanda.csv"
+    pd.DataFrame({
+        "time": pd.date_range("2024-01-01", periods=5, freq="h", tz="UTC").astype(str),
+        "open": 1.1, "high": 1.2, "low": 1.0, "close": 1.15,
+        "tick_volume": 10, "spread": 3, "real_volume": 0,
+        "timeframe": "H1", "broker": "Oanda", "asset": "EURUSD",
+    }).to_csv(clean_file, index=False)
+    assets = tmp_path / "Table_Assets.csv"
+    brokers = tmp_path / "Table_Broker.csv"
+    pd.DataFrame({"activo_id": [1], "simbolo": ["EURUSD"]}).to_csv(assets, index=False)
+    pd.DataFrame({"broker_id": [2], "nombre": ["Oanda"]}).to_csv(brokers, index=False)
+    db_path = str(tmp_path / "hermesdb.sqlite")
+
+    for _ in range(2):
+        load_clean_file(str(clean_file), db_path, str(tmp_path), str(assets), str(brokers))
+        finish_database(db_path)
+
+    assert len(rows(db_path)) == 5
@@ -0,0 +1,80 @@
+"""Caché de etapas del procesador: la clave de la limpieza incluye los módulos de los que
+depende, una limpieza con errores no se guarda, ETLProcessor devuelve lo mismo con acierto que
+con fallo de caché y los hashes memorizados de archivos borrados se desalojan."""
+
+import os
+
+import pandas as pd
+
+import DataClear
+from Common.stage_cache import StageCache
+from TL_table_sector_table_assets import ETLProcessor
+
+
+def test_clean_key_depends_on_encoding_modules():
+    names = {os.path.basename(path) for path in DataClear.CLEAN_CODE}
+    assert names == {"DataClear.py", "bar_store.py", "price_encoding.py"}
+
+
+def test_cached_table_is_the_same_on_miss_and_hit(tmp_path):
+    actives = tmp_path / "symbol_info_procesado.csv"
+    market = tmp_path / "Table_market.csv"
+    sectors = tmp_path / "Table_Sector.csv"
+    output = tmp_path / "Table_Assets.csv"
+    # El mismo símbolo en dos brokers: drop_duplicates deja huecos en el índice en memoria
+    pd.DataFrame({
+        "Broker": ["Oanda", "Darwinex", "Oanda"], "Symbol": ["EURUSD", "EURUSD", "US500"],
+        "Description": ["EUR vs USD", "EUR vs USD", None], "mercado": ["forex", "forex", "indices"],
+        "sector": ["Majors", "Majors", "US"],
+    }).to_csv(actives, index=False)
+    pd.DataFrame({"nombre": ["forex", "indices"], "mercado_id": [1, 2]}).to_csv(market, index=False)
+    pd.DataFrame({"sector_id": [1, 2], "nombre": ["majors", "us"], "mercado_id": [1, 2]}).to_csv(sectors, index=False)
+
+    processor = ETLProcessor(cache=StageCache(root=str(tmp_path / "cache")))
+    miss = processor.process_actives(str(actives), str(market), str(sectors), str(output))
+    os.remove(output)
+    hit = processor.process_actives(str(actives), str(market), str(sectors), str(output))
+
+    assert output.exists()
+    pd.testing.assert_frame_equal(miss, hit)
+
+
+def write_bars(path, column="time"):
+    pd.DataFrame({
+        column: ["2024-01-01 00:00:00", "2024-01-01 01:00:00"], "open": 1.0, "high": 1.2, "low": 0.9,
+        "close": 1.1, "tick_volume": 5, "spread": 2, "real_volume": 0, "timeframe": "H1",
+    }).to_csv(path, index=False)
+
+
+def test_clean_with_a_failed_file_is_not_cached(tmp_path, monkeypatch):
+    monkeypatch.setenv("HERMESDB_STAGE_CACHE", "on")
+    monkeypatch.setenv("HERMESDB_STAGE_CACHE_DIR", str(tmp_path / "cache"))
+    raw, clean = tmp_path / "raw", tmp_path / "clean"
+    (raw / "Oanda").mkdir(parents=True)
+    clean.mkdir()
+    write_bars(raw / "Oanda" / "EURUSD.csv")
+    # Sin columna time: _clean_frame falla y el archivo se omite del CSV limpio
+    write_bars(raw / "Oanda" / "GBPUSD.csv", column="fecha")
+    config = {"columns_to_clean": ["open", "high", "low", "close"], "timezone_offsets": {"Oanda": 2}}
+
+    DataClear.process_broker((str(raw), str(clean), "Oanda", config))
+    assert StageCache().entries() == []
+
+    write_bars(raw / "Oanda" / "GBPUSD.csv")
+    output = DataClear.process_broker((str(raw), str(clean), "Oanda", config))
+    assert len(StageCache().entries()) == 1
+    assert set(pd.read_csv(output)["asset"]) == {"EURUSD", "GBPUSD"}
+
+
+def test_evict_prunes_hashes_of_removed_files(tmp_path):
+    cache = StageCache(root=str(tmp_path / "cache"))
+    kept, removed = tmp_path / "kept.csv", tmp_path / "removed.csv"
+    kept.write_text("a\n1\n")
+    removed.write_text("a\n2\n")
+    cache.file_hash(str(kept))
+    cache.file_hash(str(removed))
+    os.remove(removed)
+
+    cache.evict()
+
+    assert len(os.listdir(cache.hashes_dir)) == 1
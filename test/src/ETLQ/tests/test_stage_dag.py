@@ -0,0 +1,72 @@
+"""StageDAG: las etapas de un broker se solapan con la descarga del siguiente respetando la
+capacidad de cada recurso, una tarea fallida omite solo a sus dependientes y la ruta crítica
+sigue la dependencia que terminó más tarde."""
+
+import operator
+import time
+
+import pytest
+
+from Common.stage_dag import DONE, FAILED, SKIPPED, StageDAG, format_report
+
+
+def _sleep(seconds, value=None):
+    time.sleep(seconds)
+    return value
+
+
+def _fail():
+    raise RuntimeError("terminal desconectado")
+
+
+def test_stages_overlap_within_resource_limits():
+    dag = StageDAG(limits={"mt5": 1, "cpu": 2, "db": 1}, min_headroom=0)
+    extract = {broker: dag.add("extract", broker, _sleep, 0.2, broker, resources={"mt5": 1})
+               for broker in ("Oanda", "Darwinex")}
+    clean = {broker: dag.add("clean", broker, _sleep, 0.1, deps=[extract[broker]], resources={"cpu": 1})
+             for broker in extract}
+    load = dag.add("load", "all", _sleep, 0.05, deps=list(clean.values()), resources={"db": 1})
+    total = dag.add("stats", "all", operator.add, 2, 3, deps=[load], mode="process", resources={"cpu": 1})
+
+    report = dag.run(process_workers=1)
+
+    assert all(task.status == DONE for task in dag.tasks) and total.result == 5
+    assert extract["Oanda"].result == "Oanda"
+    # Una sola conexión de MT5: las descargas van en serie y la segunda espera al recurso
+    first, second = sorted(extract.values(), key=lambda task: task.start)
+    assert second.start >= first.end
+    second_row = next(row for row in report["tasks"] if row["task"] == second.name)
+    assert second_row["wait"] >= 0.15
+    # La limpieza del primer broker se solapa con la descarga del segundo
+    assert clean[first.key].start < second.end
+    assert [row["task"] for row in report["critical_path"]] == [
+        second.name, clean[second.key].name, "load:all", "stats:all"]
+    assert report["stages"]["extract"]["tasks"] == 2 and report["parallelism"] > 1.0
+    assert "Ruta crítica" in format_report(report)
+
+
+def test_failed_task_skips_only_its_dependents():
+    dag = StageDAG(min_headroom=0)
+    broken = dag.add("extract", "Oanda", _fail)
+    healthy = dag.add("extract", "Darwinex", _sleep, 0.01)
+    clean_broken = dag.add("clean", "Oanda", _sleep, 0.01, deps=[broken])
+    load_broken = dag.add("load", "Oanda", _sleep, 0.01, deps=[clean_broken])
+    clean_healthy = dag.add("clean", "Darwinex", _sleep, 0.01, deps=[healthy])
+
+    report = dag.run(process_workers=1)
+
+    assert broken.status == FAILED and "terminal desconectado" in broken.error
+    assert clean_broken.status == SKIPPED and load_broken.status == SKIPPED
+    assert healthy.status == DONE and clean_healthy.status == DONE
+    assert report["failed"] == ["extract:Oanda"]
+    assert report["skipped"] == ["clean:Oanda", "load:Oanda"]
+
+
+def test_tasks_must_fit_declared_resources():
+    dag = StageDAG(limits={"db": 1})
+    with pytest.raises(ValueError):
+        dag.add("load", "all", _sleep, 0, resources={"gpu": 1})
+    with pytest.raises(ValueError):
+        dag.add("load", "all", _sleep, 0, resources={"db": 2})
+    with pytest.raises(ValueError):
+        dag.add("load", "all", _sleep, 0, mode="fiber")
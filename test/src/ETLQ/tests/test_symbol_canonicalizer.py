@@ -0,0 +1,38 @@
+"""La caché de la instancia compartida de SymbolCanonicalizer se guarda en data_path y la
+reutiliza la siguiente ejecución; una caché de otros patrones se descarta."""
+
+import json
+import os
+
+import pandas as pd
+
+from Common.config import data_path
+from symbol_canonicalizer import SymbolCanonicalizer
+
+
+def _fresh_shared(monkeypatch):
+    monkeypatch.setattr(SymbolCanonicalizer, "_shared", None)
+    return SymbolCanonicalizer.shared()
+
+
+def test_shared_cache_persists_across_runs(monkeypatch):
+    # conftest apunta HERMESDB_DATA_ROOT a una carpeta temporal
+    if os.path.exists(data_path("symbol_cache")):
+        os.remove(data_path("symbol_cache"))
+    first = _fresh_shared(monkeypatch)
+    assert first.cache_path == data_path("symbol_cache")
+
+    result = first.canonicalize(pd.Series(["EURUSD.a", "US30_CFD", "EURUSD.a"]))
+    assert list(result) == ["EURUSD", "US30", "EURUSD"]
+
+    # Nueva ejecución: la caché se carga del disco y no se vuelve a resolver nada
+    second = _fresh_shared(monkeypatch)
+    assert second is not first and len(second) == 2
+    second._regex_suffix = second._regex_cfd = None
+    assert list(second.canonicalize(pd.Series(["US30_CFD", "EURUSD.a"]))) == ["US30", "EURUSD"]
+
+
+def test_cache_from_other_patterns_is_discarded(tmp_path):
+    path = tmp_path / "symbol_cache.json"
+    path.write_text(json.dumps({"patterns": ["otro"], "symbols": {"EURUSD.a": "X"}}), encoding="utf-8")
+    assert SymbolCanonicalizer(cache_path=str(path)).canonical("EURUSD.a") == "EURUSD"
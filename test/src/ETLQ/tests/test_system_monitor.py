@@ -0,0 +1,36 @@
+"""SystemMonitor no mezcla filas de otro formato en un CSV existente: si la cabecera no coincide,
+lo renombra y empieza uno nuevo."""
+
+import os
+
+import pandas as pd
+
+from performance.system_monitor import COLUMNS, SystemMonitor
+
+
+def _sample(monitor):
+    return {column: None for column in COLUMNS} | {"id": 1, "run_id": monitor.run_id}
+
+
+def test_flush_rotates_csv_with_other_columns(tmp_path):
+    csv_path = tmp_path / "system_metrics.csv"
+    csv_path.write_text("timestamp,cpu_usage,memory_usage,disk_usage,network_usage,cpu_usage_per_core\n"
+                        "2024-01-01,1,2,3,4,[]\n")
+    monitor = SystemMonitor(str(csv_path), run_id="run", publish_metrics=False)
+    monitor.metrics.append(_sample(monitor))
+    monitor.flush()
+
+    assert list(pd.read_csv(csv_path).columns) == COLUMNS
+    rotated = [name for name in os.listdir(tmp_path) if name != "system_metrics.csv"]
+    assert len(rotated) == 1 and rotated[0].startswith("system_metrics.")
+
+
+def test_flush_appends_to_csv_with_same_columns(tmp_path):
+    csv_path = tmp_path / "system_metrics.csv"
+    for _ in range(2):
+        monitor = SystemMonitor(str(csv_path), run_id="run", publish_metrics=False)
+        monitor.metrics.append(_sample(monitor))
+        monitor.flush()
+
+    assert len(pd.read_csv(csv_path)) == 2
+    assert os.listdir(tmp_path) == ["system_metrics.csv"]
@@ -0,0 +1,75 @@
+"""Spans del pipeline: se vuelcan al cerrar el span más externo de cada hilo, el modo "on"
+omite los spans de detalle, los errores quedan en los argumentos y export_chrome_trace une
+los .jsonl de todos los procesos del run en un único timeline."""
+
+import json
+
+import pytest
+
+from Common.tracing import Tracer
+
+
+def _tracer(tmp_path, mode="on", pid=None):
+    tracer = Tracer(mode=mode, run_id="run", directory=str(tmp_path))
+    if pid is not None:
+        tracer.pid = pid
+    return tracer
+
+
+def _spool(tracer) -> list:
+    with open(tracer.spool_path(), encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_spans_are_spooled_when_the_outermost_span_closes(tmp_path):
+    tracer = _tracer(tmp_path)
+    with tracer.span("Oanda", cat="broker") as broker:
+        with tracer.span("EURUSD", cat="symbol"):
+            pass
+        with tracer.span("chunk", cat="chunk", detail=True):
+            pass
+        assert not (tmp_path / "run").exists()
+        broker.set(rows=10)
+
+    events = _spool(tracer)
+    assert events[0] == {"name": "process_name", "ph": "M", "pid": tracer.pid, "tid": 0,
+                         "args": {"name": f"worker {tracer.pid}"}}
+    assert [(e["name"], e["cat"]) for e in events[1:]] == [("EURUSD", "symbol"), ("Oanda", "broker")]
+    assert events[2]["args"] == {"rows": 10}
+    inner, outer = events[1], events[2]
+    assert outer["ts"] <= inner["ts"] and inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"] + 1
+
+
+def test_error_is_recorded_and_off_mode_records_nothing(tmp_path):
+    tracer = _tracer(tmp_path)
+    with pytest.raises(RuntimeError):
+        with tracer.span("load", cat="stage"):
+            raise RuntimeError("sin conexión")
+    assert _spool(tracer)[-1]["args"] == {"error": "RuntimeError: sin conexión"}
+
+    off = _tracer(tmp_path / "off", mode="off")
+    with off.span("load", cat="stage") as null_span:
+        null_span.set(rows=1)
+    assert not (tmp_path / "off").exists()
+
+
+def test_export_merges_every_process_of_the_run(tmp_path):
+    parent = _tracer(tmp_path)
+    parent.set_process_name("pipeline")
+    worker = _tracer(tmp_path, pid=parent.pid + 1)
+    with parent.span("run", cat="run"):
+        with worker.span("EURUSD", cat="symbol"):
+            pass
+    # Línea truncada de un worker interrumpido
+    with open(worker.spool_path(), "a", encoding="utf-8") as f:
+        f.write('{"name": "GBP')
+
+    path = parent.export_chrome_trace(str(tmp_path / "out" / "trace.json"))
+    with open(path, encoding="utf-8") as f:
+        trace = json.load(f)
+    events = trace["traceEvents"]
+    names = {e["pid"]: e["args"]["name"] for e in events if e["ph"] == "M"}
+    assert names == {parent.pid: "pipeline", worker.pid: f"worker {worker.pid}"}
+    spans = [e for e in events if e["ph"] == "X"]
+    assert [(e["name"], e["pid"]) for e in spans] == [("run", parent.pid), ("EURUSD", worker.pid)]
+    assert trace["otherData"] == {"run_id": "run"}
@@ -0,0 +1,155 @@
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+# Escalas predefinidas: brokers, símbolos por broker y barras H1 por símbolo. El resto de
+# temporalidades se generan en proporción (H4 = H1/4, D1 = H1/24, ...).
+SCALES = {
+    "small": {"brokers": 2, "symbols": 5, "h1_bars": 2000},
+    "medium": {"brokers": 3, "symbols": 20, "h1_bars": 20000},
+    "large": {"brokers": 5, "symbols": 60, "h1_bars": 60000},
+}
+BROKERS = ["Oanda", "Darwinex", "Pepperstone", "Tickmill", "Dukascopy"]
+CURRENCIES = ["EUR", "USD", "GBP", "JPY", "CHF", "AUD", "NZD", "CAD", "SEK", "NOK"]
+# Sufijos de cuenta por broker (los elimina SymbolCanonicalizer)
+BROKER_SUFFIXES = {"Oanda": "", "Darwinex": "", "Pepperstone": ".a", "Tickmill": ".pro", "Dukascopy": ""}
+TIMEFRAME_HOURS = {"H1": 1, "H4": 4, "D1": 24, "W1": 120, "MN1": 520}
+TIMEFRAME_STEPS = {"H1": "1h", "H4": "4h", "D1": "1D", "W1": "7D", "MN1": "30D"}
+START = pd.Timestamp("2015-01-01")
+RAW_COLUMNS = ["time", "open", "high", "low", "close", "tick_volume", "spread", "real_volume", "timeframe"]
+
+
+def scale_config(scale: str = "small", brokers: int = None, symbols: int = None, h1_bars: int = None,
+                 duplicate_fraction: float = 0.01, seed: int = 42) -> dict:
+    """Configuración del dataset: una escala predefinida con los valores indicados sobrescritos."""
+    if scale not in SCALES:
+        raise ValueError(f"Escala desconocida: {scale}. Opciones: {', '.join(SCALES)}")
+    config = dict(SCALES[scale], scale=scale, duplicate_fraction=duplicate_fraction, seed=seed)
+    for key, value in (("brokers", brokers), ("symbols", symbols), ("h1_bars", h1_bars)):
+        if value is not None:
+            config[key] = value
+    if not 1 <= config["brokers"] <= len(BROKERS):
+        raise ValueError(f"El número de brokers debe estar entre 1 y {len(BROKERS)}.")
+    return config
+
+
+def symbol_names(n: int) -> list:
+    """n pares de divisas distintos (EURUSD, EURGBP, ...)."""
+    pairs = [a + b for a in CURRENCIES for b in CURRENCIES if a != b]
+    if n > len(pairs):
+        raise ValueError(f"Como máximo {len(pairs)} símbolos sintéticos.")
+    return pairs[:n]
+
+
+def _bars(rng: np.random.Generator, n: int, timeframe: str, digits: int, base_price: float) -> pd.DataFrame:
+    """Barras OHLC con paseo aleatorio redondeadas a los decimales del símbolo."""
+    time = pd.date_range(START, periods=n, freq=TIMEFRAME_STEPS[timeframe])
+    step = 0.0005 * np.sqrt(TIMEFRAME_HOURS[timeframe])
+    close = base_price * np.exp(np.cumsum(rng.normal(0, step, n)))
+    open_ = np.concatenate(([base_price], close[:-1]))
+    spread_range = np.abs(rng.normal(0, step, n)) * base_price
+    high = np.maximum(open_, close) + spread_range
+    low = np.minimum(open_, close) - spread_range
+    return pd.DataFrame({
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "open": open_.round(digits),
+        "high": high.round(digits),
+        "low": low.round(digits),
+        "close": close.round(digits),
+        "tick_volume": rng.integers(1, 5000, n),
+        "spread": rng.integers(0, 30, n),
+        "real_volume": 0,
+        "timeframe": timeframe,
+    })
+
+
+def generate_raw(root: str, config: dict) -> dict:
+    """
+    Genera la estructura de entrada de DataCleaner: root/raw/<broker>/<símbolo>.csv con todas
+    las temporalidades, más symbols_metadata.json por broker. Una fracción duplicate_fraction
+    de las barras se repite para que la detección de duplicados tenga trabajo.
+
+    Returns:
+        dict: {"raw_dir": ..., "rows": filas escritas}
+    """
+    rng = np.random.default_rng(config["seed"])
+    raw_dir = os.path.join(root, "raw")
+    rows = 0
+    for broker in BROKERS[:config["brokers"]]:
+        broker_dir = os.path.join(raw_dir, broker)
+        os.makedirs(broker_dir, exist_ok=True)
+        metadata = []
+        for symbol in symbol_names(config["symbols"]):
+            digits = 3 if "JPY" in symbol else 5
+            base_price = 110.0 if digits == 3 else 1.1
+            frames = []
+            for timeframe, hours in TIMEFRAME_HOURS.items():
+                n = max(config["h1_bars"] // hours, 1)
+                frames.append(_bars(rng, n, timeframe, digits, base_price))
+            df = pd.concat(frames, ignore_index=True)
+            n_duplicates = int(len(df) * config["duplicate_fraction"])
+            if n_duplicates:
+                df = pd.concat([df, df.sample(n_duplicates, random_state=config["seed"])], ignore_index=True)
+            name = symbol + BROKER_SUFFIXES[broker]
+            df[RAW_COLUMNS].to_csv(os.path.join(broker_dir, f"{name}.csv"), index=False)
+            metadata.append({"name": name, "digits": digits, "point": 10**-digits})
+            rows += len(df)
+        with open(os.path.join(broker_dir, "symbols_metadata.json"), "w", encoding="utf-8") as f:
+            json.dump(metadata, f)
+    return {"raw_dir": raw_dir, "rows": rows}
+
+
+def generate_reference_tables(root: str, config: dict) -> dict:
+    """
+    Genera las tablas de referencia: Table_Assets y Table_Broker (mapeo de ids del adaptador)
+    y los CSV de entrada de ETLProcessor.process_actives (activos, mercados y sectores).
+
+    Returns:
+        dict: Rutas de los CSV generados.
+    """
+    ref_dir = os.path.join(root, "reference")
+    os.makedirs(ref_dir, exist_ok=True)
+    symbols = symbol_names(config["symbols"])
+    brokers = BROKERS[:config["brokers"]]
+    sectors = ["majors", "crosses", "exotics"]
+
+    paths = {
+        "assets": os.path.join(ref_dir, "Table_Assets.csv"),
+        "brokers": os.path.join(ref_dir, "Table_Broker.csv"),
+        "actives": os.path.join(ref_dir, "symbol_info_procesado.csv"),
+        "market": os.path.join(ref_dir, "Table_market.csv"),
+        "sector": os.path.join(ref_dir, "Table_Sector.csv"),
+    }
+    pd.DataFrame({"activo_id": range(1, len(symbols) + 1), "simbolo": symbols}).to_csv(paths["assets"], index=False)
+    pd.DataFrame({"broker_id": range(1, len(brokers) + 1), "nombre": brokers}).to_csv(paths["brokers"], index=False)
+    pd.DataFrame({"nombre": ["forex"], "mercado_id": [1]}).to_csv(paths["market"], index=False)
+    pd.DataFrame({
+        "sector_id": range(1, len(sectors) + 1), "nombre": sectors, "mercado_id": 1,
+    }).to_csv(paths["sector"], index=False)
+
+    actives = []
+    for broker in brokers:
+        for i, symbol in enumerate(symbols):
+            actives.append({
+                "Broker": broker,
+                "Symbol": symbol + BROKER_SUFFIXES[broker],
+                "Description": f"{symbol[:3]} vs {symbol[3:]}",
+                "Currency": symbol[:3],
+                "Category": "Forex",
+                "Sector/Industry": sectors[i % len(sectors)],
+                "ISIN": "N/A",
+                "Pais": "N/A",
+                "mercado": "forex",
+                "sector": sectors[i % len(sectors)],
+            })
+    pd.DataFrame(actives).to_csv(paths["actives"], index=False)
+    return paths
+
+
+def generate(root: str, config: dict) -> dict:
+    """Genera el dataset completo en root y devuelve sus rutas y tamaño."""
+    os.makedirs(root, exist_ok=True)
+    raw = generate_raw(root, config)
+    return {**raw, "reference": generate_reference_tables(root, config)}
@@ -0,0 +1,341 @@
+"""
+Suite de benchmarks de las etapas del pipeline ETLQ sobre datasets sintéticos.
+
+Genera (o reutiliza) un dataset multi-broker de la escala indicada y ejecuta en orden:
+limpieza (DataCleaner.process), validación (DataFrameValidator), exportación
+(CSVToPostgresAdapter.export_dataframe), tabla de activos (ETLProcessor.process_actives),
+detección de duplicados (HashPartitionDeduplicator) y búsqueda por registro_id (con índice
+y por escaneo). Cada etapa se mide --repeat veces y se compara la mediana con la línea base
+versionada de baselines/<escala>.json; el proceso termina con código 1 si alguna etapa falla
+o empeora más de --threshold, o con --require-baseline si no hay una línea base comparable.
+
+Uso:
+    python run_benchmarks.py --scale small --require-baseline
+    python run_benchmarks.py --scale medium --repeat 5 --threshold 0.2
+    python run_benchmarks.py --scale small --update-baseline
+"""
+import os
+import sys
+import json
+import glob
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+import multiprocessing
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import datasets
+
+# Módulos de las etapas (test/src/ETLQ)
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ETLQ_DIR = os.path.abspath(os.path.join(BENCH_DIR, "..", "..", "ETLQ"))
+sys.path.append(ETLQ_DIR)
+sys.path.append(os.path.join(ETLQ_DIR, "Proccess", "modules", "Processor"))
+sys.path.append(os.path.join(ETLQ_DIR, "Load", "modules"))
+
+from DataClear import DataCleaner
+from Validation import DataFrameValidator
+from TL_table_Date_historic import CSVToPostgresAdapter
+from TL_table_sector_table_assets import ETLProcessor
+from duplicate_detector import HashPartitionDeduplicator
+from seacrh import search_by_registro_ids_efficient
+
+SCHEMA_VERSION = 1
+BASELINE_DIR = os.path.join(BENCH_DIR, "baselines")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+EXPORT_FILE = "Table_Datos_historicos.csv"
+DEDUP_KEYS = ["activo_id", "broker_id", "timestamp", "timeframe"]
+SEARCH_IDS = 1000
+
+
+def _count_rows(paths: list) -> int:
+    """Filas de datos (sin cabecera) de varios CSV contando saltos de línea en binario."""
+    total = 0
+    for path in paths:
+        with open(path, "rb") as f:
+            total += sum(block.count(b"\n") for block in iter(lambda: f.read(1 << 20), b"")) - 1
+    return total
+
+
+class BenchmarkContext:
+    """Rutas del dataset y de las salidas intermedias compartidas por las etapas."""
+
+    def __init__(self, root: str, dataset: dict):
+        self.root = root
+        self.raw_dir = dataset["raw_dir"]
+        self.reference = dataset["reference"]
+        self.processed_dir = os.path.join(root, "processed")
+        self.reports_dir = os.path.join(root, "reports")
+        self.export_dir = os.path.join(root, "export")
+        self.export_path = os.path.join(self.export_dir, EXPORT_FILE)
+        self.search_ids = None
+
+
+# Cada etapa: run(ctx) es lo que se mide; check(ctx, result) cuenta las filas procesadas y
+# lanza AssertionError si la salida no es la esperada (una etapa rota no cuenta como rápida).
+
+def run_clean(ctx):
+    return DataCleaner(ctx.raw_dir, ctx.processed_dir).process()
+
+
+def check_clean(ctx, result):
+    rows = _count_rows(result)
+    assert rows > 0, "La limpieza no generó filas."
+    return rows
+
+
+def run_validate(ctx):
+    return DataFrameValidator.validate_csv_files_and_report(ctx.processed_dir, ctx.reports_dir)
+
+
+def check_validate(ctx, result):
+    overall = pd.read_csv(result[0])
+    assert len(overall) and overall["overall_valid"].all(), "La validación marcó archivos como inválidos."
+    return _count_rows(glob.glob(os.path.join(ctx.processed_dir, "*.csv")))
+
+
+def run_export(ctx):
+    adapter = CSVToPostgresAdapter(
+        folder_path=ctx.processed_dir,
+        assets_df=pd.read_csv(ctx.reference["assets"]),
+        brokers_df=pd.read_csv(ctx.reference["brokers"]),
+    )
+    adapter.export_dataframe(ctx.export_dir, EXPORT_FILE, map_ids=True, index_block_rows=10000)
+
+
+def check_export(ctx, result):
+    rows = _count_rows([ctx.export_path])
+    assert rows > 0, "La exportación no generó filas."
+    rng = np.random.default_rng(0)
+    ctx.search_ids = sorted(rng.choice(np.arange(1, rows + 1), size=min(SEARCH_IDS, rows), replace=False).tolist())
+    return rows
+
+
+def run_actives(ctx):
+    ref = ctx.reference
+    output = os.path.join(ctx.export_dir, "Table_Assets.csv")
+    return ETLProcessor().process_actives(ref["actives"], ref["market"], ref["sector"], output)
+
+
+def check_actives(ctx, result):
+    assert len(result) > 0, "La tabla de activos está vacía."
+    return len(result)
+
+
+def run_dedup(ctx):
+    deduplicator = HashPartitionDeduplicator(ctx.export_path, DEDUP_KEYS, work_dir=ctx.root)
+    return deduplicator, deduplicator.run()
+
+
+def check_dedup(ctx, result):
+    deduplicator, plan = result
+    assert len(plan) > 0, "No se detectaron los duplicados sintéticos."
+    return deduplicator.rows_scanned
+
+
+def run_search_index(ctx):
+    return search_by_registro_ids_efficient(ctx.export_path, ctx.search_ids, use_index=True)
+
+
+def run_search_scan(ctx):
+    return search_by_registro_ids_efficient(ctx.export_path, ctx.search_ids, use_index=False)
+
+
+def check_search(ctx, result):
+    assert len(result) == len(ctx.search_ids), "La búsqueda no devolvió todos los registro_id."
+    return len(result)
+
+
+# Orden de ejecución: cada etapa usa las salidas de las anteriores
+STAGES = [
+    ("clean", run_clean, check_clean),
+    ("validate", run_validate, check_validate),
+    ("export", run_export, check_export),
+    ("actives", run_actives, check_actives),
+    ("dedup", run_dedup, check_dedup),
+    ("search_index", run_search_index, check_search),
+    ("search_scan", run_search_scan, check_search),
+]
+
+
+def prepare_dataset(work_dir: str, config: dict) -> dict:
+    """Genera el dataset o reutiliza el de work_dir si se creó con la misma configuración."""
+    manifest_path = os.path.join(work_dir, "dataset.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("config") == config:
+            return manifest["dataset"]
+    print(f"Generando dataset sintético en {work_dir} ...")
+    dataset = datasets.generate(work_dir, config)
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump({"config": config, "dataset": dataset}, f, indent=2)
+    return dataset
+
+
+def run_suite(ctx: BenchmarkContext, repeat: int) -> dict:
+    """Ejecuta todas las etapas repeat veces y devuelve sus estadísticas por etapa."""
+    timings = {name: [] for name, _, _ in STAGES}
+    rows = {}
+    failures = {}
+    for iteration in range(repeat):
+        for name, run, check in STAGES:
+            if name in failures:
+                continue
+            start = time.perf_counter()
+            try:
+                result = run(ctx)
+                elapsed = time.perf_counter() - start
+                rows[name] = check(ctx, result)
+            except Exception as e:  # pylint: disable=broad-except
+                failures[name] = f"{type(e).__name__}: {e}"
+                continue
+            timings[name].append(elapsed)
+            print(f"[{iteration + 1}/{repeat}] {name}: {elapsed:.3f} s ({rows[name]} filas)")
+    stages = {}
+    for name, values in timings.items():
+        if name in failures:
+            stages[name] = {"error": failures[name]}
+            continue
+        median = statistics.median(values)
+        stages[name] = {
+            "median_s": round(median, 4),
+            "min_s": round(min(values), 4),
+            "runs": len(values),
+            "rows": rows[name],
+            "rows_per_s": round(rows[name] / median, 1) if median > 0 else None,
+        }
+    return stages
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": multiprocessing.cpu_count(),
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float, min_delta: float) -> list:
+    """
+    Compara las medianas con la línea base. Una etapa empeora si tarda más de
+    (1 + threshold) veces la línea base y al menos min_delta segundos más.
+
+    Returns:
+        list: Mensajes de las etapas que fallan o empeoran (vacía si todo está bien).
+    """
+    problems = []
+    print(f"\n{'etapa':<14}{'base (s)':>10}{'actual (s)':>12}{'ratio':>8}")
+    for name, stats in current["stages"].items():
+        if "error" in stats:
+            problems.append(f"{name}: falló ({stats['error']})")
+            print(f"{name:<14}{'':>10}{'ERROR':>12}")
+            continue
+        base = baseline["stages"].get(name) if baseline else None
+        if not base or "median_s" not in base:
+            print(f"{name:<14}{'-':>10}{stats['median_s']:>12.3f}{'-':>8}")
+            continue
+        ratio = stats["median_s"] / base["median_s"] if base["median_s"] > 0 else float("inf")
+        regressed = ratio > 1 + threshold and stats["median_s"] - base["median_s"] >= min_delta
+        flag = "  REGRESIÓN" if regressed else ""
+        print(f"{name:<14}{base['median_s']:>10.3f}{stats['median_s']:>12.3f}{ratio:>8.2f}{flag}")
+        if regressed:
+            problems.append(f"{name}: {ratio:.2f}x la línea base (umbral {1 + threshold:.2f}x)")
+    return problems
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks de las etapas del pipeline ETLQ.")
+    parser.add_argument("--scale", default="small", choices=sorted(datasets.SCALES))
+    parser.add_argument("--brokers", type=int, help="Sobrescribe el número de brokers de la escala.")
+    parser.add_argument("--symbols", type=int, help="Sobrescribe los símbolos por broker de la escala.")
+    parser.add_argument("--h1-bars", type=int, help="Sobrescribe las barras H1 por símbolo de la escala.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=3, help="Ejecuciones por etapa (se usa la mediana).")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Empeoramiento relativo permitido respecto a la línea base.")
+    parser.add_argument("--min-delta", type=float, default=0.05,
+                        help="Diferencia mínima en segundos para considerar una regresión.")
+    parser.add_argument("--work-dir", help="Carpeta del dataset y de las salidas intermedias.")
+    parser.add_argument("--baseline", help="Línea base (por defecto baselines/<escala>.json).")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Guarda los resultados como nueva línea base.")
+    parser.add_argument("--require-baseline", action="store_true",
+                        help="Falla si no hay una línea base comparable (para CI).")
+    args = parser.parse_args(argv)
+
+    config = datasets.scale_config(args.scale, args.brokers, args.symbols, args.h1_bars, seed=args.seed)
+    custom = any(v is not None for v in (args.brokers, args.symbols, args.h1_bars))
+    label = args.scale if not custom else f"{args.scale}_b{config['brokers']}_s{config['symbols']}_h{config['h1_bars']}"
+    work_dir = args.work_dir or os.path.join(tempfile.gettempdir(), "hermesdb_bench", label)
+    baseline_path = args.baseline or os.path.join(BASELINE_DIR, f"{label}.json")
+
+    ctx = BenchmarkContext(work_dir, prepare_dataset(work_dir, config))
+    current = {
+        "schema_version": SCHEMA_VERSION,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "dataset": config,
+        "environment": environment(),
+        "stages": run_suite(ctx, args.repeat),
+    }
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    result_path = os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d_%H%M%S}_{label}.json")
+    with open(result_path, "w", encoding="utf-8") as f:
+        json.dump(current, f, indent=2)
+    print(f"Resultados: {result_path}")
+
+    baseline = None
+    if os.path.exists(baseline_path):
+        with open(baseline_path, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("schema_version") != SCHEMA_VERSION or baseline.get("dataset") != config:
+            print("La línea base es de otra versión o de otro dataset; no se compara.")
+            baseline = None
+        else:
+            base_env, env = baseline.get("environment", {}), current["environment"]
+            changed = [k for k in ("python", "pandas", "numpy", "platform", "cpu_count") if base_env.get(k) != env.get(k)]
+            if changed:
+                print(f"Aviso: la línea base se midió con otro entorno ({', '.join(changed)}).")
+    else:
+        print(f"Sin línea base en {baseline_path}.")
+
+    problems = compare(current, baseline, args.threshold, args.min_delta)
+    if baseline is None and args.require_baseline and not args.update_baseline:
+        problems.append(f"sin línea base comparable en {baseline_path} (grabarla con --update-baseline)")
+
+    if args.update_baseline:
+        if any("error" in stats for stats in current["stages"].values()):
+            print("No se actualiza la línea base: hay etapas con error.")
+        else:
+            os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+            with open(baseline_path, "w", encoding="utf-8") as f:
+                json.dump(current, f, indent=2)
+            print(f"Línea base actualizada: {baseline_path}")
+            return 0
+
+    if problems:
+        print("\nFALLO:")
+        for problem in problems:
+            print(f"  - {problem}")
+        return 1
+    print("\nOK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())